@@ -0,0 +1,87 @@
+"""add stable id primary key to agenda_items
+
+Revision ID: add_agenda_item_id
+Revises: add_package_fingerprint
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+import uuid
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_agenda_item_id'
+down_revision = 'add_package_fingerprint'
+branch_labels = None
+depends_on = None
+
+
+AGENDA_COLUMNS = ['meeting_id', 'position', 'title', 'files', 'reporter', 'duration_minutes', 'pages']
+
+
+def upgrade():
+    # 议程项原来以(meeting_id, position)为复合主键，SQLite不能直接修改主键，
+    # 因此新建表、为每个议程项生成ID后复制数据，再替换原表。
+    # 已有议程项的文件仍在agenda_<位置>文件夹中，文件信息中记录的路径保持有效，不移动文件。
+    op.create_table(
+        'agenda_items_new',
+        sa.Column('id', sa.String(), nullable=False),
+        sa.Column('meeting_id', sa.String(), nullable=False),
+        sa.Column('position', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(), nullable=True),
+        sa.Column('files', sa.JSON(), nullable=True),
+        sa.Column('reporter', sa.String(), nullable=True),
+        sa.Column('duration_minutes', sa.Integer(), nullable=True),
+        sa.Column('pages', sa.JSON(), nullable=True),
+        sa.ForeignKeyConstraint(['meeting_id'], ['meetings.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('meeting_id', 'title', name='uix_meeting_agenda_title')
+    )
+
+    connection = op.get_bind()
+    rows = connection.execute(sa.text(
+        f"SELECT {', '.join(AGENDA_COLUMNS)} FROM agenda_items ORDER BY meeting_id, position"
+    )).mappings().all()
+    for row in rows:
+        values = dict(row)
+        values['id'] = str(uuid.uuid4())
+        connection.execute(sa.text(
+            f"INSERT INTO agenda_items_new (id, {', '.join(AGENDA_COLUMNS)}) "
+            f"VALUES (:id, {', '.join(':' + column for column in AGENDA_COLUMNS)})"
+        ), values)
+
+    op.drop_table('agenda_items')
+    op.rename_table('agenda_items_new', 'agenda_items')
+
+    op.create_index(op.f('ix_agenda_items_id'), 'agenda_items', ['id'], unique=False)
+    op.create_index(op.f('ix_agenda_items_meeting_id'), 'agenda_items', ['meeting_id'], unique=False)
+    op.create_index(op.f('ix_agenda_items_position'), 'agenda_items', ['position'], unique=False)
+    op.create_index(op.f('ix_agenda_items_title'), 'agenda_items', ['title'], unique=False)
+
+
+def downgrade():
+    # 恢复以(meeting_id, position)为复合主键的议程项表
+    op.create_table(
+        'agenda_items_old',
+        sa.Column('meeting_id', sa.String(), nullable=False),
+        sa.Column('position', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(), nullable=True),
+        sa.Column('files', sa.JSON(), nullable=True),
+        sa.Column('reporter', sa.String(), nullable=True),
+        sa.Column('duration_minutes', sa.Integer(), nullable=True),
+        sa.Column('pages', sa.JSON(), nullable=True),
+        sa.ForeignKeyConstraint(['meeting_id'], ['meetings.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('meeting_id', 'position'),
+        sa.UniqueConstraint('meeting_id', 'title', name='uix_meeting_agenda_title')
+    )
+
+    op.execute(
+        f"INSERT INTO agenda_items_old ({', '.join(AGENDA_COLUMNS)}) "
+        f"SELECT {', '.join(AGENDA_COLUMNS)} FROM agenda_items"
+    )
+
+    op.drop_table('agenda_items')
+    op.rename_table('agenda_items_old', 'agenda_items')
+    op.create_index(op.f('ix_agenda_items_title'), 'agenda_items', ['title'], unique=False)
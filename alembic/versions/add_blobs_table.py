@@ -0,0 +1,35 @@
+"""add blobs table for content-addressed file store
+
+Revision ID: add_blobs_table
+Revises: add_package_path
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_blobs_table'
+down_revision = 'add_package_path'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 创建内容寻址存储表
+    op.create_table(
+        'blobs',
+        sa.Column('sha256', sa.String(), nullable=False),
+        sa.Column('size', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('refcount', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('created_at', sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint('sha256')
+    )
+    op.create_index(op.f('ix_blobs_sha256'), 'blobs', ['sha256'], unique=False)
+
+
+def downgrade():
+    # 删除内容寻址存储表
+    op.drop_index(op.f('ix_blobs_sha256'), table_name='blobs')
+    op.drop_table('blobs')
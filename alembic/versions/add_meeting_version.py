@@ -0,0 +1,26 @@
+"""add version to meetings
+
+Revision ID: add_meeting_version
+Revises: add_agenda_item_id
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_meeting_version'
+down_revision = 'add_agenda_item_id'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 添加version字段到meetings表，记录会议数据的单调递增版本号，客户端只刷新版本变化的会议
+    op.add_column('meetings', sa.Column('version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    # 删除version字段
+    op.drop_column('meetings', 'version')
@@ -0,0 +1,26 @@
+"""add package_fingerprint to meetings
+
+Revision ID: add_package_fingerprint
+Revises: add_blobs_table
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_package_fingerprint'
+down_revision = 'add_blobs_table'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 添加package_fingerprint字段到meetings表，记录预生成ZIP包对应的会议文件指纹
+    op.add_column('meetings', sa.Column('package_fingerprint', sa.String(), nullable=True))
+
+
+def downgrade():
+    # 删除package_fingerprint字段
+    op.drop_column('meetings', 'package_fingerprint')
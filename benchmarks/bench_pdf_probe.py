@@ -0,0 +1,260 @@
+"""
+PDF元数据探测基准测试，比较PDFProbe与fitz.open获取页数的耗时和结果
+
+用法：
+    python benchmarks/bench_pdf_probe.py [目录或PDF文件 ...] [--synthetic 数量] [--repeat 次数]
+
+未指定路径时使用uploads目录中的所有PDF文件。--synthetic会在临时目录中用fitz生成多种结构的PDF：
+传统xref表、对象流和xref流、线性化、增量更新，以及截断的损坏文件和加密文件（用于检查退回fitz的路径）。
+另外手工构造/Count和xref流/Length为间接引用的文件（用于检查多位数的间接引用不会被误读为整数）。
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+from typing import Dict, List
+
+# 获取项目根目录
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.insert(0, project_root)
+
+# 上传目录
+UPLOAD_DIR = os.path.join(project_root, "uploads")
+
+# 生成的合成PDF的结构
+SYNTHETIC_VARIANTS = (
+    "plain", "compressed", "linearized", "incremental", "truncated",
+    "encrypted", "indirect_count", "indirect_length"
+)
+
+
+def collect_pdfs(paths: List[str]) -> List[str]:
+    """收集目录中的所有PDF文件（跳过暂存和备份文件）"""
+    pdf_files = []
+    for path in paths:
+        if os.path.isfile(path):
+            pdf_files.append(path)
+            continue
+        for root, _, files in os.walk(path):
+            for file in files:
+                if file.lower().endswith(".pdf"):
+                    pdf_files.append(os.path.join(root, file))
+    return sorted(pdf_files)
+
+
+def _write_indirect_pdf(path: str, page_count: int, variant: str):
+    """
+    手工构造引用值为多位数间接引用的PDF
+
+    indirect_count: 传统xref表，页面树根节点为 /Count N 0 R
+    indirect_length: 页面树根节点在对象流中，对象流为 /Length N 0 R，使用xref流
+    """
+    # 页面对象从12开始编号，保证间接引用的对象编号是多位数
+    kids = b" ".join(b"%d 0 R" % (12 + index) for index in range(page_count))
+    count_number = 12 + page_count
+    objects = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    }
+    for index in range(page_count):
+        objects[12 + index] = b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] >>"
+    if variant == "indirect_count":
+        objects[count_number] = b"%d" % page_count
+        pages = b"<< /Type /Pages /Kids [" + kids + b"] /Count %d 0 R >>" % count_number
+    else:
+        pages = b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % page_count
+
+    data = bytearray(b"%PDF-1.5\n%\xe2\xe3\xcf\xd3\n")
+    entries = {}  # 对象编号 -> xref条目（类型, 字段2, 字段3）
+
+    def write_object(number: int, body: bytes):
+        entries[number] = (1, len(data), 0)
+        data.extend(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+
+    if variant == "indirect_count":
+        objects[2] = pages
+        for number in sorted(objects):
+            write_object(number, objects[number])
+        size = max(entries) + 1
+        xref_offset = len(data)
+        data.extend(b"xref\n0 %d\n0000000000 65535 f \n" % size)
+        for number in range(1, size):
+            if number in entries:
+                data.extend(b"%010d 00000 n \n" % entries[number][1])
+            else:
+                data.extend(b"0000000000 65535 f \n")
+        data.extend(b"trailer\n<< /Size %d /Root 1 0 R >>\n" % size)
+    else:
+        for number in sorted(objects):
+            write_object(number, objects[number])
+        objstm_number = count_number + 40
+        length_number = count_number + 45
+        header = b"2 0 "
+        objstm_data = header + pages
+        write_object(objstm_number, b"<< /Type /ObjStm /N 1 /First %d /Length %d 0 R >>\nstream\n"
+                     % (len(header), length_number) + objstm_data + b"\nendstream")
+        write_object(length_number, b"%d" % len(objstm_data))
+        entries[2] = (2, objstm_number, 0)
+
+        # xref流：W [1 4 2]，字典中的值必须是直接对象
+        xref_number = length_number + 1
+        xref_offset = len(data)
+        entries[xref_number] = (1, xref_offset, 0)
+        size = xref_number + 1
+        rows = bytearray()
+        for number in range(size):
+            kind, field2, field3 = entries.get(number, (0, 0, 65535))
+            rows += bytes([kind]) + field2.to_bytes(4, "big") + field3.to_bytes(2, "big")
+        data.extend(b"%d 0 obj\n<< /Type /XRef /Size %d /W [1 4 2] /Root 1 0 R /Length %d >>\nstream\n"
+                    % (xref_number, size, len(rows)) + bytes(rows) + b"\nendstream\nendobj\n")
+
+    data.extend(b"startxref\n%d\n%%%%EOF\n" % xref_offset)
+    with open(path, "wb") as f:
+        f.write(bytes(data))
+
+
+def _save_variant(fitz, pdf_document, path: str, variant: str):
+    """按指定结构保存合成PDF，当前PyMuPDF不支持的选项会被忽略"""
+    if variant == "compressed":
+        try:
+            pdf_document.save(path, garbage=4, deflate=True, use_objstms=1)
+        except TypeError:
+            pdf_document.save(path, garbage=4, deflate=True)
+    elif variant == "linearized":
+        try:
+            pdf_document.save(path, garbage=4, deflate=True, linear=True)
+        except Exception:
+            # 较新的PyMuPDF不再支持线性化
+            pdf_document.save(path, garbage=4, deflate=True)
+    elif variant == "encrypted":
+        # 用户密码为空，fitz无需密码即可打开，探测应识别为加密并退回fitz
+        pdf_document.save(path, encryption=fitz.PDF_ENCRYPT_AES_256, owner_pw="owner", user_pw="")
+    else:
+        pdf_document.save(path)
+
+    if variant == "incremental":
+        # 增量更新：追加一页，新的xref段通过/Prev指向原来的xref
+        with fitz.open(path) as updated:
+            updated.new_page()
+            updated.save(path, incremental=True, encryption=fitz.PDF_ENCRYPT_KEEP)
+    elif variant == "truncated":
+        # 删除文件尾，startxref丢失，探测应失败并退回fitz
+        with open(path, "r+b") as f:
+            size = os.fstat(f.fileno()).st_size
+            f.truncate(max(size - 256, size // 2))
+
+
+def generate_synthetic(count: int, output_dir: str) -> List[str]:
+    """生成合成PDF，页数和结构轮流变化"""
+    import fitz  # PyMuPDF
+
+    paths = []
+    for i in range(count):
+        variant = SYNTHETIC_VARIANTS[i % len(SYNTHETIC_VARIANTS)]
+        page_count = 1 + (i * 7) % 120
+        path = os.path.join(output_dir, f"synthetic_{i:05d}_{variant}.pdf")
+        if variant.startswith("indirect_"):
+            _write_indirect_pdf(path, page_count, variant)
+            paths.append(path)
+            continue
+
+        pdf_document = fitz.open()
+        for page_number in range(page_count):
+            page = pdf_document.new_page()
+            page.insert_text((72, 72), f"Synthetic {i} / page {page_number + 1}")
+        _save_variant(fitz, pdf_document, path, variant)
+        pdf_document.close()
+        paths.append(path)
+    return paths
+
+
+def fitz_page_count(pdf_path: str):
+    """使用fitz打开文档获取页数，失败时返回None"""
+    import fitz  # PyMuPDF
+
+    try:
+        with fitz.open(pdf_path) as pdf_document:
+            return len(pdf_document)
+    except Exception:
+        return None
+
+
+def run_benchmark(pdf_files: List[str], repeat: int):
+    """对每个文件分别使用PDFProbe和fitz获取页数，输出耗时和不一致的结果"""
+    from services.pdf_probe import PDFProbe
+
+    methods: Dict[str, int] = {}
+    mismatches = []
+    probe_results = {}
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for pdf_path in pdf_files:
+            probe_results[pdf_path] = PDFProbe.get_info_sync(pdf_path)
+    probe_seconds = time.perf_counter() - start
+
+    fitz_results = {}
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for pdf_path in pdf_files:
+            fitz_results[pdf_path] = fitz_page_count(pdf_path)
+    fitz_seconds = time.perf_counter() - start
+
+    for pdf_path in pdf_files:
+        info = probe_results[pdf_path]
+        method = info["method"] if info else "failed"
+        methods[method] = methods.get(method, 0) + 1
+        probe_count = info["page_count"] if info else None
+        if probe_count != fitz_results[pdf_path]:
+            mismatches.append((pdf_path, probe_count, fitz_results[pdf_path]))
+
+    total = len(pdf_files) * repeat
+    print(f"\n文件数量: {len(pdf_files)}，重复次数: {repeat}")
+    print(f"PDFProbe: {probe_seconds:.3f} 秒，{total / probe_seconds if probe_seconds else 0:.0f} 个文件/秒")
+    print(f"fitz.open: {fitz_seconds:.3f} 秒，{total / fitz_seconds if fitz_seconds else 0:.0f} 个文件/秒")
+    if probe_seconds:
+        print(f"加速比: {fitz_seconds / probe_seconds:.1f}x")
+    print(f"获取方式: {methods}")
+
+    if mismatches:
+        print(f"\n页数不一致的文件 ({len(mismatches)} 个):")
+        for pdf_path, probe_count, fitz_count in mismatches:
+            print(f"- {pdf_path}: PDFProbe={probe_count}, fitz={fitz_count}")
+    else:
+        print("所有文件的页数与fitz一致")
+
+    return not mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="比较PDFProbe与fitz.open获取PDF页数的性能")
+    parser.add_argument("paths", nargs="*", help="PDF文件或目录，默认使用uploads目录")
+    parser.add_argument("--synthetic", type=int, default=0, help="额外生成的合成PDF数量")
+    parser.add_argument("--repeat", type=int, default=1, help="每个文件重复测试的次数")
+    args = parser.parse_args()
+
+    paths = args.paths or ([UPLOAD_DIR] if os.path.isdir(UPLOAD_DIR) else [])
+    pdf_files = collect_pdfs(paths)
+
+    synthetic_dir = None
+    try:
+        if args.synthetic > 0:
+            synthetic_dir = tempfile.mkdtemp(prefix="pdf_probe_bench_")
+            print(f"生成 {args.synthetic} 个合成PDF: {synthetic_dir}")
+            pdf_files += generate_synthetic(args.synthetic, synthetic_dir)
+
+        if not pdf_files:
+            print("没有找到PDF文件，请指定目录或使用--synthetic生成")
+            return 1
+
+        return 0 if run_benchmark(pdf_files, max(args.repeat, 1)) else 1
+    finally:
+        if synthetic_dir:
+            shutil.rmtree(synthetic_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,3 +1,5 @@
+from sqlalchemy import Integer, cast, func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
 import models, schemas
 from passlib.context import CryptContext
@@ -138,6 +140,7 @@ def create_meeting(db: Session, meeting: schemas.MeetingCreate):
 
     for position, item_data in enumerate(meeting.part, start=1):
         db_item = models.AgendaItem(
+            id=item_data.id or str(uuid.uuid4()),
             title=item_data.title,
             files=item_data.files,
             pages=item_data.pages,
@@ -162,7 +165,7 @@ def update_meeting_status(db: Session, meeting_id: str, status: str):
     return db_meeting
 
 def update_meeting(db: Session, meeting_id: str, meeting_update: schemas.MeetingUpdate):
-    """更新会议信息，包括其议程项（采用删除旧项，添加新项的策略）"""
+    """更新会议信息，包括其议程项（按差异只插入、修改、移动和删除变化的议程项）"""
     db_meeting = db.query(models.Meeting).filter(models.Meeting.id == meeting_id).first()
     if db_meeting:
         # 1. Update basic meeting attributes
@@ -180,10 +183,6 @@ def update_meeting(db: Session, meeting_id: str, meeting_update: schemas.Meeting
             if not agenda_items_data or len(agenda_items_data) == 0:
                 raise ValueError("会议必须至少包含一个议程项")
 
-            # Delete existing agenda items for this meeting
-            db.query(models.AgendaItem).filter(models.AgendaItem.meeting_id == meeting_id).delete()
-            db.flush() # Ensure deletes happen before adds in this transaction
-
             # 首先检查同一会议下是否有重复的议程项标题
             titles = [item.get('title') for item in agenda_items_data]
             duplicate_titles = [title for title in titles if titles.count(title) > 1]
@@ -195,27 +194,76 @@ def update_meeting(db: Session, meeting_id: str, meeting_update: schemas.Meeting
             # 这样可以允许用户只更新会议的基本信息，而不影响文件
             # 如果需要强制要求文件，可以在前端进行验证
 
-            # Create new agenda items from the provided data
-            for position, item_data_dict in enumerate(agenda_items_data, start=1):
-                # Convert dict back to Pydantic model for potential validation/defaults
-                item_data = schemas.AgendaItemCreate(**item_data_dict)
-                db_item = models.AgendaItem(
-                    title=item_data.title,
-                    reporter=item_data.reporter,
-                    duration_minutes=item_data.duration_minutes,
-                    files=item_data.files,
-                    pages=item_data.pages,
-                    meeting_id=meeting_id, # Associate with the current meeting
-                    position=position # Set the position based on the order in the list
-                )
-                db.add(db_item)
+            # Convert dicts back to Pydantic models for potential validation/defaults
+            agenda_items = [schemas.AgendaItemCreate(**item_data_dict) for item_data_dict in agenda_items_data]
+            apply_agenda_diff(db, meeting_id, agenda_items)
 
         # 3. Commit changes and refresh
         db.commit()
-        db.refresh(db_meeting) # Refresh to load the newly added agenda items
+        db.refresh(db_meeting) # Refresh to load the changed agenda items
 
     return db_meeting
 
+def apply_agenda_diff(db: Session, meeting_id: str, agenda_items: list):
+    """
+    按差异更新会议的议程项，未变化的议程项不会被改写（调用方负责提交）
+
+    议程项以稳定的ID为主键，移动议程项只修改position；标题在会议内唯一，改名时先改为临时标题
+    再改为最终标题，避免议程项互换标题时违反约束。
+
+    Args:
+        db: 数据库会话
+        meeting_id: 会议ID
+        agenda_items: 提交的议程项列表，按顺序排列
+
+    Returns:
+        AgendaDiff: 应用的议程项差异
+    """
+    from services.agenda_diff import AgendaDiff
+
+    stored_items = db.query(models.AgendaItem).filter(models.AgendaItem.meeting_id == meeting_id).all()
+    diff = AgendaDiff.compute(stored_items, agenda_items)
+    print(f"会议 {meeting_id} 议程项差异: {diff.summary()}")
+    if diff.is_empty():
+        return diff
+
+    by_id = {item.id: item for item in stored_items}
+
+    # 删除不再存在的议程项
+    for change in diff.deleted:
+        db.delete(by_id[change.item_id])
+    db.flush()
+
+    # 改名的议程项先改为临时标题
+    renamed = [change for change in diff.updated if "title" in change.changed_fields]
+    for change in renamed:
+        db_item = by_id[change.item_id]
+        db_item.title = f"__renaming_{change.item_id}__{db_item.title}"
+    if renamed:
+        db.flush()
+
+    # 写入最终的位置和变化的字段
+    for change in diff.changes:
+        if change.is_insert or change.is_delete:
+            continue
+        db_item = by_id[change.item_id]
+        db_item.position = change.new_position
+        for field in change.changed_fields:
+            setattr(db_item, field, change.values[field])
+    db.flush()
+
+    # 插入新增的议程项
+    for change in diff.inserted:
+        db_item = models.AgendaItem(
+            id=change.item_id or str(uuid.uuid4()),
+            meeting_id=meeting_id, # Associate with the current meeting
+            position=change.new_position, # Set the position based on the order in the list
+            **change.values
+        )
+        db.add(db_item)
+
+    return diff
+
 def delete_meeting(db: Session, meeting_id: str):
     """删除会议（包括其所有议程项）"""
     db_meeting = db.query(models.Meeting).filter(models.Meeting.id == meeting_id).first()
@@ -265,11 +313,61 @@ def update_meeting_status(db: Session, meeting_id: str, status: str):
     db.refresh(db_meeting)
     return db_meeting
 
-def update_meeting_change_status_token(db: Session):
-    """更新会议变更状态识别码"""
+def get_meeting_version_high_water(db: Session):
+    """获取会议版本高水位，即所有会议版本号中曾经出现过的最大值（删除会议后不会减小）"""
+    setting = db.query(models.SystemSetting).filter(models.SystemSetting.key == "meeting_version_high_water").first()
+    return int(setting.value) if setting and setting.value.isdigit() else 0
+
+def bump_meeting_version(db: Session, meeting_id: str, commit: bool = True):
+    """
+    递增会议版本号
+
+    会议的新版本号取全局高水位加1，因此版本号在所有会议之间单调递增，
+    客户端记录上次看到的高水位后，只需刷新版本号大于该值的会议。
+
+    Args:
+        db: 数据库会话
+        meeting_id: 会议ID
+        commit: 是否提交事务，为False时由调用方提交
+
+    Returns:
+        int: 会议的新版本号，会议不存在时返回None
+    """
+    db_meeting = db.query(models.Meeting).filter(models.Meeting.id == meeting_id).first()
+    if not db_meeting:
+        return None
+
+    # 在一条语句中读取并递增高水位，并发递增时每个会议得到不同的版本号；
+    # 高水位记录丢失时（如旧数据库），至少大于该会议当前的版本号，保证不会回退
+    current_version = db_meeting.version or 0
+    setting_value = models.SystemSetting.value
+    stmt = sqlite_insert(models.SystemSetting).values(
+        key="meeting_version_high_water", value=str(current_version + 1)
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[models.SystemSetting.key],
+        set_={"value": func.max(cast(setting_value, Integer), current_version) + 1}
+    ).returning(setting_value)
+    new_version = int(db.execute(stmt).scalar_one())
+    db_meeting.version = new_version
+
+    if commit:
+        db.commit()
+    print(f"[版本] 会议 {meeting_id} 版本号更新为 {new_version}")
+    return new_version
+
+def update_meeting_change_status_token(db: Session, meeting_id: str = None):
+    """
+    更新会议变更状态识别码
+
+    指定meeting_id时同时递增该会议的版本号，客户端可按会议版本号只刷新发生变化的会议。
+    """
     token = db.query(models.SystemSetting).filter(models.SystemSetting.key == "meeting_change_status_token").first()
     old_token_value = token.value if token else None
 
+    if meeting_id:
+        bump_meeting_version(db, meeting_id, commit=False)
+
     # 生成新的识别码，确保与旧的不同
     new_token_value = str(uuid.uuid4())
     # 极少数情况下可能生成相同的UUID，确保生成的新值与旧值不同
@@ -313,11 +411,15 @@ def get_system_setting(db: Session, key: str, default_value: str = None):
     setting = db.query(models.SystemSetting).filter(models.SystemSetting.key == key).first()
     if not setting:
         if default_value is not None:
-            # 如果提供了默认值，创建新设置
-            new_setting = models.SystemSetting(key=key, value=default_value)
-            db.add(new_setting)
+            # 如果提供了默认值，创建新设置；并发请求可能同时创建同一设置项，已存在时保留先写入的值
+            db.execute(
+                sqlite_insert(models.SystemSetting)
+                .values(key=key, value=default_value)
+                .on_conflict_do_nothing(index_elements=[models.SystemSetting.key])
+            )
             db.commit()
-            return default_value
+            setting = db.query(models.SystemSetting).filter(models.SystemSetting.key == key).first()
+            return setting.value if setting else default_value
         return None
     return setting.value
 
@@ -342,3 +444,65 @@ def update_system_setting(db: Session, key: str, value: str):
     db.commit()
     db.refresh(setting)
     return setting.value
+
+# --- Blob CRUD ---
+
+def get_blob(db: Session, sha256: str):
+    """
+    获取内容存储记录
+
+    Args:
+        db: 数据库会话
+        sha256: 文件内容的SHA-256哈希
+
+    Returns:
+        models.Blob: 存储记录，不存在时返回None
+    """
+    return db.query(models.Blob).filter(models.Blob.sha256 == sha256).first()
+
+def get_blobs(db: Session):
+    """获取所有内容存储记录"""
+    return db.query(models.Blob).all()
+
+def upsert_blob(db: Session, sha256: str, size: int, refcount: int, created_at: str = None):
+    """
+    创建或更新内容存储记录
+
+    Args:
+        db: 数据库会话
+        sha256: 文件内容的SHA-256哈希
+        size: 文件大小（字节）
+        refcount: 当前引用计数
+        created_at: 首次存储时间，仅在创建时使用
+
+    Returns:
+        models.Blob: 更新后的存储记录
+    """
+    blob = get_blob(db, sha256)
+    if blob:
+        blob.size = size
+        blob.refcount = refcount
+    else:
+        blob = models.Blob(sha256=sha256, size=size, refcount=refcount, created_at=created_at)
+        db.add(blob)
+    db.commit()
+    db.refresh(blob)
+    return blob
+
+def delete_blob(db: Session, sha256: str):
+    """
+    删除内容存储记录
+
+    Args:
+        db: 数据库会话
+        sha256: 文件内容的SHA-256哈希
+
+    Returns:
+        bool: 删除成功返回True，记录不存在返回False
+    """
+    blob = get_blob(db, sha256)
+    if blob:
+        db.delete(blob)
+        db.commit()
+        return True
+    return False
@@ -1,3 +1,7 @@
+# 启动耗时分析需要在导入其他模块之前开始
+from services.startup_profiler import StartupProfiler
+StartupProfiler.start()
+
 from fastapi import FastAPI, Request
 from fastapi.responses import HTMLResponse
 from fastapi.staticfiles import StaticFiles
@@ -6,6 +10,7 @@ import os
 import sys
 import asyncio
 from datetime import datetime
+from typing import Optional
 
 # 导入数据库相关模块
 import models, crud
@@ -13,6 +18,77 @@ from database import SessionLocal, engine
 
 # 导入文件服务
 from services.file_service import FileService
+from services.package_builder import PackageBuilder
+
+# 数据库初始化（建表和结构升级）是否已成功完成，完成之前API请求返回503
+database_ready: bool = False
+# 数据库初始化失败的原因，失败后API请求返回503，依赖数据库的后台任务不会启动
+database_init_error: Optional[str] = None
+
+# 数据库初始化进行中时，建议客户端重试的等待时间（秒）
+DATABASE_INIT_RETRY_AFTER_SECONDS = 5
+
+
+def initialize_database_sync():
+    """
+    初始化数据库：创建缺少的表、升级已有表的结构、初始化系统用户和会议变更状态识别码
+
+    每一步都是幂等的（已存在的表、用户和识别码不会被修改），在服务开始接受请求后于后台执行，
+    创建默认用户时的密码哈希不会推迟服务启动。
+    """
+    with StartupProfiler.phase("检查并升级数据库结构"):
+        from services.schema_upgrade import SchemaUpgrade
+        models.Base.metadata.create_all(bind=engine)
+        SchemaUpgrade.upgrade_sync(engine, models.Base.metadata)
+
+    with StartupProfiler.phase("初始化系统用户"):
+        from seed_users import seed_users
+        seed_users()
+
+    with StartupProfiler.phase("初始化会议变更状态识别码"):
+        with SessionLocal() as db:
+            crud.get_meeting_change_status_token(db)  # 确保存在初始识别码
+
+
+async def initialize_database() -> bool:
+    """
+    在后台线程中初始化数据库，完成后输出启动耗时报告（如果启用）
+
+    Returns:
+        bool: 初始化成功返回True；失败时记录原因，之后的API请求返回503
+    """
+    global database_ready, database_init_error
+    from services.async_utils import AsyncUtils, EXECUTOR_CONTROL
+
+    try:
+        await AsyncUtils.run_in_executor(EXECUTOR_CONTROL, initialize_database_sync)
+        print(f"[{datetime.now()}] 数据库初始化完成")
+        database_ready = True
+        success = True
+    except Exception as e:
+        import traceback
+        database_init_error = str(e)
+        print(f"[{datetime.now()}] 数据库初始化失败，API请求将返回503，请检查数据库后重启服务: {str(e)}")
+        print(traceback.format_exc())
+        success = False
+    StartupProfiler.mark("数据库初始化完成")
+    StartupProfiler.print_report()
+    return success
+
+
+async def run_after_database_init(database_init_task: asyncio.Task, task_func):
+    """
+    等待数据库初始化完成后再运行后台任务，避免新数据库中的表尚未创建时读取系统设置
+
+    Args:
+        database_init_task (asyncio.Task): 数据库初始化任务
+        task_func: 后台任务函数
+    """
+    if not await asyncio.shield(database_init_task):
+        print(f"[{datetime.now()}] 数据库初始化失败，不启动后台任务: {task_func.__qualname__}")
+        return
+    await task_func()
+
 
 # 定义应用生命周期管理器
 @asynccontextmanager
@@ -23,26 +99,33 @@ async def lifespan(app: FastAPI):
     在FastAPI应用启动时创建后台任务，并在应用关闭时清理资源。
     1. FileService.background_cleanup_task: 定期清理临时文件
     2. FileService.background_cleanup_meetings_task: 定期清理孤立的会议文件夹
-    3. 节点管理器后台任务: 定期检查节点状态
+    3. PackageBuilder.background_prebuild_task: 为即将开始的会议预生成文件包
+    4. 节点管理器后台任务: 定期检查节点状态
 
-    同时初始化会议变更状态识别码，确保系统正常运行。
+    数据库表检查、系统用户和会议变更状态识别码的初始化在后台执行，服务无需等待即可开始接受请求，
+    初始化完成之前API请求返回503。
     """
     # 启动时执行的代码
     print(f"[{datetime.now()}] 临时文件自动清理服务已启动")
 
+    # 在后台初始化数据库
+    database_init_task = asyncio.create_task(initialize_database())
+
     # 创建任务并保存引用，以便在应用关闭时取消
-    cleanup_task = asyncio.create_task(FileService.background_cleanup_task())
-    meetings_cleanup_task = asyncio.create_task(FileService.background_cleanup_meetings_task())
+    cleanup_task = asyncio.create_task(
+        run_after_database_init(database_init_task, FileService.background_cleanup_task))
+    meetings_cleanup_task = asyncio.create_task(
+        run_after_database_init(database_init_task, FileService.background_cleanup_meetings_task))
+    package_prebuild_task = asyncio.create_task(
+        run_after_database_init(database_init_task, PackageBuilder.background_prebuild_task))
 
     # 启动节点管理器后台任务
     start_background_tasks()
     print(f"[{datetime.now()}] 分布式节点管理服务已启动")
 
-    # 初始化会议变更状态识别码
-    with SessionLocal() as db:
-        crud.get_meeting_change_status_token(db)  # 确保存在初始识别码
-
     # 将控制权返回给应用
+    StartupProfiler.stop_import_tracking()
+    StartupProfiler.mark("开始接受请求")
     yield
 
     # 应用关闭时执行的代码
@@ -51,21 +134,39 @@ async def lifespan(app: FastAPI):
     # 取消后台任务
     cleanup_task.cancel()
     meetings_cleanup_task.cancel()
+    package_prebuild_task.cancel()
+    database_init_task.cancel()
+    PackageBuilder.cancel_all()
 
     # 等待任务取消完成
     try:
-        await asyncio.gather(cleanup_task, meetings_cleanup_task, return_exceptions=True)
+        await asyncio.gather(cleanup_task, meetings_cleanup_task, package_prebuild_task, database_init_task, return_exceptions=True)
     except asyncio.CancelledError:
         pass
 
+    # 取消页面金字塔后台渲染并关闭PDF渲染进程池
+    from services.pyramid_service import PyramidService
+    from services.raster_engine import RasterEngine
+    PyramidService.cancel_all()
+    RasterEngine.shutdown()
+
+    # 关闭密码哈希进程池
+    from services.password_hasher import PasswordHasher
+    PasswordHasher.shutdown()
+
+    # 关闭按负载类型划分的线程池
+    from services.async_utils import AsyncUtils
+    AsyncUtils.shutdown_executors()
+
     print(f"[{datetime.now()}] 应用已安全关闭")
 
-# 导入路由模块
-from routes import (
-    meetings_router, documents_router, users_router,
-    maintenance_router, pdf_conversion_router,
-    nodes_router, meetings_download_router, meetings_status_router
-)
+# 导入路由模块（PDF和图像处理库在首次使用时才加载）
+with StartupProfiler.phase("导入路由模块"):
+    from routes import (
+        meetings_router, documents_router, users_router,
+        maintenance_router, pdf_conversion_router,
+        nodes_router, meetings_download_router, meetings_status_router
+    )
 
 # 导入节点管理器
 from node_manager import start_background_tasks
@@ -75,8 +176,38 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = current_dir
 sys.path.append(project_root)
 
+# 导入响应服务：默认使用orjson序列化，按Accept-Encoding压缩响应，并跟踪数据版本以缓存热点响应
+from services.response_service import FastJSONResponse, CompressionMiddleware, ResponseCache
+
 # 创建FastAPI应用
-app = FastAPI(lifespan=lifespan)
+app = FastAPI(lifespan=lifespan, default_response_class=FastJSONResponse)
+
+# 添加响应压缩中间件
+app.add_middleware(CompressionMiddleware)
+
+
+@app.middleware("http")
+async def reject_when_database_unavailable(request: Request, call_next):
+    """
+    数据库初始化成功完成之前，API请求直接返回503，不在缺失或过期的数据库结构上执行，
+    也不与结构升级中的表重建同时执行。初始化进行中时带Retry-After，失败时返回失败原因。
+    """
+    if not database_ready and request.url.path.startswith("/api/"):
+        if database_init_error is not None:
+            return FastJSONResponse(
+                status_code=503,
+                content={"detail": f"数据库初始化失败，服务暂不可用: {database_init_error}"}
+            )
+        return FastJSONResponse(
+            status_code=503,
+            content={"detail": "数据库正在初始化，请稍后重试"},
+            headers={"Retry-After": str(DATABASE_INIT_RETRY_AFTER_SECONDS)}
+        )
+    return await call_next(request)
+
+
+# 数据库提交后使缓存的热点响应失效
+ResponseCache.install_version_tracking()
 
 # 添加静态文件支持
 app.mount("/static", StaticFiles(directory=os.path.join(project_root, "static")), name="static")
@@ -98,12 +229,7 @@ if not os.path.exists(UPLOAD_DIR):
     # 创建临时文件目录
     os.makedirs(os.path.join(UPLOAD_DIR, "temp"), exist_ok=True)
 
-# 创建数据库表（如果不存在）
-models.Base.metadata.create_all(bind=engine)
-
-# 初始化系统用户
-from seed_users import seed_users
-seed_users()
+# 数据库表的创建和系统用户的初始化在应用启动后于后台执行，见initialize_database
 
 # 获取数据库会话的依赖函数
 def get_db():
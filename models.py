@@ -1,3 +1,4 @@
+import uuid
 from sqlalchemy import Column, Integer, String, Text, ForeignKey, JSON, Boolean, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
@@ -26,10 +27,13 @@ class Meeting(Base):
     time = Column(String, nullable=True) # Store time as string for simplicity, consider DateTime for real apps
     status = Column(String, default="未开始") # Add a status field
     package_path = Column(String, nullable=True) # 存储预生成的ZIP包路径
+    package_fingerprint = Column(String, nullable=True) # 预生成ZIP包对应的会议文件指纹，与当前文件一致时包可直接使用
+    version = Column(Integer, nullable=False, default=0, server_default="0") # 会议数据版本号，取自全局高水位，客户端只刷新版本变化的会议
 
     agenda_items = relationship(
         "AgendaItem",
         back_populates="meeting",
+        order_by="AgendaItem.position",  # 按议程位置排序
         cascade="all, delete-orphan",  # 添加级联删除选项
         passive_deletes=True  # 使用数据库级别的级联删除
     )
@@ -37,9 +41,10 @@ class Meeting(Base):
 class AgendaItem(Base):
     __tablename__ = "agenda_items"
 
-    # 使用复合主键：会议ID和位置索引
-    meeting_id = Column(String, ForeignKey("meetings.id", ondelete="CASCADE"), primary_key=True)
-    position = Column(Integer, primary_key=True)  # 议程项在会议中的位置
+    # 使用稳定的议程项ID作为主键，议程项文件夹以ID命名（item_<ID>），调整顺序时只修改position
+    id = Column(String, primary_key=True, index=True, default=lambda: str(uuid.uuid4()))
+    meeting_id = Column(String, ForeignKey("meetings.id", ondelete="CASCADE"), nullable=False, index=True)
+    position = Column(Integer, nullable=False, index=True)  # 议程项在会议中的位置，仅用于排序
 
     title = Column(String, index=True)
 
@@ -62,3 +67,12 @@ class SystemSetting(Base):
 
     key = Column(String, primary_key=True, index=True)
     value = Column(String, nullable=False)
+
+class Blob(Base):
+    """内容寻址文件存储表，按SHA-256记录去重后的文件及其引用计数"""
+    __tablename__ = "blobs"
+
+    sha256 = Column(String, primary_key=True, index=True)  # 文件内容的SHA-256哈希
+    size = Column(Integer, nullable=False, default=0)  # 文件大小（字节）
+    refcount = Column(Integer, nullable=False, default=0)  # 引用该内容的议程文件数量
+    created_at = Column(String, nullable=True)  # 首次存储时间
@@ -4,7 +4,7 @@
 此模块包含所有与文档管理相关的路由，包括文件的上传、查询、下载和删除。
 """
 
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, File, UploadFile, Form, Path, Body
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, File, UploadFile, Form, Path, Body, Query, Request
 from fastapi.responses import JSONResponse, FileResponse, HTMLResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
@@ -20,6 +20,13 @@ import models, schemas, crud
 from database import SessionLocal, get_db
 from utils import format_file_size
 
+# 导入响应缓存服务
+from services.response_service import ResponseCache
+from services.admission_service import AdmissionLimiter
+
+# 导入页面图片缓存服务
+from services.page_cache_service import PageCacheService, VALID_WIDTHS
+
 # 创建路由器
 router = APIRouter(
     prefix="/api/v1/documents",  # 使用不同的前缀避免与main.py中的路由冲突
@@ -32,9 +39,19 @@ current_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 project_root = current_dir
 UPLOAD_DIR = os.path.join(project_root, "uploads")
 
+# 文档列表同时取决于uploads目录中的文件，数据库未修改时也可能变化，缓存的有效时间较短
+DOCUMENTS_CACHE_MAX_AGE = 3.0
+
 @router.get("/")
-def get_documents(db: Session = Depends(get_db)):
-    """获取所有文档列表"""
+def get_documents(request: Request, db: Session = Depends(get_db)):
+    """获取所有文档列表，响应按数据版本短时间缓存"""
+    return ResponseCache.respond(
+        request, "documents:list", lambda: build_documents_list(db), max_age=DOCUMENTS_CACHE_MAX_AGE
+    )
+
+
+def build_documents_list(db: Session):
+    """遍历uploads目录构建文档列表响应数据"""
     # 从uploads目录获取所有文件
     documents = []
     document_id = 0
@@ -69,7 +86,8 @@ def get_documents(db: Session = Depends(get_db)):
 
             # 添加引用信息
             file_references[norm_path].append({
-                "agenda_item_id": item.position,
+                "agenda_item_id": item.id,
+                "agenda_item_position": item.position,
                 "agenda_item_title": item.title,
                 "meeting_id": item.meeting_id
             })
@@ -174,9 +192,11 @@ def get_documents(db: Session = Depends(get_db)):
 @router.delete("/deletable")
 def delete_all_deletable_documents(db: Session = Depends(get_db)):
     """删除所有可删除的文件（包括临时文件和未被会议引用的文件）"""
+    # 文件删除不修改数据库，需要主动使缓存的文档列表失效
+    ResponseCache.invalidate("documents:")
     try:
         # 获取所有文档
-        docs_data = get_documents(db)
+        docs_data = build_documents_list(db)
         documents = docs_data.get("documents", [])
 
         # 筛选出可删除的文件
@@ -235,12 +255,13 @@ def delete_all_deletable_documents(db: Session = Depends(get_db)):
 @router.post("/{document_id}/unbind")
 async def unbind_document(document_id: str, db: Session = Depends(get_db)):
     """解绑文档与会议的关联，将文件移动到临时文件夹，删除JPG文件夹"""
+    ResponseCache.invalidate("documents:")
     try:
         # 首先获取文件路径
         file_path = None
 
         # 获取文档列表并尝试查找匹配的文件
-        documents = get_documents(db).get("documents", [])
+        documents = build_documents_list(db).get("documents", [])
         try:
             doc_id = int(document_id)
             if 0 <= doc_id < len(documents):
@@ -294,7 +315,8 @@ async def unbind_document(document_id: str, db: Session = Depends(get_db)):
                 if item_norm_path == norm_path:
                     # 记录引用信息
                     referenced_items.append({
-                        "agenda_item_id": item.position,
+                        "agenda_item_id": item.id,
+                        "agenda_item_position": item.position,
                         "agenda_item_title": item.title,
                         "meeting_id": item.meeting_id
                     })
@@ -374,9 +396,8 @@ async def unbind_document(document_id: str, db: Session = Depends(get_db)):
 
                 # 定位议程项文件夹
                 for ref_item in referenced_items:
-                    agenda_item_id = ref_item.get("agenda_item_id")
-                    agenda_folder_name = f"agenda_{agenda_item_id}"  # 使用位置作为文件夹名
-                    agenda_dir = os.path.join(UPLOAD_DIR, meeting_id, agenda_folder_name)
+                    # JPG文件夹位于文件所在的议程项文件夹中（item_<议程项ID>或早期的agenda_<位置>）
+                    agenda_dir = os.path.dirname(file_path)
                     jpg_dir = os.path.join(agenda_dir, "jpgs")
                     jpg_subdir = os.path.join(jpg_dir, pdf_uuid)
 
@@ -437,9 +458,172 @@ async def unbind_document(document_id: str, db: Session = Depends(get_db)):
             }
         )
 
+@router.get("/blobs/{sha256}")
+async def get_blob(sha256: str):
+    """
+    按内容哈希下载文件
+
+    会议包的manifest.json按SHA-256引用文件，节点可以通过此接口只下载本地没有的内容。
+    相同哈希的内容永远不变，因此允许客户端长期缓存。
+
+    Args:
+        sha256: 文件内容的SHA-256哈希
+
+    Returns:
+        FileResponse: 文件内容
+    """
+    from services.blob_store import BlobStore
+    from services.async_utils import AsyncUtils
+
+    sha256 = sha256.lower()
+    if not BlobStore.is_valid_sha256(sha256):
+        raise HTTPException(status_code=400, detail="无效的SHA-256哈希")
+
+    blob_path = await AsyncUtils.run_in_threadpool(BlobStore.get_blob_file, sha256)
+    if not blob_path:
+        raise HTTPException(status_code=404, detail="内容不存在")
+
+    return FileResponse(
+        blob_path,
+        media_type="application/pdf",
+        headers={
+            "Cache-Control": "public, max-age=31536000, immutable",
+            "ETag": f'"{sha256}"'
+        }
+    )
+
+@router.post("/download-selected", dependencies=[Depends(AdmissionLimiter.limit("archive"))])
+async def download_selected_documents(
+    data: dict = Body(...),
+    db: Session = Depends(get_db)
+):
+    """
+    将选中的文档打包为ZIP下载
+
+    压缩包在响应时流式生成，不读入内存也不写临时文件，并带有预先计算的Content-Length。
+    请求受准入控制限制，请求过多时返回429和Retry-After。
+
+    Args:
+        data: 请求体，包含ids（文档列表中的序号）和/或sha256（内容存储中的哈希）
+
+    Returns:
+        StreamingResponse: ZIP文件流响应
+    """
+    from fastapi.responses import StreamingResponse
+    from services.blob_store import BlobStore
+    from services.zip_stream import ZipStream, ZipStreamEntry
+
+    ids = data.get("ids") or []
+    hashes = data.get("sha256") or []
+    if not isinstance(ids, list) or not isinstance(hashes, list) or not (ids or hashes):
+        raise HTTPException(status_code=400, detail="请求体中必须包含ids或sha256列表")
+
+    entries = []
+    missing = []
+
+    if ids:
+        documents = build_documents_list(db).get("documents", [])
+        for document_id in ids:
+            try:
+                document = documents[int(document_id)]
+                entries.append(ZipStreamEntry(document["name"], path=document["path"]))
+            except (ValueError, TypeError, IndexError, OSError):
+                missing.append(str(document_id))
+
+    for sha256 in hashes:
+        blob_path = BlobStore.get_blob_file(str(sha256))
+        if blob_path is None:
+            missing.append(str(sha256))
+            continue
+        entries.append(ZipStreamEntry(f"{sha256}.pdf", path=blob_path))
+
+    if missing:
+        raise HTTPException(status_code=404, detail=f"以下文档不存在: {', '.join(missing)}")
+
+    try:
+        zip_stream = ZipStream(entries)
+    except ValueError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+    zip_filename = f"documents_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+    print(f"[文档下载] 流式打包 {len(entries)} 个文档, 大小: {zip_stream.content_length()} 字节")
+
+    return StreamingResponse(
+        zip_stream.iter_bytes(),
+        media_type="application/zip",
+        headers=zip_stream.get_response_headers(zip_filename)
+    )
+
+@router.get("/{document_id}/pages/{page_number}.jpg")
+async def get_document_page_image(
+    document_id: str,
+    page_number: int,
+    width: Optional[int] = Query(None),
+    db: Session = Depends(get_db)
+):
+    """
+    按需获取文档指定页面的JPG图片
+
+    只渲染被请求的页面，渲染结果保存在按内容哈希索引的磁盘缓存中，
+    再次请求同一页面时直接返回缓存文件。
+
+    Args:
+        document_id: 文档ID（文档列表中的序号）
+        page_number: 页码，从1开始
+        width: 输出图片的宽度，可选值：960, 1440, 1920，未指定时使用系统默认设置
+
+    Returns:
+        FileResponse: JPG图片响应
+    """
+    # 如果未指定宽度，从系统设置获取默认值
+    if width is None:
+        width = int(crud.get_system_setting(db, "default_pdf_jpg_width", "1920"))
+
+    if width not in VALID_WIDTHS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"无效的宽度值，必须是以下之一: {', '.join(str(w) for w in VALID_WIDTHS)}"
+        )
+
+    if page_number < 1:
+        raise HTTPException(status_code=404, detail=f"页码不存在: {page_number}")
+
+    # 获取文档列表并查找对应的文件
+    file_path = None
+    documents = build_documents_list(db).get("documents", [])
+    try:
+        doc_id = int(document_id)
+        if 0 <= doc_id < len(documents):
+            file_path = documents[doc_id].get("path")
+    except (ValueError, TypeError):
+        pass
+
+    if not file_path or not os.path.exists(file_path):
+        raise HTTPException(status_code=404, detail=f"文件不存在: {document_id}")
+
+    try:
+        image_path = await PageCacheService.get_page_image(file_path, page_number, width)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"文件不存在: {document_id}")
+    except Exception as e:
+        import traceback
+        print(f"渲染文档页面时出错: {traceback.format_exc()}")
+        raise HTTPException(status_code=500, detail=f"渲染文档页面失败: {str(e)}")
+
+    # 文档ID是列表中的序号，文件增删后可能指向其他文件，因此要求客户端每次重新验证
+    return FileResponse(
+        image_path,
+        media_type="image/jpeg",
+        headers={"Cache-Control": "no-cache"}
+    )
+
 @router.delete("/{document_id}")
 def delete_document(document_id: str, db: Session = Depends(get_db)):
     """删除单个文件"""
+    # 文件删除不修改数据库，需要主动使缓存的文档列表失效
+    ResponseCache.invalidate("documents:")
     try:
         # 首先获取文件路径
         file_path = None
@@ -450,7 +634,7 @@ def delete_document(document_id: str, db: Session = Depends(get_db)):
             file_path = direct_path
         else:
             # 如果直接路径不存在，获取文档列表并尝试查找匹配的文件
-            documents = get_documents(db).get("documents", [])
+            documents = build_documents_list(db).get("documents", [])
             try:
                 doc_id = int(document_id)
                 if 0 <= doc_id < len(documents):
@@ -510,7 +694,8 @@ def delete_document(document_id: str, db: Session = Depends(get_db)):
                     meeting = crud.get_meeting(db, meeting_id=item.meeting_id)
                     if meeting:
                         referenced_items.append({
-                            "agenda_item_id": item.position,
+                            "agenda_item_id": item.id,
+                            "agenda_item_position": item.position,
                             "agenda_item_title": item.title,
                             "meeting_id": item.meeting_id,
                             "meeting_title": meeting.title
@@ -5,8 +5,6 @@
 """
 
 import os
-import shutil
-import uuid
 import asyncio
 from datetime import datetime
 import time
@@ -18,7 +16,7 @@ from sqlalchemy.orm import Session
 from typing import List, Optional
 
 # 导入数据库模型、模式和CRUD操作
-import models, schemas, crud
+import schemas, crud
 from database import SessionLocal, get_db
 
 # 创建路由器
@@ -92,12 +90,11 @@ async def trigger_temp_cleanup(background_tasks: BackgroundTasks):
             file_count = len([f for f in os.listdir(temp_dir) if os.path.isfile(os.path.join(temp_dir, f)) and f.lower().endswith('.pdf')])
 
         # 创建一个可在后台运行的函数版本
-        def run_cleanup():
+        # 在应用的事件循环中运行，与定时清理共用同一个增量清理服务
+        async def run_cleanup():
             print(f"[{datetime.now()}] 后台任务开始执行临时文件清理")
-            # 使用AsyncUtils来运行异步函数
             try:
-                from services.async_utils import AsyncUtils
-                AsyncUtils.run_sync(FileService.cleanup_temp_files)
+                await FileService.cleanup_temp_files()
                 print(f"[{datetime.now()}] 后台清理任务完成")
             except Exception as e:
                 print(f"[{datetime.now()}] 后台清理任务出错: {str(e)}")
@@ -159,75 +156,12 @@ async def force_cleanup_temp_files(background_tasks: BackgroundTasks):
             }
 
         # 创建一个可在后台运行的函数版本
-        def run_force_cleanup():
+        async def run_force_cleanup():
             print(f"[{datetime.now()}] 后台任务开始执行强制清理临时文件")
             try:
-                # 获取所有会议ID
-                from database import SessionLocal
-                db = SessionLocal()
-                meetings = db.query(models.Meeting).all()
-                meeting_ids = [meeting.id for meeting in meetings]
-                db.close()
-
-                print(f"[{datetime.now()}] 当前会议ID列表: {meeting_ids}")
-
-                # 检查文件是否与任何会议关联
-                def is_file_bound_to_meeting(file_path):
-                    """检查文件是否绑定到已知会议"""
-                    # 标准化路径
-                    norm_path = os.path.normpath(file_path).replace("\\", "/")
-
-                    # 对于uploads目录下的文件，检查它们是否在会议子目录中
-                    for meeting_id in meeting_ids:
-                        meeting_path_marker = f"uploads/{meeting_id}/"
-                        if meeting_path_marker in norm_path:
-                            return True
-                    return False
-
-                # 统计变量
-                deleted_count = 0
-                preserved_count = 0
-
-                # 列出temp目录中的所有文件
-                temp_files = os.listdir(temp_dir)
-                total_count = len([f for f in temp_files if os.path.isfile(os.path.join(temp_dir, f)) and f.lower().endswith('.pdf')])
-                print(f"[{datetime.now()}] 临时目录中共有 {total_count} 个PDF文件")
-
-                # 遍历temp目录中的所有文件
-                for filename in temp_files:
-                    file_path = os.path.join(temp_dir, filename)
-
-                    # 只处理文件，跳过目录
-                    if not os.path.isfile(file_path):
-                        print(f"[{datetime.now()}] 跳过目录: {filename}")
-                        continue
-
-                    # 只处理PDF文件
-                    if not filename.lower().endswith(".pdf"):
-                        print(f"[{datetime.now()}] 跳过非PDF文件: {filename}")
-                        continue
-
-                    try:
-                        # 检查文件是否绑定到会议
-                        is_bound = is_file_bound_to_meeting(file_path)
-
-                        # 如果文件未绑定，直接删除（不考虑创建时间）
-                        if not is_bound:
-                            print(f"[{datetime.now()}] 删除未绑定的临时文件: {filename}")
-                            os.remove(file_path)
-                            deleted_count += 1
-                        else:
-                            preserved_count += 1
-                            print(f"[{datetime.now()}] 保留已绑定的临时文件: {filename}")
-                    except Exception as e:
-                        preserved_count += 1
-                        print(f"[{datetime.now()}] 处理文件 {filename} 时出错，将保留该文件: {str(e)}")
-
-                # 计算清理后的文件数量
-                remaining_count = total_count - deleted_count
-
-                print(f"[{datetime.now()}] 强制清理临时文件完成: 总共 {total_count} 个文件，删除 {deleted_count} 个，保留 {preserved_count} 个")
-
+                # 由增量清理服务分批删除未被议程项引用的临时文件（不考虑创建时间）
+                result = await FileService.cleanup_temp_files(force=True)
+                print(f"[{datetime.now()}] 强制清理临时文件完成: 总共 {result['total_count']} 个文件，删除 {result['deleted_count']} 个，保留 {result['preserved_count']} 个")
             except Exception as e:
                 print(f"[{datetime.now()}] 强制清理临时文件时出错: {str(e)}")
                 import traceback
@@ -301,11 +235,21 @@ def update_system_setting(key: str, data: dict, db: Session = Depends(get_db)):
         if value not in valid_widths:
             raise HTTPException(status_code=400, detail=f"无效的分辨率值，必须是以下之一: {', '.join(valid_widths)}")
 
+    # 验证准入控制令牌桶配置，格式为"每秒令牌数,容量"
+    from services.admission_service import AdmissionLimiter, ADMISSION_LIMITS, ADMISSION_SETTING_PREFIX
+    if key.startswith(ADMISSION_SETTING_PREFIX):
+        if key[len(ADMISSION_SETTING_PREFIX):] not in ADMISSION_LIMITS:
+            raise HTTPException(status_code=400, detail=f"未知的准入控制类型: {key}")
+        try:
+            AdmissionLimiter.parse_limit(value)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="无效的准入控制配置，格式为\"每秒令牌数,容量\"，如\"1.0,8\"")
+
     updated_value = crud.update_system_setting(db, key, value)
     return {"key": key, "value": updated_value}
 
 @router.post("/cleanup-empty-folders")
-def cleanup_empty_folders(db: Session = Depends(get_db)):
+async def cleanup_empty_folders():
     """
     清理uploads目录中的孤立文件夹
 
@@ -315,41 +259,16 @@ def cleanup_empty_folders(db: Session = Depends(get_db)):
     孤立文件夹通常是由于会议被删除但文件夹未被正确清理而产生的。
     """
     try:
-        # 获取数据库中所有会议ID
-        all_meetings = db.query(models.Meeting).all()
-        valid_meeting_ids = {meeting.id for meeting in all_meetings}
-        print(f"当前有效会议ID列表: {valid_meeting_ids}")
-
-        # 遍历uploads目录，删除不存在于数据库中的会议文件夹
-        removed_folders = []
-        skipped_folders = []
+        from services.gc_service import GCService
 
-        for folder_name in os.listdir(UPLOAD_DIR):
-            folder_path = os.path.join(UPLOAD_DIR, folder_name)
-
-            # 跳过temp目录和非目录项
-            if folder_name == "temp" or not os.path.isdir(folder_path):
-                continue
-
-            # 检查目录名是否是UUID格式（会议ID）
-            try:
-                # 尝试将目录名解析为UUID，如果成功则说明可能是会议目录
-                folder_uuid = uuid.UUID(folder_name)
-
-                # 检查该会议ID是否存在于数据库中
-                if folder_name not in valid_meeting_ids:
-                    # 会议ID不在数据库中，删除该文件夹
-                    shutil.rmtree(folder_path)
-                    removed_folders.append(folder_name)
-                    print(f"已删除孤立会议文件夹: {folder_name}")
-                else:
-                    skipped_folders.append(folder_name)
-            except ValueError:
-                # 不是UUID格式，跳过
-                skipped_folders.append(folder_name)
+        # 手动触发时不因会议进行而暂停
+        result = await GCService.run_pass(phases=("meetings",), force=True)
+        stats = result["phases"].get("meetings", {})
+        removed_folders = stats.get("removed_folders", [])
+        skipped_folders = stats.get("preserved", 0)
 
         return {
-            "message": f"清理完成，共删除 {len(removed_folders)} 个孤立文件夹，保留 {len(skipped_folders)} 个文件夹",
+            "message": f"清理完成，共删除 {len(removed_folders)} 个孤立文件夹，保留 {skipped_folders} 个文件夹",
             "removed_folders": removed_folders,
             "status": "success"
         }
@@ -365,3 +284,17 @@ def cleanup_empty_folders(db: Session = Depends(get_db)):
                 "status": "error"
             }
         )
+
+@router.get("/gc/progress")
+def get_gc_progress():
+    """
+    获取增量垃圾回收的进度
+
+    Returns:
+        dict: 当前或最近一轮清理的阶段、已扫描和已删除的条目数量、释放的字节数等信息
+    """
+    from services.gc_service import GCService
+
+    progress = GCService.get_progress()
+    progress["timestamp"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return progress
@@ -4,7 +4,7 @@
 此模块包含所有与会议管理相关的路由，包括会议的创建、查询、更新和删除。
 """
 
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, File, UploadFile, Form, Path, Body
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, File, UploadFile, Form, Path, Body, Request
 from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
@@ -26,6 +26,7 @@ from utils import format_file_size, ensure_jpg_for_pdf, ensure_jpg_in_zip, conve
 # 导入服务层
 from services.meeting_service import MeetingService
 from services.pdf_service import PDFService
+from services.response_service import ResponseCache
 
 # 导入节点管理器
 from node_manager import reset_meeting_sync_status, is_meeting_fully_synced, remove_meeting_sync_status
@@ -71,7 +72,7 @@ async def wait_for_nodes_sync_and_update_token(db: Session, meeting_id: str):
                     await asyncio.sleep(3)
 
                     # 更新会议状态识别码
-                    crud.update_meeting_change_status_token(db_session)
+                    crud.update_meeting_change_status_token(db_session, meeting_id)
                     print(f"[同步等待] 会议 {meeting_id} 的状态识别码已更新")
                     break
                 else:
@@ -84,7 +85,7 @@ async def wait_for_nodes_sync_and_update_token(db: Session, meeting_id: str):
             if elapsed_time > MAX_SYNC_WAIT_TIME:
                 print(f"[同步等待] 会议 {meeting_id} 的节点同步等待超时，强制更新状态识别码")
                 # 强制更新会议状态识别码
-                crud.update_meeting_change_status_token(db_session)
+                crud.update_meeting_change_status_token(db_session, meeting_id)
                 print(f"[同步等待] 会议 {meeting_id} 的状态识别码已强制更新")
                 break
 
@@ -94,7 +95,7 @@ async def wait_for_nodes_sync_and_update_token(db: Session, meeting_id: str):
         print(f"[同步等待] 等待会议 {meeting_id} 的节点同步时发生错误: {str(e)}")
         # 发生错误时，强制更新会议状态识别码
         try:
-            crud.update_meeting_change_status_token(db_session)
+            crud.update_meeting_change_status_token(db_session, meeting_id)
             print(f"[同步等待] 会议 {meeting_id} 的状态识别码已在错误处理中更新")
         except Exception as inner_e:
             print(f"[同步等待] 更新会议 {meeting_id} 的状态识别码时发生错误: {str(inner_e)}")
@@ -144,6 +145,7 @@ async def create_new_meeting(meeting: schemas.MeetingCreate, db: Session = Depen
         if db_meeting.agenda_items:
             for item in db_meeting.agenda_items:
                 agenda_item = {
+                    "id": item.id,
                     "title": item.title,
                     "position": item.position,
                     "meeting_id": item.meeting_id,
@@ -181,8 +183,13 @@ async def create_new_meeting(meeting: schemas.MeetingCreate, db: Session = Depen
 
 
 @router.get("/")
-def read_meetings(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    """获取会议列表"""
+def read_meetings(request: Request, skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+    """获取会议列表，响应按数据版本缓存"""
+    return ResponseCache.respond(request, "meetings:list", lambda: build_meetings_list(db))
+
+
+def build_meetings_list(db: Session):
+    """构建会议列表响应数据"""
     meetings = crud.get_meetings(db)
 
     # 手动构建响应数据
@@ -201,6 +208,7 @@ def read_meetings(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)
         if meeting.agenda_items:
             for item in meeting.agenda_items:
                 agenda_item = {
+                    "id": item.id,
                     "title": item.title,
                     "position": item.position,
                     "meeting_id": item.meeting_id,
@@ -257,6 +265,7 @@ def read_meeting(meeting_id: str, db: Session = Depends(get_db)):
     if db_meeting.agenda_items:
         for item in db_meeting.agenda_items:
             agenda_item = {
+                "id": item.id,
                 "title": item.title,
                 "position": item.position,
                 "meeting_id": item.meeting_id,
@@ -295,12 +304,13 @@ def read_meeting(meeting_id: str, db: Session = Depends(get_db)):
 
 
 @router.get("/{meeting_id}/data")
-async def get_meeting_data(meeting_id: str, db: Session = Depends(get_db)):
+async def get_meeting_data(meeting_id: str, request: Request, db: Session = Depends(get_db)):
     """
     获取指定会议的数据和压缩包URL
 
     此API用于客户端获取指定会议的数据和压缩包URL。
     如果会议不存在或不是"进行中"状态，将返回404错误。
+    响应按数据版本缓存，数据未变化时平板轮询直接返回缓存的响应。
 
     Args:
         meeting_id: 会议ID
@@ -315,6 +325,13 @@ async def get_meeting_data(meeting_id: str, db: Session = Depends(get_db)):
           - package_url: 会议压缩包URL（如果有）
           - agenda_items: 议程项列表，每个议程项包含标题、位置和文件列表
     """
+    return await ResponseCache.respond_async(
+        request, f"meetings:data:{meeting_id}", lambda: build_meeting_data(meeting_id, db)
+    )
+
+
+async def build_meeting_data(meeting_id: str, db: Session):
+    """构建会议数据响应，会议不存在或不是进行中状态时抛出404错误"""
     # 获取最新的会议变更识别码
     token = crud.get_meeting_change_status_token(db)
     print(f"[数据查询] 当前会议状态识别码: {token}")
@@ -339,6 +356,7 @@ async def get_meeting_data(meeting_id: str, db: Session = Depends(get_db)):
     meeting_data = {
         "id": token,  # 使用token作为数据包的ID
         "meeting_id": meeting.id,  # 添加实际的会议ID
+        "version": meeting.version or 0,  # 会议版本号，与状态接口中的版本号对应
         "title": meeting.title,
         "intro": meeting.intro,  # 添加会议简介
         "time": meeting_time,
@@ -353,6 +371,7 @@ async def get_meeting_data(meeting_id: str, db: Session = Depends(get_db)):
 
         for agenda_item in sorted_agenda_items:
             item_data = {
+                "id": agenda_item.id,
                 "position": agenda_item.position,
                 "title": agenda_item.title,
                 "files": []
@@ -476,7 +495,7 @@ async def get_meeting_data(meeting_id: str, db: Session = Depends(get_db)):
 
 @router.put("/{meeting_id}")
 async def update_existing_meeting(meeting_id: str, meeting: schemas.MeetingUpdate, db: Session = Depends(get_db)):
-    """更新会议信息，包括其议程项（采用删除旧项，添加新项的策略）"""
+    """更新会议信息，包括其议程项（按差异只更新变化的议程项）"""
     try:
         # 使用MeetingService更新会议
         db_meeting = await MeetingService.update_meeting(db=db, meeting_id=meeting_id, meeting_data=meeting)
@@ -501,6 +520,7 @@ async def update_existing_meeting(meeting_id: str, meeting: schemas.MeetingUpdat
         if db_meeting.agenda_items:
             for item in db_meeting.agenda_items:
                 agenda_item = {
+                    "id": item.id,
                     "title": item.title,
                     "position": item.position,
                     "meeting_id": item.meeting_id,
@@ -559,7 +579,7 @@ async def delete_existing_meeting(meeting_id: str, db: Session = Depends(get_db)
     await MeetingService.delete_meeting(db=db, meeting_id=meeting_id)
 
 @router.get("/status/token", response_model=schemas.MeetingChangeStatus)
-def get_meeting_status_token(db: Session = Depends(get_db)):
+def get_meeting_status_token(request: Request, db: Session = Depends(get_db)):
     """
     获取会议状态变更识别码和当前进行中的会议列表
 
@@ -569,11 +589,22 @@ def get_meeting_status_token(db: Session = Depends(get_db)):
 
     当没有任何会议处于"进行中"状态时，返回id为"none"，表示当前没有会议召开。
 
+    全局识别码在任何会议变化时都会更新；每个会议另有单调递增的版本号，客户端应按会议比较版本号，
+    只重新获取版本号变化的会议的数据和文件包，其他会议的变化不会引起额外的请求。
+
     返回:
-        MeetingChangeStatus: 包含id字段和meetings字段的对象
+        MeetingChangeStatus: 包含id、version和meetings字段的对象
           - id: 会议状态变更识别码，如果没有进行中的会议则为"none"
-          - meetings: 当前所有处于"进行中"状态的会议列表
+          - version: 会议版本高水位（所有会议版本号的最大值）
+          - meetings: 当前所有处于"进行中"状态的会议列表，每个会议包含其版本号version
+
+    响应按数据版本缓存，数据未变化时轮询不查询数据库。
     """
+    return ResponseCache.respond(request, "meetings:status_token", lambda: build_status_token(db))
+
+
+def build_status_token(db: Session):
+    """构建会议状态变更识别码响应"""
     # 查询所有处于"进行中"状态的会议
     in_progress_meetings = db.query(models.Meeting).filter(models.Meeting.status == "进行中").all()
 
@@ -588,7 +619,8 @@ def get_meeting_status_token(db: Session = Depends(get_db)):
         meetings_info.append({
             "id": meeting.id,
             "title": meeting.title,
-            "time": meeting_time
+            "time": meeting_time,
+            "version": meeting.version or 0
         })
 
     print(f"[识别码查询] 当前进行中会议数量: {len(meetings_info)}")
@@ -602,11 +634,15 @@ def get_meeting_status_token(db: Session = Depends(get_db)):
         token = crud.get_meeting_change_status_token(db)
         print(f"[识别码查询] 当前会议状态识别码: {token}")
 
+    # 会议版本高水位，客户端记录后只需刷新版本号大于上次高水位的会议
+    version = crud.get_meeting_version_high_water(db)
+
     # 确保数据库会话关闭，避免缓存问题
     db.close()
 
     return {
         "id": token,
+        "version": version,
         "meetings": meetings_info
     }
 
@@ -677,6 +713,9 @@ async def update_meeting_status_endpoint(meeting_id: str, status_update: schemas
         # 移除会议同步状态跟踪
         remove_meeting_sync_status(meeting_id)
 
+        # 递增会议版本号，客户端据此移除已结束的会议
+        crud.bump_meeting_version(db, meeting_id)
+
         print(f"[状态变更] 会议 {meeting_id} ZIP包删除完成")
 
     # 手动构建响应数据
@@ -693,6 +732,7 @@ async def update_meeting_status_endpoint(meeting_id: str, status_update: schemas
     if db_meeting.agenda_items:
         for item in db_meeting.agenda_items:
             agenda_item = {
+                "id": item.id,
                 "title": item.title,
                 "position": item.position,
                 "meeting_id": item.meeting_id,
@@ -799,34 +839,6 @@ async def get_meeting_package(meeting_id: str, db: Session = Depends(get_db)):
     return result
 
 
-@router.get("/{meeting_id}/download-package")
-async def download_meeting_package(meeting_id: str, db: Session = Depends(get_db)):
-    """
-    下载会议的PDF文件包，打包为ZIP格式
-    包含会议的所有PDF文件
-    适用于平板客户端查看
-
-    Args:
-        meeting_id: 会议ID
-
-    Returns:
-        StreamingResponse: ZIP文件流响应
-    """
-    # 使用MeetingService下载会议文件包
-    zip_buffer = await MeetingService.download_meeting_package(db=db, meeting_id=meeting_id)
-
-    # 准备文件名 - 使用ASCII字符确保兼容性
-    # 仅使用会议ID作为文件名，避免中文字符编码问题
-    zip_filename = f"meeting_{meeting_id}_pdfs.zip"
-
-    # 准备响应
-    headers = {
-        'Content-Disposition': f'attachment; filename="{zip_filename}"'
-    }
-
-    return StreamingResponse(zip_buffer, media_type="application/zip", headers=headers)
-
-
 @router.get("/active/meetings")
 def get_active_meetings(db: Session = Depends(get_db)):
     """
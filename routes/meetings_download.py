@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException, Depends, Request
 from fastapi.responses import FileResponse, StreamingResponse, JSONResponse
 from sqlalchemy.orm import Session
+from typing import Optional
 import os
 import io
 import time
@@ -8,20 +9,26 @@ import time
 from database import get_db
 import crud
 from services.meeting_service import MeetingService
+from services.package_tar import TarZstPackage, TAR_ZST_MEDIA_TYPE
 from node_manager import get_available_nodes
 
 router = APIRouter(prefix="/api/v1/meetings", tags=["meetings_download"])
 
 @router.get("/{meeting_id}/download-package")
-async def download_meeting_package(meeting_id: str, db: Session = Depends(get_db)):
+async def download_meeting_package(meeting_id: str, request: Request, format: Optional[str] = None,
+                                   db: Session = Depends(get_db)):
     """
     下载会议的PDF文件包
 
+    默认返回ZIP包（平板使用）。查询参数format=tar.zst或Accept请求头包含application/zstd时，
+    返回tar.zst包（Linux节点使用），tar.zst包不可用时仍返回ZIP包。
+
     Args:
         meeting_id: 会议ID
+        format: 包格式，zip或tar.zst
 
     Returns:
-        StreamingResponse: ZIP文件流响应
+        StreamingResponse: ZIP文件流响应，或tar.zst文件响应
     """
     # 查询指定会议
     meeting = crud.get_meeting(db, meeting_id=meeting_id)
@@ -37,7 +44,7 @@ async def download_meeting_package(meeting_id: str, db: Session = Depends(get_db
     # 检查会议是否有压缩包
     if not meeting.package_path:
         # 如果没有压缩包，尝试生成
-        success = await MeetingService.generate_meeting_package(db, meeting_id)
+        success = await MeetingService.generate_meeting_package(db, meeting_id, admission="package")
         if not success:
             raise HTTPException(status_code=500, detail="生成会议压缩包失败")
 
@@ -74,23 +81,95 @@ async def download_meeting_package(meeting_id: str, db: Session = Depends(get_db
 
     # 直接从本地提供文件下载，不进行重定向
     print(f"[下载本地] 使用本地文件提供会议 {meeting_id} 的下载")
-    return await download_local_package(meeting_id, db)
+    want_tar_zst = TarZstPackage.accepts(request.headers.get("accept"), format)
+    return await download_local_package(meeting_id, db, want_tar_zst=want_tar_zst)
 
 @router.get("/{meeting_id}/download-package-direct")
-async def download_meeting_package_direct(meeting_id: str, db: Session = Depends(get_db)):
+async def download_meeting_package_direct(meeting_id: str, request: Request, format: Optional[str] = None,
+                                          db: Session = Depends(get_db)):
     """
     直接下载会议包，不重定向（供分布式节点使用）
 
+    压缩包在响应时由会议文件流式生成，不读入内存也不写临时文件，并带有预先计算的Content-Length。
+    节点通过format=tar.zst或Accept: application/zstd请求时，返回预生成的tar.zst包。
+
     Args:
         meeting_id: 会议ID
+        format: 包格式，zip或tar.zst
 
     Returns:
-        StreamingResponse: ZIP文件流响应
+        StreamingResponse: ZIP文件流响应，或tar.zst文件响应
     """
-    return await download_local_package(meeting_id, db)
+    if TarZstPackage.accepts(request.headers.get("accept"), format):
+        tar_response = await get_tar_zst_response(meeting_id, db)
+        if tar_response is not None:
+            return tar_response
+
+    try:
+        zip_stream = await MeetingService.create_package_stream(db, meeting_id)
+    except ValueError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+    if zip_stream is None:
+        raise HTTPException(status_code=404, detail=f"会议 {meeting_id} 不存在")
+
+    print(f"[直接下载] 流式返回会议 {meeting_id} 的压缩包, 大小: {zip_stream.content_length()} 字节")
+
+    headers = zip_stream.get_response_headers(f"meeting_{meeting_id}_pdfs.zip")
+    headers["Vary"] = "Accept"
+
+    return StreamingResponse(
+        zip_stream.iter_bytes(),
+        media_type="application/zip",
+        headers=headers
+    )
+
+async def get_tar_zst_response(meeting_id: str, db: Session) -> Optional[FileResponse]:
+    """
+    返回会议的tar.zst包，包不可用（未安装zstandard、已关闭或生成失败）时返回None
+
+    Args:
+        meeting_id: 会议ID
+        db: 数据库会话
+
+    Returns:
+        FileResponse: tar.zst文件响应，不可用时为None
+    """
+    if not TarZstPackage.is_supported():
+        return None
+
+    # 文件包与当前会议文件一致时不会重新生成
+    success = await MeetingService.generate_meeting_package(db, meeting_id, admission="package")
+    if not success:
+        return None
+
+    meeting = crud.get_meeting(db, meeting_id=meeting_id)
+    if not meeting or not meeting.package_path:
+        return None
+
+    tar_path = TarZstPackage.get_path(meeting.package_path)
+    if not os.path.exists(tar_path):
+        return None
+
+    print(f"[tar.zst下载] 返回会议 {meeting_id} 的tar.zst包")
+
+    return FileResponse(
+        tar_path,
+        media_type=TAR_ZST_MEDIA_TYPE,
+        filename=f"meeting_{meeting_id}_pdfs.tar.zst",
+        headers={
+            "Vary": "Accept",
+            "X-Package-Fingerprint": meeting.package_fingerprint or ""
+        }
+    )
+
+async def download_local_package(meeting_id: str, db: Session, want_tar_zst: bool = False):
+    """从本地文件系统下载会议包，want_tar_zst为True且tar.zst包可用时返回tar.zst包"""
+    if want_tar_zst:
+        tar_response = await get_tar_zst_response(meeting_id, db)
+        if tar_response is not None:
+            return tar_response
 
-async def download_local_package(meeting_id: str, db: Session):
-    """从本地文件系统下载会议包"""
     # 查询指定会议
     meeting = crud.get_meeting(db, meeting_id=meeting_id)
 
@@ -101,7 +180,7 @@ async def download_local_package(meeting_id: str, db: Session):
     # 检查会议是否有压缩包
     if not meeting.package_path or not os.path.exists(meeting.package_path):
         # 如果没有压缩包，尝试生成
-        success = await MeetingService.generate_meeting_package(db, meeting_id)
+        success = await MeetingService.generate_meeting_package(db, meeting_id, admission="package")
         if not success:
             raise HTTPException(status_code=500, detail="生成会议压缩包失败")
 
@@ -121,7 +200,8 @@ async def download_local_package(meeting_id: str, db: Session):
 
     # 准备响应
     headers = {
-        'Content-Disposition': f'attachment; filename="{zip_filename}"'
+        'Content-Disposition': f'attachment; filename="{zip_filename}"',
+        'Vary': 'Accept'
     }
 
     print(f"[本地下载] 返回会议 {meeting_id} 的压缩包")
@@ -129,13 +209,116 @@ async def download_local_package(meeting_id: str, db: Session):
     return StreamingResponse(zip_buffer, media_type="application/zip", headers=headers)
 
 
+async def ensure_meeting_package(meeting_id: str, db: Session):
+    """确保会议的文件包和议程分片包已生成且与当前文件一致"""
+    success = await MeetingService.generate_meeting_package(db, meeting_id, admission="package")
+    if not success:
+        raise HTTPException(status_code=500, detail="生成会议压缩包失败")
+
+
+@router.get("/{meeting_id}/package-index")
+async def get_package_index(meeting_id: str, db: Session = Depends(get_db)):
+    """
+    获取会议按议程项分片的文件包索引
+
+    索引中的分片按议程位置排序，priority越小越应优先下载。平板可以先下载第一个分片并显示第一个议程项，
+    其余分片在后台继续下载。
+
+    Args:
+        meeting_id: 会议ID
+
+    Returns:
+        JSONResponse: 分片包索引
+    """
+    from services.async_utils import AsyncUtils
+    from services.package_builder import PackageBuilder
+
+    # 查询指定会议
+    meeting = crud.get_meeting(db, meeting_id=meeting_id)
+
+    # 如果会议不存在，返回404错误
+    if not meeting:
+        raise HTTPException(status_code=404, detail=f"会议 {meeting_id} 不存在")
+
+    # 如果会议不是进行中状态，返回404错误
+    if meeting.status != "进行中":
+        raise HTTPException(status_code=404, detail=f"会议 {meeting_id} 不是进行中状态")
+
+    # 文件包已是最新时不会重新生成
+    await ensure_meeting_package(meeting_id, db)
+
+    index = await AsyncUtils.run_in_threadpool(PackageBuilder.read_index_sync, meeting_id)
+    if index is None:
+        raise HTTPException(status_code=500, detail="读取会议分片包索引失败")
+
+    headers = {"Cache-Control": "no-cache"}
+    # 提示客户端立即预取第一个议程项的分片
+    if index.get("shards"):
+        headers["Link"] = f'<{index["shards"][0]["url"]}>; rel=preload; as=fetch'
+
+    return JSONResponse(content=index, headers=headers)
+
+
+@router.get("/{meeting_id}/package-shards/{position}")
+async def download_package_shard(meeting_id: str, position: int, db: Session = Depends(get_db)):
+    """
+    下载会议中单个议程项的分片包（也供分布式节点使用）
+
+    Args:
+        meeting_id: 会议ID
+        position: 议程位置
+
+    Returns:
+        FileResponse: 分片ZIP文件
+    """
+    from services.async_utils import AsyncUtils
+    from services.package_builder import PackageBuilder
+
+    meeting = crud.get_meeting(db, meeting_id=meeting_id)
+    if not meeting:
+        raise HTTPException(status_code=404, detail=f"会议 {meeting_id} 不存在")
+
+    # 与分片包索引一致，只提供进行中会议的分片包，避免为任意会议触发文件包生成
+    if meeting.status != "进行中":
+        raise HTTPException(status_code=404, detail=f"会议 {meeting_id} 不是进行中状态")
+
+    shard_path = PackageBuilder.get_shard_path(meeting_id, position)
+    if shard_path is None:
+        # 分片包不存在时尝试生成
+        await ensure_meeting_package(meeting_id, db)
+        shard_path = PackageBuilder.get_shard_path(meeting_id, position)
+        if shard_path is None:
+            raise HTTPException(status_code=404, detail=f"议程项 {position} 的分片包不存在")
+
+    index = await AsyncUtils.run_in_threadpool(PackageBuilder.read_index_sync, meeting_id) or {}
+    priority = next(
+        (shard["priority"] for shard in index.get("shards", []) if shard.get("position") == position),
+        0
+    )
+
+    # 优先级提示：第一个议程项最高，HTTP优先级（RFC 9218）的紧急度范围为0-7
+    headers = {
+        "Priority": f"u={min(priority, 7)}",
+        "X-Shard-Priority": str(priority),
+        "X-Package-Fingerprint": index.get("fingerprint", "")
+    }
+
+    print(f"[分片下载] 返回会议 {meeting_id} 议程项 {position} 的分片包 (优先级 {priority})")
+
+    return FileResponse(
+        shard_path,
+        media_type="application/zip",
+        filename=f"meeting_{meeting_id}_agenda_{position}.zip",
+        headers=headers
+    )
+
 @router.get("/{meeting_id}/download-nodes-info")
 async def get_download_nodes_info(meeting_id: str, request: Request, db: Session = Depends(get_db)):
     """
     获取可用于下载指定会议文件的所有端点信息
 
     此API用于获取可用于下载指定会议文件的所有端点信息，包括主控服务器和分布式节点。
-    返回简化的端点列表，每个端点只包含IP和下载URL。
+    返回简化的端点列表，每个端点包含IP、完整包下载URL和议程分片包索引URL。
 
     Args:
         meeting_id: 会议ID
@@ -157,7 +340,7 @@ async def get_download_nodes_info(meeting_id: str, request: Request, db: Session
     # 检查会议是否有压缩包
     if not meeting.package_path:
         # 如果没有压缩包，尝试生成
-        success = await MeetingService.generate_meeting_package(db, meeting_id)
+        success = await MeetingService.generate_meeting_package(db, meeting_id, admission="package")
         if not success:
             raise HTTPException(status_code=500, detail="生成会议压缩包失败")
 
@@ -174,21 +357,20 @@ async def get_download_nodes_info(meeting_id: str, request: Request, db: Session
     # 获取主控服务器地址（从请求中提取）
     host = request.headers.get("host", "localhost")
 
-    # 准备响应数据 - 简化的下载端点列表
+    # 准备响应数据 - 简化的下载端点列表（主控服务器和可用节点）
     download_endpoints = []
-
-    # 添加主控服务器下载端点
-    download_endpoints.append({
-        "ip": host,
-        "download_url": f"http://{host}/api/v1/meetings/{meeting_id}/download-package"
-    })
-
-    # 添加可用节点信息
-    for node in available_nodes:
-        download_endpoints.append({
-            "ip": node,
-            "download_url": f"http://{node}/api/v1/meetings/{meeting_id}/download-package"
-        })
+    tar_zst_available = os.path.exists(TarZstPackage.get_path(meeting.package_path))
+
+    for endpoint in [host] + list(available_nodes):
+        endpoint_info = {
+            "ip": endpoint,
+            "download_url": f"http://{endpoint}/api/v1/meetings/{meeting_id}/download-package",
+            "package_index_url": f"http://{endpoint}/api/v1/meetings/{meeting_id}/package-index"
+        }
+        # 支持tar.zst时提供tar.zst包地址，供Linux节点使用
+        if tar_zst_available:
+            endpoint_info["tar_zst_url"] = f"{endpoint_info['download_url']}?format=tar.zst"
+        download_endpoints.append(endpoint_info)
 
     # 返回JSON响应
     return JSONResponse(content=download_endpoints)
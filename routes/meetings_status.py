@@ -27,7 +27,8 @@ async def get_meeting_status_token(db: Session = Depends(get_db)):
     Returns:
         dict: 包含会议状态变更识别码和会议列表的字典
           - id: 会议状态变更识别码
-          - meetings: 会议列表，每个会议包含id、title、time和status
+          - version: 会议版本高水位
+          - meetings: 会议列表，每个会议包含id、title、time、status和version
     """
     # 获取最新的会议变更识别码
     token = crud.get_meeting_change_status_token(db)
@@ -42,7 +43,8 @@ async def get_meeting_status_token(db: Session = Depends(get_db)):
             "id": meeting.id,
             "title": meeting.title,
             "time": meeting.time,
-            "status": meeting.status
+            "status": meeting.status,
+            "version": meeting.version or 0
         }
 
         # 如果会议状态为"进行中"，添加议程项信息
@@ -63,6 +65,7 @@ async def get_meeting_status_token(db: Session = Depends(get_db)):
     # 返回状态信息
     return {
         "id": token,
+        "version": crud.get_meeting_version_high_water(db),
         "timestamp": time.time(),
         "meetings": meeting_list
     }
@@ -74,11 +77,13 @@ async def get_meeting_status_for_node(db: Session = Depends(get_db)):
 
     此API专为分布式节点设计，提供简化的会议状态信息，只包含必要的数据。
     分布式节点通过此API获取当前进行中的会议信息，用于同步会议文件。
+    节点应按会议比较版本号，只重新同步版本号变化的会议。
 
     Returns:
         dict: 包含会议状态信息的字典
           - id: 会议状态变更识别码
-          - active_meetings: 当前进行中的会议列表
+          - version: 会议版本高水位
+          - active_meetings: 当前进行中的会议列表，每个会议包含id、title和version
           - timestamp: 当前时间戳
     """
     # 获取最新的会议变更识别码
@@ -93,7 +98,8 @@ async def get_meeting_status_for_node(db: Session = Depends(get_db)):
         for meeting in meetings:
             active_meetings.append({
                 "id": meeting.id,
-                "title": meeting.title
+                "title": meeting.title,
+                "version": meeting.version or 0
             })
         print(f"[节点API] 当前进行中会议数量: {len(active_meetings)}")
     else:
@@ -102,6 +108,7 @@ async def get_meeting_status_for_node(db: Session = Depends(get_db)):
     # 返回状态信息
     return {
         "id": token,
+        "version": crud.get_meeting_version_high_water(db),
         "active_meetings": active_meetings,
         "timestamp": time.time()
     }
@@ -5,11 +5,15 @@ PDF转换相关路由
 """
 
 import os
-from fastapi import APIRouter, File, UploadFile, Form
-from typing import List
+from fastapi import APIRouter, Depends, File, UploadFile, Form, HTTPException, Request, Body, Header
+from fastapi.responses import JSONResponse, Response
+from typing import List, Optional
 
 # 导入PDF服务
 from services.pdf_service import PDFService
+from services.resumable_upload_service import ResumableUploadService, ResumableUploadError
+from services.response_service import ResponseCache
+from services.admission_service import AdmissionLimiter
 
 # 获取项目根目录
 current_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -45,27 +49,56 @@ async def upload_pdf(file: UploadFile = File(...)):
     # 使用PDFService上传PDF文件
     return await PDFService.upload_pdf(file)
 
-@router.post("/convert-to-jpg")
+@router.post("/convert-to-jpg", dependencies=[Depends(AdmissionLimiter.limit("render"))])
 async def convert_pdf_to_jpg(
     file: UploadFile = File(...),
     dpi: int = Form(200),
     format: str = Form("jpg"),
-    merge: bool = Form(False)
+    merge: bool = Form(False),
+    job_id: Optional[str] = Form(None),
+    quality: Optional[int] = Form(None),
+    target_kb: Optional[int] = Form(None)
 ):
     """
     将上传的PDF文件转换为JPG图片，使用PyMuPDF库实现，不依赖本地poppler环境
 
+    转换请求受准入控制限制，请求过多时返回429和Retry-After。
+
     Args:
         file (UploadFile): 上传的PDF文件
         dpi (int): 输出图片的DPI值，默认为200
         format (str): 输出图片的格式，默认为jpg
         merge (bool): 是否将所有页面合并为一个长图，默认为False
+        job_id (str, optional): 渲染任务ID（UUID），客户端可用它取消正在进行的转换，不是UUID时返回422，与进行中的任务重复时返回409
+        quality (int, optional): jpg/webp/avif的编码质量
+        target_kb (int, optional): 每页的目标大小（KB），指定时按目标大小搜索编码质量
 
     Returns:
         JSONResponse: 包含转换结果的JSON响应
     """
     # 使用PDFService转换PDF文件为JPG
-    return await PDFService.convert_pdf_to_jpg_files(file, dpi, format, merge)
+    return await PDFService.convert_pdf_to_jpg_files(file, dpi, format, merge, job_id, quality, target_kb)
+
+@router.post("/jobs/{job_id}/cancel")
+async def cancel_conversion_job(job_id: str):
+    """
+    取消正在进行的PDF转换任务
+
+    Args:
+        job_id (str): 转换时指定的渲染任务ID
+
+    Returns:
+        dict: 包含操作结果的字典
+    """
+    from services.raster_engine import normalize_job_id
+    try:
+        job_id = normalize_job_id(job_id)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    if not PDFService.cancel_conversion(job_id):
+        raise HTTPException(status_code=404, detail=f"转换任务不存在或已完成: {job_id}")
+    return {"status": "success", "job_id": job_id, "message": "已请求取消转换任务"}
 
 @router.post("/upload-temp")
 async def upload_temp_files(
@@ -76,4 +109,135 @@ async def upload_temp_files(
     文件去重：检查文件名是否已存在，如果存在则复用已有文件而不是创建新文件
     """
     # 使用PDFService上传临时文件
-    return await PDFService.upload_temp_files(files)
\ No newline at end of file
+    result = await PDFService.upload_temp_files(files)
+    # 新文件出现在文档列表中
+    ResponseCache.invalidate("documents:")
+    return result
+
+def _resumable_error_response(e: ResumableUploadError) -> JSONResponse:
+    """将可续传上传错误转换为JSON响应，偏移量相关的错误附带当前偏移量"""
+    headers = {"Cache-Control": "no-store"}
+    content = {"error": e.message}
+    if e.offset is not None:
+        headers["Upload-Offset"] = str(e.offset)
+        content["offset"] = e.offset
+    return JSONResponse(status_code=e.status_code, content=content, headers=headers)
+
+@router.post("/uploads", status_code=201)
+async def create_resumable_upload(data: dict = Body(...)):
+    """
+    创建可续传上传会话
+
+    Args:
+        data (dict): 请求体，包含filename（文件名）和length（文件总大小，字节）
+
+    Returns:
+        JSONResponse: 包含upload_id、offset、length的响应，Location头为上传地址
+    """
+    try:
+        length = int(data.get("length", 0))
+    except (TypeError, ValueError):
+        return JSONResponse(status_code=400, content={"error": "无效的文件大小"})
+
+    try:
+        result = await ResumableUploadService.create_upload(data.get("filename"), length)
+    except ResumableUploadError as e:
+        return _resumable_error_response(e)
+
+    upload_url = f"{router.prefix}/uploads/{result['upload_id']}"
+    result["upload_url"] = upload_url
+    return JSONResponse(
+        status_code=201,
+        content=result,
+        headers={"Location": upload_url, "Upload-Offset": "0", "Upload-Length": str(length)}
+    )
+
+@router.head("/uploads/{upload_id}")
+async def get_resumable_upload_status(upload_id: str):
+    """
+    查询可续传上传会话的当前偏移量，客户端断线重连后据此继续上传
+
+    Args:
+        upload_id (str): 上传会话ID
+
+    Returns:
+        Response: Upload-Offset和Upload-Length响应头
+    """
+    try:
+        status = await ResumableUploadService.get_status(upload_id)
+    except ResumableUploadError as e:
+        return Response(status_code=e.status_code, headers={"Cache-Control": "no-store"})
+
+    return Response(
+        status_code=200,
+        headers={
+            "Upload-Offset": str(status["offset"]),
+            "Upload-Length": str(status["length"]),
+            "Cache-Control": "no-store"
+        }
+    )
+
+@router.patch("/uploads/{upload_id}")
+async def append_resumable_upload(
+    upload_id: str,
+    request: Request,
+    upload_offset: int = Header(..., alias="Upload-Offset")
+):
+    """
+    向可续传上传会话追加一块数据
+
+    请求体为原始二进制数据，Upload-Offset请求头必须等于服务器上已保存的数据大小。
+
+    Args:
+        upload_id (str): 上传会话ID
+        request (Request): 请求对象，用于流式读取请求体
+        upload_offset (int): 本块数据的起始偏移量
+
+    Returns:
+        Response: 204响应，Upload-Offset头为写入后的新偏移量
+    """
+    try:
+        new_offset = await ResumableUploadService.append_chunk(upload_id, upload_offset, request.stream())
+    except ResumableUploadError as e:
+        return _resumable_error_response(e)
+
+    return Response(status_code=204, headers={"Upload-Offset": str(new_offset), "Cache-Control": "no-store"})
+
+@router.post("/uploads/{upload_id}/finalize")
+async def finalize_resumable_upload(upload_id: str):
+    """
+    完成可续传上传，文件进入与/upload-temp相同的临时文件流程
+
+    Args:
+        upload_id (str): 上传会话ID
+
+    Returns:
+        dict: 与/upload-temp相同格式的上传结果
+    """
+    try:
+        file_info = await ResumableUploadService.finalize_upload(upload_id)
+    except ResumableUploadError as e:
+        return _resumable_error_response(e)
+
+    ResponseCache.invalidate("documents:")
+    return {"status": "success", "uploaded_files": [file_info]}
+
+@router.delete("/uploads/{upload_id}")
+async def abort_resumable_upload(upload_id: str):
+    """
+    取消可续传上传会话并删除已上传的数据
+
+    Args:
+        upload_id (str): 上传会话ID
+
+    Returns:
+        dict: 包含操作结果的字典
+    """
+    try:
+        removed = await ResumableUploadService.abort_upload(upload_id)
+    except ResumableUploadError as e:
+        return _resumable_error_response(e)
+
+    if not removed:
+        raise HTTPException(status_code=404, detail="上传会话不存在")
+    return {"status": "success", "upload_id": upload_id}
@@ -106,10 +106,10 @@ def delete_user_endpoint(user_id: int, db: Session = Depends(get_db)):
     return UserService.delete_user(db=db, user_id=user_id)
 
 @router.post("/login")
-def login(username: str = Form(...), password: str = Form(...), db: Session = Depends(get_db)):
-    """用户登录"""
+async def login(username: str = Form(...), password: str = Form(...), db: Session = Depends(get_db)):
+    """用户登录（密码验证在独立的密码哈希进程池中执行）"""
     # 使用UserService进行用户登录
-    user = UserService.login(db, username, password)
+    user = await UserService.login_async(db, username, password)
 
     # 手动构建响应数据
     response = {
@@ -124,10 +124,10 @@ def login(username: str = Form(...), password: str = Form(...), db: Session = De
     return response
 
 @router.post("/token", response_model=schemas.Token)
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    """用户登录并获取访问令牌"""
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+    """用户登录并获取访问令牌（密码验证在独立的密码哈希进程池中执行）"""
     # 使用UserService进行用户认证
-    user = UserService.authenticate_user(db, form_data.username, form_data.password)
+    user = await UserService.authenticate_user_async(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -36,6 +36,7 @@ class User(UserBase):
 
 # --- Agenda Item Schemas ---
 class AgendaItemBase(BaseModel):
+    id: Optional[str] = None  # 稳定的议程项ID，新增议程项时为空
     title: str
     position: Optional[int] = None  # 议程项在会议中的位置
     files: Optional[List[Any]] = None  # 允许任何类型的列表元素，包括字符串和字典
@@ -84,4 +85,5 @@ class Meeting(MeetingBase):
 class MeetingChangeStatus(BaseModel):
     """会议变更状态响应模型"""
     id: str
+    version: int = 0  # 会议版本高水位
     meetings: List[dict] = []
@@ -0,0 +1,27 @@
+"""
+主控服务启动脚本
+
+用法：python server.py [--host 0.0.0.0] [--port 8000] [--profile-startup]
+也可以直接使用 uvicorn main:app 启动（设置环境变量PROFILE_STARTUP=1输出启动耗时报告）。
+
+不要直接运行main.py：PDF渲染和密码哈希进程池使用spawn方式创建子进程，子进程会重新执行主模块，
+主模块是main.py时每个子进程都会导入全部路由并初始化应用。此脚本只包含启动参数的解析，
+子进程重新执行时不做任何初始化。
+"""
+import os
+
+
+if __name__ == "__main__":
+    import argparse
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="无纸化会议系统主控服务")
+    parser.add_argument("--host", default="0.0.0.0", help="监听地址")
+    parser.add_argument("--port", type=int, default=8000, help="监听端口")
+    parser.add_argument("--profile-startup", action="store_true", help="输出模块导入和初始化各阶段的耗时报告")
+    args = parser.parse_args()
+
+    if args.profile_startup:
+        os.environ["PROFILE_STARTUP"] = "1"
+
+    uvicorn.run("main:app", host=args.host, port=args.port)
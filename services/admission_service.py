@@ -0,0 +1,219 @@
+"""
+准入控制模块，使用令牌桶限制重负载接口的请求速率
+
+PDF转换、生成会议文件包等操作会占用大量CPU和磁盘带宽。请求过多时直接返回429和Retry-After，
+由客户端稍后重试，而不是让请求排队占用资源，保证心跳和状态查询等控制面接口的响应时间稳定。
+
+只对真正执行重负载工作的请求消耗令牌：例如会议文件包已是最新时，客户端获取文件包不受限制。
+各令牌桶的速率和容量可通过系统设置admission_limit_<名称>修改，值的格式为"每秒令牌数,容量"，如"1.0,8"。
+"""
+import math
+import time
+import threading
+from typing import Callable, Dict, Tuple
+
+from fastapi import HTTPException
+
+# 各类重负载操作的默认令牌桶配置：名称 -> (每秒补充的令牌数, 桶容量即允许的突发请求数)
+ADMISSION_LIMITS: Dict[str, Tuple[float, int]] = {
+    "render": (0.5, 4),   # PDF转换为图片
+    "package": (1.0, 8),  # 客户端请求触发的会议文件包生成
+    "archive": (0.5, 2),  # 打包下载选中的文档
+}
+
+# 令牌桶配置的系统设置键前缀
+ADMISSION_SETTING_PREFIX = "admission_limit_"
+
+# 重新读取令牌桶配置的间隔（秒）
+ADMISSION_SETTINGS_TTL = 30
+
+
+class TokenBucket:
+    """令牌桶，按固定速率补充令牌，每个请求消耗一个令牌"""
+
+    def __init__(self, rate: float, capacity: int):
+        """
+        Args:
+            rate (float): 每秒补充的令牌数
+            capacity (int): 桶容量
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def try_acquire(self, tokens: float = 1.0) -> float:
+        """
+        尝试获取令牌
+
+        Args:
+            tokens (float): 需要的令牌数
+
+        Returns:
+            float: 获取成功返回0，否则返回需要等待的秒数
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return 0.0
+            return (tokens - self.tokens) / self.rate if self.rate > 0 else float("inf")
+
+
+class AdmissionLimiter:
+    """准入控制类，管理各类重负载接口的令牌桶"""
+
+    _buckets: Dict[str, TokenBucket] = {}
+    _lock = threading.Lock()
+    # 各令牌桶最近一次读取系统设置的时间
+    _loaded_at: Dict[str, float] = {}
+
+    @staticmethod
+    def parse_limit(value: str) -> Tuple[float, int]:
+        """
+        解析令牌桶配置
+
+        Args:
+            value (str): 格式为"每秒令牌数,容量"的配置，如"1.0,8"
+
+        Returns:
+            Tuple[float, int]: (每秒补充的令牌数, 桶容量)
+
+        Raises:
+            ValueError: 格式无效、速率不大于0或容量小于1时
+        """
+        rate_str, capacity_str = [part.strip() for part in value.split(",")]
+        rate, capacity = float(rate_str), int(capacity_str)
+        if not rate > 0 or capacity < 1:
+            raise ValueError(f"无效的令牌桶配置: {value}")
+        return rate, capacity
+
+    @staticmethod
+    def get_limit_sync(name: str) -> Tuple[float, int]:
+        """
+        从系统设置读取令牌桶配置（同步版本），未设置或无效时使用ADMISSION_LIMITS中的默认值
+
+        Args:
+            name (str): 令牌桶名称
+
+        Returns:
+            Tuple[float, int]: (每秒补充的令牌数, 桶容量)
+        """
+        from database import SessionLocal
+        import crud
+
+        default = ADMISSION_LIMITS[name]
+        db = SessionLocal()
+        try:
+            value = crud.get_system_setting(db, f"{ADMISSION_SETTING_PREFIX}{name}", None)
+        finally:
+            db.close()
+
+        if not value:
+            return default
+        try:
+            return AdmissionLimiter.parse_limit(value)
+        except ValueError:
+            print(f"警告: 无效的准入控制配置 {name}={value}，将使用默认值{default}")
+            return default
+
+    @staticmethod
+    async def refresh(name: str):
+        """距上次读取超过ADMISSION_SETTINGS_TTL时，从系统设置重新读取令牌桶配置"""
+        now = time.monotonic()
+        if now - AdmissionLimiter._loaded_at.get(name, float("-inf")) < ADMISSION_SETTINGS_TTL:
+            return
+        AdmissionLimiter._loaded_at[name] = now
+
+        from services.async_utils import AsyncUtils, EXECUTOR_CONTROL
+
+        try:
+            rate, capacity = await AsyncUtils.run_in_executor(EXECUTOR_CONTROL, AdmissionLimiter.get_limit_sync, name)
+        except Exception as e:
+            print(f"读取准入控制配置失败: {name}, 错误: {str(e)}")
+            return
+
+        bucket = AdmissionLimiter.get_bucket(name)
+        with bucket.lock:
+            if (bucket.rate, bucket.capacity) != (rate, capacity):
+                print(f"[准入控制] {name} 配置已更新: 每秒 {rate} 个令牌, 容量 {capacity}")
+                bucket.rate = rate
+                bucket.capacity = capacity
+                bucket.tokens = min(bucket.tokens, float(capacity))
+
+    @staticmethod
+    def get_bucket(name: str) -> TokenBucket:
+        """
+        获取指定名称的令牌桶，首次调用时按ADMISSION_LIMITS创建
+
+        Args:
+            name (str): 令牌桶名称
+
+        Returns:
+            TokenBucket: 令牌桶
+        """
+        bucket = AdmissionLimiter._buckets.get(name)
+        if bucket is None:
+            rate, capacity = ADMISSION_LIMITS[name]
+            with AdmissionLimiter._lock:
+                bucket = AdmissionLimiter._buckets.setdefault(name, TokenBucket(rate, capacity))
+        return bucket
+
+    @staticmethod
+    def check(name: str):
+        """
+        检查请求是否可以被接受
+
+        Args:
+            name (str): 令牌桶名称
+
+        Raises:
+            HTTPException: 令牌不足时返回429错误，Retry-After为需要等待的秒数
+        """
+        wait = AdmissionLimiter.get_bucket(name).try_acquire()
+        if wait > 0:
+            retry_after = max(1, math.ceil(wait))
+            print(f"[准入控制] {name} 请求过多，拒绝请求，{retry_after} 秒后重试")
+            raise HTTPException(
+                status_code=429,
+                detail=f"服务器繁忙，请 {retry_after} 秒后重试",
+                headers={"Retry-After": str(retry_after)}
+            )
+
+    @staticmethod
+    async def acquire(name: str):
+        """
+        按最新的系统设置检查请求是否可以被接受，用于只在执行重负载工作时才需要准入检查的代码路径
+
+        Args:
+            name (str): 令牌桶名称
+
+        Raises:
+            HTTPException: 令牌不足时返回429错误
+        """
+        await AdmissionLimiter.refresh(name)
+        AdmissionLimiter.check(name)
+
+    @staticmethod
+    def limit(name: str) -> Callable[[], None]:
+        """
+        创建用于路由依赖注入的准入检查函数
+
+        用法：@router.post("/convert-to-jpg", dependencies=[Depends(AdmissionLimiter.limit("render"))])
+
+        Args:
+            name (str): 令牌桶名称
+
+        Returns:
+            Callable: 准入检查函数
+        """
+        if name not in ADMISSION_LIMITS:
+            raise ValueError(f"未知的准入控制类型: {name}")
+
+        async def _check_admission():
+            await AdmissionLimiter.acquire(name)
+
+        return _check_admission
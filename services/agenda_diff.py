@@ -0,0 +1,204 @@
+"""
+议程项差异模块，计算已保存的议程项与提交的议程项之间的最小差异
+
+更新会议时不再删除全部议程项后重新插入，而是按差异只修改变化的部分：
+- 插入：新增的议程项
+- 修改：标题、报告人、时长、文件或页面发生变化的议程项
+- 移动：位置发生变化的议程项（可以同时被修改）
+- 删除：不再存在的议程项
+
+议程项优先按稳定的议程项ID匹配；没有ID的议程项按标题匹配（同一会议下标题唯一），
+仍未匹配上的再按位置匹配，视为修改了标题。议程项文件夹以ID命名，移动议程项只修改position，不涉及文件。
+"""
+from typing import Any, Dict, Iterable, List, Optional
+
+# 参与比较的议程项字段
+AGENDA_FIELDS = ("title", "reporter", "duration_minutes", "files", "pages")
+
+
+def _item_id(item: Any) -> Optional[str]:
+    """获取议程项的ID，没有ID时返回None"""
+    if isinstance(item, dict):
+        return item.get("id")
+    return getattr(item, "id", None)
+
+
+def _item_values(item: Any) -> Dict[str, Any]:
+    """将议程项（数据库对象、Pydantic模型或字典）转换为字段字典"""
+    if isinstance(item, dict):
+        source = item
+    elif hasattr(item, "dict") and not hasattr(item, "__table__"):
+        source = item.dict()
+    else:
+        source = {field: getattr(item, field, None) for field in AGENDA_FIELDS}
+    return {field: source.get(field) for field in AGENDA_FIELDS}
+
+
+class AgendaChange:
+    """一个议程项的变化"""
+
+    def __init__(self, item_id: Optional[str], old_position: Optional[int], new_position: Optional[int],
+                 values: Optional[Dict[str, Any]] = None, changed_fields: Iterable[str] = ()):
+        """
+        Args:
+            item_id (str, optional): 议程项ID，新增的议程项为提交的ID（可能为None）
+            old_position (int, optional): 原来的位置，新增的议程项为None
+            new_position (int, optional): 新的位置，删除的议程项为None
+            values (Dict[str, Any], optional): 提交的字段值，删除的议程项为None
+            changed_fields (Iterable[str]): 发生变化的字段
+        """
+        self.item_id = item_id
+        self.old_position = old_position
+        self.new_position = new_position
+        self.values = values
+        self.changed_fields = set(changed_fields)
+
+    @property
+    def is_insert(self) -> bool:
+        return self.old_position is None
+
+    @property
+    def is_delete(self) -> bool:
+        return self.new_position is None
+
+    @property
+    def is_move(self) -> bool:
+        return not self.is_insert and not self.is_delete and self.old_position != self.new_position
+
+    @property
+    def is_update(self) -> bool:
+        return not self.is_insert and not self.is_delete and bool(self.changed_fields)
+
+    @property
+    def files_changed(self) -> bool:
+        """议程项的文件是否变化（新增的议程项视为变化）"""
+        return self.is_insert or "files" in self.changed_fields
+
+    def __repr__(self) -> str:
+        return (f"AgendaChange(id={self.item_id}, old={self.old_position}, new={self.new_position}, "
+                f"changed={sorted(self.changed_fields)})")
+
+
+class AgendaDiff:
+    """议程项差异类"""
+
+    def __init__(self, changes: List[AgendaChange], unchanged: List[int], matched_ids: Dict[int, str]):
+        """
+        Args:
+            changes (List[AgendaChange]): 发生变化的议程项
+            unchanged (List[int]): 没有变化的议程项位置
+            matched_ids (Dict[int, str]): 提交的议程项新位置到已保存议程项ID的映射
+        """
+        self.changes = changes
+        self.unchanged = unchanged
+        self.matched_ids = matched_ids
+
+    @staticmethod
+    def compute(stored_items: Iterable[Any], submitted_items: Iterable[Any]) -> "AgendaDiff":
+        """
+        计算已保存的议程项与提交的议程项之间的差异
+
+        Args:
+            stored_items (Iterable[Any]): 已保存的议程项（带id和position属性的数据库对象）
+            submitted_items (Iterable[Any]): 提交的议程项，按顺序排列，位置从1开始
+
+        Returns:
+            AgendaDiff: 议程项差异
+        """
+        stored_items = list(stored_items)
+        submitted_items = list(submitted_items)
+        stored = {item.position: _item_values(item) for item in stored_items}
+        stored_ids = {item.position: item.id for item in stored_items}
+        submitted = {position: _item_values(item) for position, item in enumerate(submitted_items, start=1)}
+        submitted_ids = {position: _item_id(item) for position, item in enumerate(submitted_items, start=1)}
+
+        matches: Dict[int, int] = {}  # 新位置 -> 原位置
+        matched_old = set()
+
+        # 第一轮：按议程项ID匹配
+        stored_by_id = {item_id: position for position, item_id in stored_ids.items()}
+        for new_position, item_id in submitted_ids.items():
+            old_position = stored_by_id.get(item_id) if item_id else None
+            if old_position is not None and old_position not in matched_old:
+                matches[new_position] = old_position
+                matched_old.add(old_position)
+
+        # 第二轮：按标题匹配
+        stored_by_title = {values["title"]: position for position, values in stored.items()}
+        for new_position, values in submitted.items():
+            if new_position in matches:
+                continue
+            old_position = stored_by_title.get(values["title"])
+            if old_position is not None and old_position not in matched_old:
+                matches[new_position] = old_position
+                matched_old.add(old_position)
+
+        # 第三轮：仍未匹配的议程项按位置匹配，视为修改了标题
+        for new_position in submitted:
+            if new_position in matches:
+                continue
+            if new_position in stored and new_position not in matched_old:
+                matches[new_position] = new_position
+                matched_old.add(new_position)
+
+        changes: List[AgendaChange] = []
+        unchanged: List[int] = []
+
+        for new_position, values in submitted.items():
+            old_position = matches.get(new_position)
+            if old_position is None:
+                changes.append(AgendaChange(submitted_ids[new_position], None, new_position, values, AGENDA_FIELDS))
+                continue
+
+            item_id = stored_ids[old_position]
+            changed_fields = [field for field in AGENDA_FIELDS if stored[old_position][field] != values[field]]
+            if changed_fields or old_position != new_position:
+                changes.append(AgendaChange(item_id, old_position, new_position, values, changed_fields))
+            else:
+                unchanged.append(new_position)
+
+        for old_position in sorted(set(stored) - matched_old):
+            changes.append(AgendaChange(stored_ids[old_position], old_position, None))
+
+        matched_ids = {new_position: stored_ids[old_position] for new_position, old_position in matches.items()}
+        return AgendaDiff(changes, unchanged, matched_ids)
+
+    @property
+    def inserted(self) -> List[AgendaChange]:
+        return [change for change in self.changes if change.is_insert]
+
+    @property
+    def deleted(self) -> List[AgendaChange]:
+        return [change for change in self.changes if change.is_delete]
+
+    @property
+    def moved(self) -> List[AgendaChange]:
+        return [change for change in self.changes if change.is_move]
+
+    @property
+    def updated(self) -> List[AgendaChange]:
+        return [change for change in self.changes if change.is_update]
+
+    def is_empty(self) -> bool:
+        """议程项是否完全没有变化"""
+        return not self.changes
+
+    def get_change(self, new_position: int) -> Optional[AgendaChange]:
+        """
+        获取新位置上议程项的变化
+
+        Args:
+            new_position (int): 议程项的新位置
+
+        Returns:
+            Optional[AgendaChange]: 变化，议程项没有变化时返回None
+        """
+        for change in self.changes:
+            if change.new_position == new_position:
+                return change
+        return None
+
+    def summary(self) -> str:
+        """返回用于日志的差异摘要"""
+        return (f"插入 {len(self.inserted)} 个，修改 {len(self.updated)} 个，移动 {len(self.moved)} 个，"
+                f"删除 {len(self.deleted)} 个，未变化 {len(self.unchanged)} 个")
@@ -3,16 +3,105 @@
 
 此模块提供了一系列工具函数，用于处理异步操作，包括在同步环境中执行异步函数、
 并行执行多个异步任务等。
+
+阻塞操作按负载类型在各自的线程池中执行，互不影响：
+- control：控制面操作（心跳、状态查询、数据库读写等短小操作），保证在大量转换任务时仍能及时响应
+- io：文件读写、目录检查等文件I/O，run_in_threadpool默认使用此线程池
+- cpu：压缩打包、图片拼接等在线程中执行的CPU密集操作（PDF渲染另由RasterEngine的进程池执行）
 """
+import os
+import time
 import asyncio
 import functools
-from typing import Any, Callable, Coroutine, List, TypeVar, Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Awaitable, Callable, Coroutine, Dict, Iterable, List, TypeVar, Optional
 
 T = TypeVar('T')
 
+# 线程池名称
+EXECUTOR_CONTROL = "control"
+EXECUTOR_IO = "io"
+EXECUTOR_CPU = "cpu"
+
+# 各线程池的线程数量
+EXECUTOR_SIZES = {
+    EXECUTOR_CONTROL: 4,
+    EXECUTOR_IO: 16,
+    EXECUTOR_CPU: max(os.cpu_count() or 1, 2),
+}
+
+# bounded_map默认的初始并发数和并发数上限
+BOUNDED_MAP_INITIAL_LIMIT = 4
+BOUNDED_MAP_MAX_LIMIT = max((os.cpu_count() or 1) * 2, BOUNDED_MAP_INITIAL_LIMIT)
+# 任务耗时超过基准耗时的倍数时视为过载，并发数减半
+BOUNDED_MAP_LATENCY_TOLERANCE = 2.0
+# 系统内存占用超过该百分比时并发数减半（需要安装psutil）
+BOUNDED_MAP_MEMORY_PERCENT = 85.0
+
+
+class _AIMDController:
+    """
+    按加性增、乘性减（AIMD）调整并发数
+
+    每完成与当前并发数相同数量的任务且未过载时并发数加1；任务耗时明显高于基准耗时，
+    或系统内存占用过高时并发数减半。每一轮（当前并发数个任务）最多减一次，避免连续减半。
+    """
+
+    # psutil模块，首次检查时导入；未安装时为False
+    _psutil: Any = None
+
+    def __init__(self, initial: int, minimum: int, maximum: int, latency_tolerance: float):
+        self.minimum = max(minimum, 1)
+        self.maximum = max(maximum, self.minimum)
+        self.limit = min(max(initial, self.minimum), self.maximum)
+        self.latency_tolerance = latency_tolerance
+        self.baseline: Optional[float] = None
+        self.completed_in_round = 0
+        self.decreased_in_round = False
+
+    @staticmethod
+    def _memory_overloaded() -> bool:
+        """检查系统内存占用是否过高，未安装psutil时不检查"""
+        if _AIMDController._psutil is None:
+            try:
+                # 可选依赖：psutil
+                import psutil
+                _AIMDController._psutil = psutil
+            except ImportError:
+                _AIMDController._psutil = False
+        if not _AIMDController._psutil:
+            return False
+        return _AIMDController._psutil.virtual_memory().percent >= BOUNDED_MAP_MEMORY_PERCENT
+
+    def record(self, latency: float):
+        """记录一个任务的耗时并调整并发数"""
+        # 基准耗时取观察到的最小耗时并缓慢上浮，适应任务本身变慢的情况
+        if self.baseline is None or latency < self.baseline:
+            self.baseline = latency
+        else:
+            self.baseline = self.baseline * 0.95 + latency * 0.05
+
+        overloaded = latency > self.baseline * self.latency_tolerance or self._memory_overloaded()
+        if overloaded and not self.decreased_in_round:
+            self.limit = max(self.minimum, self.limit // 2)
+            self.decreased_in_round = True
+
+        self.completed_in_round += 1
+        if self.completed_in_round >= self.limit:
+            if not overloaded and not self.decreased_in_round:
+                self.limit = min(self.maximum, self.limit + 1)
+            self.completed_in_round = 0
+            self.decreased_in_round = False
+
+
 class AsyncUtils:
     """异步工具类，提供异步操作相关的工具函数"""
 
+    # 按名称创建的线程池
+    _executors: Dict[str, ThreadPoolExecutor] = {}
+    _executors_lock = threading.Lock()
+
     @staticmethod
     async def gather_with_concurrency(n: int, *tasks) -> List[Any]:
         """
@@ -36,6 +125,93 @@ class AsyncUtils:
         
         return await asyncio.gather(*(sem_task(task) for task in tasks))
 
+    @staticmethod
+    async def bounded_map(
+        func: Callable[[Any], Awaitable[T]],
+        items: Iterable[Any],
+        limit: int = BOUNDED_MAP_INITIAL_LIMIT,
+        ordered: bool = True,
+        adaptive: bool = True,
+        min_limit: int = 1,
+        max_limit: int = BOUNDED_MAP_MAX_LIMIT,
+        cancel_on_error: bool = True
+    ) -> AsyncIterator[T]:
+        """
+        限制并发数量地对每一项执行异步函数，以异步迭代器的方式逐个返回结果
+
+        与gather_with_concurrency不同，协程在有空闲并发时才创建，结果产生后立即返回给调用方，
+        不需要等所有任务完成，调用方可以据此报告进度。
+
+        Args:
+            func (Callable): 对每一项执行的异步函数
+            items (Iterable): 输入项，按需逐个读取
+            limit (int): 初始并发数，默认为4
+            ordered (bool): 为True时按输入顺序返回结果，否则按完成顺序返回
+            adaptive (bool): 是否按任务耗时和内存占用自动调整并发数（AIMD）；耗时与最快的任务比较，
+                只适用于每一项工作量相近的情况，工作量差别很大时（如页数不同的PDF文件）应设为False
+            min_limit (int): 自动调整时的最小并发数
+            max_limit (int): 自动调整时的最大并发数，默认为CPU核心数的2倍
+            cancel_on_error (bool): 为True时任一任务失败即取消其余任务并抛出异常；
+                为False时异常对象作为该项的结果返回
+
+        Yields:
+            Any: 每一项的结果
+        """
+        controller = _AIMDController(
+            limit, min_limit, max_limit if adaptive else limit, BOUNDED_MAP_LATENCY_TOLERANCE
+        )
+        iterator = iter(items)
+        exhausted = False
+        running: Dict[asyncio.Task, tuple] = {}  # 任务 -> (序号, 开始时间)
+        finished: Dict[int, Any] = {}  # 按顺序返回时，已完成但还不能返回的结果
+        next_index = 0  # 下一个要读取的输入项序号
+        next_yield = 0  # 按顺序返回时，下一个要返回的结果序号
+
+        try:
+            while True:
+                # 启动新任务直到达到并发数；按顺序返回时限制等待返回的结果数量，避免缓存过多结果
+                while not exhausted and len(running) < controller.limit and (
+                    not ordered or next_index - next_yield < controller.maximum * 2
+                ):
+                    try:
+                        item = next(iterator)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    task = asyncio.ensure_future(func(item))
+                    running[task] = (next_index, time.monotonic())
+                    next_index += 1
+
+                if not running:
+                    break
+
+                done, _ = await asyncio.wait(running.keys(), return_when=asyncio.FIRST_COMPLETED)
+                completed = []
+                for task in done:
+                    index, started_at = running.pop(task)
+                    error = task.exception()
+                    if error is not None and cancel_on_error:
+                        raise error
+                    if adaptive:
+                        controller.record(time.monotonic() - started_at)
+                    completed.append((index, error if error is not None else task.result()))
+
+                if not ordered:
+                    for _, result in sorted(completed, key=lambda pair: pair[0]):
+                        yield result
+                    continue
+
+                finished.update(completed)
+                while next_yield in finished:
+                    yield finished.pop(next_yield)
+                    next_yield += 1
+        finally:
+            # 出错、调用方提前结束迭代或被取消时，取消所有尚未完成的任务
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+
     @staticmethod
     def run_sync(func: Callable[..., Coroutine[Any, Any, T]], *args, **kwargs) -> T:
         """
@@ -87,13 +263,45 @@ class AsyncUtils:
         return sync_func
 
     @staticmethod
-    async def run_in_threadpool(func: Callable[..., T], *args, **kwargs) -> T:
+    def get_executor(name: str) -> ThreadPoolExecutor:
         """
-        在线程池中运行同步函数
+        获取指定负载类型的线程池，首次调用时创建
 
-        用于在异步环境中执行可能阻塞的同步操作，避免阻塞事件循环。
+        Args:
+            name (str): 线程池名称，EXECUTOR_CONTROL、EXECUTOR_IO或EXECUTOR_CPU
+
+        Returns:
+            ThreadPoolExecutor: 线程池
+        """
+        executor = AsyncUtils._executors.get(name)
+        if executor is None:
+            if name not in EXECUTOR_SIZES:
+                raise ValueError(f"未知的线程池: {name}")
+            with AsyncUtils._executors_lock:
+                executor = AsyncUtils._executors.get(name)
+                if executor is None:
+                    executor = ThreadPoolExecutor(
+                        max_workers=EXECUTOR_SIZES[name], thread_name_prefix=f"{name}-pool"
+                    )
+                    AsyncUtils._executors[name] = executor
+        return executor
+
+    @staticmethod
+    def shutdown_executors():
+        """关闭所有按名称创建的线程池，尚未开始的任务被取消"""
+        with AsyncUtils._executors_lock:
+            executors = list(AsyncUtils._executors.values())
+            AsyncUtils._executors.clear()
+        for executor in executors:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    async def run_in_executor(name: str, func: Callable[..., T], *args, **kwargs) -> T:
+        """
+        在指定负载类型的线程池中运行同步函数
 
         Args:
+            name (str): 线程池名称，EXECUTOR_CONTROL、EXECUTOR_IO或EXECUTOR_CPU
             func (Callable): 要执行的同步函数
             *args: 传递给同步函数的位置参数
             **kwargs: 传递给同步函数的关键字参数
@@ -103,9 +311,27 @@ class AsyncUtils:
         """
         loop = asyncio.get_running_loop()
         return await loop.run_in_executor(
-            None, lambda: func(*args, **kwargs)
+            AsyncUtils.get_executor(name), lambda: func(*args, **kwargs)
         )
 
+    @staticmethod
+    async def run_in_threadpool(func: Callable[..., T], *args, **kwargs) -> T:
+        """
+        在文件I/O线程池中运行同步函数
+
+        用于在异步环境中执行可能阻塞的同步操作，避免阻塞事件循环。
+        CPU密集的操作应使用run_in_executor(EXECUTOR_CPU, ...)，控制面操作使用EXECUTOR_CONTROL。
+
+        Args:
+            func (Callable): 要执行的同步函数
+            *args: 传递给同步函数的位置参数
+            **kwargs: 传递给同步函数的关键字参数
+
+        Returns:
+            Any: 同步函数的返回值
+        """
+        return await AsyncUtils.run_in_executor(EXECUTOR_IO, func, *args, **kwargs)
+
     @staticmethod
     def to_async(sync_func: Callable[..., T]) -> Callable[..., Coroutine[Any, Any, T]]:
         """
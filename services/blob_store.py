@@ -0,0 +1,375 @@
+"""
+内容寻址文件存储模块，对上传的文件按内容去重
+
+同一份PDF（如长期有效的规章制度）常被附加到几十个会议中。此模块将文件内容按SHA-256哈希
+保存在uploads/blobs/<sha256>中，每个内容只保存一份；议程目录中的文件是指向该内容的硬链接，
+不再重复占用磁盘空间，也不需要复制。
+
+存储路径上的文件始终是完整的：内容先写入存储目录中的临时文件并校验哈希，再原子地链接到最终路径，
+并发存入相同内容或存入过程中进程退出时，不会出现被当作已存在内容使用的不完整文件。
+
+引用计数即硬链接数减一（存储目录自身持有一个链接），同步记录在blobs表中。
+无论议程目录以何种方式被删除，引用计数都保持准确；引用数为0的内容由GCService的blobs阶段通过collect_blob_entry_sync分批清理。
+文件系统不支持硬链接时依次退回为reflink和复制，此时议程文件独立存在，存储中的内容只作为按哈希访问的副本。
+"""
+import os
+import re
+import uuid
+import hashlib
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+# 获取项目根目录
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+
+# 上传目录
+UPLOAD_DIR = os.path.join(project_root, "uploads")
+# 内容存储目录
+BLOB_DIR = os.path.join(UPLOAD_DIR, "blobs")
+
+# 计算哈希时每次读取的块大小
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# 新存入的内容在此时间（秒）内不会被垃圾回收，避免在存入和建立链接之间被删除
+GC_GRACE_SECONDS = 3600
+
+SHA256_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+# 存入过程中使用的临时文件名前缀，超过保护期仍存在的临时文件由垃圾回收删除
+INGEST_TEMP_PREFIX = ".ingest-"
+
+# 记录文件内容哈希的扩展属性名，值为"哈希:大小:修改时间(ns)"，文件被修改后记录失效
+HASH_XATTR_NAME = "user.huiyi.sha256"
+
+
+class BlobStore:
+    """内容寻址存储类，负责内容去重、建立链接和引用计数"""
+
+    @staticmethod
+    def is_valid_sha256(sha256: str) -> bool:
+        """检查字符串是否为合法的SHA-256十六进制哈希"""
+        return bool(sha256) and bool(SHA256_PATTERN.match(sha256))
+
+    @staticmethod
+    def get_blob_path(sha256: str) -> str:
+        """
+        获取内容在存储中的路径
+
+        Args:
+            sha256 (str): 文件内容的SHA-256哈希
+
+        Returns:
+            str: 存储中的文件路径
+
+        Raises:
+            ValueError: 当哈希格式不合法时
+        """
+        if not BlobStore.is_valid_sha256(sha256):
+            raise ValueError(f"无效的SHA-256哈希: {sha256}")
+        return os.path.join(BLOB_DIR, sha256)
+
+    @staticmethod
+    def compute_sha256_sync(file_path: str) -> str:
+        """
+        按块读取文件并计算SHA-256哈希（同步版本）
+
+        Args:
+            file_path (str): 文件路径
+
+        Returns:
+            str: 十六进制格式的SHA-256哈希值
+        """
+        sha256 = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            while True:
+                chunk = f.read(HASH_CHUNK_SIZE)
+                if not chunk:
+                    break
+                sha256.update(chunk)
+        return sha256.hexdigest()
+
+    @staticmethod
+    def record_sha256_sync(file_path: str, sha256: str) -> bool:
+        """
+        在文件的扩展属性中记录服务端计算出的内容哈希，之后提交文件时可以不再读取文件（同步版本）
+
+        记录中包含文件的大小和修改时间，文件被修改后记录自动失效。硬链接共享同一记录。
+
+        Args:
+            file_path (str): 文件路径
+            sha256 (str): 文件内容的SHA-256哈希
+
+        Returns:
+            bool: 记录成功返回True，平台或文件系统不支持扩展属性时返回False
+        """
+        if not hasattr(os, "setxattr") or not BlobStore.is_valid_sha256(sha256):
+            return False
+        try:
+            stat = os.stat(file_path)
+            os.setxattr(file_path, HASH_XATTR_NAME, f"{sha256}:{stat.st_size}:{stat.st_mtime_ns}".encode("ascii"))
+            return True
+        except OSError:
+            return False
+
+    @staticmethod
+    def get_recorded_sha256_sync(file_path: str) -> Optional[str]:
+        """
+        读取record_sha256_sync记录的内容哈希（同步版本）
+
+        Args:
+            file_path (str): 文件路径
+
+        Returns:
+            Optional[str]: 记录的哈希；没有记录、记录后文件被修改或不支持扩展属性时返回None
+        """
+        if not hasattr(os, "getxattr"):
+            return None
+        try:
+            value = os.getxattr(file_path, HASH_XATTR_NAME).decode("ascii")
+            stat = os.stat(file_path)
+        except (OSError, UnicodeDecodeError):
+            return None
+
+        parts = value.split(":")
+        if len(parts) != 3 or parts[1:] != [str(stat.st_size), str(stat.st_mtime_ns)]:
+            return None
+        return parts[0] if BlobStore.is_valid_sha256(parts[0]) else None
+
+    @staticmethod
+    def sync_refcount(sha256: str) -> int:
+        """根据硬链接数更新数据库中的引用计数，返回当前引用计数"""
+        from database import SessionLocal
+        import crud
+
+        blob_path = BlobStore.get_blob_path(sha256)
+        stat = os.stat(blob_path)
+        refcount = max(stat.st_nlink - 1, 0)
+
+        db = SessionLocal()
+        try:
+            crud.upsert_blob(
+                db, sha256, stat.st_size, refcount,
+                created_at=datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            )
+        finally:
+            db.close()
+        return refcount
+
+    @staticmethod
+    def _publish_sync(path: str, blob_path: str) -> bool:
+        """
+        将完整的文件原子地放到存储路径，已存在时不覆盖
+
+        Args:
+            path (str): 完整的文件（源文件或存储目录中的临时文件）
+            blob_path (str): 存储路径
+
+        Returns:
+            bool: 放置成功返回True，存储路径已存在（同一内容被并发存入）返回False
+
+        Raises:
+            OSError: 不能建立硬链接时（跨设备或文件系统不支持）
+        """
+        try:
+            os.link(path, blob_path)
+            return True
+        except FileExistsError:
+            return False
+
+    @staticmethod
+    def _write_verified_copy_sync(src_path: str, sha256: str) -> str:
+        """
+        将源文件复制（或reflink）到存储目录中的临时文件，写入磁盘后校验哈希
+
+        Args:
+            src_path (str): 源文件路径
+            sha256 (str): 源文件内容的SHA-256哈希
+
+        Returns:
+            str: 临时文件路径
+
+        Raises:
+            OSError: 复制失败或复制后的内容与哈希不一致时
+        """
+        import shutil
+        from services.file_commit import try_reflink
+
+        temp_path = os.path.join(BLOB_DIR, f"{INGEST_TEMP_PREFIX}{sha256[:16]}-{uuid.uuid4().hex}")
+        try:
+            if not try_reflink(src_path, temp_path):
+                shutil.copy2(src_path, temp_path)
+            with open(temp_path, "rb") as f:
+                os.fsync(f.fileno())
+            if BlobStore.compute_sha256_sync(temp_path) != sha256:
+                raise OSError(f"复制到存储的内容校验失败: {sha256}")
+            return temp_path
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+
+    @staticmethod
+    def ingest_sync(src_path: str, keep_source: bool = False, sha256: Optional[str] = None) -> str:
+        """
+        将文件内容存入存储（同步版本），内容已存在时直接复用
+
+        同一文件系统内直接将源文件硬链接到存储路径；不能建立硬链接时先复制到存储目录中的临时文件，
+        写入磁盘并校验哈希后再原子地放到存储路径。存储路径上不会出现不完整的文件。
+
+        keep_source为True时源文件保持不变，否则存入后删除源文件；内容已存在时源文件不做处理。
+
+        Args:
+            src_path (str): 源文件路径
+            keep_source (bool): 是否保留源文件
+            sha256 (str, optional): 调用方刚根据文件内容计算出的哈希，传入时不再重复读取文件
+
+        Returns:
+            str: 文件内容的SHA-256哈希
+        """
+        os.makedirs(BLOB_DIR, exist_ok=True)
+
+        if sha256 is None:
+            sha256 = BlobStore.compute_sha256_sync(src_path)
+        blob_path = BlobStore.get_blob_path(sha256)
+
+        if os.path.exists(blob_path):
+            print(f"内容已存在于存储中，复用: {sha256}")
+            return sha256
+
+        try:
+            published = BlobStore._publish_sync(src_path, blob_path)
+        except FileExistsError:
+            published = False
+        except OSError:
+            # 跨设备或不支持硬链接：写入校验过的副本后再放到存储路径
+            temp_path = BlobStore._write_verified_copy_sync(src_path, sha256)
+            try:
+                try:
+                    published = BlobStore._publish_sync(temp_path, blob_path)
+                except FileExistsError:
+                    published = False
+                except OSError:
+                    # 存储目录不支持硬链接，改用原子重命名（内容相同，覆盖并发存入的副本不影响正确性）
+                    os.replace(temp_path, blob_path)
+                    published = True
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+
+        if published and not keep_source:
+            os.remove(src_path)
+
+        if published:
+            print(f"新内容已存入存储: {sha256}")
+        else:
+            print(f"内容已被并发存入存储，复用: {sha256}")
+        return sha256
+
+    @staticmethod
+    def store_file_sync(src_path: str, dest_path: str) -> Dict[str, Any]:
+        """
+        将文件存入内容存储，并在目标位置建立指向该内容的链接（同步版本）
+
+        源文件会被移入存储（内容已存在时直接删除源文件），目标位置得到硬链接。
+        哈希始终根据文件实际内容计算，不信任客户端回传的文件信息。
+
+        Args:
+            src_path (str): 源文件路径（通常是uploads/temp中的临时文件）
+            dest_path (str): 目标文件路径（议程目录中的文件）
+
+        Returns:
+            Dict[str, Any]: 包含sha256、size、link（hardlink、reflink或copy）、deduplicated和refcount的字典
+        """
+        from services.file_commit import link_file
+
+        size = os.path.getsize(src_path)
+        sha256 = BlobStore.compute_sha256_sync(src_path)
+        blob_path = BlobStore.get_blob_path(sha256)
+        deduplicated = os.path.exists(blob_path)
+
+        # 源文件就是目标文件时必须保留，由下面重新建立链接
+        same_path = os.path.normpath(src_path) == os.path.normpath(dest_path)
+        BlobStore.ingest_sync(src_path, keep_source=same_path)
+
+        # 目标位置已经是同一内容的链接时不需要重新建立
+        link = "hardlink"
+        if not (os.path.exists(dest_path) and os.path.samefile(dest_path, blob_path)):
+            staging_path = f"{dest_path}.link.tmp"
+            link = link_file(blob_path, staging_path)
+            os.replace(staging_path, dest_path)
+
+        # 删除源文件（已被移入存储的源文件不存在，同一内容的源文件只是多余的链接）
+        if os.path.exists(src_path) and not same_path:
+            try:
+                os.remove(src_path)
+            except OSError as e:
+                print(f"删除源文件失败: {src_path}, 错误: {str(e)}")
+
+        refcount = BlobStore.sync_refcount(sha256)
+
+        return {
+            "sha256": sha256,
+            "size": size,
+            "link": link,
+            "deduplicated": deduplicated,
+            "refcount": refcount
+        }
+
+    @staticmethod
+    def get_blob_file(sha256: str) -> Optional[str]:
+        """
+        获取存储中内容的文件路径
+
+        Args:
+            sha256 (str): 文件内容的SHA-256哈希
+
+        Returns:
+            Optional[str]: 文件路径，不存在或哈希不合法时返回None
+        """
+        if not BlobStore.is_valid_sha256(sha256):
+            return None
+        blob_path = BlobStore.get_blob_path(sha256)
+        return blob_path if os.path.isfile(blob_path) else None
+
+    @staticmethod
+    def collect_blob_entry_sync(entry: os.DirEntry, now: float, known_refcount: Optional[int], db) -> int:
+        """
+        检查存储目录中的一个内容：无引用且超过保护期时删除，否则在引用计数变化时更新数据库（同步版本）
+
+        Args:
+            entry (os.DirEntry): 存储目录中的条目
+            now (float): 当前时间戳
+            known_refcount (Optional[int]): 数据库中记录的引用计数，没有记录时为None
+            db: 数据库会话
+
+        Returns:
+            int: 删除内容释放的字节数，未删除返回0；不是内容文件时返回-1
+        """
+        import crud
+
+        # 存入过程中进程退出时遗留的临时文件
+        if entry.name.startswith(INGEST_TEMP_PREFIX) and entry.is_file():
+            stat = entry.stat()
+            if now - stat.st_mtime > GC_GRACE_SECONDS:
+                os.remove(entry.path)
+                return stat.st_size
+            return -1
+
+        if not entry.is_file() or not BlobStore.is_valid_sha256(entry.name):
+            return -1
+
+        stat = entry.stat()
+        refcount = max(stat.st_nlink - 1, 0)
+
+        # 引用数为0且已超过保护期的内容可以删除
+        if refcount == 0 and now - stat.st_ctime > GC_GRACE_SECONDS:
+            os.remove(entry.path)
+            crud.delete_blob(db, entry.name)
+            return stat.st_size
+
+        if known_refcount != refcount:
+            crud.upsert_blob(db, entry.name, stat.st_size, refcount)
+        return 0
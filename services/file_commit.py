@@ -0,0 +1,285 @@
+"""
+文件提交模块，以事务方式将临时文件批量提交到会议目录
+
+保存会议时，所有议程项的临时文件在同一个事务中提交：
+1. 暂存：每个文件存入内容存储，并在目标位置旁边建立暂存链接，源文件保持不变
+2. 提交：将所有暂存文件原子重命名为目标文件
+3. 清理：全部成功后才删除源文件
+
+任何一步失败都会回滚：删除暂存文件、恢复被覆盖的目标文件，源文件不受影响。
+文件信息中的sha256与上传时记录在文件上的哈希一致时直接使用，不再读取文件；
+没有记录（或文件已被修改）时才计算哈希，多个文件在有限的线程中并行处理，同一源文件只计算一次。
+同一内容只存入一次（多个议程共用同一文件时不会有多个线程同时存入相同内容），之后再为每个目标建立暂存链接。
+
+文件传输优先使用元数据操作：同一文件系统内使用硬链接和os.replace，
+支持的文件系统上使用reflink（写时复制克隆），只有跨设备时才退回为完整复制。
+"""
+import os
+import sys
+import uuid
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+# Linux上FICLONE ioctl的请求号，用于reflink克隆文件
+FICLONE = 0x40049409
+
+# 暂存阶段并行处理的最大文件数
+STAGE_MAX_WORKERS = 4
+
+
+def try_reflink(src_path: str, dest_path: str) -> bool:
+    """
+    尝试以reflink（写时复制）方式克隆文件，只在支持的文件系统（如Btrfs、XFS）上成功
+
+    Args:
+        src_path (str): 源文件路径
+        dest_path (str): 目标文件路径，必须不存在
+
+    Returns:
+        bool: 克隆成功返回True，不支持时返回False
+    """
+    if not sys.platform.startswith("linux"):
+        return False
+
+    try:
+        import fcntl
+    except ImportError:
+        return False
+
+    try:
+        with open(src_path, "rb") as src, open(dest_path, "xb") as dest:
+            fcntl.ioctl(dest.fileno(), FICLONE, src.fileno())
+        shutil.copystat(src_path, dest_path)
+        return True
+    except OSError:
+        try:
+            os.remove(dest_path)
+        except OSError:
+            pass
+        return False
+
+
+def link_file(src_path: str, dest_path: str) -> str:
+    """
+    在目标位置建立与源文件内容相同的文件，源文件保留
+
+    依次尝试硬链接、reflink，都不支持时复制文件。
+
+    Args:
+        src_path (str): 源文件路径
+        dest_path (str): 目标文件路径，必须不存在
+
+    Returns:
+        str: 使用的方式：hardlink、reflink或copy
+    """
+    try:
+        os.link(src_path, dest_path)
+        return "hardlink"
+    except OSError:
+        pass
+
+    if try_reflink(src_path, dest_path):
+        return "reflink"
+
+    shutil.copy2(src_path, dest_path)
+    return "copy"
+
+
+class FileCommitError(Exception):
+    """文件提交事务失败时抛出的异常，抛出时事务已回滚"""
+    pass
+
+
+class FileCommitTransaction:
+    """文件提交事务类，将多个临时文件作为一个整体提交到会议目录"""
+
+    def __init__(self, label: str = ""):
+        """
+        Args:
+            label (str): 事务说明，用于日志
+        """
+        self.tx_id = uuid.uuid4().hex[:12]
+        self.label = label
+        self._operations: List[Dict[str, Any]] = []
+
+    def __len__(self) -> int:
+        return len(self._operations)
+
+    def add(self, src_path: str, dest_path: str, record: Optional[Dict[str, Any]] = None):
+        """
+        登记一个文件提交操作
+
+        record为该文件的文件信息字典：添加时保存其快照，事务回滚时恢复为快照内容，
+        提交成功时写入sha256。
+
+        Args:
+            src_path (str): 源文件路径（临时文件或原议程目录中的文件）
+            dest_path (str): 目标文件路径
+            record (Dict[str, Any], optional): 文件信息字典
+        """
+        self._operations.append({
+            "src": src_path,
+            "dest": dest_path,
+            "record": record,
+            "snapshot": dict(record) if record is not None else None,
+            "staging": f"{dest_path}.{self.tx_id}.staging",
+            "backup": f"{dest_path}.{self.tx_id}.bak",
+            "staged": False,
+            "backed_up": False,
+            "committed": False,
+            "sha256": None,
+            "method": None
+        })
+
+    @staticmethod
+    def _stage_sync(op: Dict[str, Any]):
+        """暂存一个文件：在目标位置旁边建立指向已存入内容的暂存链接"""
+        from services.blob_store import BlobStore
+
+        os.makedirs(os.path.dirname(op["dest"]), exist_ok=True)
+        op["method"] = link_file(BlobStore.get_blob_path(op["sha256"]), op["staging"])
+        op["staged"] = True
+
+    @staticmethod
+    def _get_source_sha256_sync(src_path: str, claimed: Optional[str]) -> str:
+        """
+        获取源文件的内容哈希
+
+        文件信息来自客户端提交的数据，其中的sha256只有与上传时服务端记录在文件上的哈希一致时才直接使用；
+        否则读取文件计算哈希，并记录在文件上供下次提交使用。
+        """
+        from services.blob_store import BlobStore
+
+        if claimed and BlobStore.get_recorded_sha256_sync(src_path) == claimed:
+            return claimed
+
+        sha256 = BlobStore.compute_sha256_sync(src_path)
+        BlobStore.record_sha256_sync(src_path, sha256)
+        return sha256
+
+    def _ingest_sources_sync(self, executor: ThreadPoolExecutor):
+        """
+        获取所有源文件的哈希并存入内容存储，结果写入每个操作的sha256
+
+        上传时已记录哈希的文件不再读取，其余文件每个只读取一次，同一内容只由一个线程存入。
+        """
+        from services.blob_store import BlobStore
+
+        sources: Dict[str, tuple] = {}
+        for op in self._operations:
+            claimed = op["record"].get("sha256") if isinstance(op["record"], dict) else None
+            sources.setdefault(os.path.normpath(op["src"]), (op["src"], claimed))
+        hashes = dict(zip(sources, executor.map(
+            lambda item: FileCommitTransaction._get_source_sha256_sync(*item), sources.values()
+        )))
+
+        blobs: Dict[str, str] = {}
+        for op in self._operations:
+            op["sha256"] = hashes[os.path.normpath(op["src"])]
+            blobs.setdefault(op["sha256"], op["src"])
+        list(executor.map(
+            lambda item: BlobStore.ingest_sync(item[1], keep_source=True, sha256=item[0]),
+            blobs.items()
+        ))
+
+    def _rollback_sync(self):
+        """回滚事务：删除暂存文件，恢复被覆盖的目标文件，恢复文件信息"""
+        for op in reversed(self._operations):
+            try:
+                if op["committed"]:
+                    os.remove(op["dest"])
+                if op["backed_up"]:
+                    os.replace(op["backup"], op["dest"])
+                if op["staged"] and os.path.exists(op["staging"]):
+                    os.remove(op["staging"])
+            except OSError as e:
+                print(f"回滚文件提交失败: {op['dest']}, 错误: {str(e)}")
+
+            if op["record"] is not None:
+                op["record"].clear()
+                op["record"].update(op["snapshot"])
+
+    def commit_sync(self) -> List[Dict[str, Any]]:
+        """
+        提交事务（同步版本）
+
+        Returns:
+            List[Dict[str, Any]]: 每个文件的提交结果，包含src、dest、sha256和method
+
+        Raises:
+            FileCommitError: 提交失败时抛出，此时事务已回滚
+        """
+        from services.blob_store import BlobStore
+
+        if not self._operations:
+            return []
+
+        print(f"开始文件提交事务 {self.tx_id} {self.label}: {len(self._operations)} 个文件")
+
+        try:
+            # 第一阶段：存入内容存储并建立暂存链接，源文件保持不变
+            # 按源文件和内容去重后并行存入；各文件的暂存链接并行建立，等待全部完成后再检查错误，
+            # 回滚时不会有文件仍在暂存中
+            workers = min(STAGE_MAX_WORKERS, len(self._operations))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="file-commit") as executor:
+                self._ingest_sources_sync(executor)
+                futures = [executor.submit(FileCommitTransaction._stage_sync, op) for op in self._operations]
+            for future in futures:
+                future.result()
+
+            # 第二阶段：原子替换目标文件
+            for op in self._operations:
+                if os.path.exists(op["dest"]):
+                    os.replace(op["dest"], op["backup"])
+                    op["backed_up"] = True
+                os.replace(op["staging"], op["dest"])
+                op["staged"] = False
+                op["committed"] = True
+
+        except Exception as e:
+            print(f"文件提交事务 {self.tx_id} 失败，开始回滚: {str(e)}")
+            self._rollback_sync()
+            raise FileCommitError(f"文件提交失败: {str(e)}") from e
+
+        # 第三阶段：全部成功后删除源文件和备份，更新引用计数
+        for op in self._operations:
+            for path in (op["backup"] if op["backed_up"] else None,
+                         op["src"] if os.path.normpath(op["src"]) != os.path.normpath(op["dest"]) else None):
+                if path and os.path.exists(path):
+                    try:
+                        os.remove(path)
+                    except OSError as e:
+                        print(f"删除已提交的源文件失败: {path}, 错误: {str(e)}")
+
+            if op["record"] is not None:
+                op["record"]["sha256"] = op["sha256"]
+
+        for sha256 in {op["sha256"] for op in self._operations}:
+            try:
+                BlobStore.sync_refcount(sha256)
+            except OSError as e:
+                print(f"更新引用计数失败: {sha256}, 错误: {str(e)}")
+
+        methods = {}
+        for op in self._operations:
+            methods[op["method"]] = methods.get(op["method"], 0) + 1
+        print(f"文件提交事务 {self.tx_id} 完成: {methods}")
+
+        return [
+            {"src": op["src"], "dest": op["dest"], "sha256": op["sha256"], "method": op["method"]}
+            for op in self._operations
+        ]
+
+    async def commit(self) -> List[Dict[str, Any]]:
+        """
+        提交事务，文件操作在线程池中执行，不阻塞事件循环
+
+        Returns:
+            List[Dict[str, Any]]: 每个文件的提交结果
+
+        Raises:
+            FileCommitError: 提交失败时抛出，此时事务已回滚
+        """
+        from services.async_utils import AsyncUtils
+        return await AsyncUtils.run_in_threadpool(self.commit_sync)
@@ -2,18 +2,15 @@
 文件服务模块，包含文件处理相关的业务逻辑代码
 """
 import os
-import shutil
-import time
-import uuid
 import asyncio
+import hashlib
+import aiofiles
+import aiofiles.os
 from typing import List, Dict, Any, Optional
 from fastapi import HTTPException, UploadFile
 from sqlalchemy.orm import Session
 from datetime import datetime
 
-import models
-import crud
-from database import SessionLocal
 from utils import format_file_size
 
 # 获取项目根目录
@@ -23,9 +20,52 @@ project_root = os.path.dirname(current_dir)
 # 上传目录
 UPLOAD_DIR = os.path.join(project_root, "uploads")
 
+# 流式保存上传文件时每次读取的块大小
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
 class FileService:
     """文件服务类，处理文件相关的业务逻辑"""
 
+    @staticmethod
+    async def save_upload_file(file: UploadFile, dest_path: str, chunk_size: int = UPLOAD_CHUNK_SIZE) -> Dict[str, Any]:
+        """
+        以流式方式将上传文件保存到磁盘，同时计算SHA-256和文件大小
+
+        按固定大小的块读取请求体并异步写入磁盘，内存占用与文件大小无关。
+        数据先写入临时文件，全部写入成功后再重命名为目标文件，失败时删除临时文件。
+
+        Args:
+            file (UploadFile): 上传的文件对象
+            dest_path (str): 目标文件路径
+            chunk_size (int): 每次读取的块大小，默认为1MB
+
+        Returns:
+            Dict[str, Any]: 包含size（字节数）和sha256（十六进制哈希）的字典
+        """
+        partial_path = f"{dest_path}.part"
+        sha256 = hashlib.sha256()
+        size = 0
+
+        try:
+            async with aiofiles.open(partial_path, "wb") as out_file:
+                while True:
+                    chunk = await file.read(chunk_size)
+                    if not chunk:
+                        break
+                    sha256.update(chunk)
+                    size += len(chunk)
+                    await out_file.write(chunk)
+
+            await aiofiles.os.replace(partial_path, dest_path)
+        except BaseException:
+            try:
+                await aiofiles.os.remove(partial_path)
+            except OSError:
+                pass
+            raise
+
+        return {"size": size, "sha256": sha256.hexdigest()}
+
     @staticmethod
     def get_documents(db: Session):
         """获取所有文档列表"""
@@ -57,13 +97,20 @@ class FileService:
         pass
 
     @staticmethod
-    async def cleanup_temp_files():
+    async def cleanup_temp_files(force: bool = False):
         """
-        清理uploads/temp目录中超过24小时的临时文件
+        清理uploads/temp目录中超过24小时且未被任何议程项引用的临时文件
+
+        清理由GCService分批执行，不会一次性列出和处理整个目录。
+
+        Args:
+            force (bool): 是否强制清理，为True时忽略文件的创建时间
 
         Returns:
             Dict: 包含清理结果的字典
         """
+        from services.gc_service import GCService
+
         try:
             print(f"[{datetime.now()}] 开始自动清理临时文件...")
 
@@ -88,85 +135,14 @@ class FileService:
                     "message": "临时文件路径存在但不是目录，跳过清理"
                 }
 
-            print(f"[{datetime.now()}] 临时文件目录: {temp_dir}")
-
-            # 获取所有会议ID
-            db = SessionLocal()
-            meetings = db.query(models.Meeting).all()
-            meeting_ids = [meeting.id for meeting in meetings]
-            db.close()
-
-            print(f"[{datetime.now()}] 当前会议ID列表: {meeting_ids}")
-
-            # 检查文件是否与任何会议关联
-            def is_file_bound_to_meeting(file_path):
-                """检查文件是否绑定到已知会议"""
-                # 标准化路径
-                norm_path = os.path.normpath(file_path).replace("\\", "/")
-
-                # 对于uploads目录下的文件，检查它们是否在会议子目录中
-                for meeting_id in meeting_ids:
-                    meeting_path_marker = f"uploads/{meeting_id}/"
-                    if meeting_path_marker in norm_path:
-                        return True
-                return False
-
-            # 统计变量
-            deleted_count = 0
-            preserved_count = 0
-            expired_count = 0
-
-            # 获取当前时间
-            current_time = time.time()
-            one_day_in_seconds = 24 * 60 * 60
-
-            # 列出temp目录中的所有文件
-            temp_files = os.listdir(temp_dir)
-            total_count = len([f for f in temp_files if os.path.isfile(os.path.join(temp_dir, f)) and f.lower().endswith('.pdf')])
-            print(f"[{datetime.now()}] 临时目录中共有 {total_count} 个PDF文件")
-
-            # 遍历temp目录中的所有文件
-            for filename in temp_files:
-                file_path = os.path.join(temp_dir, filename)
-
-                # 只处理文件，跳过目录
-                if not os.path.isfile(file_path):
-                    print(f"[{datetime.now()}] 跳过目录: {filename}")
-                    continue
-
-                # 只处理PDF文件
-                if not filename.lower().endswith(".pdf"):
-                    print(f"[{datetime.now()}] 跳过非PDF文件: {filename}")
-                    continue
-
-                try:
-                    # 获取文件创建时间
-                    file_creation_time = os.path.getctime(file_path)
-                    file_age_in_seconds = current_time - file_creation_time
-                    file_age_hours = file_age_in_seconds / 3600
-
-                    # 检查文件是否绑定到会议
-                    is_bound = is_file_bound_to_meeting(file_path)
-
-                    # 如果文件超过24小时且未被绑定，则删除
-                    if file_age_in_seconds > one_day_in_seconds:
-                        expired_count += 1
-                        if not is_bound:
-                            print(f"[{datetime.now()}] 删除过期临时文件: {filename} (年龄: {file_age_hours:.1f}小时)")
-                            os.remove(file_path)
-                            deleted_count += 1
-                        else:
-                            preserved_count += 1
-                            print(f"[{datetime.now()}] 保留已绑定的过期临时文件: {filename} (年龄: {file_age_hours:.1f}小时)")
-                    else:
-                        preserved_count += 1
-                        print(f"[{datetime.now()}] 保留新上传的临时文件: {filename} (年龄: {file_age_hours:.1f}小时)")
-                except Exception as e:
-                    preserved_count += 1
-                    print(f"[{datetime.now()}] 处理文件 {filename} 时出错，将保留该文件: {str(e)}")
-
-            # 计算清理后的文件数量
-            remaining_count = total_count - deleted_count
+            result = await GCService.run_pass(phases=("temp",), force=force)
+            stats = result["phases"].get("temp", {})
+
+            total_count = stats.get("scanned", 0)
+            deleted_count = stats.get("deleted", 0)
+            preserved_count = stats.get("preserved", 0)
+            expired_count = stats.get("expired", 0)
+            expired_uploads = stats.get("expired_uploads", 0)
 
             print(f"[{datetime.now()}] 临时文件清理完成: 总共 {total_count} 个文件，删除 {deleted_count} 个，保留 {preserved_count} 个，过期文件 {expired_count} 个")
 
@@ -176,7 +152,9 @@ class FileService:
                 "preserved_count": preserved_count,
                 "total_count": total_count,
                 "expired_count": expired_count,
-                "remaining_count": remaining_count,
+                "remaining_count": total_count - deleted_count,
+                "expired_uploads": expired_uploads,
+                "freed_bytes": stats.get("freed_bytes", 0),
                 "message": f"临时文件清理完成：总共扫描 {total_count} 个文件，删除 {deleted_count} 个，保留 {preserved_count} 个。"
             }
 
@@ -219,45 +197,17 @@ class FileService:
             try:
                 print(f"[{datetime.now()}] 开始自动清理无效会议文件夹...")
 
-                # 获取数据库连接
-                db = SessionLocal()
-
-                # 获取数据库中所有会议ID
-                all_meetings = db.query(models.Meeting).all()
-                valid_meeting_ids = {meeting.id for meeting in all_meetings}
-                print(f"[{datetime.now()}] 当前有效会议ID列表数量: {len(valid_meeting_ids)}")
-
-                # 遍历uploads目录
-                removed_folders = []
-                skipped_folders = []
-
-                for item in os.listdir(UPLOAD_DIR):
-                    item_path = os.path.join(UPLOAD_DIR, item)
-
-                    # 跳过temp目录和非目录项
-                    if item == "temp" or not os.path.isdir(item_path):
-                        continue
-
-                    # 检查目录名是否是UUID格式（会议ID）
-                    try:
-                        # 尝试将目录名解析为UUID，如果成功则说明可能是会议目录
-                        uuid_obj = uuid.UUID(item)
-
-                        # 检查该会议ID是否存在于数据库中
-                        if item not in valid_meeting_ids:
-                            # 会议ID不在数据库中，删除该文件夹
-                            shutil.rmtree(item_path)
-                            removed_folders.append(item)
-                            print(f"[{datetime.now()}] 自动清理：已删除孤立会议文件夹: {item}")
-                        else:
-                            skipped_folders.append(item)
-                    except ValueError:
-                        # 不是UUID格式，跳过
-                        skipped_folders.append(item)
-
-                db.close()
-
-                print(f"[{datetime.now()}] 无效会议文件夹清理完成: 总共删除 {len(removed_folders)} 个目录，保留 {len(skipped_folders)} 个目录")
+                # 分批删除数据库中已不存在的会议目录，清理不再被任何议程文件引用的存储内容，
+                # 以及对应内容已被删除的PDF优化原始文件
+                from services.gc_service import GCService
+                result = await GCService.run_pass(phases=("meetings", "blobs", "originals"))
+                meeting_stats = result["phases"].get("meetings", {})
+                blob_stats = result["phases"].get("blobs", {})
+                original_stats = result["phases"].get("originals", {})
+
+                print(f"[{datetime.now()}] 无效会议文件夹清理完成: 总共删除 {meeting_stats.get('deleted', 0)} 个目录，保留 {meeting_stats.get('preserved', 0)} 个目录")
+                print(f"[{datetime.now()}] 内容存储清理完成: 删除 {blob_stats.get('deleted', 0)} 个，保留 {blob_stats.get('preserved', 0)} 个")
+                print(f"[{datetime.now()}] 原始PDF文件清理完成: 删除 {original_stats.get('deleted', 0)} 个，保留 {original_stats.get('preserved', 0)} 个")
                 print(f"[{datetime.now()}] 下次无效会议文件夹清理将在 {cleanup_interval_hours} 小时后执行")
 
                 # 等待指定时间后再次执行清理
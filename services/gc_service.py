@@ -0,0 +1,518 @@
+"""
+增量垃圾回收服务模块，分批清理上传目录中不再被引用的文件
+
+清理分为以下阶段，每个阶段使用os.scandir迭代器作为游标逐批推进：
+- temp: 删除uploads/temp中超过有效期、且没有被任何议程项引用的临时PDF文件，并清理过期的可续传上传会话
+- meetings: 删除uploads中数据库里已不存在的会议目录
+- blobs: 删除内容存储中引用数为0的内容，并同步引用计数
+- originals: 删除PDF优化保存的原始文件中，对应内容已不在内容存储中且超过有效期的文件
+
+引用关系在每轮清理开始时从数据库一次性读取（会议ID、议程项文件列表、内容引用计数），
+之后每个条目只做集合查找。每次只处理有限数量的条目，并限制每次删除的字节数，
+两次处理之间让出事件循环；有会议正在进行时暂停清理，避免影响会议中的磁盘读写。
+"""
+import os
+import time
+import uuid
+import shutil
+import asyncio
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional, Set
+
+# 获取项目根目录
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+
+# 上传目录
+UPLOAD_DIR = os.path.join(project_root, "uploads")
+# 临时文件目录
+TEMP_DIR = os.path.join(UPLOAD_DIR, "temp")
+
+# 临时文件的有效期（秒），超过此时间且未被引用的临时文件会被删除
+TEMP_FILE_MAX_AGE_SECONDS = 24 * 60 * 60
+
+# 清理阶段及其顺序
+GC_PHASES = ("temp", "meetings", "blobs", "originals")
+
+# 默认每批处理的条目数量
+DEFAULT_BATCH_SIZE = 500
+# 默认每批最多删除的数据量（MB）
+DEFAULT_IO_BUDGET_MB = 64
+# 默认两批之间的间隔（秒）
+DEFAULT_TICK_INTERVAL = 0.5
+# 有会议正在进行时，两次检查之间的等待时间（秒）
+MEETING_PAUSE_SECONDS = 60
+
+# 正在进行的会议状态
+MEETING_IN_PROGRESS_STATUS = "进行中"
+
+
+def _get_directory_size(path: str) -> int:
+    """计算目录中所有文件的总大小"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+class GCService:
+    """增量垃圾回收服务类，负责分批清理并记录清理进度"""
+
+    # 当前或最近一轮清理的进度
+    _progress: Dict[str, Any] = {
+        "running": False,
+        "phase": None,
+        "force": False,
+        "paused": False,
+        "started_at": None,
+        "finished_at": None,
+        "ticks": 0,
+        "scanned": 0,
+        "deleted": 0,
+        "freed_bytes": 0,
+        "errors": 0,
+        "last_result": None
+    }
+    _running_task: Optional[asyncio.Task] = None
+    # 正在进行的清理是否为强制清理
+    _running_force = False
+    # 用于让正在进行的非强制清理提前结束，为手动强制清理让路
+    _preempt_event: Optional[asyncio.Event] = None
+
+    @staticmethod
+    async def _wait_or_preempted(event: asyncio.Event, seconds: float) -> bool:
+        """
+        等待指定的时间，期间收到抢占请求时立即返回
+
+        Returns:
+            bool: 是否被抢占
+        """
+        try:
+            await asyncio.wait_for(event.wait(), timeout=seconds)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    @staticmethod
+    def get_settings() -> Dict[str, Any]:
+        """
+        获取垃圾回收相关的系统设置
+
+        Returns:
+            Dict[str, Any]: 包含batch_size、io_budget_bytes、tick_interval和pause_during_meeting的字典
+        """
+        from database import SessionLocal
+        import crud
+
+        db = SessionLocal()
+        try:
+            batch_size_str = crud.get_system_setting(db, "gc_batch_size", str(DEFAULT_BATCH_SIZE))
+            budget_str = crud.get_system_setting(db, "gc_io_budget_mb", str(DEFAULT_IO_BUDGET_MB))
+            interval_str = crud.get_system_setting(db, "gc_tick_interval", str(DEFAULT_TICK_INTERVAL))
+            pause_str = crud.get_system_setting(db, "gc_pause_during_meeting", "true")
+        finally:
+            db.close()
+
+        try:
+            batch_size = max(int(batch_size_str), 1)
+        except (TypeError, ValueError):
+            print(f"警告: 无效的垃圾回收批大小 {batch_size_str}，将使用默认值{DEFAULT_BATCH_SIZE}")
+            batch_size = DEFAULT_BATCH_SIZE
+
+        try:
+            io_budget_mb = max(float(budget_str), 1.0)
+        except (TypeError, ValueError):
+            io_budget_mb = DEFAULT_IO_BUDGET_MB
+
+        try:
+            tick_interval = max(float(interval_str), 0.0)
+        except (TypeError, ValueError):
+            tick_interval = DEFAULT_TICK_INTERVAL
+
+        return {
+            "batch_size": batch_size,
+            "io_budget_bytes": int(io_budget_mb * 1024 * 1024),
+            "tick_interval": tick_interval,
+            "pause_during_meeting": str(pause_str).lower() in ("true", "1", "yes", "on")
+        }
+
+    @staticmethod
+    def get_progress() -> Dict[str, Any]:
+        """
+        获取当前或最近一轮清理的进度
+
+        Returns:
+            Dict[str, Any]: 进度信息
+        """
+        return dict(GCService._progress)
+
+    @staticmethod
+    def _load_references_sync() -> Dict[str, Any]:
+        """
+        从数据库一次性读取本轮清理需要的引用信息（同步版本）
+
+        Returns:
+            Dict[str, Any]: 包含meeting_ids（会议ID集合）、temp_refs（被议程项引用的临时文件名集合）
+                和blob_refcounts（内容哈希到引用计数的映射）的字典
+        """
+        from database import SessionLocal
+        import crud
+        import models
+
+        db = SessionLocal()
+        try:
+            meeting_ids = {row[0] for row in db.query(models.Meeting.id).all()}
+
+            # 保存会议时文件提交失败的议程项仍引用uploads/temp中的文件，这些文件不能删除
+            temp_refs: Set[str] = set()
+            temp_dir = os.path.normpath(TEMP_DIR)
+            for (files,) in db.query(models.AgendaItem.files).all():
+                for file_info in files or []:
+                    if not isinstance(file_info, dict) or not file_info.get("path"):
+                        continue
+                    path = os.path.normpath(file_info["path"])
+                    if os.path.dirname(path) == temp_dir:
+                        temp_refs.add(os.path.basename(path))
+
+            blob_refcounts = {blob.sha256: blob.refcount for blob in crud.get_blobs(db)}
+        finally:
+            db.close()
+
+        return {"meeting_ids": meeting_ids, "temp_refs": temp_refs, "blob_refcounts": blob_refcounts}
+
+    @staticmethod
+    def _is_meeting_in_progress_sync() -> bool:
+        """检查是否有会议正在进行"""
+        from database import SessionLocal
+        import crud
+
+        db = SessionLocal()
+        try:
+            return bool(crud.get_meetings_by_status(db, MEETING_IN_PROGRESS_STATUS))
+        finally:
+            db.close()
+
+    @staticmethod
+    def _collect_temp_entry_sync(entry: os.DirEntry, state: Dict[str, Any]) -> int:
+        """检查一个临时文件，过期且未被引用时删除，返回释放的字节数"""
+        stats = state["phases"]["temp"]
+
+        if not entry.is_file() or not entry.name.lower().endswith(".pdf"):
+            return 0
+
+        stats["scanned"] += 1
+        stat = entry.stat()
+        expired = state["now"] - stat.st_ctime > TEMP_FILE_MAX_AGE_SECONDS
+        if expired:
+            stats["expired"] += 1
+
+        if (expired or state["force"]) and entry.name not in state["refs"]["temp_refs"]:
+            os.remove(entry.path)
+            stats["deleted"] += 1
+            print(f"[{datetime.now()}] 删除未引用的临时文件: {entry.name}")
+            return stat.st_size
+
+        stats["preserved"] += 1
+        return 0
+
+    @staticmethod
+    def _collect_meeting_entry_sync(entry: os.DirEntry, state: Dict[str, Any]) -> int:
+        """检查一个会议目录，会议已不存在时删除，返回释放的字节数"""
+        stats = state["phases"]["meetings"]
+
+        if not entry.is_dir(follow_symlinks=False):
+            return 0
+        # 只处理UUID格式的目录（会议ID），temp、blobs等目录不会被匹配
+        try:
+            uuid.UUID(entry.name)
+        except ValueError:
+            return 0
+
+        stats["scanned"] += 1
+        if entry.name in state["refs"]["meeting_ids"]:
+            stats["preserved"] += 1
+            return 0
+
+        # 引用信息在本轮开始时读取，删除前再确认会议确实不存在，避免删除刚创建的会议目录
+        import models
+        if state["db"].query(models.Meeting.id).filter(models.Meeting.id == entry.name).first():
+            stats["preserved"] += 1
+            return 0
+
+        size = _get_directory_size(entry.path)
+        shutil.rmtree(entry.path)
+        stats["deleted"] += 1
+        stats.setdefault("removed_folders", []).append(entry.name)
+        print(f"[{datetime.now()}] 删除孤立会议文件夹: {entry.name}")
+        return size
+
+    @staticmethod
+    def _collect_blob_entry_sync(entry: os.DirEntry, state: Dict[str, Any]) -> int:
+        """检查一个存储内容，无引用时删除，返回释放的字节数"""
+        from services.blob_store import BlobStore
+
+        stats = state["phases"]["blobs"]
+        freed = BlobStore.collect_blob_entry_sync(
+            entry, state["now"], state["refs"]["blob_refcounts"].get(entry.name), state["db"]
+        )
+        if freed < 0:
+            return 0
+
+        stats["scanned"] += 1
+        if freed > 0:
+            stats["deleted"] += 1
+        else:
+            stats["preserved"] += 1
+        return freed
+
+    @staticmethod
+    def _collect_original_entry_sync(entry: os.DirEntry, state: Dict[str, Any]) -> int:
+        """
+        检查一个PDF优化保存的原始文件，对应的内容已被删除且超过有效期时删除，返回释放的字节数
+
+        原始文件以优化后内容的SHA-256命名。优化后的文件还在uploads/temp中、尚未提交到内容存储时，
+        原始文件在临时文件的有效期内保留；旧版本以临时文件名命名的原始文件在临时文件不存在后删除。
+        """
+        from services.blob_store import BlobStore
+        from services.pdf_optimizer import ORIGINAL_SUFFIX
+
+        stats = state["phases"]["originals"]
+
+        if not entry.is_file() or not entry.name.endswith(ORIGINAL_SUFFIX):
+            return 0
+
+        stats["scanned"] += 1
+        stat = entry.stat()
+        expired = state["now"] - stat.st_ctime > TEMP_FILE_MAX_AGE_SECONDS
+        if expired:
+            stats["expired"] += 1
+
+        owner = entry.name[:-len(ORIGINAL_SUFFIX)]
+        if BlobStore.is_valid_sha256(owner):
+            in_use = BlobStore.get_blob_file(owner) is not None
+        else:
+            in_use = os.path.exists(os.path.join(TEMP_DIR, owner))
+
+        if (expired or state["force"]) and not in_use:
+            os.remove(entry.path)
+            stats["deleted"] += 1
+            print(f"[{datetime.now()}] 删除不再使用的原始PDF文件: {entry.name}")
+            return stat.st_size
+
+        stats["preserved"] += 1
+        return 0
+
+    @staticmethod
+    def _get_phase_dir(phase: str) -> str:
+        """获取清理阶段扫描的目录"""
+        from services.blob_store import BLOB_DIR
+        from services.pdf_optimizer import ORIGINALS_DIR
+
+        return {"temp": TEMP_DIR, "meetings": UPLOAD_DIR, "blobs": BLOB_DIR, "originals": ORIGINALS_DIR}[phase]
+
+    @staticmethod
+    def _finish_phase_sync(phase: str, state: Dict[str, Any]):
+        """结束一个清理阶段"""
+        if phase == "temp":
+            from services.resumable_upload_service import ResumableUploadService
+            state["phases"]["temp"]["expired_uploads"] = ResumableUploadService.cleanup_expired_sync()
+
+    @staticmethod
+    def _run_tick_sync(state: Dict[str, Any]) -> bool:
+        """
+        处理一批条目（同步版本，在线程池中执行）
+
+        从当前阶段的scandir游标继续读取，最多处理batch_size个条目，
+        删除的数据量达到io_budget_bytes时提前结束本批。
+
+        Args:
+            state (Dict[str, Any]): 本轮清理的状态，包含游标和统计信息
+
+        Returns:
+            bool: 所有阶段都已完成返回True
+        """
+        from database import SessionLocal
+
+        collectors = {
+            "temp": GCService._collect_temp_entry_sync,
+            "meetings": GCService._collect_meeting_entry_sync,
+            "blobs": GCService._collect_blob_entry_sync,
+            "originals": GCService._collect_original_entry_sync
+        }
+
+        processed = 0
+        freed_in_tick = 0
+        state["now"] = time.time()
+        state["db"] = SessionLocal()
+        try:
+            while processed < state["batch_size"] and freed_in_tick < state["io_budget_bytes"]:
+                if state["cursor"] is None:
+                    if not state["pending_phases"]:
+                        return True
+                    phase = state["pending_phases"].pop(0)
+                    state["phase"] = phase
+                    state["phases"][phase] = {"scanned": 0, "deleted": 0, "preserved": 0, "expired": 0, "freed_bytes": 0}
+                    directory = GCService._get_phase_dir(phase)
+                    if not os.path.isdir(directory):
+                        GCService._finish_phase_sync(phase, state)
+                        continue
+                    state["cursor"] = os.scandir(directory)
+
+                phase = state["phase"]
+                entry = next(state["cursor"], None)
+                if entry is None:
+                    state["cursor"].close()
+                    state["cursor"] = None
+                    GCService._finish_phase_sync(phase, state)
+                    continue
+
+                processed += 1
+                try:
+                    freed = collectors[phase](entry, state)
+                except OSError as e:
+                    state["errors"] += 1
+                    print(f"[{datetime.now()}] 清理 {entry.path} 时出错，将保留该条目: {str(e)}")
+                    continue
+
+                freed_in_tick += freed
+                state["phases"][phase]["freed_bytes"] += freed
+        finally:
+            state["db"].close()
+            state["db"] = None
+            state["processed"] += processed
+            state["freed_bytes"] += freed_in_tick
+
+        return False
+
+    @staticmethod
+    async def _run(phases: Iterable[str], force: bool, preempt_event: asyncio.Event) -> Dict[str, Any]:
+        """执行一轮增量清理，preempt_event被设置时在当前批次后结束"""
+        from services.async_utils import AsyncUtils, EXECUTOR_CONTROL
+
+        settings = await AsyncUtils.run_in_executor(EXECUTOR_CONTROL, GCService.get_settings)
+        refs = await AsyncUtils.run_in_threadpool(GCService._load_references_sync)
+
+        started = time.time()
+        state = {
+            "force": force,
+            "refs": refs,
+            "pending_phases": [phase for phase in GC_PHASES if phase in phases],
+            "phase": None,
+            "cursor": None,
+            "phases": {},
+            "batch_size": settings["batch_size"],
+            "io_budget_bytes": settings["io_budget_bytes"],
+            "processed": 0,
+            "freed_bytes": 0,
+            "errors": 0,
+            "db": None,
+            "now": started
+        }
+        preempted = False
+
+        progress = GCService._progress
+        progress.update({
+            "running": True,
+            "phase": None,
+            "force": force,
+            "paused": False,
+            "started_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "finished_at": None,
+            "ticks": 0,
+            "scanned": 0,
+            "deleted": 0,
+            "freed_bytes": 0,
+            "errors": 0
+        })
+        print(f"[{datetime.now()}] 开始增量清理: 阶段 {state['pending_phases']}, 每批 {settings['batch_size']} 个条目")
+
+        try:
+            while True:
+                # 有会议正在进行时暂停清理，手动强制清理除外；暂停期间收到强制清理请求时结束本轮
+                if settings["pause_during_meeting"] and not force:
+                    while await AsyncUtils.run_in_executor(EXECUTOR_CONTROL, GCService._is_meeting_in_progress_sync):
+                        progress["paused"] = True
+                        if await GCService._wait_or_preempted(preempt_event, MEETING_PAUSE_SECONDS):
+                            preempted = True
+                            break
+                    progress["paused"] = False
+                    if preempted:
+                        break
+
+                done = await AsyncUtils.run_in_threadpool(GCService._run_tick_sync, state)
+
+                progress.update({
+                    "phase": state["phase"],
+                    "ticks": progress["ticks"] + 1,
+                    "scanned": state["processed"],
+                    "deleted": sum(stats["deleted"] for stats in state["phases"].values()),
+                    "freed_bytes": state["freed_bytes"],
+                    "errors": state["errors"]
+                })
+                if done:
+                    break
+
+                if await GCService._wait_or_preempted(preempt_event, settings["tick_interval"]):
+                    preempted = True
+                    break
+        finally:
+            if state["cursor"] is not None:
+                state["cursor"].close()
+            progress["running"] = False
+            progress["paused"] = False
+            progress["finished_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        if preempted:
+            print(f"[{datetime.now()}] 收到强制清理请求，本轮清理提前结束")
+
+        result = {
+            "phases": state["phases"],
+            "force": force,
+            "preempted": preempted,
+            "scanned": state["processed"],
+            "deleted": progress["deleted"],
+            "freed_bytes": state["freed_bytes"],
+            "errors": state["errors"],
+            "ticks": progress["ticks"],
+            "duration_seconds": round(time.time() - started, 2)
+        }
+        progress["last_result"] = result
+        print(
+            f"[{datetime.now()}] 增量清理完成: 扫描 {result['scanned']} 个条目, 删除 {result['deleted']} 个, "
+            f"释放 {result['freed_bytes']} 字节, 耗时 {result['duration_seconds']} 秒"
+        )
+        return result
+
+    @staticmethod
+    async def run_pass(phases: Iterable[str] = GC_PHASES, force: bool = False) -> Dict[str, Any]:
+        """
+        执行一轮增量清理，同一时间只有一轮清理在运行
+
+        已有清理正在进行时：强制清理会让正在进行的非强制清理（可能因会议进行而暂停）在当前批次后结束，
+        其他情况等待其完成。被提前结束的清理返回已完成部分的结果，其中preempted为True。
+
+        Args:
+            phases (Iterable[str]): 要执行的清理阶段，可选值：temp、meetings、blobs、originals
+            force (bool): 是否强制清理，为True时忽略临时文件的有效期并且不因会议进行而暂停
+
+        Returns:
+            Dict[str, Any]: 清理结果，phases中包含每个阶段的scanned、deleted、preserved和freed_bytes
+        """
+        while GCService._running_task is not None and not GCService._running_task.done():
+            if force and not GCService._running_force and GCService._preempt_event is not None:
+                print(f"[{datetime.now()}] 已有清理正在进行，通知其提前结束")
+                GCService._preempt_event.set()
+            else:
+                print(f"[{datetime.now()}] 已有清理正在进行，等待其完成")
+            await asyncio.wait({GCService._running_task})
+
+        preempt_event = asyncio.Event()
+        task = asyncio.ensure_future(GCService._run(tuple(phases), force, preempt_event))
+        GCService._running_task = task
+        GCService._running_force = force
+        GCService._preempt_event = preempt_event
+        return await asyncio.shield(task)
@@ -0,0 +1,268 @@
+"""
+图像编码模块，负责将渲染后的页面编码为渐进式JPEG、WebP或AVIF
+
+PDF栅格化后的图片体积通常远大于原始PDF（参见issue.md），此模块提供更高效的编码方式：
+- 渐进式JPEG：所有平板都支持，体积略小并且可以边下载边显示
+- WebP：同等画质下体积明显小于JPEG
+- AVIF：压缩率最高，需要Pillow支持（安装pillow-avif-plugin或Pillow自带AVIF支持）
+
+每一页既可以使用固定质量编码，也可以指定目标字节数，通过二分查找选择不超过目标大小的最高质量。
+"""
+import io
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+# 默认编码质量
+DEFAULT_QUALITY = 80
+# 按目标大小搜索质量时允许的最低质量
+MIN_QUALITY = 20
+# 允许的最高质量
+MAX_QUALITY = 95
+
+# 编码格式与文件扩展名的对应关系
+FORMAT_EXTENSIONS = {
+    "jpeg": "jpg",
+    "webp": "webp",
+    "avif": "avif"
+}
+
+# 格式别名
+FORMAT_ALIASES = {
+    "jpg": "jpeg",
+    "jpeg": "jpeg",
+    "pjpeg": "jpeg",
+    "webp": "webp",
+    "avif": "avif"
+}
+
+
+def normalize_format(image_format: str) -> Optional[str]:
+    """
+    将格式名称规范化为编码器使用的格式
+
+    Args:
+        image_format (str): 格式名称，如jpg、jpeg、webp、avif
+
+    Returns:
+        Optional[str]: 规范化后的格式，不由本模块编码的格式（如png）返回None
+    """
+    if not image_format:
+        return None
+    return FORMAT_ALIASES.get(image_format.lower())
+
+
+class ImageEncoder:
+    """图像编码类，提供多种格式的编码和按目标大小的质量搜索"""
+
+    _avif_supported: Optional[bool] = None
+
+    @staticmethod
+    def is_avif_supported() -> bool:
+        """
+        检查当前Pillow是否支持AVIF编码
+
+        Returns:
+            bool: 支持AVIF返回True，否则返回False
+        """
+        if ImageEncoder._avif_supported is None:
+            supported = False
+            try:
+                from PIL import features
+                supported = bool(features.check("avif"))
+            except Exception:
+                supported = False
+
+            if not supported:
+                try:
+                    # 可选依赖：为旧版本Pillow注册AVIF插件
+                    import pillow_avif  # noqa: F401
+                    supported = True
+                except ImportError:
+                    supported = False
+
+            ImageEncoder._avif_supported = supported
+
+        return ImageEncoder._avif_supported
+
+    @staticmethod
+    def is_webp_supported() -> bool:
+        """
+        检查当前Pillow是否支持WebP编码
+
+        Returns:
+            bool: 支持WebP返回True，否则返回False
+        """
+        try:
+            from PIL import features
+            return bool(features.check("webp"))
+        except Exception:
+            return False
+
+    @staticmethod
+    def get_supported_formats() -> List[str]:
+        """
+        获取当前环境支持的编码格式
+
+        Returns:
+            List[str]: 支持的格式列表
+        """
+        formats = ["jpeg"]
+        if ImageEncoder.is_webp_supported():
+            formats.append("webp")
+        if ImageEncoder.is_avif_supported():
+            formats.append("avif")
+        return formats
+
+    @staticmethod
+    def is_format_supported(image_format: str) -> bool:
+        """
+        检查指定格式是否可以编码
+
+        Args:
+            image_format (str): 格式名称
+
+        Returns:
+            bool: 可以编码返回True，否则返回False
+        """
+        normalized = normalize_format(image_format)
+        return normalized is not None and normalized in ImageEncoder.get_supported_formats()
+
+    @staticmethod
+    def get_extension(image_format: str) -> str:
+        """
+        获取格式对应的文件扩展名
+
+        Args:
+            image_format (str): 格式名称
+
+        Returns:
+            str: 文件扩展名（不含点）
+        """
+        normalized = normalize_format(image_format)
+        return FORMAT_EXTENSIONS.get(normalized, image_format.lower())
+
+    @staticmethod
+    def _get_save_options(image_format: str, quality: int) -> Dict:
+        """获取Pillow保存图片时的编码参数"""
+        if image_format == "jpeg":
+            # 渐进式JPEG，并优化哈夫曼表
+            return {"format": "JPEG", "quality": quality, "progressive": True, "optimize": True}
+        if image_format == "webp":
+            return {"format": "WEBP", "quality": quality, "method": 4}
+        if image_format == "avif":
+            return {"format": "AVIF", "quality": quality, "speed": 6}
+        raise ValueError(f"不支持的编码格式: {image_format}")
+
+    @staticmethod
+    def _encode_once(image: "Image.Image", image_format: str, quality: int) -> bytes:
+        """使用指定质量编码一次图片"""
+        buffer = io.BytesIO()
+        image.save(buffer, **ImageEncoder._get_save_options(image_format, quality))
+        return buffer.getvalue()
+
+    @staticmethod
+    def encode_sync(
+        image: "Image.Image",
+        image_format: str = "jpeg",
+        quality: Optional[int] = None,
+        target_bytes: Optional[int] = None
+    ) -> Tuple[bytes, int]:
+        """
+        编码图片（同步版本）
+
+        指定target_bytes时，在[MIN_QUALITY, quality]范围内二分查找不超过目标大小的最高质量；
+        如果最低质量仍超过目标大小，则使用最低质量的结果。
+
+        Args:
+            image (Image.Image): 要编码的图片
+            image_format (str): 编码格式，可选值：jpeg、webp、avif
+            quality (int, optional): 编码质量（1-95），指定目标大小时作为质量上限
+            target_bytes (int, optional): 每页的目标字节数
+
+        Returns:
+            Tuple[bytes, int]: 编码后的数据和实际使用的质量
+
+        Raises:
+            ValueError: 当格式不受支持时
+        """
+        normalized = normalize_format(image_format)
+        if normalized is None or normalized not in ImageEncoder.get_supported_formats():
+            raise ValueError(f"不支持的编码格式: {image_format}")
+
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+
+        max_quality = min(max(int(quality or DEFAULT_QUALITY), 1), MAX_QUALITY)
+        data = ImageEncoder._encode_once(image, normalized, max_quality)
+        if not target_bytes or len(data) <= target_bytes:
+            return data, max_quality
+
+        # 二分查找不超过目标大小的最高质量
+        low = min(MIN_QUALITY, max_quality)
+        high = max_quality - 1
+        best: Optional[Tuple[bytes, int]] = None
+        while low <= high:
+            middle = (low + high) // 2
+            candidate = ImageEncoder._encode_once(image, normalized, middle)
+            if len(candidate) <= target_bytes:
+                best = (candidate, middle)
+                low = middle + 1
+            else:
+                high = middle - 1
+
+        if best is None:
+            lowest = min(MIN_QUALITY, max_quality)
+            return ImageEncoder._encode_once(image, normalized, lowest), lowest
+
+        return best
+
+    @staticmethod
+    def pixmap_to_image(pixmap) -> "Image.Image":
+        """
+        将PyMuPDF的Pixmap转换为Pillow图片
+
+        Args:
+            pixmap: PyMuPDF渲染得到的Pixmap（不含透明通道）
+
+        Returns:
+            Image.Image: Pillow图片
+        """
+        from PIL import Image
+
+        mode = "L" if pixmap.n == 1 else "RGB"
+        return Image.frombytes(mode, (pixmap.width, pixmap.height), pixmap.samples)
+
+    @staticmethod
+    def build_size_report(pdf_size: int, pages: List[Dict], image_format: str,
+                          quality: Optional[int], target_bytes: Optional[int]) -> Dict:
+        """
+        生成编码结果与原始PDF大小的对比报告
+
+        Args:
+            pdf_size (int): 原始PDF文件大小（字节）
+            pages (List[Dict]): 每一页的渲染结果，需包含bytes字段
+            image_format (str): 编码格式
+            quality (int, optional): 质量设置
+            target_bytes (int, optional): 每页目标字节数
+
+        Returns:
+            Dict: 包含总大小、与PDF大小之比等信息的报告
+        """
+        from utils import format_file_size
+
+        image_bytes = sum(page.get("bytes", 0) for page in pages)
+        ratio = round(image_bytes / pdf_size, 3) if pdf_size else None
+        return {
+            "format": normalize_format(image_format) or image_format,
+            "quality": quality,
+            "target_bytes_per_page": target_bytes,
+            "page_count": len(pages),
+            "pdf_size": pdf_size,
+            "pdf_size_formatted": format_file_size(pdf_size),
+            "image_bytes": image_bytes,
+            "image_bytes_formatted": format_file_size(image_bytes),
+            "ratio_to_pdf": ratio,
+            "smaller_than_pdf": image_bytes < pdf_size if pdf_size else None
+        }
@@ -15,8 +15,15 @@ from sqlalchemy.orm import Session
 
 import crud
 import models
-from utils import format_file_size
+from utils import format_file_size, get_agenda_folder_name, get_agenda_item_folders, is_agenda_folder_name
 from services.pdf_service import PDFService
+from services.file_service import FileService
+from services.blob_store import BlobStore
+from services.file_commit import FileCommitTransaction, FileCommitError
+from services.package_builder import PackageBuilder
+from services.package_tar import TarZstPackage
+from services.agenda_diff import AgendaDiff
+from services.pyramid_service import PyramidService, PYRAMID_DIR_NAME, PYRAMID_MANIFEST_NAME
 
 # 获取项目根目录
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -25,6 +32,9 @@ project_root = os.path.dirname(current_dir)
 # 上传目录
 UPLOAD_DIR = os.path.join(project_root, "uploads")
 
+# 保存会议时同时处理（获取页数、生成JPG）的初始PDF文件数，之后按处理耗时自动调整
+TEMP_FILE_CONCURRENCY = 4
+
 class MeetingService:
     """会议服务类，处理会议相关的业务逻辑"""
 
@@ -41,15 +51,34 @@ class MeetingService:
             raise HTTPException(status_code=404, detail="会议未找到")
         return meeting
 
+    @staticmethod
+    def _assign_agenda_item_ids(agenda_items: List[Any], agenda_diff: Optional[AgendaDiff] = None):
+        """为提交的议程项分配稳定的ID：已有的议程项沿用原ID，新增的议程项生成新ID
+
+        Args:
+            agenda_items: 提交的议程项列表，按顺序排列
+            agenda_diff: 议程项差异，创建会议时为None
+        """
+        for position, agenda_item in enumerate(agenda_items or [], start=1):
+            matched_id = agenda_diff.matched_ids.get(position) if agenda_diff is not None else None
+            # 新增的议程项始终生成新ID，避免客户端提交的ID与其他议程项冲突
+            agenda_item.id = matched_id or str(uuid.uuid4())
+
     @staticmethod
     async def create_meeting(db: Session, meeting_data: Dict[str, Any]):
         """创建新会议"""
         try:
+            # 分配议程项ID，议程项文件夹以ID命名
+            MeetingService._assign_agenda_item_ids(meeting_data.part)
+
             # 处理临时文件
             await MeetingService.process_temp_files_in_meeting(meeting_data)
 
             # 创建会议
             db_meeting = crud.create_meeting(db=db, meeting=meeting_data)
+
+            # 在后台预生成会议文件包
+            PackageBuilder.schedule_build(db_meeting.id)
             return db_meeting
         except ValueError as e:
             # 处理标题重复错误
@@ -96,10 +125,13 @@ class MeetingService:
             # 不在这里删除文件夹
             # await MeetingService.delete_agenda_item_folder(meeting_id, position)
 
-        # 处理临时文件
+        # 处理临时文件，只处理文件发生变化的议程项
         if hasattr(meeting_data, 'part') and meeting_data.part:
+            agenda_diff = AgendaDiff.compute(current_agenda_items, meeting_data.part)
+            print(f"议程项差异: {agenda_diff.summary()}")
+            MeetingService._assign_agenda_item_ids(meeting_data.part, agenda_diff)
             print(f"处理会议编辑中的临时文件，共 {len(meeting_data.part)} 个议程项")
-            await MeetingService.process_temp_files_in_meeting_update(meeting_id, meeting_data)
+            await MeetingService.process_temp_files_in_meeting_update(meeting_id, meeting_data, agenda_diff)
         else:
             print("没有议程项需要处理")
 
@@ -111,6 +143,9 @@ class MeetingService:
                 raise HTTPException(status_code=404, detail="会议更新失败")
 
             print(f"会议 {meeting_id} 更新成功")
+
+            # 会议文件可能已变化，在后台重新预生成会议文件包
+            PackageBuilder.schedule_build(meeting_id)
             return db_meeting
         except ValueError as e:
             # 处理标题重复错误
@@ -153,7 +188,8 @@ class MeetingService:
             print(f"错误: 会议 {meeting_id} 未找到")
             raise HTTPException(status_code=404, detail="会议未找到")
 
-        # 1. 先删除ZIP包
+        # 1. 先取消后台预生成并删除ZIP包
+        PackageBuilder.cancel_build(meeting_id)
         await MeetingService.delete_meeting_package(db, meeting_id)
 
         # 2. 删除文件系统中的会议文件夹
@@ -199,8 +235,9 @@ class MeetingService:
         meeting_dir = os.path.join(UPLOAD_DIR, meeting_id)
         os.makedirs(meeting_dir, exist_ok=True)
 
-        # 创建议程项目录
-        agenda_dir = os.path.join(meeting_dir, f"agenda_{position}")
+        # 创建议程项目录（以议程项ID命名）
+        agenda_folder_name = get_agenda_folder_name(db_agenda_item.id)
+        agenda_dir = os.path.join(meeting_dir, agenda_folder_name)
         os.makedirs(agenda_dir, exist_ok=True)
 
         # 创廾JPG文件存储目录
@@ -222,10 +259,9 @@ class MeetingService:
             filename = f"{unique_id}_{file.filename}"
             file_path = os.path.join(agenda_dir, filename)
 
-            # 保存文件
+            # 以流式方式分块保存文件，同时计算SHA-256
             try:
-                with open(file_path, "wb") as buffer:
-                    shutil.copyfileobj(file.file, buffer)
+                saved = await FileService.save_upload_file(file, file_path)
             except Exception as e:
                 return JSONResponse(
                     status_code=500,
@@ -234,6 +270,12 @@ class MeetingService:
             finally:
                 await file.close()
 
+            # 将文件存入内容存储，相同内容只保存一份，议程目录中保留硬链接
+            from services.async_utils import AsyncUtils
+            stored = await AsyncUtils.run_in_threadpool(BlobStore.store_file_sync, file_path, file_path)
+            if stored["deduplicated"]:
+                print(f"上传内容已存在于存储中，已复用: {stored['sha256']}")
+
             # 为PDF文件创廾JPG文件
             jpg_subdir = os.path.join(jpg_dir, unique_id)
             os.makedirs(jpg_subdir, exist_ok=True)
@@ -254,15 +296,19 @@ class MeetingService:
                 await PDFService.convert_pdf_to_jpg_for_pad(file_path, jpg_subdir)
                 print(f"PDF转JPG完成: {file_path}")
 
+            # 在后台预渲染多分辨率页面金字塔
+            PyramidService.schedule_pyramid(file_path, jpg_subdir)
+
             # 添加文件信息
             file_info = {
                 "name": file.filename,
                 "path": file_path,
-                "size": os.path.getsize(file_path),
-                "url": f"/uploads/{meeting_id}/agenda_{position}/{filename}",
+                "size": saved["size"],
+                "url": f"/uploads/{meeting_id}/{agenda_folder_name}/{filename}",
                 "display_name": file.filename,
                 "meeting_id": meeting_id,
-                "agenda_folder": f"agenda_{position}"
+                "agenda_folder": agenda_folder_name,
+                "sha256": saved["sha256"]
             }
             uploaded_files.append(file_info)
 
@@ -278,8 +324,93 @@ class MeetingService:
         db.commit()
         db.refresh(db_agenda_item)
 
+        # 在后台重新预生成会议文件包
+        PackageBuilder.schedule_build(meeting_id)
+
         return {"success": True, "files": uploaded_files}
 
+    @staticmethod
+    async def _collect_agenda_folder_jpgs(meeting_id: str, meeting_dir: str, agenda_folder_name: str):
+        """收集一个议程项文件夹中的PDF及其JPG文件信息"""
+        from services.async_utils import AsyncUtils
+
+        agenda_dir = os.path.join(meeting_dir, agenda_folder_name)
+        jpg_dir = os.path.join(agenda_dir, "jpgs")
+
+        agenda_files = []
+
+        # 使用线程池检查议程项目录是否存在
+        agenda_dir_exists = await AsyncUtils.run_in_threadpool(lambda: os.path.exists(agenda_dir))
+        if not agenda_dir_exists:
+            return agenda_files
+
+        # 使用线程池检查JPG目录是否存在
+        jpg_dir_exists = await AsyncUtils.run_in_threadpool(lambda: os.path.exists(jpg_dir))
+        if not jpg_dir_exists:
+            return agenda_files
+
+        # 使用线程池获取JPG目录中的所有子目录
+        async def get_pdf_dirs():
+            def _get_pdf_dirs():
+                return [d for d in os.listdir(jpg_dir) if os.path.isdir(os.path.join(jpg_dir, d))]
+            return await AsyncUtils.run_in_threadpool(_get_pdf_dirs)
+
+        pdf_dirs = await get_pdf_dirs()
+
+        # 遍历所有PDF对应的目录
+        for pdf_id in pdf_dirs:
+            pdf_jpg_dir = os.path.join(jpg_dir, pdf_id)
+
+            # 使用线程池查找对应的PDF文件
+            async def find_pdf_file():
+                def _find_pdf_file():
+                    for file in os.listdir(agenda_dir):
+                        if file.startswith(f"{pdf_id}_") and file.lower().endswith(".pdf"):
+                            return file
+                    return None
+                return await AsyncUtils.run_in_threadpool(_find_pdf_file)
+
+            pdf_file = await find_pdf_file()
+
+            if not pdf_file:
+                continue
+
+            # 使用线程池获取所有JPG文件
+            async def get_jpg_files():
+                def _get_jpg_files():
+                    jpg_paths = []
+                    for jpg_file in os.listdir(pdf_jpg_dir):
+                        # 图片模式下页面可能是WebP或AVIF格式
+                        if jpg_file.lower().endswith((".jpg", ".webp", ".avif")):
+                            jpg_path = f"/uploads/{meeting_id}/{agenda_folder_name}/jpgs/{pdf_id}/{jpg_file}"
+                            jpg_paths.append(jpg_path)
+                    return jpg_paths
+                return await AsyncUtils.run_in_threadpool(_get_jpg_files)
+
+            jpg_files = await get_jpg_files()
+
+            # 使用线程池读取页面金字塔清单
+            pyramid_manifest = await AsyncUtils.run_in_threadpool(PyramidService.read_manifest_sync, pdf_jpg_dir)
+
+            # 如果有JPG文件，添加到结果中
+            if jpg_files:
+                file_entry = {
+                    "pdf_id": pdf_id,
+                    "pdf_file": f"/uploads/{meeting_id}/{agenda_folder_name}/{pdf_file}",
+                    "jpg_files": jpg_files
+                }
+                if pyramid_manifest:
+                    pyramid_base = f"/uploads/{meeting_id}/{agenda_folder_name}/jpgs/{pdf_id}/{PYRAMID_DIR_NAME}"
+                    file_entry["pyramid"] = {
+                        "manifest_url": f"{pyramid_base}/{PYRAMID_MANIFEST_NAME}",
+                        "base_url": pyramid_base,
+                        "widths": pyramid_manifest.get("widths", []),
+                        "page_count": pyramid_manifest.get("page_count", 0)
+                    }
+                agenda_files.append(file_entry)
+
+        return agenda_files
+
     @staticmethod
     async def get_meeting_jpgs(db: Session, meeting_id: str):
         """获取会议的JPG文件信息
@@ -307,68 +438,15 @@ class MeetingService:
         # 遍历会议的所有议程项
         for agenda_item in db_meeting.agenda_items:
             position = agenda_item.position
-            agenda_dir = os.path.join(meeting_dir, f"agenda_{position}")
-            jpg_dir = os.path.join(agenda_dir, "jpgs")
-
-            # 使用线程池检查议程项目录是否存在
-            agenda_dir_exists = await AsyncUtils.run_in_threadpool(lambda: os.path.exists(agenda_dir))
-            if not agenda_dir_exists:
-                continue
-
-            # 使用线程池检查JPG目录是否存在
-            jpg_dir_exists = await AsyncUtils.run_in_threadpool(lambda: os.path.exists(jpg_dir))
-            if not jpg_dir_exists:
-                continue
 
             # 收集议程项的JPG文件信息
             agenda_files = []
 
-            # 使用线程池获取JPG目录中的所有子目录
-            async def get_pdf_dirs():
-                def _get_pdf_dirs():
-                    return [d for d in os.listdir(jpg_dir) if os.path.isdir(os.path.join(jpg_dir, d))]
-                return await AsyncUtils.run_in_threadpool(_get_pdf_dirs)
-
-            pdf_dirs = await get_pdf_dirs()
-
-            # 遍历所有PDF对应的目录
-            for pdf_id in pdf_dirs:
-                pdf_jpg_dir = os.path.join(jpg_dir, pdf_id)
-
-                # 使用线程池查找对应的PDF文件
-                async def find_pdf_file():
-                    def _find_pdf_file():
-                        for file in os.listdir(agenda_dir):
-                            if file.startswith(f"{pdf_id}_") and file.lower().endswith(".pdf"):
-                                return file
-                        return None
-                    return await AsyncUtils.run_in_threadpool(_find_pdf_file)
-
-                pdf_file = await find_pdf_file()
-
-                if not pdf_file:
-                    continue
-
-                # 使用线程池获取所有JPG文件
-                async def get_jpg_files():
-                    def _get_jpg_files():
-                        jpg_paths = []
-                        for jpg_file in os.listdir(pdf_jpg_dir):
-                            if jpg_file.lower().endswith(".jpg"):
-                                jpg_path = f"/uploads/{meeting_id}/agenda_{position}/jpgs/{pdf_id}/{jpg_file}"
-                                jpg_paths.append(jpg_path)
-                        return jpg_paths
-                    return await AsyncUtils.run_in_threadpool(_get_jpg_files)
-
-                jpg_files = await get_jpg_files()
-
-                # 如果有JPG文件，添加到结果中
-                if jpg_files:
-                    agenda_files.append({
-                        "pdf_id": pdf_id,
-                        "pdf_file": f"/uploads/{meeting_id}/agenda_{position}/{pdf_file}",
-                        "jpg_files": jpg_files
-                    })
+            # 议程项的文件可能位于以ID命名的文件夹和早期的agenda_<位置>文件夹中
+            for agenda_folder_name in get_agenda_item_folders(agenda_item.id, agenda_item.files):
+                agenda_files.extend(await MeetingService._collect_agenda_folder_jpgs(
+                    meeting_id, meeting_dir, agenda_folder_name
+                ))
 
             # 添加议程项信息
             if agenda_files:
@@ -415,7 +493,6 @@ class MeetingService:
         # 遍历会议的所有议程项
         for agenda_item in db_meeting.agenda_items:
             position = agenda_item.position
-            agenda_dir = os.path.join(meeting_dir, f"agenda_{position}")
 
             # 准备议程项信息
             agenda_info = {
@@ -426,9 +503,15 @@ class MeetingService:
                 "files": []
             }
 
-            # 使用线程池检查议程项目录是否存在
-            agenda_dir_exists = await AsyncUtils.run_in_threadpool(lambda: os.path.exists(agenda_dir))
-            if agenda_dir_exists:
+            # 议程项的文件可能位于以ID命名的文件夹和早期的agenda_<位置>文件夹中
+            for agenda_folder_name in get_agenda_item_folders(agenda_item.id, agenda_item.files):
+                agenda_dir = os.path.join(meeting_dir, agenda_folder_name)
+
+                # 使用线程池检查议程项目录是否存在
+                agenda_dir_exists = await AsyncUtils.run_in_threadpool(lambda: os.path.exists(agenda_dir))
+                if not agenda_dir_exists:
+                    continue
+
                 # 使用线程池获取目录中的所有PDF文件
                 async def get_pdf_files():
                     def _get_pdf_files():
@@ -438,7 +521,7 @@ class MeetingService:
                 pdf_files = await get_pdf_files()
 
                 # 并行处理所有PDF文件
-                async def process_pdf_file(file):
+                async def process_pdf_file(file, agenda_dir=agenda_dir, agenda_folder_name=agenda_folder_name):
                     file_path = os.path.join(agenda_dir, file)
 
                     # 使用线程池获取文件大小
@@ -453,22 +536,116 @@ class MeetingService:
                         "path": file_path,
                         "size": file_size,
                         "formatted_size": format_file_size(file_size),
-                        "url": f"/uploads/{meeting_id}/agenda_{position}/{file}",
+                        "url": f"/uploads/{meeting_id}/{agenda_folder_name}/{file}",
                         "type": "pdf"
                     }
 
-                # 并行处理所有PDF文件，但限制并发数量为4
-                tasks = [process_pdf_file(file) for file in pdf_files]
-                file_results = await AsyncUtils.gather_with_concurrency(4, *tasks)
-
-                # 添加文件信息到议程项
-                agenda_info["files"] = file_results
+                # 并行处理所有PDF文件，并发数按处理耗时自动调整，按文件顺序添加文件信息到议程项
+                async for file_result in AsyncUtils.bounded_map(process_pdf_file, pdf_files):
+                    agenda_info["files"].append(file_result)
 
             # 添加议程项信息到结果中
             result["agenda_items"].append(agenda_info)
 
         return result
 
+    @staticmethod
+    def _get_package_arcname(pdf_path: str, meeting_dir: str) -> str:
+        """获取PDF文件在会议文件包中的相对路径：保留议程目录，文件名只使用UUID部分"""
+        # 获取文件名和UUID
+        pdf_filename = os.path.basename(pdf_path)
+        # 从文件名中提取UUID部分（通常是文件名的第一部分，以下划线分隔）
+        pdf_uuid = pdf_filename.split("_")[0] if "_" in pdf_filename else pdf_filename
+
+        # 确保文件名有.pdf扩展名
+        if not pdf_uuid.lower().endswith(".pdf"):
+            pdf_uuid = f"{pdf_uuid}.pdf"
+
+        # 获取文件所在的目录相对路径
+        rel_dir = os.path.dirname(os.path.relpath(pdf_path, meeting_dir))
+
+        # 创建新的相对路径，使用UUID作为文件名
+        return os.path.join(rel_dir, pdf_uuid)
+
+    @staticmethod
+    async def create_package_stream(db: Session, meeting_id: str):
+        """
+        创建会议文件包的流式ZIP，内容与预生成的文件包相同，不在内存或磁盘中生成整个压缩包
+
+        Args:
+            db: 数据库会话
+            meeting_id: 会议ID
+
+        Returns:
+            ZipStream: 流式ZIP生成器，会议不存在时返回None
+
+        Raises:
+            ValueError: 当压缩包超过ZIP32限制时
+        """
+        from services.async_utils import AsyncUtils
+        from services.zip_stream import ZipStream, ZipStreamEntry
+
+        db_meeting = crud.get_meeting(db, meeting_id=meeting_id)
+        if db_meeting is None:
+            return None
+
+        meeting_dir = os.path.join(UPLOAD_DIR, meeting_id)
+
+        # 议程文件信息中记录的内容哈希：路径 -> sha256
+        known_hashes = {}
+        for agenda_item in db_meeting.agenda_items:
+            for file_info in agenda_item.files or []:
+                if isinstance(file_info, dict) and file_info.get('path') and file_info.get('sha256'):
+                    known_hashes[os.path.normpath(file_info['path'])] = file_info['sha256']
+
+        def _collect_entries():
+            pdf_files = []
+            for root, dirs, files in os.walk(meeting_dir):
+                for file in files:
+                    if file.lower().endswith(".pdf"):
+                        pdf_files.append(os.path.join(root, file))
+
+            if not pdf_files:
+                info_content = f"会议 '{db_meeting.title}' (ID: {meeting_id}) 没有可用的PDF文件。\n请确保会议中包含PDF文件。"
+                return [ZipStreamEntry("README.txt", data=info_content.encode("utf-8"))]
+
+            readme_content = f"会议: {db_meeting.title} (ID: {meeting_id})\n"
+            readme_content += f"生成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
+            readme_content += f"包含PDF文件数量: {len(pdf_files)}\n\n"
+            readme_content += "文件列表:\n"
+            for pdf_path in pdf_files:
+                readme_content += f"- {os.path.relpath(pdf_path, meeting_dir)}\n"
+
+            entries = [ZipStreamEntry("README.txt", data=readme_content.encode("utf-8"))]
+            manifest_files = []
+            for pdf_path in pdf_files:
+                try:
+                    arcname = MeetingService._get_package_arcname(pdf_path, meeting_dir)
+                    entry = ZipStreamEntry(arcname, path=pdf_path)
+                    sha256 = known_hashes.get(os.path.normpath(pdf_path)) or BlobStore.compute_sha256_sync(pdf_path)
+                except OSError as e:
+                    print(f"添加文件到ZIP失败: {pdf_path}, 错误: {str(e)}")
+                    continue
+                entries.append(entry)
+                manifest_files.append({
+                    "path": entry.arcname,
+                    "sha256": sha256,
+                    "size": entry.size,
+                    "blob_url": f"/api/v1/documents/blobs/{sha256}"
+                })
+
+            # 清单放在最后，与预生成的文件包一致；其大小需要在开始输出前确定
+            entries.append(ZipStreamEntry("manifest.json", data=json.dumps({
+                "meeting_id": meeting_id,
+                "title": db_meeting.title,
+                "generated_at": datetime.now().isoformat(),
+                "files": manifest_files
+            }, ensure_ascii=False, indent=2).encode("utf-8")))
+            return entries
+
+        entries = await AsyncUtils.run_in_threadpool(_collect_entries)
+        return ZipStream(entries)
+
     @staticmethod
     async def download_meeting_package(db: Session, meeting_id: str):
         """下载会议的JPG文件包，返回预生成的ZIP文件
@@ -516,6 +693,123 @@ class MeetingService:
             error_buffer.seek(0)
             return error_buffer
 
+    @staticmethod
+    async def _prepare_committed_pdf(file_info: Dict[str, Any], jpg_dir: str,
+                                     image_settings: Optional[Dict[str, Any]] = None):
+        """为已提交到议程目录的PDF文件获取总页数、生成JPG并安排预渲染页面金字塔，image_settings为平板图片设置"""
+        from services.async_utils import AsyncUtils
+
+        new_path = file_info.get('path')
+        # 从UUID_filename.pdf格式中提取UUID部分
+        pdf_filename = os.path.basename(new_path)
+        pdf_uuid = pdf_filename.split("_")[0] if "_" in pdf_filename else ""
+        jpg_subdir = os.path.join(jpg_dir, pdf_uuid)
+
+        def _check_files():
+            os.makedirs(jpg_subdir, exist_ok=True)
+            if not os.path.exists(new_path):
+                return False, False
+            # 检查目录中是否已经有JPG文件
+            for file in os.listdir(jpg_subdir):
+                if file.lower().endswith(".jpg"):
+                    print(f"JPG文件已存在，跳过转JPG: {jpg_subdir}/{file}")
+                    return True, True
+            return True, False
+
+        # 多个PDF并行处理，文件检查放到线程池中，不阻塞事件循环
+        pdf_exists, jpg_exists = await AsyncUtils.run_in_threadpool(_check_files)
+
+        # 先检查PDF文件是否存在
+        if pdf_exists:
+            # 获取PDF文件的总页数
+            page_count = await PDFService.get_pdf_page_count(new_path)
+            if page_count is not None:
+                print(f"PDF文件总页数: {page_count}")
+                # 将总页数添加到文件信息中
+                file_info['total_pages'] = page_count
+            else:
+                print(f"无法获取PDF文件总页数: {new_path}")
+                file_info['total_pages'] = 0
+
+            # 只有当JPG文件不存在时才进行转换
+            if not jpg_exists:
+                print(f"开始转换PDF到JPG: {new_path} -> {jpg_subdir}")
+                # 使用异步方式调用PDF转JPG功能
+                await PDFService.convert_pdf_to_jpg_for_pad(new_path, jpg_subdir, image_settings=image_settings)
+                print(f"PDF转JPG完成: {new_path}")
+
+            # 在后台预渲染多分辨率页面金字塔
+            PyramidService.schedule_pyramid(new_path, jpg_subdir)
+        else:
+            print(f"PDF文件不存在，跳过转JPG: {new_path}")
+            file_info['total_pages'] = 0
+
+    @staticmethod
+    async def _commit_temp_files(transaction: FileCommitTransaction, pending_pdfs: List[tuple],
+                                 jpg_moves: Optional[List[tuple]] = None) -> bool:
+        """
+        提交会议保存时登记的所有临时文件，成功后处理其中的PDF文件
+
+        Args:
+            transaction (FileCommitTransaction): 登记了本次保存所有文件的提交事务
+            pending_pdfs (List[tuple]): 待处理的PDF文件，每项为(文件信息, JPG目录, 是否在事务中)
+            jpg_moves (List[tuple], optional): 提交成功后随文件移动的JPG目录，每项为(原目录, 新目录)
+
+        Returns:
+            bool: 提交成功返回True；失败时事务已回滚，文件信息恢复为临时文件，返回False
+        """
+        committed = True
+        if len(transaction):
+            try:
+                await transaction.commit()
+            except FileCommitError as e:
+                # 文件信息已恢复为临时文件，下次保存时会重新提交
+                print(f"提交临时文件失败，本次保存的文件已全部回滚: {e}")
+                committed = False
+
+        if committed:
+            for old_jpg_dir, new_jpg_dir in jpg_moves or []:
+                if os.path.isdir(old_jpg_dir) and not os.path.exists(new_jpg_dir):
+                    try:
+                        os.makedirs(os.path.dirname(new_jpg_dir), exist_ok=True)
+                        os.replace(old_jpg_dir, new_jpg_dir)
+                        print(f"JPG目录随文件移动: {old_jpg_dir} -> {new_jpg_dir}")
+                    except OSError as e:
+                        print(f"移动JPG目录失败，将重新生成: {old_jpg_dir}, 错误: {e}")
+
+        async def prepare_isolated(file_info, jpg_dir, image_settings):
+            # 每个文件单独处理错误，一个文件失败不影响其他文件
+            try:
+                await MeetingService._prepare_committed_pdf(file_info, jpg_dir, image_settings)
+            except Exception as e:
+                print(f"处理PDF文件时出错: {file_info.get('path')}, 错误: {e}")
+                import traceback
+                traceback.print_exc()
+                file_info.setdefault('total_pages', 0)
+
+        # 所有议程项的PDF文件并行处理，保存耗时取决于最慢的文件而不是所有文件之和
+        pending = [
+            (file_info, jpg_dir)
+            for file_info, jpg_dir, in_transaction in pending_pdfs
+            if committed or not in_transaction
+        ]
+        if pending:
+            from services.async_utils import AsyncUtils, EXECUTOR_CONTROL
+            # 平板图片设置在并行处理之前读取一次，所有文件使用相同的设置
+            image_settings = await AsyncUtils.run_in_executor(EXECUTOR_CONTROL, PDFService.get_pad_image_settings)
+            print(f"并行处理 {len(pending)} 个PDF文件，并发数 {TEMP_FILE_CONCURRENCY}")
+            processed = 0
+            # 按完成顺序报告进度。文件从几页到几百页不等，单个文件的耗时不能反映系统负载，
+            # 不按耗时自动调整并发数，使用固定并发数
+            async for _ in AsyncUtils.bounded_map(
+                lambda item: prepare_isolated(*item, image_settings), pending, limit=TEMP_FILE_CONCURRENCY, ordered=False,
+                adaptive=False
+            ):
+                processed += 1
+                print(f"PDF文件处理进度: {processed}/{len(pending)}")
+
+        return committed
+
     @staticmethod
     async def process_temp_files_in_meeting(meeting_data):
         """处理会议中的临时文件，将它们从临时目录移动到正式目录
@@ -530,6 +824,10 @@ class MeetingService:
             os.makedirs(meeting_dir, exist_ok=True)
             print(f"创建会议目录: {meeting_dir}")
 
+            # 本次保存的所有临时文件在同一个事务中提交，任何文件失败都会全部回滚
+            transaction = FileCommitTransaction(f"会议 {meeting_data.id}")
+            pending_pdfs = []
+
             # 处理议程项中的临时文件
             if not meeting_data.part:
                 print("没有议程项需要处理")
@@ -570,9 +868,8 @@ class MeetingService:
                 print(f"保留 {len(non_temp_files)} 个非临时文件")
 
                 # 创建议程项目录
-                # 使用位置作为文件夹名称
-                position = agenda_index + 1
-                agenda_folder_name = f"agenda_{position}"
+                # 使用议程项ID作为文件夹名称
+                agenda_folder_name = get_agenda_folder_name(agenda_item.id)
                 agenda_dir = os.path.join(meeting_dir, agenda_folder_name)
                 os.makedirs(agenda_dir, exist_ok=True)
                 print(f"创建议程项目录: {agenda_dir}")
@@ -614,16 +911,8 @@ class MeetingService:
                         if is_same_file:
                             print(f"源文件和目标文件相同，跳过复制: {temp_path}")
                         else:
-                            # 复制文件而不是移动，以避免权限问题
-                            shutil.copy2(temp_path, new_path)
-                            print("文件复制成功")
-
-                            # 只有当源文件和目标文件不同时，才尝试删除原文件
-                            try:
-                                os.remove(temp_path)
-                                print("原文件删除成功")
-                            except Exception as e:
-                                print(f"删除原文件失败: {e}")
+                            # 登记到本次保存的文件提交事务，处理完所有议程项后一次性提交
+                            transaction.add(temp_path, new_path, file_info)
 
                         # 更新文件信息
                         file_info['path'] = new_path
@@ -636,45 +925,9 @@ class MeetingService:
                         existing_files[file_name] = file_info
                         print("文件信息更新成功")
 
-                        # 为新处理的PDF文件创廾JPG文件并获取总页数
+                        # PDF文件在文件提交事务完成后再转换JPG
                         if file_name.lower().endswith(".pdf"):
-                            # 从UUID_filename.pdf格式中提取UUID部分
-                            pdf_filename = os.path.basename(new_path)
-                            pdf_uuid = pdf_filename.split("_")[0] if "_" in pdf_filename else ""
-                            jpg_subdir = os.path.join(jpg_dir, pdf_uuid)
-                            os.makedirs(jpg_subdir, exist_ok=True)
-
-                            # 先检查PDF文件是否存在
-                            if os.path.exists(new_path):
-                                # 获取PDF文件的总页数
-                                page_count = await PDFService.get_pdf_page_count(new_path)
-                                if page_count is not None:
-                                    print(f"PDF文件总页数: {page_count}")
-                                    # 将总页数添加到文件信息中
-                                    file_info['total_pages'] = page_count
-                                else:
-                                    print(f"无法获取PDF文件总页数: {new_path}")
-                                    file_info['total_pages'] = 0
-
-                                # 检查是否已经有JPG文件
-                                jpg_exists = False
-                                if os.path.exists(jpg_subdir):
-                                    # 检查目录中是否有JPG文件
-                                    for file in os.listdir(jpg_subdir):
-                                        if file.lower().endswith(".jpg"):
-                                            jpg_exists = True
-                                            print(f"JPG文件已存在，跳过转JPG: {jpg_subdir}/{file}")
-                                            break
-
-                                # 只有当JPG文件不存在时才进行转换
-                                if not jpg_exists:
-                                    print(f"开始转换PDF到JPG: {new_path} -> {jpg_subdir}")
-                                    # 使用异步方式调用PDF转JPG功能
-                                    await PDFService.convert_pdf_to_jpg_for_pad(new_path, jpg_subdir)
-                                    print(f"PDF转JPG完成: {new_path}")
-                            else:
-                                print(f"PDF文件不存在，跳过转JPG: {new_path}")
-                                file_info['total_pages'] = 0
+                            pending_pdfs.append((file_info, jpg_dir, not is_same_file))
 
                     except Exception as e:
                         print(f"处理临时文件时出错: {e}")
@@ -686,6 +939,9 @@ class MeetingService:
                 agenda_item.files = non_temp_files + processed_files
                 print(f"议程项文件列表更新成功，共 {len(agenda_item.files)} 个文件")
 
+            # 一次性提交所有文件，然后为PDF文件生成JPG
+            await MeetingService._commit_temp_files(transaction, pending_pdfs)
+
         except Exception as e:
             print(f"\n\n处理临时文件时发生全局错误: {e}")
             import traceback
@@ -694,13 +950,13 @@ class MeetingService:
             # 即使文件处理失败，也应该允许会议信息保存
 
     @staticmethod
-    async def delete_agenda_item_folder(meeting_id: str, agenda_item_id: int):
+    async def delete_agenda_item_folder(meeting_id: str, agenda_item_id: str):
         """删除议程项对应的文件夹及其中的所有文件
         在编辑会议时，如果议程项被移除，调用此方法删除对应的文件夹
 
         Args:
             meeting_id: 会议ID
-            agenda_item_id: 议程项位置
+            agenda_item_id: 议程项ID
         """
         # 获取数据库会话
         from database import get_db
@@ -709,29 +965,26 @@ class MeetingService:
             # 导入异步工具
             from services.async_utils import AsyncUtils
 
-            # 构建议程项文件夹路径
-            # 获取议程项的位置
+            # 议程项使用以ID命名的文件夹，早期创建的文件还可能位于agenda_<位置>文件夹中
             agenda_item = db.query(models.AgendaItem).filter(
                 models.AgendaItem.meeting_id == meeting_id,
-                models.AgendaItem.position == agenda_item_id
+                models.AgendaItem.id == agenda_item_id
             ).first()
+            files = agenda_item.files if agenda_item else None
 
-            if agenda_item:
-                agenda_dir = os.path.join(UPLOAD_DIR, meeting_id, f"agenda_{agenda_item.position}")
-            else:
-                # 如果找不到议程项，尝试直接使用ID
-                agenda_dir = os.path.join(UPLOAD_DIR, meeting_id, f"agenda_{agenda_item_id}")
+            for agenda_folder_name in get_agenda_item_folders(agenda_item_id, files):
+                agenda_dir = os.path.join(UPLOAD_DIR, meeting_id, agenda_folder_name)
 
-            # 检查文件夹是否存在
-            dir_exists = await AsyncUtils.run_in_threadpool(lambda: os.path.exists(agenda_dir))
-            if not dir_exists:
-                print(f"议程项 {agenda_item_id} 的文件夹不存在: {agenda_dir}")
-                return
+                # 检查文件夹是否存在
+                dir_exists = await AsyncUtils.run_in_threadpool(lambda: os.path.exists(agenda_dir))
+                if not dir_exists:
+                    print(f"议程项 {agenda_item_id} 的文件夹不存在: {agenda_dir}")
+                    continue
 
-            # 删除文件夹及其内容
-            print(f"删除议程项 {agenda_item_id} 的文件夹: {agenda_dir}")
-            await AsyncUtils.run_in_threadpool(lambda: shutil.rmtree(agenda_dir, ignore_errors=True))
-            print(f"成功删除议程项 {agenda_item_id} 的文件夹")
+                # 删除文件夹及其内容
+                print(f"删除议程项 {agenda_item_id} 的文件夹: {agenda_dir}")
+                await AsyncUtils.run_in_threadpool(lambda: shutil.rmtree(agenda_dir, ignore_errors=True))
+                print(f"成功删除议程项 {agenda_item_id} 的文件夹")
 
         except Exception as e:
             print(f"删除议程项 {agenda_item_id} 的文件夹时出错: {str(e)}")
@@ -752,6 +1005,9 @@ class MeetingService:
         """
         print(f"\n开始删除会议 {meeting_id} 的ZIP文件包")
 
+        # 删除按议程项生成的分片包
+        PackageBuilder.remove_shards_sync(meeting_id)
+
         # 检查会议是否存在
         db_meeting = crud.get_meeting(db, meeting_id=meeting_id)
         if db_meeting is None:
@@ -765,10 +1021,12 @@ class MeetingService:
 
         # 检查文件是否存在
         package_path = db_meeting.package_path
+        TarZstPackage.remove_sync(package_path)
         if not os.path.exists(package_path):
             print(f"包文件不存在: {package_path}")
             # 清除包路径记录
             db_meeting.package_path = None
+            db_meeting.package_fingerprint = None
             db.commit()
             return True
 
@@ -779,6 +1037,7 @@ class MeetingService:
 
             # 清除包路径记录
             db_meeting.package_path = None
+            db_meeting.package_fingerprint = None
             db.commit()
 
             return True
@@ -787,13 +1046,16 @@ class MeetingService:
             return False
 
     @staticmethod
-    async def generate_meeting_package(db: Session, meeting_id: str) -> bool:
+    async def generate_meeting_package(db: Session, meeting_id: str, admission: Optional[str] = None) -> bool:
         """为会议预生成PDF文件包，将所有PDF文件打包成ZIP文件并保存到磁盘
-        在会议开始时调用此方法，生成完成后才将会议状态更新为“进行中”
+        在会议开始时调用此方法，生成完成后才将会议状态更新为“进行中”；
+        会议文件变化后也会由PackageBuilder在后台提前调用，开始会议时即可直接使用
 
         Args:
             db: 数据库会话
             meeting_id: 会议ID
+            admission: 准入控制的令牌桶名称，客户端请求触发时传入；
+                只有确实需要重新生成文件包时才消耗令牌，令牌不足时抛出429错误
 
         Returns:
             bool: 生成成功返回true，失败返回false
@@ -806,6 +1068,17 @@ class MeetingService:
             print(f"错误: 会议 {meeting_id} 未找到")
             return False
 
+        # 同一会议同时只生成一个文件包，开始会议时如果后台正在预生成则等待其完成
+        async with PackageBuilder.get_lock(meeting_id):
+            # 后台预生成可能已在其他会话中更新了包路径
+            db.refresh(db_meeting)
+            return await MeetingService._write_meeting_package(db, db_meeting, meeting_id, admission)
+
+    @staticmethod
+    async def _write_meeting_package(db: Session, db_meeting, meeting_id: str, admission: Optional[str] = None) -> bool:
+        """生成会议文件包，已有的文件包与当前会议文件一致时直接复用"""
+        from services.async_utils import AsyncUtils, EXECUTOR_CONTROL, EXECUTOR_CPU
+
         # 获取会议目录
         meeting_dir = os.path.join(UPLOAD_DIR, meeting_id)
         print(f"会议目录: {meeting_dir}")
@@ -825,12 +1098,39 @@ class MeetingService:
         zip_path = os.path.join(packages_dir, zip_filename)
         print(f"ZIP文件路径: {zip_path}")
 
+        # 会议文件没有变化时直接使用已生成的包（通常由后台预生成）
+        fingerprint = await AsyncUtils.run_in_threadpool(
+            PackageBuilder.compute_fingerprint_sync, meeting_id, db_meeting.title
+        )
+        if PackageBuilder.is_package_current(db_meeting, fingerprint) and PackageBuilder.has_shards(meeting_id):
+            # tar.zst包在当前指纹下已生成失败时只提供ZIP包，不因缺少tar.zst包而重新生成ZIP和分片包
+            tar_ready = os.path.exists(TarZstPackage.get_path(db_meeting.package_path)) or \
+                TarZstPackage.has_failed(meeting_id, fingerprint)
+            if tar_ready or not await AsyncUtils.run_in_executor(EXECUTOR_CONTROL, TarZstPackage.is_enabled):
+                # 只修改了标题或议程顺序时只更新分片包索引
+                refreshed = await AsyncUtils.run_in_threadpool(
+                    PackageBuilder.refresh_index_sync,
+                    meeting_id, db_meeting.title, PackageBuilder.get_agenda_layout(db_meeting)
+                )
+                if refreshed is not None:
+                    print(f"会议文件未变化，使用已生成的包: {db_meeting.package_path}")
+                    return True
+                print("分片包索引需要重新生成")
+
+        # 需要重新生成文件包，客户端请求触发时先经过准入控制
+        if admission:
+            from services.admission_service import AdmissionLimiter
+            await AdmissionLimiter.acquire(admission)
+
+        # 先写入临时文件，完成后再原子替换，正在下载旧包的客户端不受影响
+        tmp_zip_path = f"{zip_path}.tmp"
         file_count = 0  # 用于跟踪添加到ZIP的文件数量
+        # 按议程项分片时使用的文件：(PDF路径, 包内相对路径, 清单条目)
+        shard_entries = []
+        # tar.zst包的成员：(包内路径, 磁盘文件路径, 内存数据)
+        tar_members = []
 
         try:
-            # 导入异步工具
-            from services.async_utils import AsyncUtils
-
             # 收集所有PDF文件
             pdf_files = []
             for root, dirs, files in os.walk(meeting_dir):
@@ -843,12 +1143,22 @@ class MeetingService:
             # 如果没有PDF文件，创建一个包含说明文件的ZIP
             if not pdf_files:
                 print("没有找到PDF文件，添加说明文件到空ZIP包")
-                with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+                with zipfile.ZipFile(tmp_zip_path, 'w', zipfile.ZIP_DEFLATED) as zip_file:
                     info_content = f"会议 '{db_meeting.title}' (ID: {meeting_id}) 没有可用的PDF文件。\n请确保会议中包含PDF文件。"
                     zip_file.writestr("README.txt", info_content)
+                    tar_members.append(("README.txt", None, info_content.encode("utf-8")))
             else:
                 # 有PDF文件，创建包含这些文件的ZIP
-                with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+                # 议程文件信息中记录的内容哈希：路径 -> sha256
+                known_hashes = {}
+                for agenda_item in db_meeting.agenda_items:
+                    for file_info in agenda_item.files or []:
+                        if isinstance(file_info, dict) and file_info.get('path') and file_info.get('sha256'):
+                            known_hashes[os.path.normpath(file_info['path'])] = file_info['sha256']
+
+                manifest_files = []
+
+                with zipfile.ZipFile(tmp_zip_path, 'w', zipfile.ZIP_DEFLATED) as zip_file:
                     # 添加README.txt说明文件
                     readme_content = f"会议: {db_meeting.title} (ID: {meeting_id})\n"
                     readme_content += f"生成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
@@ -861,40 +1171,90 @@ class MeetingService:
                         readme_content += f"- {rel_path}\n"
 
                     zip_file.writestr("README.txt", readme_content)
+                    tar_members.append(("README.txt", None, readme_content.encode("utf-8")))
                     file_count += 1
 
                     # 添加所有PDF文件
                     for pdf_path in pdf_files:
                         try:
-                            # 获取文件名和UUID
-                            pdf_filename = os.path.basename(pdf_path)
-                            # 从文件名中提取UUID部分（通常是文件名的第一部分，以下划线分隔）
-                            pdf_uuid = pdf_filename.split("_")[0] if "_" in pdf_filename else pdf_filename
-
-                            # 确保文件名有.pdf扩展名
-                            if not pdf_uuid.lower().endswith(".pdf"):
-                                pdf_uuid = f"{pdf_uuid}.pdf"
-
-                            # 获取文件所在的目录相对路径
-                            rel_dir = os.path.dirname(os.path.relpath(pdf_path, meeting_dir))
-
-                            # 创建新的相对路径，使用UUID作为文件名
-                            new_rel_path = os.path.join(rel_dir, pdf_uuid)
+                            # 包内使用UUID作为文件名
+                            new_rel_path = MeetingService._get_package_arcname(pdf_path, meeting_dir)
 
                             # 添加文件到ZIP
                             print(f"添加文件到ZIP: {pdf_path} -> {new_rel_path} (仅使用UUID)")
-                            zip_file.write(pdf_path, new_rel_path)
+                            # 压缩在CPU线程池中执行，避免阻塞事件循环
+                            await AsyncUtils.run_in_executor(EXECUTOR_CPU, zip_file.write, pdf_path, new_rel_path)
+                            tar_members.append((new_rel_path, pdf_path, None))
                             file_count += 1
                             print(f"成功添加文件到ZIP: {pdf_path}")
+
+                            # 记录文件的内容哈希，节点可按哈希判断是否已有相同内容
+                            sha256 = known_hashes.get(os.path.normpath(pdf_path))
+                            if not sha256:
+                                sha256 = await AsyncUtils.run_in_threadpool(BlobStore.compute_sha256_sync, pdf_path)
+                            manifest_entry = {
+                                "path": new_rel_path.replace(os.sep, "/"),
+                                "sha256": sha256,
+                                "size": os.path.getsize(pdf_path),
+                                "blob_url": f"/api/v1/documents/blobs/{sha256}"
+                            }
+                            manifest_files.append(manifest_entry)
+                            shard_entries.append((pdf_path, new_rel_path, manifest_entry))
                         except Exception as e:
                             print(f"添加文件到ZIP失败: {pdf_path}, 错误: {str(e)}")
 
+                    # 添加按内容哈希引用文件的清单
+                    manifest_content = json.dumps({
+                        "meeting_id": meeting_id,
+                        "title": db_meeting.title,
+                        "generated_at": datetime.now().isoformat(),
+                        "files": manifest_files
+                    }, ensure_ascii=False, indent=2)
+                    zip_file.writestr("manifest.json", manifest_content)
+                    tar_members.append(("manifest.json", None, manifest_content.encode("utf-8")))
+
             # 检查ZIP文件大小
-            zip_size = os.path.getsize(zip_path)
+            zip_size = os.path.getsize(tmp_zip_path)
             print(f"生成的ZIP文件大小: {zip_size} 字节, 包含 {file_count} 个文件")
 
-            # 更新会议元数据，记录ZIP包路径
+            # 按议程项生成分片包和索引，平板可以先下载并显示第一个议程项
+            await AsyncUtils.run_in_executor(
+                EXECUTOR_CPU, PackageBuilder.write_shards_sync,
+                meeting_id, db_meeting.title, PackageBuilder.get_agenda_layout(db_meeting), shard_entries, fingerprint
+            )
+
+            # 为Linux节点生成tar.zst变体，失败时节点继续使用ZIP包
+            tar_path = TarZstPackage.get_path(zip_path)
+            if await AsyncUtils.run_in_executor(EXECUTOR_CONTROL, TarZstPackage.is_enabled):
+                try:
+                    level = await AsyncUtils.run_in_executor(EXECUTOR_CONTROL, TarZstPackage.get_compression_level)
+                    tar_size = await AsyncUtils.run_in_executor(
+                        EXECUTOR_CPU, TarZstPackage.write_sync, tar_path, tar_members, level
+                    )
+                    print(f"生成的tar.zst文件大小: {tar_size} 字节")
+                    TarZstPackage.clear_failed(meeting_id)
+                except Exception as e:
+                    print(f"生成tar.zst包失败，会议文件变化前仅提供ZIP包: {str(e)}")
+                    TarZstPackage.remove_sync(zip_path)
+                    TarZstPackage.mark_failed(meeting_id, fingerprint)
+            else:
+                # 已关闭tar.zst包时删除以前生成的包，避免提供过期内容
+                TarZstPackage.remove_sync(zip_path)
+
+            os.replace(tmp_zip_path, zip_path)
+
+            # 会议标题变化时包文件名也会变化，删除旧的包文件
+            old_package_path = db_meeting.package_path
+            if old_package_path and os.path.normpath(old_package_path) != os.path.normpath(zip_path):
+                try:
+                    os.remove(old_package_path)
+                except OSError:
+                    pass
+                TarZstPackage.remove_sync(old_package_path)
+
+            # 更新会议元数据，记录ZIP包路径和对应的会议文件指纹
             db_meeting.package_path = zip_path
+            db_meeting.package_fingerprint = fingerprint
             db.commit()
 
             return True
@@ -903,13 +1263,20 @@ class MeetingService:
             print(f"创建ZIP文件时发生错误: {str(e)}")
             import traceback
             traceback.print_exc()
+            if os.path.exists(tmp_zip_path):
+                try:
+                    os.remove(tmp_zip_path)
+                except OSError:
+                    pass
             return False
 
     @staticmethod
-    async def process_temp_files_in_meeting_update(meeting_id, meeting_data):
+    async def process_temp_files_in_meeting_update(meeting_id, meeting_data, agenda_diff: Optional[AgendaDiff] = None):
         """处理会议更新中的临时文件
         文件去重：检查文件名是否已存在，如果存在则复用已有文件而不是创建新文件
         自动转换：PDF文件会自动转换为JPG格式，用于无线平板显示
+        按差异处理：提供agenda_diff时只处理文件发生变化的议程项。议程项文件夹以ID命名，
+        调整议程顺序只修改数据库中的位置，不移动任何文件
         """
         try:
             print(f"\n\n开始处理会议 {meeting_id} 的临时文件")
@@ -919,8 +1286,14 @@ class MeetingService:
             os.makedirs(meeting_dir, exist_ok=True)
             print(f"创建会议目录: {meeting_dir}")
 
-            # 记录当前使用的议程项文件夹
-            current_agenda_folders = set()
+            # 本次保存的所有临时文件在同一个事务中提交，任何文件失败都会全部回滚
+            transaction = FileCommitTransaction(f"会议 {meeting_id}")
+            pending_pdfs = []
+            # 随文件一起移动的JPG目录：(原目录, 新目录)
+            jpg_moves = []
+
+            # 临时文件原来所在的议程项文件夹
+            old_folders = set()
 
             # 处理议程项中的临时文件
             if not meeting_data.part:
@@ -937,6 +1310,12 @@ class MeetingService:
                     print("该议程项没有文件")
                     continue
 
+                # 文件没有变化的议程项不需要处理（只调整了位置的议程项也不涉及文件）
+                change = agenda_diff.get_change(agenda_index + 1) if agenda_diff is not None else None
+                if agenda_diff is not None and (change is None or not change.files_changed):
+                    print("该议程项的文件没有变化，跳过")
+                    continue
+
                 # 安全地过滤出临时文件信息和非临时文件
                 temp_files = []
                 non_temp_files = []
@@ -960,16 +1339,12 @@ class MeetingService:
                     continue
 
                 # 创建议程项目录
-                # 使用位置作为文件夹名称
-                position = agenda_index + 1
-                agenda_folder_name = f"agenda_{position}"
+                # 使用议程项ID作为文件夹名称
+                agenda_folder_name = get_agenda_folder_name(agenda_item.id)
                 agenda_dir = os.path.join(meeting_dir, agenda_folder_name)
                 os.makedirs(agenda_dir, exist_ok=True)
                 print(f"创建议程项目录: {agenda_dir}")
 
-                # 将当前使用的文件夹添加到集合中
-                current_agenda_folders.add(agenda_folder_name)
-
                 # 创廾JPG文件存储目录
                 jpg_dir = os.path.join(agenda_dir, "jpgs")
                 os.makedirs(jpg_dir, exist_ok=True)
@@ -1027,16 +1402,17 @@ class MeetingService:
                         if is_same_file:
                             print(f"源文件和目标文件相同，跳过复制: {temp_path}")
                         else:
-                            # 复制文件而不是移动，以避免权限问题
-                            shutil.copy2(temp_path, new_path)
-                            print("文件复制成功")
-
-                            # 只有当源文件和目标文件不同时，才尝试删除原文件
-                            try:
-                                os.remove(temp_path)
-                                print("原文件删除成功")
-                            except Exception as e:
-                                print(f"删除原文件失败: {e}")
+                            # 登记到本次保存的文件提交事务，处理完所有议程项后一次性提交
+                            transaction.add(temp_path, new_path, file_info)
+
+                            # 文件来自本会议的其他议程文件夹时，已生成的JPG目录随文件移动，无需重新转换
+                            source_dir = os.path.dirname(os.path.normpath(temp_path))
+                            if os.path.dirname(source_dir) == os.path.normpath(meeting_dir) and "_" in filename:
+                                pdf_uuid = filename.split("_")[0]
+                                jpg_moves.append((
+                                    os.path.join(source_dir, "jpgs", pdf_uuid),
+                                    os.path.join(jpg_dir, pdf_uuid)
+                                ))
 
                         # 更新文件信息
                         file_info['path'] = new_path
@@ -1049,45 +1425,9 @@ class MeetingService:
                         existing_files[file_name] = file_info
                         print("文件信息更新成功")
 
-                        # 为新处理的PDF文件创廾JPG文件并获取总页数
+                        # PDF文件在文件提交事务完成后再转换JPG
                         if file_name.lower().endswith(".pdf"):
-                            # 从UUID_filename.pdf格式中提取UUID部分
-                            pdf_filename = os.path.basename(new_path)
-                            pdf_uuid = pdf_filename.split("_")[0] if "_" in pdf_filename else ""
-                            jpg_subdir = os.path.join(jpg_dir, pdf_uuid)
-                            os.makedirs(jpg_subdir, exist_ok=True)
-
-                            # 先检查PDF文件是否存在
-                            if os.path.exists(new_path):
-                                # 获取PDF文件的总页数
-                                page_count = await PDFService.get_pdf_page_count(new_path)
-                                if page_count is not None:
-                                    print(f"PDF文件总页数: {page_count}")
-                                    # 将总页数添加到文件信息中
-                                    file_info['total_pages'] = page_count
-                                else:
-                                    print(f"无法获取PDF文件总页数: {new_path}")
-                                    file_info['total_pages'] = 0
-
-                                # 检查是否已经有JPG文件
-                                jpg_exists = False
-                                if os.path.exists(jpg_subdir):
-                                    # 检查目录中是否有JPG文件
-                                    for file in os.listdir(jpg_subdir):
-                                        if file.lower().endswith(".jpg"):
-                                            jpg_exists = True
-                                            print(f"JPG文件已存在，跳过转JPG: {jpg_subdir}/{file}")
-                                            break
-
-                                # 只有当JPG文件不存在时才进行转换
-                                if not jpg_exists:
-                                    print(f"开始转换PDF到JPG: {new_path} -> {jpg_subdir}")
-                                    # 使用异步方式调用PDF转JPG功能
-                                    await PDFService.convert_pdf_to_jpg_for_pad(new_path, jpg_subdir)
-                                    print(f"PDF转JPG完成: {new_path}")
-                            else:
-                                print(f"PDF文件不存在，跳过转JPG: {new_path}")
-                                file_info['total_pages'] = 0
+                            pending_pdfs.append((file_info, jpg_dir, not is_same_file))
 
                     except Exception as e:
                         print(f"处理临时文件时出错: {e}")
@@ -1098,32 +1438,42 @@ class MeetingService:
                 # 更新议程项的文件列表 - 合并非临时文件和处理后的临时文件
                 agenda_item.files = non_temp_files + processed_files
 
-                # 检查并删除原来的文件夹（如果与当前文件夹不同）
-                # 收集所有需要检查的原始文件夹
-                old_folders = set()
+                # 收集需要检查的原始文件夹（如果与当前文件夹不同），文件提交后再检查
                 for file_item in temp_files:
                     if 'agenda_folder' in file_item and file_item['agenda_folder'] != agenda_folder_name:
                         old_folders.add(file_item['agenda_folder'])
 
-                # 检查并删除空文件夹
-                for folder_name in old_folders:
-                    old_folder = os.path.join(meeting_dir, folder_name)
-                    if os.path.exists(old_folder) and os.path.isdir(old_folder):
-                        # 检查文件夹是否为空
-                        if not os.listdir(old_folder):
-                            try:
-                                shutil.rmtree(old_folder)
-                                print(f"删除空文件夹: {old_folder}")
-                            except Exception as e:
-                                print(f"删除空文件夹失败: {e}")
+            # 一次性提交所有文件，然后为PDF文件生成JPG
+            committed = await MeetingService._commit_temp_files(transaction, pending_pdfs, jpg_moves)
+            if not committed:
+                # 提交失败时源文件仍在原文件夹中，不能删除任何文件夹
+                print("文件提交失败，跳过清理议程项文件夹")
+                return
+
+            # 检查并删除空的原始文件夹
+            for folder_name in old_folders:
+                old_folder = os.path.join(meeting_dir, folder_name)
+                if os.path.exists(old_folder) and os.path.isdir(old_folder):
+                    # 检查文件夹是否为空
+                    if not os.listdir(old_folder):
+                        try:
+                            shutil.rmtree(old_folder)
+                            print(f"删除空文件夹: {old_folder}")
+                        except Exception as e:
+                            print(f"删除空文件夹失败: {e}")
 
             # 处理完所有议程项后，检查并删除不再使用的文件夹
+            # 有文件的议程项的文件夹，以及文件实际所在的文件夹（包括早期的agenda_<位置>文件夹）都在使用中
+            current_agenda_folders = set()
+            for agenda_item in meeting_data.part:
+                if agenda_item.files:
+                    current_agenda_folders.update(get_agenda_item_folders(agenda_item.id, agenda_item.files))
             print(f"\n当前使用的议程项文件夹: {current_agenda_folders}")
 
             # 获取会议目录中的所有议程项文件夹
             all_agenda_folders = set()
             for item in os.listdir(meeting_dir):
-                if os.path.isdir(os.path.join(meeting_dir, item)) and item.startswith("agenda_"):
+                if os.path.isdir(os.path.join(meeting_dir, item)) and is_agenda_folder_name(item):
                     all_agenda_folders.add(item)
 
             print(f"所有议程项文件夹: {all_agenda_folders}")
@@ -0,0 +1,608 @@
+"""
+会议文件包预生成模块，在会议开始之前于后台生成ZIP包
+
+会议文件包原来只在管理员点击“开始会议”时同步生成，这正是对延迟最敏感的时刻。此模块：
+- 在会议创建、编辑或上传文件后，延迟一段时间（合并短时间内的多次修改）在后台生成文件包
+- 定期检查即将开始的会议，提前生成文件包
+- 为每个文件包记录会议文件指纹，开始会议时指纹一致即可直接使用已生成的包，无需重新打包
+
+文件包先写入临时文件，完成后再原子替换，正在下载旧包的客户端不受影响。
+
+除完整的会议文件包外，还按议程项生成分片包（uploads/packages/shards/<会议ID>/item_<议程项ID>.zip）
+和按议程位置排序的索引index.json，平板可以先下载第一个议程项，其余议程项在后台继续下载。
+分片包以议程项ID命名，调整议程顺序时只更新索引，不重新打包。
+分片目录<会议ID>是指向<会议ID>.gen-<时间戳>目录的符号链接，新的分片包写入新目录后原子替换符号链接，
+读取分片包的请求不会看到目录不存在或只生成了一部分的中间状态。
+"""
+import os
+import json
+import time
+import shutil
+import asyncio
+import zipfile
+import hashlib
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+# 获取项目根目录
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+
+# 上传目录
+UPLOAD_DIR = os.path.join(project_root, "uploads")
+# 议程项分片包目录
+SHARDS_DIR = os.path.join(UPLOAD_DIR, "packages", "shards")
+# 分片包索引文件名
+SHARD_INDEX_NAME = "index.json"
+# 分片包各次生成的目录名中的标记，目录名为<会议ID>.gen-<时间戳>
+SHARD_GENERATION_MARKER = ".gen-"
+
+# 会议文件变化后等待多久（秒）再生成文件包，期间的再次修改会重新计时
+PACKAGE_BUILD_DEBOUNCE_SECONDS = 30
+# 默认在会议开始前多少分钟预生成文件包
+DEFAULT_PREBUILD_LEAD_MINUTES = 60
+# 检查即将开始的会议的间隔（秒）
+PREBUILD_CHECK_INTERVAL_SECONDS = 5 * 60
+
+# 只为尚未开始的会议预生成文件包
+PREBUILD_STATUS = "未开始"
+
+# 会议时间可能使用的格式
+MEETING_TIME_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%dT%H:%M")
+
+
+def parse_meeting_time(value: Optional[str]) -> Optional[datetime]:
+    """
+    解析会议时间字符串
+
+    Args:
+        value (str): 会议时间，如 2025-01-01 09:00 或 2025-01-01T09:00
+
+    Returns:
+        Optional[datetime]: 解析后的时间，无法解析时返回None
+    """
+    if not value:
+        return None
+    value = value.strip()
+    for fmt in MEETING_TIME_FORMATS:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+class PackageBuilder:
+    """会议文件包预生成类，负责计算文件指纹、防抖调度和后台生成"""
+
+    # 等待执行的防抖任务：会议ID -> asyncio.Task
+    _pending: Dict[str, asyncio.Task] = {}
+    # 每个会议的生成锁，保证同一会议同时只有一个生成任务
+    _locks: Dict[str, asyncio.Lock] = {}
+
+    @staticmethod
+    def get_lock(meeting_id: str) -> asyncio.Lock:
+        """
+        获取会议的文件包生成锁
+
+        Args:
+            meeting_id (str): 会议ID
+
+        Returns:
+            asyncio.Lock: 该会议的生成锁
+        """
+        lock = PackageBuilder._locks.get(meeting_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            PackageBuilder._locks[meeting_id] = lock
+        return lock
+
+    @staticmethod
+    def compute_fingerprint_sync(meeting_id: str, title: str) -> str:
+        """
+        计算会议文件指纹（同步版本）
+
+        指纹由会议标题以及会议目录中所有PDF文件的相对路径、大小和修改时间组成，
+        只读取文件元数据，不读取文件内容。
+
+        Args:
+            meeting_id (str): 会议ID
+            title (str): 会议标题（出现在文件包名称和说明文件中）
+
+        Returns:
+            str: 十六进制格式的指纹
+        """
+        meeting_dir = os.path.join(UPLOAD_DIR, meeting_id)
+        entries = []
+        for root, dirs, files in os.walk(meeting_dir):
+            for file in files:
+                if not file.lower().endswith(".pdf"):
+                    continue
+                path = os.path.join(root, file)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                rel_path = os.path.relpath(path, meeting_dir).replace(os.sep, "/")
+                entries.append(f"{rel_path}\0{stat.st_size}\0{stat.st_mtime_ns}")
+
+        fingerprint = hashlib.sha256()
+        fingerprint.update((title or "").encode("utf-8"))
+        for entry in sorted(entries):
+            fingerprint.update(b"\n")
+            fingerprint.update(entry.encode("utf-8"))
+        return fingerprint.hexdigest()
+
+    @staticmethod
+    def is_package_current(db_meeting, fingerprint: str) -> bool:
+        """
+        检查会议已记录的文件包是否存在并与当前文件一致
+
+        Args:
+            db_meeting: 会议数据库对象
+            fingerprint (str): 当前会议文件指纹
+
+        Returns:
+            bool: 文件包可直接使用返回True
+        """
+        return bool(
+            db_meeting.package_path
+            and db_meeting.package_fingerprint == fingerprint
+            and os.path.exists(db_meeting.package_path)
+        )
+
+    @staticmethod
+    def get_shard_dir(meeting_id: str) -> str:
+        """
+        获取会议分片包目录
+
+        Args:
+            meeting_id (str): 会议ID
+
+        Returns:
+            str: 分片包目录路径
+        """
+        return os.path.join(SHARDS_DIR, os.path.basename(meeting_id))
+
+    @staticmethod
+    def has_shards(meeting_id: str) -> bool:
+        """检查会议的分片包索引是否存在"""
+        return os.path.exists(os.path.join(PackageBuilder.get_shard_dir(meeting_id), SHARD_INDEX_NAME))
+
+    @staticmethod
+    def get_agenda_layout(db_meeting) -> List[Dict[str, Any]]:
+        """
+        获取会议议程项的分片信息，按议程位置排序
+
+        Args:
+            db_meeting: 会议数据库对象
+
+        Returns:
+            List[Dict[str, Any]]: 每项包含议程项ID、位置、标题和议程项使用的文件夹
+        """
+        from utils import get_agenda_item_folders
+
+        return [
+            {
+                "id": item.id,
+                "position": item.position,
+                "title": item.title,
+                "folders": get_agenda_item_folders(item.id, item.files)
+            }
+            for item in sorted(db_meeting.agenda_items, key=lambda item: item.position)
+        ]
+
+    @staticmethod
+    def _get_shard_url(meeting_id: str, position: int) -> str:
+        """获取议程项分片包的下载地址"""
+        return f"/api/v1/meetings/{meeting_id}/package-shards/{position}"
+
+    @staticmethod
+    def write_shards_sync(meeting_id: str, title: str, agenda_layout: List[Dict[str, Any]],
+                          entries: List[Tuple[str, str, Dict[str, Any]]], fingerprint: str) -> Dict[str, Any]:
+        """
+        按议程项生成分片包和索引（同步版本）
+
+        分片包先写入新的目录，全部完成后原子替换指向分片目录的符号链接。
+        PDF本身已经压缩，分片包使用存储模式（不再压缩），生成和解压都更快。
+        文件没有变化的议程项直接复用原有的分片包，只重新打包变化的议程项。
+
+        Args:
+            meeting_id (str): 会议ID
+            title (str): 会议标题
+            agenda_layout (List[Dict[str, Any]]): 议程项分片信息，见get_agenda_layout
+            entries (List[Tuple[str, str, Dict[str, Any]]]): 文件列表，每项为(PDF路径, 包内相对路径, 清单条目)
+            fingerprint (str): 会议文件指纹
+
+        Returns:
+            Dict[str, Any]: 分片包索引
+        """
+        from utils import get_agenda_folder_name
+
+        # 按议程项分组：议程项的文件可能位于以ID命名的文件夹和早期的agenda_<位置>文件夹中
+        folder_items = {}
+        for agenda in agenda_layout:
+            for folder in agenda["folders"]:
+                folder_items.setdefault(folder, agenda["id"])
+
+        groups: Dict[str, List[Tuple[str, str, Dict[str, Any]]]] = {}
+        for pdf_path, rel_path, manifest_entry in entries:
+            folder = rel_path.replace(os.sep, "/").split("/")[0]
+            item_id = folder_items.get(folder)
+            if item_id is None:
+                continue
+            groups.setdefault(item_id, []).append((pdf_path, rel_path, manifest_entry))
+
+        from services.file_commit import link_file
+
+        shard_dir = PackageBuilder.get_shard_dir(meeting_id)
+        staging_dir = f"{shard_dir}{SHARD_GENERATION_MARKER}{time.time_ns()}"
+        os.makedirs(staging_dir)
+
+        # 原有分片包的文件列表，文件没有变化的分片包可以直接复用
+        old_index = PackageBuilder.read_index_sync(meeting_id) or {}
+        old_files = {shard.get("id"): shard.get("files") for shard in old_index.get("shards", [])}
+        reused_count = 0
+
+        shards = []
+        try:
+            for agenda in agenda_layout:
+                item_id = agenda["id"]
+                if item_id not in groups:
+                    continue
+
+                shard_filename = f"{get_agenda_folder_name(item_id)}.zip"
+                shard_path = os.path.join(staging_dir, shard_filename)
+                files = [manifest_entry for _, _, manifest_entry in groups[item_id]]
+
+                old_shard_path = os.path.join(shard_dir, shard_filename)
+                if old_files.get(item_id) == files and os.path.isfile(old_shard_path):
+                    link_file(old_shard_path, shard_path)
+                    reused_count += 1
+                else:
+                    with zipfile.ZipFile(shard_path, "w", zipfile.ZIP_STORED) as zip_file:
+                        for pdf_path, rel_path, _ in groups[item_id]:
+                            zip_file.write(pdf_path, rel_path)
+                        # 分片包中不记录议程位置，调整议程顺序后分片包仍然有效
+                        zip_file.writestr("manifest.json", json.dumps({
+                            "meeting_id": meeting_id,
+                            "agenda_item_id": item_id,
+                            "files": files
+                        }, ensure_ascii=False, indent=2))
+
+                shards.append({
+                    "id": item_id,
+                    "position": agenda["position"],
+                    "title": agenda["title"],
+                    "priority": len(shards),
+                    "filename": shard_filename,
+                    "url": PackageBuilder._get_shard_url(meeting_id, agenda["position"]),
+                    "size": os.path.getsize(shard_path),
+                    "file_count": len(files),
+                    "files": files
+                })
+
+            index = {
+                "meeting_id": meeting_id,
+                "title": title,
+                "fingerprint": fingerprint,
+                "generated_at": datetime.now().isoformat(),
+                "package_url": f"/api/v1/meetings/{meeting_id}/download-package",
+                "shards": shards
+            }
+            with open(os.path.join(staging_dir, SHARD_INDEX_NAME), "w", encoding="utf-8") as f:
+                json.dump(index, f, ensure_ascii=False, indent=2)
+
+            PackageBuilder._publish_shard_dir_sync(meeting_id, staging_dir)
+        except Exception:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            raise
+
+        print(f"会议 {meeting_id} 的分片包已生成: {len(shards)} 个议程项，其中 {reused_count} 个复用原有分片包")
+        return index
+
+    @staticmethod
+    def _list_shard_generations_sync(meeting_id: str) -> List[str]:
+        """列出会议各次生成的分片目录"""
+        prefix = f"{os.path.basename(PackageBuilder.get_shard_dir(meeting_id))}{SHARD_GENERATION_MARKER}"
+        try:
+            with os.scandir(SHARDS_DIR) as entries:
+                return [entry.path for entry in entries if entry.name.startswith(prefix) and entry.is_dir(follow_symlinks=False)]
+        except FileNotFoundError:
+            return []
+
+    @staticmethod
+    def _publish_shard_dir_sync(meeting_id: str, generation_dir: str):
+        """
+        将新生成的分片目录设为会议当前的分片目录（同步版本）
+
+        先创建指向新目录的临时符号链接，再用os.replace原子替换分片目录的符号链接。
+        保留上一次生成的目录，正在下载旧分片包的请求不受影响，更早的目录被删除。
+
+        Args:
+            meeting_id (str): 会议ID
+            generation_dir (str): 新生成的分片目录
+        """
+        shard_dir = PackageBuilder.get_shard_dir(meeting_id)
+        previous_dir = os.path.realpath(shard_dir) if os.path.islink(shard_dir) else None
+
+        # 早期版本的分片目录是普通目录，不能被符号链接替换，先改名为一次生成的目录
+        if os.path.isdir(shard_dir) and not os.path.islink(shard_dir):
+            previous_dir = f"{shard_dir}{SHARD_GENERATION_MARKER}0"
+            shutil.rmtree(previous_dir, ignore_errors=True)
+            os.replace(shard_dir, previous_dir)
+
+        link_tmp = f"{shard_dir}.link.tmp"
+        if os.path.lexists(link_tmp):
+            os.remove(link_tmp)
+        os.symlink(os.path.basename(generation_dir), link_tmp)
+        os.replace(link_tmp, shard_dir)
+
+        keep = {os.path.realpath(generation_dir), previous_dir}
+        for path in PackageBuilder._list_shard_generations_sync(meeting_id):
+            if os.path.realpath(path) not in keep:
+                shutil.rmtree(path, ignore_errors=True)
+        # 早期版本替换目录时使用的临时目录
+        for legacy_dir in (f"{shard_dir}.tmp", f"{shard_dir}.old"):
+            shutil.rmtree(legacy_dir, ignore_errors=True)
+
+    @staticmethod
+    def refresh_index_sync(meeting_id: str, title: str, agenda_layout: List[Dict[str, Any]]) -> Optional[bool]:
+        """
+        会议文件没有变化时更新分片包索引中的标题、议程位置和下载顺序，不重新打包（同步版本）
+
+        调整议程顺序或修改标题只会执行到这里，分片包文件保持不变。
+
+        Args:
+            meeting_id (str): 会议ID
+            title (str): 会议标题
+            agenda_layout (List[Dict[str, Any]]): 议程项分片信息，见get_agenda_layout
+
+        Returns:
+            Optional[bool]: 索引被更新返回True，无需更新返回False；
+                索引不存在或是早期按位置生成的索引时返回None，需要重新生成分片包
+        """
+        index = PackageBuilder.read_index_sync(meeting_id)
+        if index is None:
+            return None
+
+        old_shards = index.get("shards", [])
+        if any("id" not in shard for shard in old_shards):
+            return None
+
+        agendas = {agenda["id"]: agenda for agenda in agenda_layout}
+        shards = sorted(
+            (shard for shard in old_shards if shard.get("id") in agendas),
+            key=lambda shard: agendas[shard["id"]]["position"]
+        )
+        changed = index.get("title") != title or len(shards) != len(old_shards)
+        index["title"] = title
+
+        for priority, shard in enumerate(shards):
+            agenda = agendas[shard["id"]]
+            updated = {
+                "position": agenda["position"],
+                "title": agenda["title"],
+                "priority": priority,
+                "url": PackageBuilder._get_shard_url(meeting_id, agenda["position"])
+            }
+            for key, value in updated.items():
+                if shard.get(key) != value:
+                    shard[key] = value
+                    changed = True
+        index["shards"] = shards
+
+        if not changed:
+            return False
+
+        index_path = os.path.join(PackageBuilder.get_shard_dir(meeting_id), SHARD_INDEX_NAME)
+        tmp_path = f"{index_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, index_path)
+        print(f"会议 {meeting_id} 的分片包索引已更新（标题和议程顺序）")
+        return True
+
+    @staticmethod
+    def read_index_sync(meeting_id: str) -> Optional[Dict[str, Any]]:
+        """
+        读取会议的分片包索引（同步版本）
+
+        Args:
+            meeting_id (str): 会议ID
+
+        Returns:
+            Optional[Dict[str, Any]]: 分片包索引，不存在时返回None
+        """
+        index_path = os.path.join(PackageBuilder.get_shard_dir(meeting_id), SHARD_INDEX_NAME)
+        try:
+            with open(index_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def get_shard_path(meeting_id: str, position: int) -> Optional[str]:
+        """
+        获取议程项分片包的文件路径
+
+        分片包以议程项ID命名，按议程位置从索引中查找对应的分片包。
+
+        Args:
+            meeting_id (str): 会议ID
+            position (int): 议程位置
+
+        Returns:
+            Optional[str]: 分片包路径，不存在时返回None
+        """
+        index = PackageBuilder.read_index_sync(meeting_id) or {}
+        for shard in index.get("shards", []):
+            if shard.get("position") == int(position) and shard.get("filename"):
+                shard_path = os.path.join(PackageBuilder.get_shard_dir(meeting_id), os.path.basename(shard["filename"]))
+                return shard_path if os.path.isfile(shard_path) else None
+        return None
+
+    @staticmethod
+    def remove_shards_sync(meeting_id: str):
+        """
+        删除会议的分片包
+
+        Args:
+            meeting_id (str): 会议ID
+        """
+        shard_dir = PackageBuilder.get_shard_dir(meeting_id)
+        if not os.path.lexists(shard_dir):
+            return
+
+        if os.path.islink(shard_dir):
+            os.remove(shard_dir)
+        else:
+            shutil.rmtree(shard_dir, ignore_errors=True)
+        for path in PackageBuilder._list_shard_generations_sync(meeting_id):
+            shutil.rmtree(path, ignore_errors=True)
+        print(f"已删除会议 {meeting_id} 的分片包")
+
+    @staticmethod
+    async def build_package(meeting_id: str) -> bool:
+        """
+        在后台为会议生成文件包，文件包已是最新时直接返回
+
+        Args:
+            meeting_id (str): 会议ID
+
+        Returns:
+            bool: 文件包可用返回True
+        """
+        from database import SessionLocal
+        import crud
+        from services.meeting_service import MeetingService
+
+        db = SessionLocal()
+        try:
+            db_meeting = crud.get_meeting(db, meeting_id=meeting_id)
+            if db_meeting is None:
+                return False
+            if db_meeting.status != PREBUILD_STATUS:
+                print(f"会议 {meeting_id} 状态为 {db_meeting.status}，跳过预生成文件包")
+                return False
+
+            print(f"[{datetime.now()}] 开始预生成会议 {meeting_id} 的文件包")
+            return await MeetingService.generate_meeting_package(db, meeting_id)
+        finally:
+            db.close()
+
+    @staticmethod
+    def schedule_build(meeting_id: str, delay: float = PACKAGE_BUILD_DEBOUNCE_SECONDS):
+        """
+        安排在一段时间后为会议生成文件包；时间到达前再次调用会重新计时
+
+        Args:
+            meeting_id (str): 会议ID
+            delay (float): 等待时间（秒）
+        """
+        pending = PackageBuilder._pending.get(meeting_id)
+        if pending is not None and not pending.done():
+            pending.cancel()
+
+        async def _delayed_build():
+            await asyncio.sleep(delay)
+            # 开始生成后不再被新的修改取消，新的修改会在生成完成后再安排一次
+            if PackageBuilder._pending.get(meeting_id) is task:
+                PackageBuilder._pending.pop(meeting_id, None)
+            try:
+                await PackageBuilder.build_package(meeting_id)
+            except Exception as e:
+                print(f"预生成会议 {meeting_id} 的文件包失败: {str(e)}")
+
+        task = asyncio.ensure_future(_delayed_build())
+        PackageBuilder._pending[meeting_id] = task
+
+    @staticmethod
+    def cancel_build(meeting_id: str):
+        """
+        取消会议尚未开始执行的预生成任务
+
+        Args:
+            meeting_id (str): 会议ID
+        """
+        pending = PackageBuilder._pending.pop(meeting_id, None)
+        if pending is not None and not pending.done():
+            pending.cancel()
+
+    @staticmethod
+    def cancel_all():
+        """取消所有尚未开始执行的预生成任务（应用关闭时调用）"""
+        for meeting_id in list(PackageBuilder._pending.keys()):
+            PackageBuilder.cancel_build(meeting_id)
+
+    @staticmethod
+    def get_prebuild_lead_minutes() -> int:
+        """
+        获取在会议开始前多少分钟预生成文件包
+
+        Returns:
+            int: 提前的分钟数
+        """
+        from database import SessionLocal
+        import crud
+
+        db = SessionLocal()
+        try:
+            value = crud.get_system_setting(db, "package_prebuild_lead_minutes", str(DEFAULT_PREBUILD_LEAD_MINUTES))
+        finally:
+            db.close()
+
+        try:
+            return max(int(value), 0)
+        except (TypeError, ValueError):
+            print(f"警告: 无效的预生成提前时间 {value}，将使用默认值{DEFAULT_PREBUILD_LEAD_MINUTES}")
+            return DEFAULT_PREBUILD_LEAD_MINUTES
+
+    @staticmethod
+    def _find_upcoming_meetings_sync(lead_minutes: int):
+        """查找即将开始且文件包不是最新的会议ID"""
+        from database import SessionLocal
+        import crud
+
+        now = datetime.now()
+        deadline = now + timedelta(minutes=lead_minutes)
+        upcoming = []
+
+        db = SessionLocal()
+        try:
+            for meeting in crud.get_meetings_by_status(db, PREBUILD_STATUS):
+                meeting_time = parse_meeting_time(meeting.time)
+                if meeting_time is None or not (now <= meeting_time <= deadline):
+                    continue
+                fingerprint = PackageBuilder.compute_fingerprint_sync(meeting.id, meeting.title)
+                if not PackageBuilder.is_package_current(meeting, fingerprint):
+                    upcoming.append(meeting.id)
+        finally:
+            db.close()
+
+        return upcoming
+
+    @staticmethod
+    async def background_prebuild_task():
+        """
+        后台任务，定期为即将开始的会议预生成文件包
+        """
+        from services.async_utils import AsyncUtils, EXECUTOR_CONTROL
+
+        while True:
+            try:
+                lead_minutes = await AsyncUtils.run_in_executor(EXECUTOR_CONTROL, PackageBuilder.get_prebuild_lead_minutes)
+                if lead_minutes > 0:
+                    upcoming = await AsyncUtils.run_in_executor(
+                        EXECUTOR_CONTROL, PackageBuilder._find_upcoming_meetings_sync, lead_minutes
+                    )
+                    for meeting_id in upcoming:
+                        print(f"[{datetime.now()}] 会议 {meeting_id} 即将开始，预生成文件包")
+                        PackageBuilder.schedule_build(meeting_id, delay=0)
+
+                await asyncio.sleep(PREBUILD_CHECK_INTERVAL_SECONDS)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[{datetime.now()}] 预生成文件包任务出错: {str(e)}")
+                await asyncio.sleep(PREBUILD_CHECK_INTERVAL_SECONDS)
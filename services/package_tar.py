@@ -0,0 +1,258 @@
+"""
+tar.zst会议文件包模块，为运行在Linux上的分布式节点生成ZIP包之外的tar.zst变体
+
+与ZIP（DEFLATE）相比：
+- 使用Zstandard多线程压缩，主控端生成文件包更快、CPU占用更少
+- 启用长距离匹配（LDM）和较大的匹配窗口，多个议程项中重复的PDF只需很少的额外空间
+- 议程目录中的PDF是内容存储的硬链接，同一内容的多个文件在tar中记录为硬链接，只存储一次
+- 节点使用tar和zstd解压，速度比解压ZIP快
+
+依赖可选的zstandard库，未安装时不生成tar.zst包，所有客户端继续使用ZIP包。
+平板始终使用ZIP包，只有明确请求tar.zst格式的客户端才会得到tar.zst包。
+"""
+import os
+import io
+import time
+import tarfile
+from typing import Dict, List, Optional, Tuple
+
+# tar.zst包的文件扩展名和媒体类型
+TAR_ZST_EXTENSION = ".tar.zst"
+TAR_ZST_MEDIA_TYPE = "application/zstd"
+# 客户端可以在Accept请求头中使用的媒体类型
+TAR_ZST_ACCEPT_TYPES = ("application/zstd", "application/x-zstd", "application/x-tar+zstd")
+
+# 默认压缩级别（1-22），3在速度和压缩率之间较为均衡
+DEFAULT_ZSTD_LEVEL = 3
+# 长距离匹配窗口大小（2的幂），27即128MB，是zstd命令行默认允许解压的最大窗口
+ZSTD_WINDOW_LOG = 27
+# 写入压缩流时的块大小
+TAR_WRITE_CHUNK_SIZE = 1024 * 1024
+
+
+class TarZstPackage:
+    """tar.zst文件包类，负责检查依赖和生成文件包"""
+
+    _supported: Optional[bool] = None
+    # 生成tar.zst包失败时的会议文件指纹：会议ID -> 指纹，文件未变化时不再重试，只提供ZIP包
+    _failed_fingerprints: Dict[str, str] = {}
+
+    @staticmethod
+    def mark_failed(meeting_id: str, fingerprint: Optional[str]):
+        """记录会议在指定文件指纹下生成tar.zst包失败"""
+        TarZstPackage._failed_fingerprints[meeting_id] = fingerprint
+
+    @staticmethod
+    def clear_failed(meeting_id: str):
+        """清除会议的tar.zst包生成失败记录"""
+        TarZstPackage._failed_fingerprints.pop(meeting_id, None)
+
+    @staticmethod
+    def has_failed(meeting_id: str, fingerprint: Optional[str]) -> bool:
+        """
+        检查会议在当前文件指纹下是否已生成tar.zst包失败
+
+        Args:
+            meeting_id (str): 会议ID
+            fingerprint (str): 当前的会议文件指纹
+
+        Returns:
+            bool: 已失败时返回True，此时文件包与指纹一致即可使用，不需要为tar.zst包重新生成
+        """
+        return meeting_id in TarZstPackage._failed_fingerprints and \
+            TarZstPackage._failed_fingerprints[meeting_id] == fingerprint
+
+    @staticmethod
+    def is_supported() -> bool:
+        """
+        检查当前环境是否安装了zstandard库
+
+        Returns:
+            bool: 可以生成tar.zst包返回True
+        """
+        if TarZstPackage._supported is None:
+            try:
+                # 可选依赖：Zstandard压缩
+                import zstandard  # noqa: F401
+                TarZstPackage._supported = True
+            except ImportError:
+                TarZstPackage._supported = False
+
+        return TarZstPackage._supported
+
+    @staticmethod
+    def is_enabled() -> bool:
+        """
+        检查是否需要生成tar.zst包：已安装zstandard且系统设置package_tar_zst_enabled未关闭
+
+        Returns:
+            bool: 需要生成返回True
+        """
+        if not TarZstPackage.is_supported():
+            return False
+
+        from database import SessionLocal
+        import crud
+
+        db = SessionLocal()
+        try:
+            value = crud.get_system_setting(db, "package_tar_zst_enabled", "true")
+        finally:
+            db.close()
+
+        return str(value).strip().lower() in ("true", "1", "yes", "on")
+
+    @staticmethod
+    def get_compression_level() -> int:
+        """
+        获取系统设置中的zstd压缩级别
+
+        Returns:
+            int: 压缩级别（1-22）
+        """
+        from database import SessionLocal
+        import crud
+
+        db = SessionLocal()
+        try:
+            value = crud.get_system_setting(db, "package_zstd_level", str(DEFAULT_ZSTD_LEVEL))
+        finally:
+            db.close()
+
+        try:
+            return min(max(int(value), 1), 22)
+        except (TypeError, ValueError):
+            print(f"警告: 无效的zstd压缩级别 {value}，将使用默认值{DEFAULT_ZSTD_LEVEL}")
+            return DEFAULT_ZSTD_LEVEL
+
+    @staticmethod
+    def get_path(package_path: str) -> str:
+        """
+        根据ZIP包路径获取对应的tar.zst包路径
+
+        Args:
+            package_path (str): ZIP包路径
+
+        Returns:
+            str: tar.zst包路径
+        """
+        base, _ = os.path.splitext(package_path)
+        return base + TAR_ZST_EXTENSION
+
+    @staticmethod
+    def accepts(accept_header: Optional[str], format: Optional[str] = None) -> bool:
+        """
+        根据查询参数或Accept请求头判断客户端是否请求tar.zst格式
+
+        查询参数优先；Accept中只有明确列出的zstd媒体类型才会选择tar.zst，*/*等通配符仍返回ZIP。
+
+        Args:
+            accept_header (str, optional): Accept请求头
+            format (str, optional): 查询参数format，如tar.zst或zip
+
+        Returns:
+            bool: 客户端请求tar.zst返回True
+        """
+        if format:
+            return format.strip().lower() in ("tar.zst", "tar.zstd", "zst", "zstd")
+
+        if not accept_header:
+            return False
+
+        for part in accept_header.split(","):
+            params = part.strip().split(";")
+            media_type = params[0].strip().lower()
+            if media_type not in TAR_ZST_ACCEPT_TYPES:
+                continue
+
+            quality = 1.0
+            for param in params[1:]:
+                key, _, value = param.strip().partition("=")
+                if key.strip() == "q":
+                    try:
+                        quality = float(value)
+                    except ValueError:
+                        quality = 0.0
+            if quality > 0:
+                return True
+
+        return False
+
+    @staticmethod
+    def write_sync(dest_path: str, members: List[Tuple[str, Optional[str], Optional[bytes]]],
+                   level: int = DEFAULT_ZSTD_LEVEL) -> int:
+        """
+        生成tar.zst包（同步版本），先写入临时文件，完成后原子替换
+
+        Args:
+            dest_path (str): tar.zst包路径
+            members (List[Tuple[str, str, bytes]]): 包内成员：(包内路径, 磁盘文件路径, 内存数据)，后两者二选一
+            level (int): zstd压缩级别
+
+        Returns:
+            int: 生成的tar.zst包大小（字节）
+        """
+        import zstandard
+
+        params = zstandard.ZstdCompressionParameters.from_level(
+            level,
+            threads=-1,  # 使用所有CPU核心
+            enable_ldm=True,
+            window_log=ZSTD_WINDOW_LOG
+        )
+        compressor = zstandard.ZstdCompressor(compression_params=params)
+
+        tmp_path = f"{dest_path}.tmp"
+        try:
+            with open(tmp_path, "wb") as raw_file:
+                with compressor.stream_writer(raw_file, closefd=False,
+                                              write_size=TAR_WRITE_CHUNK_SIZE) as zst_writer:
+                    # 流式tar写入，不需要在压缩流中回退
+                    with tarfile.open(fileobj=zst_writer, mode="w|", format=tarfile.PAX_FORMAT) as tar:
+                        for arcname, path, data in members:
+                            arcname = arcname.replace(os.sep, "/")
+                            if path is not None:
+                                # gettarinfo记录inode，同一内容的硬链接只存储一次
+                                tarinfo = tar.gettarinfo(path, arcname=arcname)
+                                tarinfo.uid = tarinfo.gid = 0
+                                tarinfo.uname = tarinfo.gname = ""
+                                if tarinfo.isreg():
+                                    with open(path, "rb") as f:
+                                        tar.addfile(tarinfo, f)
+                                else:
+                                    tar.addfile(tarinfo)
+                            else:
+                                tarinfo = tarfile.TarInfo(arcname)
+                                tarinfo.size = len(data)
+                                tarinfo.mtime = int(time.time())
+                                tarinfo.mode = 0o644
+                                tar.addfile(tarinfo, io.BytesIO(data))
+
+            os.replace(tmp_path, dest_path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+        return os.path.getsize(dest_path)
+
+    @staticmethod
+    def remove_sync(package_path: Optional[str]):
+        """
+        删除ZIP包对应的tar.zst包
+
+        Args:
+            package_path (str, optional): ZIP包路径
+        """
+        if not package_path:
+            return
+
+        tar_path = TarZstPackage.get_path(package_path)
+        if os.path.exists(tar_path):
+            try:
+                os.remove(tar_path)
+                print(f"已删除tar.zst包: {tar_path}")
+            except OSError as e:
+                print(f"删除tar.zst包失败: {tar_path}, 错误: {str(e)}")
@@ -0,0 +1,325 @@
+"""
+页面图片缓存服务模块，按需渲染PDF单页并缓存到磁盘
+
+此模块提供PDF单页的延迟渲染功能：只有当客户端请求某一页时才使用PyMuPDF渲染该页，
+渲染结果按“文件内容哈希 + 页码 + 宽度”作为键保存在磁盘缓存目录中。
+缓存总大小受限，超出上限时按最近最少使用（LRU）顺序淘汰。
+同一页面的并发请求会合并为一次渲染。
+"""
+import os
+import hashlib
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Tuple
+
+
+# 获取项目根目录
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+
+# 上传目录
+UPLOAD_DIR = os.path.join(project_root, "uploads")
+# 页面图片缓存目录
+PAGE_CACHE_DIR = os.path.join(UPLOAD_DIR, "page_cache")
+
+# 缓存大小上限的默认值（MB），可通过系统设置 page_cache_max_mb 修改
+DEFAULT_CACHE_MAX_MB = 512
+
+# 允许的输出宽度，与ensure_jpg_for_pdf保持一致
+VALID_WIDTHS = [960, 1440, 1920]
+
+# 计算文件哈希时每次读取的块大小
+HASH_CHUNK_SIZE = 1024 * 1024
+# 文件内容哈希缓存最多记录的文件数量，超过时淘汰最久未使用的记录
+HASH_MEMO_MAX_ENTRIES = 4096
+
+
+class PageCacheService:
+    """页面图片缓存服务类，负责单页渲染、缓存命中和LRU淘汰"""
+
+    # 缓存索引：文件名 -> 文件大小，按访问顺序排列（最近访问的在末尾）
+    _index: "OrderedDict[str, int]" = OrderedDict()
+    _index_loaded: bool = False
+    _total_bytes: int = 0
+
+    # 正在进行中的渲染任务，用于合并同一页面的并发请求
+    _inflight: Dict[str, asyncio.Task] = {}
+
+    # 文件内容哈希缓存：路径 -> (修改时间, 大小, sha256)，按访问顺序排列（最近访问的在末尾）
+    _hash_memo: "OrderedDict[str, Tuple[int, int, str]]" = OrderedDict()
+    # 哈希计算在线程池中执行，读写缓存时加锁
+    _hash_memo_lock = threading.Lock()
+
+    @staticmethod
+    def get_max_cache_bytes() -> int:
+        """
+        获取缓存大小上限（字节）
+
+        从系统设置 page_cache_max_mb 读取，如果不存在则使用默认值。
+
+        Returns:
+            int: 缓存大小上限（字节）
+        """
+        from database import SessionLocal
+        import crud
+
+        db = SessionLocal()
+        try:
+            value = crud.get_system_setting(db, "page_cache_max_mb", str(DEFAULT_CACHE_MAX_MB))
+            try:
+                max_mb = int(value)
+            except (TypeError, ValueError):
+                print(f"警告: 无效的页面缓存上限 {value}，将使用默认值{DEFAULT_CACHE_MAX_MB}MB")
+                max_mb = DEFAULT_CACHE_MAX_MB
+        finally:
+            db.close()
+
+        return max(max_mb, 1) * 1024 * 1024
+
+    @staticmethod
+    def compute_file_hash_sync(file_path: str) -> str:
+        """
+        计算文件内容的SHA-256哈希（同步版本）
+
+        按块读取文件，避免一次性将大文件读入内存。
+        对相同路径、修改时间和大小的文件复用上次的计算结果，每个路径只保留最新的结果，
+        最多记录HASH_MEMO_MAX_ENTRIES个文件。
+
+        Args:
+            file_path (str): 文件路径
+
+        Returns:
+            str: 十六进制格式的SHA-256哈希值
+        """
+        stat = os.stat(file_path)
+        memo_key = os.path.abspath(file_path)
+        with PageCacheService._hash_memo_lock:
+            cached = PageCacheService._hash_memo.get(memo_key)
+            if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+                PageCacheService._hash_memo.move_to_end(memo_key)
+                return cached[2]
+
+        sha256 = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            while True:
+                chunk = f.read(HASH_CHUNK_SIZE)
+                if not chunk:
+                    break
+                sha256.update(chunk)
+
+        digest = sha256.hexdigest()
+        with PageCacheService._hash_memo_lock:
+            PageCacheService._hash_memo[memo_key] = (stat.st_mtime_ns, stat.st_size, digest)
+            PageCacheService._hash_memo.move_to_end(memo_key)
+            while len(PageCacheService._hash_memo) > HASH_MEMO_MAX_ENTRIES:
+                PageCacheService._hash_memo.popitem(last=False)
+        return digest
+
+    @staticmethod
+    def _load_index_sync() -> Tuple["OrderedDict[str, int]", int]:
+        """
+        扫描缓存目录，按最后访问时间构建LRU索引（同步版本）
+
+        Returns:
+            Tuple[OrderedDict[str, int], int]: 缓存索引和缓存总大小
+        """
+        os.makedirs(PAGE_CACHE_DIR, exist_ok=True)
+
+        entries = []
+        with os.scandir(PAGE_CACHE_DIR) as it:
+            for entry in it:
+                if not entry.is_file():
+                    continue
+                # 清理上次异常退出时残留的临时文件
+                if entry.name.endswith(".tmp"):
+                    try:
+                        os.remove(entry.path)
+                    except OSError:
+                        pass
+                    continue
+                stat = entry.stat()
+                entries.append((max(stat.st_atime, stat.st_mtime), entry.name, stat.st_size))
+
+        entries.sort()
+        index = OrderedDict()
+        total = 0
+        for _, name, size in entries:
+            index[name] = size
+            total += size
+        return index, total
+
+    @staticmethod
+    async def _ensure_index():
+        """确保缓存索引已从磁盘加载"""
+        if PageCacheService._index_loaded:
+            return
+
+        from services.async_utils import AsyncUtils
+
+        index, total = await AsyncUtils.run_in_threadpool(PageCacheService._load_index_sync)
+        # 加载期间可能已有其他协程完成加载，避免覆盖
+        if not PageCacheService._index_loaded:
+            PageCacheService._index = index
+            PageCacheService._total_bytes = total
+            PageCacheService._index_loaded = True
+            print(f"页面缓存索引已加载: {len(index)} 个文件, 共 {total} 字节")
+
+    @staticmethod
+    def render_page_sync(pdf_path: str, page_number: int, width: int, output_path: str) -> int:
+        """
+        渲染PDF的单个页面为JPG文件（同步版本）
+
+        先写入临时文件，完成后再原子替换为目标文件，避免读取到不完整的图片。
+
+        Args:
+            pdf_path (str): PDF文件路径
+            page_number (int): 页码，从1开始
+            width (int): 输出图片的宽度（像素）
+            output_path (str): 输出JPG文件路径
+
+        Returns:
+            int: 生成的JPG文件大小（字节）
+
+        Raises:
+            ValueError: 当页码超出范围时
+        """
+        import fitz  # PyMuPDF
+
+        tmp_path = f"{output_path}.{os.getpid()}.tmp"
+        with fitz.open(pdf_path) as pdf_document:
+            if page_number < 1 or page_number > len(pdf_document):
+                raise ValueError(f"页码超出范围: {page_number}，文档共 {len(pdf_document)} 页")
+
+            page = pdf_document.load_page(page_number - 1)
+            zoom_factor = width / page.rect.width if page.rect.width else 1.0
+            matrix = fitz.Matrix(zoom_factor, zoom_factor)
+            pixmap = page.get_pixmap(matrix=matrix, alpha=False)
+            pixmap.save(tmp_path, "jpeg")
+
+        os.replace(tmp_path, output_path)
+        return os.path.getsize(output_path)
+
+    @staticmethod
+    def _evict_sync(paths):
+        """删除被淘汰的缓存文件（同步版本）"""
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                print(f"删除页面缓存文件失败: {path}, 错误: {str(e)}")
+
+    @staticmethod
+    async def _evict_if_needed():
+        """当缓存总大小超过上限时，按LRU顺序淘汰最久未访问的文件"""
+        from services.async_utils import AsyncUtils, EXECUTOR_CONTROL
+
+        max_bytes = await AsyncUtils.run_in_executor(EXECUTOR_CONTROL, PageCacheService.get_max_cache_bytes)
+
+        evicted = []
+        while PageCacheService._total_bytes > max_bytes and len(PageCacheService._index) > 1:
+            name, size = PageCacheService._index.popitem(last=False)
+            # 正在渲染中的文件不会出现在索引中，可以安全删除
+            PageCacheService._total_bytes -= size
+            evicted.append(os.path.join(PAGE_CACHE_DIR, name))
+
+        if evicted:
+            print(f"页面缓存超出上限，淘汰 {len(evicted)} 个文件")
+            await AsyncUtils.run_in_threadpool(PageCacheService._evict_sync, evicted)
+
+    @staticmethod
+    async def _render_and_store(pdf_path: str, page_number: int, width: int, cache_name: str) -> str:
+        """渲染页面并登记到缓存索引中"""
+        from services.raster_engine import RasterEngine
+
+        # 在渲染进程中打开文档并渲染，不在服务进程内共享文档句柄
+        output_path = os.path.join(PAGE_CACHE_DIR, cache_name)
+        size = await RasterEngine.run(
+            PageCacheService.render_page_sync, pdf_path, page_number, width, output_path
+        )
+
+        PageCacheService._index[cache_name] = size
+        PageCacheService._index.move_to_end(cache_name)
+        PageCacheService._total_bytes += size
+
+        await PageCacheService._evict_if_needed()
+        return output_path
+
+    @staticmethod
+    async def get_page_image(pdf_path: str, page_number: int, width: int) -> str:
+        """
+        获取PDF指定页面的JPG图片路径，如果缓存中没有则按需渲染
+
+        缓存键由PDF文件内容的SHA-256哈希、页码和宽度组成，
+        因此同一文件在不同位置（如多个会议）共享同一份缓存。
+        同一页面的并发请求只会触发一次渲染。
+
+        Args:
+            pdf_path (str): PDF文件路径
+            page_number (int): 页码，从1开始
+            width (int): 输出图片的宽度，可选值：960, 1440, 1920
+
+        Returns:
+            str: 缓存中的JPG文件路径
+
+        Raises:
+            ValueError: 当宽度无效或页码超出范围时
+            FileNotFoundError: 当PDF文件不存在时
+        """
+        from services.async_utils import AsyncUtils
+
+        if width not in VALID_WIDTHS:
+            raise ValueError(f"无效的宽度值 {width}，可选值: {', '.join(str(w) for w in VALID_WIDTHS)}")
+
+        pdf_exists = await AsyncUtils.run_in_threadpool(lambda: os.path.isfile(pdf_path))
+        if not pdf_exists:
+            raise FileNotFoundError(f"PDF文件不存在: {pdf_path}")
+
+        await PageCacheService._ensure_index()
+
+        content_hash = await AsyncUtils.run_in_threadpool(PageCacheService.compute_file_hash_sync, pdf_path)
+        cache_name = f"{content_hash}_p{page_number}_w{width}.jpg"
+        cache_path = os.path.join(PAGE_CACHE_DIR, cache_name)
+
+        # 缓存命中：更新LRU顺序和访问时间
+        if cache_name in PageCacheService._index:
+            still_exists = await AsyncUtils.run_in_threadpool(lambda: os.path.isfile(cache_path))
+            if still_exists:
+                PageCacheService._index.move_to_end(cache_name)
+                try:
+                    await AsyncUtils.run_in_threadpool(lambda: os.utime(cache_path))
+                except OSError:
+                    pass
+                return cache_path
+
+            # 文件已被外部删除，从索引中移除后重新渲染
+            PageCacheService._total_bytes -= PageCacheService._index.pop(cache_name)
+
+        # 合并并发请求：如果同一页面正在渲染，等待同一个任务完成
+        task = PageCacheService._inflight.get(cache_name)
+        if task is None:
+            task = asyncio.ensure_future(
+                PageCacheService._render_and_store(pdf_path, page_number, width, cache_name)
+            )
+            PageCacheService._inflight[cache_name] = task
+            task.add_done_callback(lambda _: PageCacheService._inflight.pop(cache_name, None))
+
+        # 使用shield，避免某个请求被取消时影响其他等待同一渲染结果的请求
+        return await asyncio.shield(task)
+
+    @staticmethod
+    def get_cache_stats() -> Dict[str, Any]:
+        """
+        获取页面缓存的统计信息
+
+        Returns:
+            Dict[str, Any]: 包含缓存文件数、总大小和正在渲染的页面数
+        """
+        return {
+            "file_count": len(PageCacheService._index),
+            "total_bytes": PageCacheService._total_bytes,
+            "inflight": len(PageCacheService._inflight),
+            "loaded": PageCacheService._index_loaded
+        }
@@ -0,0 +1,270 @@
+"""
+PDF优化模块，在上传阶段重写PDF文件以减小会议包体积
+
+扫描件等议程文档常常包含600 DPI的图片和大量未使用的对象，此模块对PDF进行以下处理：
+- 将有效分辨率高于目标DPI的嵌入图片降采样并重新编码为JPEG
+- 清理未使用的对象（garbage collection）并压缩所有数据流
+- 线性化（Fast Web View），使平板可以更快显示第一页
+
+优化后的文件只有在体积变小时才会替换原文件，原始文件保存在uploads/originals目录中，
+以优化后文件内容的SHA-256命名。优化后的文件提交到内容存储后，原始文件随对应的内容一起由垃圾回收清理。
+是否启用由系统设置 pdf_optimize_on_upload 控制，目标DPI由 pdf_optimize_target_dpi 控制。
+"""
+import io
+import os
+import shutil
+from typing import Any, Dict, Optional
+
+
+# 获取项目根目录
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+
+# 上传目录
+UPLOAD_DIR = os.path.join(project_root, "uploads")
+# 原始PDF文件的保存目录
+ORIGINALS_DIR = os.path.join(UPLOAD_DIR, "originals")
+# 原始PDF文件的扩展名
+ORIGINAL_SUFFIX = ".orig"
+
+# 默认目标DPI，适合平板显示
+DEFAULT_TARGET_DPI = 150
+# 降采样后图片的JPEG质量
+DEFAULT_JPEG_QUALITY = 80
+# 有效DPI超过目标DPI的比例达到此阈值才降采样，避免对接近目标的图片做无意义的重新编码
+DOWNSAMPLE_THRESHOLD = 1.2
+# 小于此像素数的图片不处理（图标、线条等）
+MIN_IMAGE_PIXELS = 64 * 64
+
+
+def _get_image_effective_dpi(page, xref: int, pixel_width: int, pixel_height: int) -> Optional[float]:
+    """计算图片在页面上的有效DPI，图片出现多次时取最大值"""
+    try:
+        rects = page.get_image_rects(xref)
+    except Exception:
+        return None
+
+    max_dpi = None
+    for rect in rects:
+        if rect.width <= 0 or rect.height <= 0:
+            continue
+        dpi = max(pixel_width / (rect.width / 72.0), pixel_height / (rect.height / 72.0))
+        max_dpi = dpi if max_dpi is None else max(max_dpi, dpi)
+    return max_dpi
+
+
+def optimize_pdf_sync(src_path: str, dst_path: str, target_dpi: int, jpeg_quality: int = DEFAULT_JPEG_QUALITY) -> Dict[str, Any]:
+    """
+    优化PDF文件（同步版本，在渲染进程中执行）
+
+    Args:
+        src_path (str): 原始PDF文件路径
+        dst_path (str): 优化后PDF的输出路径
+        target_dpi (int): 目标DPI，有效分辨率高于此值的图片会被降采样
+        jpeg_quality (int): 降采样后图片的JPEG质量
+
+    Returns:
+        Dict[str, Any]: 优化结果，包含降采样图片数量和是否线性化
+    """
+    import fitz  # PyMuPDF
+    from PIL import Image
+
+    # 每个图片xref在所有页面上的最大有效DPI
+    image_dpis: Dict[int, float] = {}
+    # 每个图片xref所在的某一页，replace_image需要通过页面调用
+    image_pages: Dict[int, int] = {}
+    images_downsampled = 0
+    images_skipped = 0
+
+    with fitz.open(src_path) as pdf_document:
+        for page in pdf_document:
+            for image in page.get_images(full=True):
+                xref, smask, pixel_width, pixel_height = image[0], image[1], image[2], image[3]
+                # 带透明蒙版的图片不处理，避免破坏透明效果
+                if smask or pixel_width * pixel_height < MIN_IMAGE_PIXELS:
+                    continue
+                dpi = _get_image_effective_dpi(page, xref, pixel_width, pixel_height)
+                if dpi is not None:
+                    image_dpis[xref] = max(image_dpis.get(xref, 0), dpi)
+                    image_pages.setdefault(xref, page.number)
+
+        for xref, dpi in image_dpis.items():
+            if dpi < target_dpi * DOWNSAMPLE_THRESHOLD:
+                continue
+
+            try:
+                pixmap = fitz.Pixmap(pdf_document, xref)
+                if pixmap.alpha or pixmap.colorspace is None or pixmap.colorspace.n not in (1, 3):
+                    pixmap = fitz.Pixmap(fitz.csRGB, pixmap)
+
+                mode = "L" if pixmap.n == 1 else "RGB"
+                pil_image = Image.frombytes(mode, (pixmap.width, pixmap.height), pixmap.samples)
+
+                scale = target_dpi / dpi
+                new_size = (max(int(pixmap.width * scale), 1), max(int(pixmap.height * scale), 1))
+                resized = pil_image.resize(new_size, Image.LANCZOS)
+
+                buffer = io.BytesIO()
+                resized.save(buffer, "JPEG", quality=jpeg_quality, optimize=True)
+                new_stream = buffer.getvalue()
+
+                # 只有重新编码后变小才替换
+                original_length = len(pdf_document.xref_stream_raw(xref) or b"")
+                if original_length and len(new_stream) >= original_length:
+                    images_skipped += 1
+                    continue
+
+                # replace_image会替换该xref，所有引用此图片的页面都会生效
+                pdf_document[image_pages[xref]].replace_image(xref, stream=new_stream)
+                images_downsampled += 1
+            except Exception as e:
+                print(f"降采样图片失败: xref={xref}, 错误: {str(e)}")
+                images_skipped += 1
+
+        # 清理未使用对象、压缩数据流并线性化
+        linearized = True
+        try:
+            pdf_document.save(dst_path, garbage=4, deflate=True, clean=True, linear=True)
+        except Exception as e:
+            # 部分PyMuPDF版本不再支持线性化，退回到不线性化保存
+            print(f"PDF线性化失败，将不线性化保存: {str(e)}")
+            linearized = False
+            pdf_document.save(dst_path, garbage=4, deflate=True, clean=True)
+
+    return {
+        "images_examined": len(image_dpis),
+        "images_downsampled": images_downsampled,
+        "images_skipped": images_skipped,
+        "linearized": linearized
+    }
+
+
+class PDFOptimizer:
+    """PDF优化类，负责读取优化设置、执行优化并保留原始文件"""
+
+    @staticmethod
+    def get_settings() -> Dict[str, Any]:
+        """
+        获取PDF优化相关的系统设置
+
+        Returns:
+            Dict[str, Any]: 包含enabled、target_dpi、jpeg_quality的字典
+        """
+        from database import SessionLocal
+        import crud
+
+        db = SessionLocal()
+        try:
+            enabled = crud.get_system_setting(db, "pdf_optimize_on_upload", "false")
+            target_dpi_str = crud.get_system_setting(db, "pdf_optimize_target_dpi", str(DEFAULT_TARGET_DPI))
+            quality_str = crud.get_system_setting(db, "pdf_optimize_jpeg_quality", str(DEFAULT_JPEG_QUALITY))
+        finally:
+            db.close()
+
+        try:
+            target_dpi = int(target_dpi_str)
+        except (TypeError, ValueError):
+            print(f"警告: 无效的PDF优化目标DPI {target_dpi_str}，将使用默认值{DEFAULT_TARGET_DPI}")
+            target_dpi = DEFAULT_TARGET_DPI
+
+        try:
+            jpeg_quality = int(quality_str)
+        except (TypeError, ValueError):
+            jpeg_quality = DEFAULT_JPEG_QUALITY
+
+        return {
+            "enabled": str(enabled).lower() in ("true", "1", "yes", "on"),
+            "target_dpi": max(target_dpi, 36),
+            "jpeg_quality": min(max(jpeg_quality, 10), 95)
+        }
+
+    @staticmethod
+    def get_original_path(sha256: str) -> str:
+        """
+        获取原始PDF文件的保存路径
+
+        Args:
+            sha256 (str): 优化后文件内容的SHA-256
+
+        Returns:
+            str: 原始PDF文件路径
+        """
+        return os.path.join(ORIGINALS_DIR, f"{sha256}{ORIGINAL_SUFFIX}")
+
+    @staticmethod
+    async def optimize_file(file_path: str, settings: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        优化PDF文件，如果结果更小则替换原文件，并将原始文件保存到uploads/originals
+
+        Args:
+            file_path (str): PDF文件路径
+            settings (Dict[str, Any], optional): get_settings返回的设置，未指定时从数据库读取
+
+        Returns:
+            Dict[str, Any]: 优化报告，包含优化前后的大小和减少的比例
+        """
+        from services.async_utils import AsyncUtils, EXECUTOR_CONTROL
+        from services.raster_engine import RasterEngine
+
+        if settings is None:
+            settings = await AsyncUtils.run_in_executor(EXECUTOR_CONTROL, PDFOptimizer.get_settings)
+
+        original_size = await AsyncUtils.run_in_threadpool(lambda: os.path.getsize(file_path))
+        tmp_path = f"{file_path}.opt.tmp"
+        report = {
+            "optimized": False,
+            "original_size": original_size,
+            "optimized_size": original_size,
+            "reduction_bytes": 0,
+            "reduction_percent": 0.0,
+            "original_path": None
+        }
+
+        try:
+            result = await RasterEngine.run(
+                optimize_pdf_sync, file_path, tmp_path, settings["target_dpi"], settings["jpeg_quality"]
+            )
+            report.update(result)
+
+            optimized_size = await AsyncUtils.run_in_threadpool(lambda: os.path.getsize(tmp_path))
+            if optimized_size >= original_size:
+                print(f"PDF优化后未变小，保留原文件: {file_path}")
+                return report
+
+            def _replace():
+                from services.blob_store import BlobStore
+
+                # 原始文件以优化后内容的哈希命名，垃圾回收据此判断对应的内容是否仍在使用
+                original_path = PDFOptimizer.get_original_path(BlobStore.compute_sha256_sync(tmp_path))
+                os.makedirs(ORIGINALS_DIR, exist_ok=True)
+                shutil.copy2(file_path, original_path)
+                os.replace(tmp_path, file_path)
+                return original_path
+
+            original_path = await AsyncUtils.run_in_threadpool(_replace)
+
+            reduction = original_size - optimized_size
+            report.update({
+                "optimized": True,
+                "optimized_size": optimized_size,
+                "reduction_bytes": reduction,
+                "reduction_percent": round(reduction * 100.0 / original_size, 1) if original_size else 0.0,
+                "original_path": original_path
+            })
+            print(
+                f"PDF优化完成: {os.path.basename(file_path)}, {original_size} -> {optimized_size} 字节, "
+                f"减少 {report['reduction_percent']}%"
+            )
+            return report
+
+        except Exception as e:
+            print(f"PDF优化失败，保留原文件: {file_path}, 错误: {str(e)}")
+            report["error"] = str(e)
+            return report
+
+        finally:
+            if os.path.exists(tmp_path):
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
@@ -0,0 +1,606 @@
+"""
+PDF元数据探测模块，不完整打开文档即可获取页数等基本信息
+
+fitz.open需要解析整个文档结构，只为读取页数时开销很大。此模块直接读取文件的少量字节：
+1. 文件头：PDF版本；线性化（Fast Web View）文件的线性化字典中直接记录了页数（/N）
+2. 文件尾：startxref指向的交叉引用表（传统xref表或xref流），沿/Prev链合并增量更新
+3. 通过交叉引用表定位文档目录（/Root）和页面树根节点（/Pages），读取其中的/Count
+
+不遍历页面树，也不解析页面内容。文件损坏、加密的对象流或不支持的过滤器等情况下探测失败，
+此时退回使用fitz打开文档。
+"""
+import os
+import re
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+# 读取文件头和文件尾的字节数
+HEAD_READ_SIZE = 1024
+TAIL_READ_SIZE = 2048
+TAIL_MAX_READ_SIZE = 64 * 1024
+# 读取单个对象时每次追加读取的字节数和上限
+OBJECT_READ_SIZE = 4096
+OBJECT_MAX_READ_SIZE = 1024 * 1024
+# 读取传统xref表子段标题行的字节数
+XREF_HEADER_READ_SIZE = 64
+# 标准xref条目的字节数（10位偏移、5位代号、n或f和2字节换行）
+XREF_ENTRY_SIZE = 20
+# 最多跟随的增量更新（/Prev）数量，防止损坏文件中的循环引用
+MAX_XREF_SECTIONS = 64
+
+VERSION_RE = re.compile(rb"%PDF-(\d+\.\d+)")
+LINEARIZED_RE = re.compile(rb"/Linearized\s")
+STARTXREF_RE = re.compile(rb"startxref\s+(\d+)")
+OBJ_HEADER_RE = re.compile(rb"(\d+)\s+(\d+)\s+obj\b")
+XREF_SUBSECTION_RE = re.compile(rb"(\d+)\s+(\d+)[ \t]*(?:\r\n|\r|\n)")
+XREF_ENTRY_RE = re.compile(rb"(\d{10}) (\d{5}) ([nf])[ \r\n]{2}")
+REF_RE_TEMPLATE = rb"/%s\s+(\d+)\s+(\d+)\s+R"
+INT_RE_TEMPLATE = rb"/%s\s+(\d+)(?!\d)(\s+\d+\s+R\b)?"
+ARRAY_RE_TEMPLATE = rb"/%s\s*\[([^\]]*)\]"
+
+
+class PDFProbeError(Exception):
+    """探测失败时抛出的异常，调用方应退回使用fitz"""
+    pass
+
+
+def _get_ref(data: bytes, key: bytes) -> Optional[int]:
+    """读取字典中的间接引用（如 /Root 1 0 R），返回对象编号"""
+    match = re.search(REF_RE_TEMPLATE % key, data)
+    return int(match.group(1)) if match else None
+
+
+def _get_int(data: bytes, key: bytes) -> Optional[int]:
+    """读取字典中的整数值，值为间接引用（如 /Count 12 0 R）时抛出PDFProbeError"""
+    match = re.search(INT_RE_TEMPLATE % key, data)
+    if not match:
+        return None
+    if match.group(2):
+        raise PDFProbeError(f"/{key.decode('latin-1')} 的值是间接引用")
+    return int(match.group(1))
+
+
+def _get_int_array(data: bytes, key: bytes) -> Optional[List[int]]:
+    """读取字典中的整数数组（如 /W [1 2 1]）"""
+    match = re.search(ARRAY_RE_TEMPLATE % key, data)
+    if not match:
+        return None
+    return [int(value) for value in match.group(1).split()]
+
+
+def _read_dict(data: bytes, start: int) -> Tuple[bytes, int]:
+    """
+    从start位置的<<开始读取完整的字典（支持嵌套字典和字符串）
+
+    Returns:
+        Tuple[bytes, int]: 字典内容和字典结束后的位置
+    """
+    pos = data.index(b"<<", start)
+    depth = 0
+    i = pos
+    length = len(data)
+    while i < length:
+        char = data[i:i + 1]
+        if data.startswith(b"<<", i):
+            depth += 1
+            i += 2
+            continue
+        if data.startswith(b">>", i):
+            depth -= 1
+            i += 2
+            if depth == 0:
+                return data[pos:i], i
+            continue
+        if char == b"(":
+            # 跳过字符串，字符串中可能包含<<或>>
+            nesting = 0
+            while i < length:
+                char = data[i:i + 1]
+                if char == b"\\":
+                    i += 2
+                    continue
+                if char == b"(":
+                    nesting += 1
+                elif char == b")":
+                    nesting -= 1
+                    if nesting == 0:
+                        break
+                i += 1
+        i += 1
+    raise PDFProbeError("字典不完整")
+
+
+def _png_unpredict(data: bytes, columns: int) -> bytes:
+    """还原使用PNG预测器（/Predictor >= 10）编码的xref流数据"""
+    row_length = columns + 1
+    if len(data) % row_length:
+        raise PDFProbeError("xref流数据长度与预测器列数不匹配")
+
+    output = bytearray()
+    previous = bytearray(columns)
+    for offset in range(0, len(data), row_length):
+        filter_type = data[offset]
+        row = bytearray(data[offset + 1:offset + row_length])
+        for i in range(columns):
+            left = row[i - 1] if i > 0 else 0
+            up = previous[i]
+            if filter_type == 1:
+                row[i] = (row[i] + left) & 0xFF
+            elif filter_type == 2:
+                row[i] = (row[i] + up) & 0xFF
+            elif filter_type == 3:
+                row[i] = (row[i] + ((left + up) >> 1)) & 0xFF
+            elif filter_type == 4:
+                upper_left = previous[i - 1] if i > 0 else 0
+                estimate = left + up - upper_left
+                pa, pb, pc = abs(estimate - left), abs(estimate - up), abs(estimate - upper_left)
+                if pa <= pb and pa <= pc:
+                    row[i] = (row[i] + left) & 0xFF
+                elif pb <= pc:
+                    row[i] = (row[i] + up) & 0xFF
+                else:
+                    row[i] = (row[i] + upper_left) & 0xFF
+            elif filter_type != 0:
+                raise PDFProbeError(f"不支持的PNG预测器类型: {filter_type}")
+        output.extend(row)
+        previous = row
+    return bytes(output)
+
+
+class _XRefTable:
+    """传统xref表中的一段，按对象编号直接计算条目位置，只读取需要的条目"""
+
+    def __init__(self, reader: "_PDFReader", subsections: List[Tuple[int, int, int]]):
+        """
+        Args:
+            reader (_PDFReader): 读取器
+            subsections (List[Tuple[int, int, int]]): 子段列表，每项为(起始编号, 数量, 第一个条目的文件偏移)
+        """
+        self.reader = reader
+        self.subsections = subsections
+
+    def lookup(self, number: int) -> Optional[Tuple[int, int, int]]:
+        for first, count, entries_offset in self.subsections:
+            if first <= number < first + count:
+                entry = self.reader.read_at(entries_offset + (number - first) * XREF_ENTRY_SIZE, XREF_ENTRY_SIZE)
+                match = XREF_ENTRY_RE.match(entry)
+                if not match:
+                    raise PDFProbeError(f"对象 {number} 的xref条目无效")
+                # 空闲条目不返回：混合文件中压缩对象在xref表中标记为空闲，实际条目在/XRefStm中
+                if match.group(3) == b"n":
+                    return 1, int(match.group(1)), int(match.group(2))
+        return None
+
+
+class _XRefStream:
+    """xref流中的一段，只解码需要的行"""
+
+    def __init__(self, data: bytes, widths: List[int], index: List[int], columns: int, predicted: bool):
+        """
+        Args:
+            data (bytes): 解压后的流数据
+            widths (List[int]): 每行三个字段的字节数（/W）
+            index (List[int]): 对象编号范围（/Index）
+            columns (int): 每行的字节数
+            predicted (bool): 数据是否使用PNG预测器编码（每行前有一个预测器类型字节）
+        """
+        self.widths = widths
+        self.index = index
+        self.columns = columns
+        self.row_length = columns + 1 if predicted else columns
+        self.data = data
+
+        self.up_only = False
+        if predicted:
+            rows = len(data) // self.row_length
+            types = data[0::self.row_length]
+            if types == b"\x02" * rows:
+                # 常见情况：所有行都使用Up预测器，每列的值是该列之前所有差值之和，按需计算
+                self.up_only = True
+            elif types == b"\x00" * rows:
+                pass
+            else:
+                self.data = _png_unpredict(data, columns)
+                self.row_length = columns
+                predicted = False
+        self.predicted = predicted
+
+    def _get_row(self, row: int) -> bytes:
+        start = row * self.row_length
+        if start + self.row_length > len(self.data):
+            raise PDFProbeError("xref流数据不完整")
+        if not self.predicted:
+            return self.data[start:start + self.row_length]
+        if not self.up_only:
+            return self.data[start + 1:start + self.row_length]
+        end = start + self.row_length
+        return bytes(
+            sum(self.data[column + 1:end:self.row_length]) & 0xFF
+            for column in range(self.columns)
+        )
+
+    def lookup(self, number: int) -> Optional[Tuple[int, int, int]]:
+        row = 0
+        for first, count in zip(self.index[0::2], self.index[1::2]):
+            if first <= number < first + count:
+                data = self._get_row(row + number - first)
+                fields = []
+                position = 0
+                for width in self.widths:
+                    fields.append(int.from_bytes(data[position:position + width], "big") if width else None)
+                    position += width
+                kind = 1 if fields[0] is None else fields[0]
+                if kind == 0:
+                    return None
+                return kind, fields[1] or 0, fields[2] or 0
+            row += count
+        return None
+
+
+class _PDFReader:
+    """读取PDF交叉引用表和对象的最小解析器"""
+
+    def __init__(self, f, size: int):
+        self.f = f
+        self.size = size
+        # 交叉引用段，新的增量更新在前
+        self.sections: List[Any] = []
+        self.trailer = b""
+
+    def read_at(self, offset: int, size: int) -> bytes:
+        self.f.seek(offset)
+        return self.f.read(size)
+
+    def find_startxref(self) -> int:
+        """从文件尾查找startxref记录的偏移"""
+        read_size = TAIL_READ_SIZE
+        while True:
+            read_size = min(read_size, self.size)
+            tail = self.read_at(self.size - read_size, read_size)
+            matches = list(STARTXREF_RE.finditer(tail))
+            if matches:
+                return int(matches[-1].group(1))
+            if read_size >= min(self.size, TAIL_MAX_READ_SIZE):
+                raise PDFProbeError("文件尾没有startxref")
+            read_size *= 4
+
+    def load_xref(self):
+        """从startxref开始读取所有交叉引用段，新的增量更新优先"""
+        offset = self.find_startxref()
+        visited = set()
+        while offset is not None and offset not in visited:
+            if len(visited) >= MAX_XREF_SECTIONS or not 0 <= offset < self.size:
+                raise PDFProbeError("交叉引用链无效")
+            visited.add(offset)
+
+            start = self.read_at(offset, 16).lstrip()
+            if start.startswith(b"xref"):
+                trailer = self._load_xref_table(offset)
+                # 混合文件：传统xref表之外还有/XRefStm指向的xref流
+                xref_stream = _get_int(trailer, b"XRefStm")
+                if xref_stream is not None and xref_stream not in visited:
+                    visited.add(xref_stream)
+                    self._load_xref_stream(xref_stream)
+            else:
+                trailer = self._load_xref_stream(offset)
+
+            if not self.trailer:
+                self.trailer = trailer
+            offset = _get_int(trailer, b"Prev")
+
+    def _read_until_dict_end(self, offset: int) -> bytes:
+        """从偏移处读取足够的数据，直到包含一个完整的字典"""
+        read_size = OBJECT_READ_SIZE
+        while True:
+            data = self.read_at(offset, read_size)
+            try:
+                _read_dict(data, 0)
+                return data
+            except (PDFProbeError, ValueError):
+                if len(data) < read_size or read_size >= OBJECT_MAX_READ_SIZE:
+                    raise PDFProbeError(f"偏移 {offset} 处的字典不完整")
+                read_size *= 4
+
+    def _load_xref_table(self, offset: int) -> bytes:
+        """
+        读取传统xref表的子段位置和trailer字典
+
+        标准xref条目固定为20字节，只读取每个子段的标题行，条目在查找对象时再按位置读取。
+        """
+        data = self.read_at(offset, XREF_HEADER_READ_SIZE)
+        position = offset + data.index(b"xref") + 4
+        subsections = []
+        while True:
+            data = self.read_at(position, XREF_HEADER_READ_SIZE)
+            stripped = data.lstrip()
+            position += len(data) - len(stripped)
+            if stripped.startswith(b"trailer"):
+                trailer, _ = _read_dict(self._read_until_dict_end(position), 0)
+                break
+
+            match = XREF_SUBSECTION_RE.match(stripped)
+            if not match:
+                raise PDFProbeError("xref表格式无效")
+            first, count = int(match.group(1)), int(match.group(2))
+            entries_offset = position + match.end()
+            if count:
+                # 只支持标准的20字节条目，其他格式退回fitz
+                if not XREF_ENTRY_RE.match(self.read_at(entries_offset, XREF_ENTRY_SIZE)):
+                    raise PDFProbeError("xref条目不是标准的20字节格式")
+            subsections.append((first, count, entries_offset))
+            position = entries_offset + count * XREF_ENTRY_SIZE
+
+        self.sections.append(_XRefTable(self, subsections))
+        return trailer
+
+    def _read_object(self, offset: int) -> Tuple[int, bytes, int]:
+        """
+        读取偏移处的间接对象
+
+        Returns:
+            Tuple[int, bytes, int]: 对象编号、对象内容（obj之后的部分）和对象内容的文件偏移
+        """
+        read_size = OBJECT_READ_SIZE
+        while True:
+            data = self.read_at(offset, read_size)
+            if b"endobj" in data or b"stream" in data or len(data) < read_size:
+                break
+            if read_size >= OBJECT_MAX_READ_SIZE:
+                raise PDFProbeError("对象过大")
+            read_size *= 4
+
+        stripped = data.lstrip()
+        match = OBJ_HEADER_RE.match(stripped)
+        if not match:
+            raise PDFProbeError(f"偏移 {offset} 处不是对象")
+        body_start = len(data) - len(stripped) + match.end()
+        return int(match.group(1)), data[body_start:], offset + body_start
+
+    def _read_stream(self, body: bytes, body_offset: int) -> Tuple[bytes, bytes]:
+        """读取流对象的字典和解压后的数据（预测器由调用方处理）"""
+        dictionary, dict_end = _read_dict(body, 0)
+        stream_pos = body.find(b"stream", dict_end)
+        if stream_pos < 0:
+            raise PDFProbeError("对象不是流")
+        data_start = stream_pos + len(b"stream")
+        if body.startswith(b"\r\n", data_start):
+            data_start += 2
+        elif body.startswith(b"\n", data_start) or body.startswith(b"\r", data_start):
+            data_start += 1
+
+        length_ref = _get_ref(dictionary, b"Length")
+        if length_ref is not None:
+            length = int(self.get_object(length_ref).split()[0])
+        else:
+            length = _get_int(dictionary, b"Length")
+            if length is None:
+                raise PDFProbeError("流没有长度")
+
+        raw = self.read_at(body_offset + data_start, length)
+        if len(raw) != length:
+            raise PDFProbeError("流数据不完整")
+
+        filters = []
+        if b"/Filter" in dictionary:
+            filter_value = dictionary.split(b"/Filter", 1)[1].lstrip()
+            if filter_value.startswith(b"["):
+                filters = re.findall(rb"/(\w+)", filter_value[:filter_value.index(b"]")])
+            else:
+                filters = re.findall(rb"^/(\w+)", filter_value)
+        for name in filters:
+            if name != b"FlateDecode":
+                raise PDFProbeError(f"不支持的过滤器: {name.decode('latin-1')}")
+            try:
+                raw = zlib.decompress(raw)
+            except zlib.error as e:
+                # 加密文件的流数据无法直接解压
+                raise PDFProbeError(f"流数据解压失败: {e}")
+
+        return dictionary, raw
+
+    def _load_xref_stream(self, offset: int) -> bytes:
+        """读取xref流，返回其字典（同时作为trailer）"""
+        _, body, body_offset = self._read_object(offset)
+        dictionary, data = self._read_stream(body, body_offset)
+        if b"/XRef" not in dictionary:
+            raise PDFProbeError("startxref没有指向xref流")
+
+        widths = _get_int_array(dictionary, b"W")
+        if not widths or len(widths) != 3:
+            raise PDFProbeError("xref流缺少/W")
+        index = _get_int_array(dictionary, b"Index") or [0, _get_int(dictionary, b"Size") or 0]
+
+        predictor = _get_int(dictionary, b"Predictor") or 1
+        if predictor != 1 and predictor < 10:
+            raise PDFProbeError(f"不支持的预测器: {predictor}")
+        columns = sum(widths)
+        if predictor >= 10 and (_get_int(dictionary, b"Columns") or 1) != columns:
+            raise PDFProbeError("xref流预测器列数与/W不一致")
+
+        self.sections.append(_XRefStream(data, widths, index, columns, predictor >= 10))
+        return dictionary
+
+    def get_entry(self, number: int) -> Optional[Tuple[int, int, int]]:
+        """按增量更新从新到旧查找对象的xref条目"""
+        for section in self.sections:
+            entry = section.lookup(number)
+            if entry is not None:
+                return entry
+        return None
+
+    def get_object(self, number: int) -> bytes:
+        """
+        获取对象的内容，支持对象流中的压缩对象
+
+        Args:
+            number (int): 对象编号
+
+        Returns:
+            bytes: 对象内容
+        """
+        entry = self.get_entry(number)
+        if entry is None:
+            raise PDFProbeError(f"对象 {number} 不存在")
+
+        if entry[0] == 1:
+            found, body, _ = self._read_object(entry[1])
+            if found != number:
+                raise PDFProbeError(f"对象 {number} 的偏移错误")
+            end = body.find(b"endobj")
+            return body[:end] if end >= 0 else body
+
+        if entry[0] == 2:
+            stream_entry = self.get_entry(entry[1])
+            if stream_entry is None or stream_entry[0] != 1:
+                raise PDFProbeError(f"对象流 {entry[1]} 不存在")
+            _, body, body_offset = self._read_object(stream_entry[1])
+            dictionary, data = self._read_stream(body, body_offset)
+            if b"/Predictor" in dictionary:
+                raise PDFProbeError("不支持带预测器的对象流")
+            count = _get_int(dictionary, b"N")
+            first = _get_int(dictionary, b"First")
+            if count is None or first is None:
+                raise PDFProbeError("对象流缺少/N或/First")
+
+            header = [int(value) for value in data[:first].split()[:count * 2]]
+            offsets = dict(zip(header[0::2], header[1::2]))
+            if number not in offsets:
+                raise PDFProbeError(f"对象 {number} 不在对象流中")
+            start = first + offsets[number]
+            following = sorted(value for value in offsets.values() if value > offsets[number])
+            end = first + following[0] if following else len(data)
+            return data[start:end]
+
+        raise PDFProbeError(f"未知的xref条目类型: {entry[0]}")
+
+
+class PDFProbe:
+    """PDF元数据探测类，负责读取页数等基本信息"""
+
+    @staticmethod
+    def probe_sync(pdf_path: str) -> Dict[str, Any]:
+        """
+        只读取文件头、文件尾和少量对象，获取PDF的基本信息（同步版本）
+
+        Args:
+            pdf_path (str): PDF文件路径
+
+        Returns:
+            Dict[str, Any]: 包含page_count、version、linearized、encrypted、size和method的字典，
+                method为linearized（来自线性化字典）或xref（来自页面树根节点）
+
+        Raises:
+            PDFProbeError: 无法探测（包括加密文件）时抛出，调用方应退回使用fitz
+            OSError: 文件无法读取时
+        """
+        with open(pdf_path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            head = f.read(HEAD_READ_SIZE)
+
+            version_match = VERSION_RE.search(head)
+            if not version_match:
+                raise PDFProbeError("不是PDF文件")
+            # 线性化文件的第一页trailer在文件头中
+            if b"/Encrypt" in head:
+                raise PDFProbeError("文件已加密")
+
+            info = {
+                "page_count": None,
+                "version": version_match.group(1).decode("ascii"),
+                "linearized": False,
+                "encrypted": False,
+                "size": size,
+                "method": None
+            }
+
+            # 线性化文件：线性化字典中的/L等于文件大小时，其中的/N就是页数
+            # 文件被增量更新后/L不再等于文件大小，线性化信息可能已过期，不能使用
+            linearized_match = LINEARIZED_RE.search(head)
+            if linearized_match:
+                try:
+                    dict_start = head.rindex(b"<<", 0, linearized_match.start())
+                    dictionary, _ = _read_dict(head, dict_start)
+                    if _get_int(dictionary, b"L") == size and _get_int(dictionary, b"N"):
+                        info["linearized"] = True
+                        info["page_count"] = _get_int(dictionary, b"N")
+                        info["method"] = "linearized"
+                except (PDFProbeError, ValueError):
+                    pass
+
+            reader = _PDFReader(f, size)
+            try:
+                reader.load_xref()
+            except (PDFProbeError, ValueError):
+                if info["page_count"] is None:
+                    raise
+                return info
+
+            # 加密文件的对象（包括对象流）需要解密，交给fitz处理
+            if b"/Encrypt" in reader.trailer:
+                raise PDFProbeError("文件已加密")
+            if info["page_count"] is not None:
+                return info
+
+            root = _get_ref(reader.trailer, b"Root")
+            if root is None:
+                raise PDFProbeError("trailer中没有/Root")
+            pages = _get_ref(reader.get_object(root), b"Pages")
+            if pages is None:
+                raise PDFProbeError("文档目录中没有/Pages")
+            count = _get_int(reader.get_object(pages), b"Count")
+            if count is None:
+                raise PDFProbeError("页面树根节点中没有/Count")
+
+            info["page_count"] = count
+            info["method"] = "xref"
+            return info
+
+    @staticmethod
+    def get_info_sync(pdf_path: str) -> Optional[Dict[str, Any]]:
+        """
+        获取PDF的基本信息（同步版本），探测失败时退回使用fitz
+
+        Args:
+            pdf_path (str): PDF文件路径
+
+        Returns:
+            Optional[Dict[str, Any]]: 与probe_sync相同的字典（退回fitz时method为fitz），文件无法打开时返回None
+        """
+        try:
+            return PDFProbe.probe_sync(pdf_path)
+        except (PDFProbeError, ValueError, IndexError) as e:
+            print(f"PDF元数据探测失败，使用fitz打开: {pdf_path}, 原因: {str(e)}")
+        except OSError as e:
+            print(f"读取PDF文件失败: {pdf_path}, 错误: {str(e)}")
+            return None
+
+        try:
+            import fitz  # PyMuPDF
+
+            with fitz.open(pdf_path) as pdf_document:
+                version = (pdf_document.metadata or {}).get("format", "")
+                return {
+                    "page_count": len(pdf_document),
+                    "version": version.replace("PDF ", "") if version else None,
+                    "linearized": False,
+                    "encrypted": bool(pdf_document.is_encrypted or pdf_document.needs_pass),
+                    "size": os.path.getsize(pdf_path),
+                    "method": "fitz"
+                }
+        except Exception as e:
+            print(f"使用fitz打开PDF文件失败: {pdf_path}, 错误: {str(e)}")
+            return None
+
+    @staticmethod
+    def get_page_count_sync(pdf_path: str) -> Optional[int]:
+        """
+        获取PDF的总页数（同步版本），探测失败时退回使用fitz
+
+        Args:
+            pdf_path (str): PDF文件路径
+
+        Returns:
+            Optional[int]: 总页数，获取失败时返回None
+        """
+        info = PDFProbe.get_info_sync(pdf_path)
+        return info["page_count"] if info else None
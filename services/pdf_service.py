@@ -7,13 +7,10 @@ import os
 import tempfile
 import uuid
 import shutil
-import io
 import asyncio
 from typing import List, Dict, Any, Optional
 from fastapi import UploadFile, HTTPException
 from fastapi.responses import JSONResponse
-from PIL import Image
-import fitz  # PyMuPDF
 
 # 获取项目根目录
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -25,6 +22,11 @@ UPLOAD_DIR = os.path.join(project_root, "uploads")
 TEMP_DIR = os.path.join(UPLOAD_DIR, "temp")
 IMAGES_DIR = TEMP_DIR
 
+# JPEG格式允许的最大高度（像素），合并长图的单个分段不能超过此高度
+MERGE_MAX_SEGMENT_HEIGHT = 65500
+# 合并长图单个分段的最大像素数，限制组装画布占用的内存（约120MB的RGB画布）
+MERGE_MAX_SEGMENT_PIXELS = 40 * 1024 * 1024
+
 class PDFService:
     """PDF服务类，处理PDF相关的业务逻辑"""
 
@@ -48,20 +50,9 @@ class PDFService:
 
         file_location = os.path.join(UPLOAD_DIR, file.filename)
         try:
-            # 使用异步IO操作保存文件
-            from services.async_utils import AsyncUtils
-
-            # 读取文件内容
-            content = await file.read()
-
-            # 使用线程池异步写入文件
-            async def write_file(path, data):
-                def _write_file(path, data):
-                    with open(path, "wb") as f:
-                        f.write(data)
-                await AsyncUtils.run_in_threadpool(_write_file, path, data)
-
-            await write_file(file_location, content)
+            # 以流式方式分块写入文件，避免将整个文件读入内存
+            from services.file_service import FileService
+            await FileService.save_upload_file(file, file_location)
         except Exception as e:
             return {"error": f"保存文件时出错: {e}"}
         finally:
@@ -75,31 +66,55 @@ class PDFService:
         file: UploadFile,
         dpi: int = 200,
         format: str = "jpg",
-        merge: bool = False
+        merge: bool = False,
+        job_id: Optional[str] = None,
+        quality: Optional[int] = None,
+        target_kb: Optional[int] = None
     ) -> Dict[str, Any]:
         """
         将上传的PDF文件转换为JPG图片，使用PyMuPDF库实现，不依赖本地poppler环境
-        使用异步IO和线程池处理文件和CPU密集型操作，避免阻塞事件循环。
+        页面渲染由RasterEngine在独立的工作进程中并行完成，每个进程使用自己的文档句柄。
 
         Args:
             file (UploadFile): 上传的PDF文件
             dpi (int): 输出图片的DPI值，默认为200
-            format (str): 输出图片的格式，默认为jpg
+            format (str): 输出图片的格式，默认为jpg，也支持png、webp以及环境支持时的avif
             merge (bool): 是否将所有页面合并为一个长图，默认为False
+            job_id (str, optional): 渲染任务ID，可用于取消转换，未指定时自动生成
+            quality (int, optional): jpg/webp/avif的编码质量
+            target_kb (int, optional): 每页的目标大小（KB），指定时按目标大小搜索编码质量
 
         Returns:
             Dict[str, Any]: 包含转换结果的字典
         """
-        # 导入异步工具
-        from services.async_utils import AsyncUtils
+        # 导入异步工具和渲染引擎
+        from services.async_utils import AsyncUtils, EXECUTOR_CPU
+        from services.raster_engine import RasterEngine, RasterCancelledError, RasterJobConflictError, normalize_job_id
+        from services.image_encoder import ImageEncoder, normalize_format
 
         # 检查文件类型
         if not file.filename.lower().endswith(".pdf"):
             return JSONResponse(status_code=400, content={"error": "只允许上传PDF文件"})
 
+        # 检查输出格式是否受支持
+        if normalize_format(format) and not ImageEncoder.is_format_supported(format):
+            return JSONResponse(
+                status_code=400,
+                content={"error": f"不支持的图片格式: {format}，可用格式: {', '.join(ImageEncoder.get_supported_formats())}"}
+            )
+        target_bytes = target_kb * 1024 if target_kb and target_kb > 0 else None
+
+        # 客户端指定的任务ID会用作取消标记文件名，只接受UUID
+        if job_id:
+            try:
+                job_id = normalize_job_id(job_id)
+            except ValueError as e:
+                return JSONResponse(status_code=422, content={"error": str(e)})
+
         # 创建唯一的文件夹名称，用于存储转换后的图片
         unique_id = str(uuid.uuid4())
         output_folder = os.path.join(IMAGES_DIR, unique_id)
+        job_id = job_id or unique_id
 
         # 使用线程池创建目录
         await AsyncUtils.run_in_threadpool(lambda: os.makedirs(output_folder, exist_ok=True))
@@ -107,13 +122,9 @@ class PDFService:
         # 保存上传的PDF文件到临时位置
         temp_pdf_path = os.path.join(tempfile.gettempdir(), f"{unique_id}.pdf")
         try:
-            # 读取文件内容
-            content = await file.read()
-
-            # 使用线程池异步写入文件
-            await AsyncUtils.run_in_threadpool(
-                lambda: open(temp_pdf_path, "wb").write(content)
-            )
+            # 以流式方式分块写入文件，避免将整个文件读入内存
+            from services.file_service import FileService
+            saved = await FileService.save_upload_file(file, temp_pdf_path)
         except Exception as e:
             return JSONResponse(status_code=500, content={"error": f"保存PDF文件时出错: {str(e)}"})
         finally:
@@ -122,109 +133,69 @@ class PDFService:
         # 计算缩放因子，基于DPI
         zoom_factor = dpi / 72.0  # 72 DPI是PDF的默认分辨率
 
-        # 存储转换结果
-        image_results = []
-
         try:
-            # 使用线程池打开PDF文件，这是CPU密集型操作
-            async def open_pdf_in_threadpool():
-                return await AsyncUtils.run_in_threadpool(lambda: fitz.open(temp_pdf_path))
-
-            pdf_document = await open_pdf_in_threadpool()
-
             # 如果选择合并模式，将所有页面合并为一个长图
             if merge:
-                # 创建一个列表来存储所有页面的图像
-                page_images = []
-                total_height = 0
-                max_width = 0
-
-                # 处理每一页，使用线程池处理CPU密集型操作
-                async def process_page(page_num):
-                    def _process_page(page_num):
-                        page = pdf_document.load_page(page_num)
-                        matrix = fitz.Matrix(zoom_factor, zoom_factor)
-                        pixmap = page.get_pixmap(matrix=matrix, alpha=False)
-                        img = Image.open(io.BytesIO(pixmap.tobytes()))
-                        return img
-                    return await AsyncUtils.run_in_threadpool(_process_page, page_num)
-
-                # 并行处理所有页面，但限制并发数量为4，避免内存溢出
-                tasks = [process_page(page_num) for page_num in range(len(pdf_document))]
-                processed_images = await AsyncUtils.gather_with_concurrency(4, *tasks)
-
-                for img in processed_images:
-                    page_images.append(img)
-                    total_height += img.height
-                    max_width = max(max_width, img.width)
-
-                # 使用线程池创建并保存合并图像
-                async def create_and_save_merged_image():
-                    def _create_and_save():
-                        # 创建一个新的空白图像
-                        merged_image = Image.new('RGB', (max_width, total_height), (255, 255, 255))
-
-                        # 将每一页粘贴到新图像上
-                        y_offset = 0
-                        for img in page_images:
-                            merged_image.paste(img, (0, y_offset))
-                            y_offset += img.height
-
-                        # 保存合并后的图像
-                        merged_filename = "merged.jpg"
-                        merged_path = os.path.join(output_folder, merged_filename)
-                        merged_image.save(merged_path, "JPEG")
-
-                        # 获取相对路径，用于URL
-                        rel_path = os.path.relpath(merged_path, project_root)
-                        url_path = f"/{rel_path.replace(os.sep, '/')}"  # 使用正斜杠作为URL路径分隔符
-
-                        return url_path, merged_path
-
-                    return await AsyncUtils.run_in_threadpool(_create_and_save)
-
-                url_path, merged_path = await create_and_save_merged_image()
+                # 先由渲染进程将每一页渲染为单独的图片，页面只存在于磁盘上，不同时驻留内存；
+                # 中间图片使用无损的PNG，合并长图只在最后编码一次JPEG
+                pages_folder = os.path.join(output_folder, "pages")
+                await AsyncUtils.run_in_threadpool(lambda: os.makedirs(pages_folder, exist_ok=True))
+                page_results = await RasterEngine.render_pages(
+                    temp_pdf_path, pages_folder, zoom_factor, "png", job_id
+                )
+
+                # 按分段逐页组装长图，每次只在内存中保留一个分段画布和一页图片
+                def _assemble():
+                    try:
+                        return PDFService.assemble_merged_segments_sync(page_results, output_folder)
+                    finally:
+                        # 删除单页图片
+                        shutil.rmtree(pages_folder, ignore_errors=True)
+
+                manifest = await AsyncUtils.run_in_executor(EXECUTOR_CPU, _assemble)
+                first_segment = manifest["segments"][0] if manifest["segments"] else {}
 
                 return {
-                    "merged_jpg_url": url_path,
-                    "merged_jpg_path": merged_path
+                    "job_id": job_id,
+                    "merged_jpg_url": first_segment.get("url"),
+                    "merged_jpg_path": first_segment.get("path"),
+                    "manifest_url": manifest["manifest_url"],
+                    "segments": manifest["segments"]
                 }
             else:
-                # 单独处理每一页，使用并行处理提高性能
-                async def process_page_to_file(page_num):
-                    def _process_page_to_file(page_num):
-                        page = pdf_document.load_page(page_num)
-                        matrix = fitz.Matrix(zoom_factor, zoom_factor)
-                        pixmap = page.get_pixmap(matrix=matrix, alpha=False)
-
-                        # 构建输出文件路径
-                        image_filename = f"page_{page_num + 1}.{format.lower()}"
-                        image_path = os.path.join(output_folder, image_filename)
-
-                        # 保存图像
-                        if format.lower() == "jpg":
-                            pixmap.save(image_path, "jpeg")
-                        else:
-                            pixmap.save(image_path)
-
-                        # 获取相对路径，用于URL
-                        rel_path = os.path.relpath(image_path, project_root)
-                        url_path = f"/{rel_path.replace(os.sep, '/')}"
+                # 由渲染进程池并行渲染所有页面
+                page_results = await RasterEngine.render_pages(
+                    temp_pdf_path, output_folder, zoom_factor, format, job_id,
+                    quality=quality, target_bytes=target_bytes
+                )
 
-                        return {
-                            "url": url_path,
-                            "filename": image_filename,
-                            "page": page_num + 1
-                        }
+                image_results = []
+                for page in page_results:
+                    # 获取相对路径，用于URL
+                    rel_path = os.path.relpath(page["path"], project_root)
+                    url_path = f"/{rel_path.replace(os.sep, '/')}"
 
-                    return await AsyncUtils.run_in_threadpool(_process_page_to_file, page_num)
+                    image_results.append({
+                        "url": url_path,
+                        "filename": page["filename"],
+                        "page": page["page"]
+                    })
 
-                # 并行处理所有页面，但限制并发数量为4
-                tasks = [process_page_to_file(page_num) for page_num in range(len(pdf_document))]
-                image_results = await AsyncUtils.gather_with_concurrency(4, *tasks)
+                # 生成与原始PDF大小的对比报告
+                report = ImageEncoder.build_size_report(saved["size"], page_results, format, quality, target_bytes)
 
-                return {"jpg_files": image_results}
+                return {"job_id": job_id, "jpg_files": image_results, "report": report}
 
+        except RasterCancelledError:
+            # 删除已生成的部分图片
+            await AsyncUtils.run_in_threadpool(lambda: shutil.rmtree(output_folder, ignore_errors=True))
+            return JSONResponse(
+                status_code=409,
+                content={"error": "PDF转换已取消", "job_id": job_id}
+            )
+        except RasterJobConflictError as e:
+            await AsyncUtils.run_in_threadpool(lambda: shutil.rmtree(output_folder, ignore_errors=True))
+            return JSONResponse(status_code=409, content={"error": str(e), "job_id": job_id})
         except Exception as e:
             import traceback
             error_details = traceback.format_exc()
@@ -243,11 +214,163 @@ class PDFService:
             except:
                 pass
 
+    @staticmethod
+    def plan_merge_segments(
+        page_sizes: List[Dict[str, Any]],
+        max_height: int = MERGE_MAX_SEGMENT_HEIGHT,
+        max_pixels: int = MERGE_MAX_SEGMENT_PIXELS
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        根据页面尺寸规划合并长图的分段
+
+        页面按顺序依次放入当前分段，当加入下一页会使分段高度超过JPEG高度上限，
+        或分段画布像素数超过内存预算时，开始新的分段。
+
+        Args:
+            page_sizes (List[Dict[str, Any]]): 按页码排序的页面信息，需包含width和height
+            max_height (int): 单个分段的最大高度（像素）
+            max_pixels (int): 单个分段画布的最大像素数
+
+        Returns:
+            List[List[Dict[str, Any]]]: 分段列表，每个分段是其包含的页面信息列表
+        """
+        segments = []
+        current = []
+        current_width = 0
+        current_height = 0
+
+        for page in page_sizes:
+            width = max(int(page["width"]), 1)
+            height = max(int(page["height"]), 1)
+            new_width = max(current_width, width)
+            new_height = current_height + height
+
+            if current and (new_height > max_height or new_width * new_height > max_pixels):
+                segments.append(current)
+                current = []
+                new_width = width
+                new_height = height
+
+            current.append(page)
+            current_width = new_width
+            current_height = new_height
+
+        if current:
+            segments.append(current)
+
+        return segments
+
+    @staticmethod
+    def assemble_merged_segments_sync(page_results: List[Dict[str, Any]], output_folder: str) -> Dict[str, Any]:
+        """
+        将已渲染的单页图片逐页组装为一个或多个合并长图分段（同步版本）
+
+        每个分段单独创建画布，逐页打开、粘贴并关闭页面图片，分段完成后立即编码保存并释放，
+        内存占用只与单个分段的大小有关，与PDF总页数无关。
+        只有一个分段时文件名保持为merged.jpg，多个分段时依次命名为merged_001.jpg、merged_002.jpg……
+        分段信息同时写入输出目录下的manifest.json。
+
+        Args:
+            page_results (List[Dict[str, Any]]): RasterEngine返回的按页码排序的渲染结果
+            output_folder (str): 输出目录
+
+        Returns:
+            Dict[str, Any]: 分段清单，包含segments列表和manifest_url
+        """
+        import json
+        from PIL import Image
+
+        # 单页高度超过上限时需要等比缩小，使其能够单独放入一个分段
+        max_page_height = min(
+            MERGE_MAX_SEGMENT_HEIGHT,
+            MERGE_MAX_SEGMENT_PIXELS // max(max((p["width"] for p in page_results), default=1), 1)
+        )
+        planned_pages = []
+        for page in page_results:
+            scale = min(1.0, max_page_height / page["height"]) if page["height"] else 1.0
+            planned_pages.append({
+                **page,
+                "width": max(int(page["width"] * scale), 1),
+                "height": max(int(page["height"] * scale), 1)
+            })
+
+        planned_segments = PDFService.plan_merge_segments(planned_pages)
+        single = len(planned_segments) == 1
+
+        segments = []
+        for index, segment_pages in enumerate(planned_segments, start=1):
+            segment_width = max(page["width"] for page in segment_pages)
+            segment_height = sum(page["height"] for page in segment_pages)
+
+            # 创建一个新的空白分段画布
+            canvas = Image.new('RGB', (segment_width, segment_height), (255, 255, 255))
+            try:
+                y_offset = 0
+                for page in segment_pages:
+                    with Image.open(page["path"]) as img:
+                        if img.size != (page["width"], page["height"]):
+                            resized = img.resize((page["width"], page["height"]), Image.LANCZOS)
+                            canvas.paste(resized, (0, y_offset))
+                            resized.close()
+                        else:
+                            canvas.paste(img, (0, y_offset))
+                    y_offset += page["height"]
+
+                segment_filename = "merged.jpg" if single else f"merged_{index:03d}.jpg"
+                segment_path = os.path.join(output_folder, segment_filename)
+                canvas.save(segment_path, "JPEG")
+            finally:
+                canvas.close()
+
+            # 获取相对路径，用于URL
+            rel_path = os.path.relpath(segment_path, project_root)
+            segments.append({
+                "index": index,
+                "filename": segment_filename,
+                "url": f"/{rel_path.replace(os.sep, '/')}",
+                "path": segment_path,
+                "width": segment_width,
+                "height": segment_height,
+                "pages": [page["page"] for page in segment_pages]
+            })
+
+        # 写入分段清单
+        manifest_path = os.path.join(output_folder, "manifest.json")
+        with open(manifest_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "page_count": len(page_results),
+                "segments": [{k: v for k, v in segment.items() if k != "path"} for segment in segments]
+            }, f, ensure_ascii=False, indent=2)
+
+        rel_manifest = os.path.relpath(manifest_path, project_root)
+        print(f"合并长图已生成: {len(page_results)} 页, {len(segments)} 个分段")
+
+        return {
+            "segments": segments,
+            "manifest_url": f"/{rel_manifest.replace(os.sep, '/')}"
+        }
+
+    @staticmethod
+    def cancel_conversion(job_id: str) -> bool:
+        """
+        取消正在进行的PDF转换任务
+
+        Args:
+            job_id (str): 渲染任务ID
+
+        Returns:
+            bool: 任务存在并已发出取消请求返回True，否则返回False
+        """
+        from services.raster_engine import RasterEngine
+        return RasterEngine.cancel(job_id)
+
     @staticmethod
     async def upload_temp_files(files: List[UploadFile]) -> Dict[str, Any]:
         """
         上传临时文件，不关联到特定会议或议程项
         使用异步IO和线程池处理文件操作，避免阻塞事件循环。
+        系统设置 pdf_optimize_on_upload 启用时，每个PDF在保存后会经过优化（降采样、清理、线性化），
+        返回的文件信息中包含optimization优化报告。
 
         Args:
             files (List[UploadFile]): 上传的文件列表
@@ -256,13 +379,18 @@ class PDFService:
             Dict[str, Any]: 包含上传结果的字典
         """
         # 导入异步工具
-        from services.async_utils import AsyncUtils
+        from services.async_utils import AsyncUtils, EXECUTOR_CONTROL
 
         # 使用线程池创建临时文件存储目录
         await AsyncUtils.run_in_threadpool(lambda: os.makedirs(TEMP_DIR, exist_ok=True))
 
         uploaded_files = []
 
+        # 读取PDF优化设置
+        from services.file_service import FileService
+        from services.pdf_optimizer import PDFOptimizer
+        optimize_settings = await AsyncUtils.run_in_executor(EXECUTOR_CONTROL, PDFOptimizer.get_settings)
+
         # 不再检查现有临时文件，允许相同文件再次上传
         print("有临时文件: 0个")
 
@@ -280,36 +408,23 @@ class PDFService:
                 safe_filename = f"{file_uuid}_{file.filename}"
                 file_path = os.path.join(TEMP_DIR, safe_filename)
 
-                # 读取文件内容
-                content = await file.read()
+                # 以流式方式分块写入文件，同时计算SHA-256
+                try:
+                    saved = await FileService.save_upload_file(file, file_path)
+                finally:
+                    # 关闭文件
+                    await file.close()
 
-                # 使用线程池异步写入文件
-                await AsyncUtils.run_in_threadpool(
-                    lambda: open(file_path, "wb").write(content)
+                # 优化PDF（如果启用）并生成临时文件信息
+                return await PDFService.finalize_temp_file(
+                    file_path, file.filename, file_uuid, saved["sha256"], optimize_settings
                 )
 
-                # 使用线程池获取文件大小
-                file_size = await AsyncUtils.run_in_threadpool(lambda: os.path.getsize(file_path))
-
-                # 关闭文件
-                await file.close()
-
-                # 添加到上传文件列表
-                return {
-                    "name": file.filename,
-                    "path": file_path,
-                    "size": file_size,
-                    "url": f"/uploads/temp/{safe_filename}",
-                    "display_name": file.filename,  # 使用原始文件名作为显示名称
-                    "temp_id": file_uuid  # 临时ID，用于后续关联
-                }
-
-            # 并行处理所有文件，但限制并发数量为4
-            tasks = [process_file(file) for file in files]
-            results = await AsyncUtils.gather_with_concurrency(4, *tasks)
-
-            # 过滤掉None结果（非PDF文件）
-            uploaded_files = [result for result in results if result is not None]
+            # 并行处理所有文件，结果按上传顺序返回，过滤掉None结果（非PDF文件）；
+            # 文件大小差别很大，处理耗时不能反映系统负载，使用固定并发数
+            async for result in AsyncUtils.bounded_map(process_file, files, adaptive=False):
+                if result is not None:
+                    uploaded_files.append(result)
 
             return {"status": "success", "uploaded_files": uploaded_files}
 
@@ -323,22 +438,87 @@ class PDFService:
             raise HTTPException(status_code=500, detail=f"File upload failed: {str(e)}")
 
     @staticmethod
-    async def convert_pdf_to_jpg_for_pad(pdf_path: str, output_dir: str, width: int = None) -> Optional[str]:
+    async def finalize_temp_file(
+        file_path: str,
+        filename: str,
+        file_uuid: str,
+        sha256: str,
+        optimize_settings: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
         """
-        将PDF文件转换为JPG长图，用于无线平板显示。
-        注意：此方法已被修改为不执行实际的转换，只返回PDF文件路径。
-        这是为了减少文件大小，因为JPG文件通常比PDF文件大得多。
+        完成临时文件的保存：按设置优化PDF，并生成临时文件信息
+
+        普通表单上传和可续传上传完成后都通过此方法进入相同的临时文件流程。
+
+        Args:
+            file_path (str): 已保存在uploads/temp中的文件路径
+            filename (str): 原始文件名
+            file_uuid (str): 临时ID，也是文件名的UUID前缀
+            sha256 (str): 文件内容的SHA-256哈希
+            optimize_settings (Dict[str, Any], optional): PDF优化设置，未指定时从数据库读取
+
+        Returns:
+            Dict[str, Any]: 临时文件信息
+        """
+        from services.async_utils import AsyncUtils, EXECUTOR_CONTROL
+        from services.blob_store import BlobStore
+        from services.pdf_optimizer import PDFOptimizer
+
+        if optimize_settings is None:
+            optimize_settings = await AsyncUtils.run_in_executor(EXECUTOR_CONTROL, PDFOptimizer.get_settings)
+
+        # 如果启用了PDF优化，重写PDF并保留原始文件
+        optimization = None
+        if optimize_settings["enabled"]:
+            optimization = await PDFOptimizer.optimize_file(file_path, optimize_settings)
+            if optimization.get("optimized"):
+                # 文件内容已改变，重新计算哈希
+                optimization["original_sha256"] = sha256
+                sha256 = await AsyncUtils.run_in_threadpool(BlobStore.compute_sha256_sync, file_path)
+
+        def _record_hash_and_get_size():
+            # 在文件上记录服务端计算的哈希，保存会议时核对文件信息中的哈希即可，不必再次读取文件
+            BlobStore.record_sha256_sync(file_path, sha256)
+            return os.path.getsize(file_path)
+
+        file_size = await AsyncUtils.run_in_threadpool(_record_hash_and_get_size)
+
+        file_info = {
+            "name": filename,
+            "path": file_path,
+            "size": file_size,
+            "url": f"/uploads/temp/{os.path.basename(file_path)}",
+            "display_name": filename,  # 使用原始文件名作为显示名称
+            "temp_id": file_uuid,  # 临时ID，用于后续关联
+            "sha256": sha256  # 文件内容的哈希，用于去重和缓存
+        }
+        if optimization is not None:
+            file_info["optimization"] = optimization
+        return file_info
+
+    @staticmethod
+    async def convert_pdf_to_jpg_for_pad(pdf_path: str, output_dir: str, width: int = None,
+                                         image_settings: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """
+        将PDF文件转换为图片，用于无线平板显示。
+        默认（系统设置 pad_image_mode 为pdf）不执行实际的转换，只创建占位JPG并返回PDF文件路径，
+        这是为了减少文件大小，因为普通JPG文件通常比PDF文件大得多（参见issue.md）。
+        pad_image_mode 设置为jpeg、webp或avif时，按页渲染为渐进式JPEG/WebP/AVIF图片，
+        质量由 pad_image_quality 控制，pad_image_target_kb 大于0时每页按目标大小搜索质量，
+        并在输出目录中写入与PDF大小对比的 image_report.json。
 
         Args:
             pdf_path (str): PDF文件的完整路径
-            output_dir (str): 输出JPG文件的目录（不再使用）
-            width (int, optional): 输出图片的宽度（不再使用）
+            output_dir (str): 输出图片的目录
+            width (int, optional): 输出图片的宽度，如果为None则使用系统默认设置
+            image_settings (Dict[str, Any], optional): get_pad_image_settings返回的设置，未指定时从数据库读取；
+                并行处理多个文件时由调用方读取一次后传入
 
         Returns:
-            Optional[str]: 原始PDF文件路径，失败时返回None
+            Optional[str]: 图片模式下返回第一页图片路径，否则返回原始PDF文件路径，失败时返回None
         """
         # 导入异步工具
-        from services.async_utils import AsyncUtils
+        from services.async_utils import AsyncUtils, EXECUTOR_CONTROL
 
         try:
             # 检查PDF文件是否存在
@@ -353,6 +533,12 @@ class PDFService:
             # 确保输出目录存在（为了兼容性）
             await AsyncUtils.run_in_threadpool(lambda: os.makedirs(output_dir, exist_ok=True))
 
+            # 检查是否启用了图片模式
+            if image_settings is None:
+                image_settings = await AsyncUtils.run_in_executor(EXECUTOR_CONTROL, PDFService.get_pad_image_settings)
+            if image_settings["mode"] != "pdf":
+                return await PDFService.render_pad_images(pdf_path, output_dir, width, image_settings)
+
             # 提取文件名信息（为了兼容性）
             async def get_file_info():
                 def _get_file_info():
@@ -373,6 +559,8 @@ class PDFService:
             )
 
             if not placeholder_exists:
+                from PIL import Image
+
                 # 创建一个1x1像素的空白JPG文件作为占位符
                 await AsyncUtils.run_in_threadpool(
                     lambda: Image.new('RGB', (1, 1), color='white').save(placeholder_path, "JPEG")
@@ -391,6 +579,113 @@ class PDFService:
             print(traceback.format_exc())
             return None
 
+    @staticmethod
+    def get_pad_image_settings() -> Dict[str, Any]:
+        """
+        获取平板图片模式的系统设置
+
+        Returns:
+            Dict[str, Any]: 包含mode、quality、target_bytes、width的字典，
+                mode为pdf表示不生成图片
+        """
+        from database import SessionLocal
+        from services.image_encoder import ImageEncoder, normalize_format, DEFAULT_QUALITY
+        import crud
+
+        db = SessionLocal()
+        try:
+            mode = crud.get_system_setting(db, "pad_image_mode", "pdf")
+            quality_str = crud.get_system_setting(db, "pad_image_quality", str(DEFAULT_QUALITY))
+            target_kb_str = crud.get_system_setting(db, "pad_image_target_kb", "0")
+            width_str = crud.get_system_setting(db, "default_pdf_jpg_width", "1920")
+        finally:
+            db.close()
+
+        mode = (mode or "pdf").lower()
+        if mode != "pdf":
+            normalized = normalize_format(mode)
+            if normalized is None or not ImageEncoder.is_format_supported(normalized):
+                print(f"警告: 不支持的平板图片模式 {mode}，将使用PDF模式")
+                mode = "pdf"
+            else:
+                mode = normalized
+
+        try:
+            quality = int(quality_str)
+        except (TypeError, ValueError):
+            quality = DEFAULT_QUALITY
+
+        try:
+            target_kb = int(target_kb_str)
+        except (TypeError, ValueError):
+            target_kb = 0
+
+        try:
+            width = int(width_str)
+        except (TypeError, ValueError):
+            width = 1920
+
+        return {
+            "mode": mode,
+            "quality": quality,
+            "target_bytes": target_kb * 1024 if target_kb > 0 else None,
+            "width": width
+        }
+
+    @staticmethod
+    async def render_pad_images(pdf_path: str, output_dir: str, width: Optional[int], image_settings: Dict[str, Any]) -> Optional[str]:
+        """
+        按平板图片模式将PDF的每一页渲染为图片，并写入与PDF大小对比的报告
+
+        Args:
+            pdf_path (str): PDF文件的完整路径
+            output_dir (str): 输出图片的目录
+            width (int, optional): 输出图片的宽度，如果为None则使用系统默认设置
+            image_settings (Dict[str, Any]): get_pad_image_settings返回的设置
+
+        Returns:
+            Optional[str]: 第一页图片路径，失败时返回None
+        """
+        import json
+        from services.async_utils import AsyncUtils
+        from services.image_encoder import ImageEncoder
+        from services.raster_engine import RasterEngine
+
+        width = width or image_settings["width"]
+        if width not in [960, 1440, 1920]:
+            print(f"警告: 无效的宽度值 {width}，将使用默认值1920")
+            width = 1920
+
+        print(f"开始渲染平板图片: {pdf_path}, 格式: {image_settings['mode']}, 宽度: {width}")
+        pages = await RasterEngine.render_pages(
+            pdf_path, output_dir, 1.0, image_settings["mode"],
+            quality=image_settings["quality"],
+            target_bytes=image_settings["target_bytes"],
+            target_width=width
+        )
+
+        pdf_size = await AsyncUtils.run_in_threadpool(lambda: os.path.getsize(pdf_path))
+        report = ImageEncoder.build_size_report(
+            pdf_size, pages, image_settings["mode"], image_settings["quality"], image_settings["target_bytes"]
+        )
+        report["width"] = width
+        report["pages"] = [
+            {"page": page["page"], "filename": page["filename"], "bytes": page["bytes"], "quality": page["quality"]}
+            for page in pages
+        ]
+
+        def _write_report():
+            with open(os.path.join(output_dir, "image_report.json"), "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+
+        await AsyncUtils.run_in_threadpool(_write_report)
+        print(
+            f"平板图片渲染完成: {len(pages)} 页, 图片共 {report['image_bytes_formatted']}, "
+            f"PDF {report['pdf_size_formatted']}, 比例 {report['ratio_to_pdf']}"
+        )
+
+        return pages[0]["path"] if pages else None
+
     @staticmethod
     def convert_pdf_to_jpg_for_pad_sync(pdf_path: str, output_dir: str, width: int = None) -> Optional[str]:
         """
@@ -439,14 +734,9 @@ class PDFService:
             if not check_result:
                 return None
 
-            # 使用线程池打开PDF文件并获取页数
-            async def get_page_count():
-                def _get_page_count():
-                    with fitz.open(pdf_path) as pdf_document:
-                        return len(pdf_document)
-                return await AsyncUtils.run_in_threadpool(_get_page_count)
-
-            page_count = await get_page_count()
+            # 使用线程池读取PDF的交叉引用表获取页数，无法解析的文件退回fitz打开
+            from services.pdf_probe import PDFProbe
+            page_count = await AsyncUtils.run_in_threadpool(PDFProbe.get_page_count_sync, pdf_path)
             return page_count
 
         except Exception as e:
@@ -458,7 +748,7 @@ class PDFService:
     @staticmethod
     def get_pdf_page_count_sync(pdf_path: str) -> Optional[int]:
         """
-        同步版本的获取PDF页数函数，使用AsyncUtils来执行异步操作。
+        同步版本的获取PDF页数函数，直接在当前线程中读取PDF元数据。
 
         Args:
             pdf_path (str): PDF文件的完整路径
@@ -467,9 +757,10 @@ class PDFService:
             Optional[int]: PDF文件的总页数，如果获取失败则返回None
         """
         try:
-            # 使用AsyncUtils来运行异步函数
-            from services.async_utils import AsyncUtils
-            return AsyncUtils.run_sync(PDFService.get_pdf_page_count, pdf_path)
+            if not (os.path.exists(pdf_path) and pdf_path.lower().endswith(".pdf")):
+                return None
+            from services.pdf_probe import PDFProbe
+            return PDFProbe.get_page_count_sync(pdf_path)
         except Exception as e:
             print(f"同步获取PDF页数失败: {pdf_path}, 错误: {str(e)}")
             import traceback
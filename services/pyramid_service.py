@@ -0,0 +1,259 @@
+"""
+页面金字塔服务模块，在后台为PDF文件预先渲染多种分辨率的页面图片
+
+PDF文件绑定到议程项后，此模块在后台任务中将每一页按配置的宽度（默认960/1440/1920）
+分别渲染为JPG图片，保存在该PDF的JPG目录下的pyramid子目录中：
+
+    jpgs/<pdf_uuid>/pyramid/<宽度>/page_<页码>.jpg
+    jpgs/<pdf_uuid>/pyramid/manifest.json
+
+不同类型的平板可以直接获取与自身分辨率匹配的图片，请求路径上不再需要渲染。
+"""
+import os
+import json
+import shutil
+import asyncio
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+
+# 默认的金字塔宽度，可通过系统设置 pdf_pyramid_widths 修改（逗号分隔）
+DEFAULT_PYRAMID_WIDTHS = "960,1440,1920"
+
+# 允许的宽度范围（像素）
+MIN_PYRAMID_WIDTH = 320
+MAX_PYRAMID_WIDTH = 4096
+
+# 金字塔目录和清单文件名称
+PYRAMID_DIR_NAME = "pyramid"
+PYRAMID_MANIFEST_NAME = "manifest.json"
+
+
+def _render_pyramid_range(pdf_path: str, start: int, end: int, widths: List[int], output_dir: str) -> List[Dict[str, Any]]:
+    """
+    在渲染进程中将一段页面按多个宽度渲染为JPG图片
+
+    Args:
+        pdf_path (str): PDF文件路径
+        start (int): 起始页索引（从0开始，包含）
+        end (int): 结束页索引（不包含）
+        widths (List[int]): 需要渲染的宽度列表
+        output_dir (str): 金字塔输出目录，每个宽度对应一个子目录
+
+    Returns:
+        List[Dict[str, Any]]: 每一页在每个宽度下的渲染结果
+    """
+    import fitz  # PyMuPDF
+
+    results = []
+    with fitz.open(pdf_path) as pdf_document:
+        for page_num in range(start, min(end, len(pdf_document))):
+            page = pdf_document.load_page(page_num)
+            page_width = page.rect.width or 1.0
+
+            for width in widths:
+                zoom_factor = width / page_width
+                pixmap = page.get_pixmap(matrix=fitz.Matrix(zoom_factor, zoom_factor), alpha=False)
+
+                image_filename = f"page_{page_num + 1}.jpg"
+                pixmap.save(os.path.join(output_dir, str(width), image_filename), "jpeg")
+
+                results.append({
+                    "page": page_num + 1,
+                    "width": pixmap.width,
+                    "height": pixmap.height,
+                    "level": width,
+                    "filename": image_filename
+                })
+
+    return results
+
+
+class PyramidService:
+    """页面金字塔服务类，负责后台多分辨率渲染和清单读取"""
+
+    # 正在进行的金字塔渲染任务：JPG目录 -> 任务
+    _tasks: Dict[str, asyncio.Task] = {}
+
+    @staticmethod
+    def get_pyramid_widths() -> List[int]:
+        """
+        获取需要预渲染的宽度列表
+
+        从系统设置 pdf_pyramid_widths 读取，无效的值会被忽略。
+
+        Returns:
+            List[int]: 从小到大排序的宽度列表
+        """
+        from database import SessionLocal
+        import crud
+
+        db = SessionLocal()
+        try:
+            value = crud.get_system_setting(db, "pdf_pyramid_widths", DEFAULT_PYRAMID_WIDTHS)
+        finally:
+            db.close()
+
+        widths = set()
+        for item in str(value).split(","):
+            item = item.strip()
+            if not item:
+                continue
+            try:
+                width = int(item)
+            except ValueError:
+                print(f"警告: 无效的金字塔宽度 {item}，已忽略")
+                continue
+            if MIN_PYRAMID_WIDTH <= width <= MAX_PYRAMID_WIDTH:
+                widths.add(width)
+            else:
+                print(f"警告: 金字塔宽度 {width} 超出范围 {MIN_PYRAMID_WIDTH}-{MAX_PYRAMID_WIDTH}，已忽略")
+
+        return sorted(widths)
+
+    @staticmethod
+    def get_pyramid_dir(jpg_subdir: str) -> str:
+        """获取PDF对应的金字塔目录"""
+        return os.path.join(jpg_subdir, PYRAMID_DIR_NAME)
+
+    @staticmethod
+    def read_manifest_sync(jpg_subdir: str) -> Optional[Dict[str, Any]]:
+        """
+        读取PDF的金字塔清单（同步版本）
+
+        Args:
+            jpg_subdir (str): PDF对应的JPG目录
+
+        Returns:
+            Optional[Dict[str, Any]]: 清单内容，如果不存在或无法读取则返回None
+        """
+        manifest_path = os.path.join(PyramidService.get_pyramid_dir(jpg_subdir), PYRAMID_MANIFEST_NAME)
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    async def build_pyramid(pdf_path: str, jpg_subdir: str) -> Optional[Dict[str, Any]]:
+        """
+        为PDF文件渲染多分辨率页面金字塔并写入清单
+
+        渲染先写入临时目录，全部完成后再替换正式目录，客户端不会看到不完整的金字塔。
+        如果已有清单且宽度配置和PDF文件大小未变，则跳过渲染。
+
+        Args:
+            pdf_path (str): PDF文件路径
+            jpg_subdir (str): PDF对应的JPG目录
+
+        Returns:
+            Optional[Dict[str, Any]]: 生成的清单，跳过或失败时返回已有清单或None
+        """
+        from services.async_utils import AsyncUtils, EXECUTOR_CONTROL
+        from services.raster_engine import RasterEngine
+
+        widths = await AsyncUtils.run_in_executor(EXECUTOR_CONTROL, PyramidService.get_pyramid_widths)
+        if not widths:
+            print("未配置有效的金字塔宽度，跳过预渲染")
+            return None
+
+        try:
+            pdf_size = await AsyncUtils.run_in_threadpool(lambda: os.path.getsize(pdf_path))
+        except OSError:
+            print(f"PDF文件不存在，跳过页面金字塔预渲染: {pdf_path}")
+            return None
+
+        # 已有相同配置的金字塔时跳过
+        existing = await AsyncUtils.run_in_threadpool(PyramidService.read_manifest_sync, jpg_subdir)
+        if existing and existing.get("widths") == widths and existing.get("pdf_size") == pdf_size:
+            print(f"页面金字塔已存在，跳过预渲染: {jpg_subdir}")
+            return existing
+
+        pyramid_dir = PyramidService.get_pyramid_dir(jpg_subdir)
+        staging_dir = f"{pyramid_dir}.tmp"
+
+        def _prepare_staging():
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            for width in widths:
+                os.makedirs(os.path.join(staging_dir, str(width)), exist_ok=True)
+
+        await AsyncUtils.run_in_threadpool(_prepare_staging)
+
+        try:
+            page_count = await RasterEngine.get_page_count(pdf_path)
+            page_ranges = RasterEngine.split_page_ranges(page_count, RasterEngine.get_worker_count())
+            range_results = await asyncio.gather(*[
+                RasterEngine.run(_render_pyramid_range, pdf_path, start, end, widths, staging_dir)
+                for start, end in page_ranges
+            ])
+
+            levels = {str(width): [] for width in widths}
+            for pages in range_results:
+                for page in pages:
+                    levels[str(page["level"])].append({
+                        "page": page["page"],
+                        "filename": page["filename"],
+                        "width": page["width"],
+                        "height": page["height"]
+                    })
+            for pages in levels.values():
+                pages.sort(key=lambda item: item["page"])
+
+            manifest = {
+                "pdf": os.path.basename(pdf_path),
+                "pdf_size": pdf_size,
+                "page_count": page_count,
+                "widths": widths,
+                "levels": levels,
+                "generated_at": datetime.now().isoformat()
+            }
+
+            def _publish():
+                with open(os.path.join(staging_dir, PYRAMID_MANIFEST_NAME), "w", encoding="utf-8") as f:
+                    json.dump(manifest, f, ensure_ascii=False, indent=2)
+                shutil.rmtree(pyramid_dir, ignore_errors=True)
+                os.replace(staging_dir, pyramid_dir)
+
+            await AsyncUtils.run_in_threadpool(_publish)
+            print(f"页面金字塔生成完成: {pdf_path}, {page_count} 页, 宽度: {widths}")
+            return manifest
+
+        except Exception as e:
+            print(f"页面金字塔生成失败: {pdf_path}, 错误: {str(e)}")
+            await AsyncUtils.run_in_threadpool(lambda: shutil.rmtree(staging_dir, ignore_errors=True))
+            return None
+
+    @staticmethod
+    def schedule_pyramid(pdf_path: str, jpg_subdir: str) -> Optional[asyncio.Task]:
+        """
+        在后台任务中为PDF文件生成页面金字塔，不阻塞调用方
+
+        同一个JPG目录已有正在进行的任务时不会重复创建。
+
+        Args:
+            pdf_path (str): PDF文件路径
+            jpg_subdir (str): PDF对应的JPG目录
+
+        Returns:
+            Optional[asyncio.Task]: 后台任务，如果已有任务在进行则返回该任务
+        """
+        task = PyramidService._tasks.get(jpg_subdir)
+        if task is not None and not task.done():
+            return task
+
+        task = asyncio.create_task(PyramidService.build_pyramid(pdf_path, jpg_subdir))
+        PyramidService._tasks[jpg_subdir] = task
+
+        def _on_done(finished: asyncio.Task):
+            if PyramidService._tasks.get(jpg_subdir) is finished:
+                PyramidService._tasks.pop(jpg_subdir, None)
+
+        task.add_done_callback(_on_done)
+        print(f"已安排页面金字塔后台渲染: {pdf_path}")
+        return task
+
+    @staticmethod
+    def cancel_all():
+        """取消所有正在进行的金字塔渲染任务"""
+        for task in list(PyramidService._tasks.values()):
+            task.cancel()
@@ -0,0 +1,394 @@
+"""
+PDF光栅化引擎模块，使用进程池并行渲染PDF页面
+
+PyMuPDF的Document对象不是线程安全的，而且PIL/渲染工作在线程池中会受GIL限制。
+此模块将渲染工作分发到独立的工作进程中：每个工作进程为自己负责的页面范围
+单独打开文档句柄，渲染完成后立即关闭，进程之间不共享任何文档对象。
+
+进程数量默认与CPU核心数一致，渲染任务支持取消。
+"""
+import os
+import math
+import uuid
+import asyncio
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional
+
+
+# 每个工作进程平均分到的页面范围数量，范围越小负载越均衡，取消也越及时
+RANGES_PER_WORKER = 4
+
+
+class RasterCancelledError(Exception):
+    """渲染任务被取消时抛出的异常"""
+    pass
+
+
+class RasterJobConflictError(Exception):
+    """渲染任务ID已被正在进行的任务使用时抛出的异常"""
+    pass
+
+
+def normalize_job_id(job_id: str) -> str:
+    """
+    校验渲染任务ID并转换为标准UUID格式
+
+    任务ID会用作取消标记文件名和任务表的键，只接受UUID，避免路径分隔符等字符进入文件路径。
+
+    Args:
+        job_id (str): 渲染任务ID
+
+    Returns:
+        str: 标准格式的UUID字符串
+
+    Raises:
+        ValueError: 任务ID不是有效的UUID时
+    """
+    try:
+        return str(uuid.UUID(str(job_id)))
+    except (ValueError, AttributeError, TypeError):
+        raise ValueError(f"渲染任务ID必须是UUID: {job_id}")
+
+
+def _cancel_flag_path(job_id: str) -> str:
+    """获取渲染任务的取消标记文件路径，工作进程通过检查该文件判断任务是否被取消"""
+    return os.path.join(tempfile.gettempdir(), f"raster_cancel_{normalize_job_id(job_id)}")
+
+
+def _get_page_count(pdf_path: str) -> int:
+    """在工作进程中获取PDF总页数"""
+    import fitz  # PyMuPDF
+    with fitz.open(pdf_path) as pdf_document:
+        return len(pdf_document)
+
+
+def _render_page_range(
+    pdf_path: str,
+    start: int,
+    end: int,
+    zoom_factor: float,
+    output_folder: str,
+    image_format: str,
+    job_id: Optional[str] = None,
+    quality: Optional[int] = None,
+    target_bytes: Optional[int] = None,
+    target_width: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    在工作进程中渲染PDF的一段页面范围
+
+    每次调用都单独打开文档句柄，保证句柄只在当前进程中使用。
+    jpg/webp/avif格式由ImageEncoder编码（渐进式JPEG、支持质量和目标大小），其他格式直接由PyMuPDF保存。
+
+    Args:
+        pdf_path (str): PDF文件路径
+        start (int): 起始页索引（从0开始，包含）
+        end (int): 结束页索引（不包含）
+        zoom_factor (float): 缩放因子，指定target_width时忽略
+        output_folder (str): 输出目录
+        image_format (str): 输出图片格式，如jpg、png、webp、avif
+        job_id (str, optional): 渲染任务ID，用于检查取消标记
+        quality (int, optional): 编码质量
+        target_bytes (int, optional): 每页的目标字节数
+        target_width (int, optional): 输出图片宽度，指定时按每页的实际宽度计算缩放因子
+
+    Returns:
+        List[Dict[str, Any]]: 每一页的渲染结果，包含页码、文件名、路径、尺寸和字节数
+    """
+    import fitz  # PyMuPDF
+    from services.image_encoder import ImageEncoder, normalize_format
+
+    cancel_flag = _cancel_flag_path(job_id) if job_id else None
+    image_format = image_format.lower()
+    encoder_format = normalize_format(image_format)
+    extension = ImageEncoder.get_extension(image_format) if encoder_format else image_format
+    results = []
+
+    with fitz.open(pdf_path) as pdf_document:
+        for page_num in range(start, min(end, len(pdf_document))):
+            # 每渲染一页前检查是否已被取消
+            if cancel_flag and os.path.exists(cancel_flag):
+                break
+
+            page = pdf_document.load_page(page_num)
+            page_zoom = zoom_factor
+            if target_width:
+                page_zoom = target_width / page.rect.width if page.rect.width else 1.0
+            pixmap = page.get_pixmap(matrix=fitz.Matrix(page_zoom, page_zoom), alpha=False)
+
+            image_filename = f"page_{page_num + 1}.{extension}"
+            image_path = os.path.join(output_folder, image_filename)
+            used_quality = None
+
+            if encoder_format:
+                data, used_quality = ImageEncoder.encode_sync(
+                    ImageEncoder.pixmap_to_image(pixmap), encoder_format, quality, target_bytes
+                )
+                with open(image_path, "wb") as f:
+                    f.write(data)
+            else:
+                pixmap.save(image_path)
+
+            results.append({
+                "page": page_num + 1,
+                "filename": image_filename,
+                "path": image_path,
+                "width": pixmap.width,
+                "height": pixmap.height,
+                "bytes": os.path.getsize(image_path),
+                "quality": used_quality
+            })
+
+    return results
+
+
+class RasterEngine:
+    """PDF光栅化引擎类，管理渲染进程池和渲染任务"""
+
+    _executor: Optional[ProcessPoolExecutor] = None
+
+    # 正在运行的渲染任务：任务ID -> 该任务的所有future
+    _jobs: Dict[str, List[asyncio.Future]] = {}
+
+    @staticmethod
+    def get_worker_count() -> int:
+        """
+        获取渲染进程数量
+
+        Returns:
+            int: 进程数量，与CPU核心数一致
+        """
+        return max(os.cpu_count() or 1, 1)
+
+    @staticmethod
+    def get_executor() -> ProcessPoolExecutor:
+        """
+        获取渲染进程池，首次调用时创建
+
+        使用spawn方式启动工作进程，避免在多线程的服务进程中fork带来的死锁问题。
+
+        Returns:
+            ProcessPoolExecutor: 渲染进程池
+        """
+        if RasterEngine._executor is None:
+            worker_count = RasterEngine.get_worker_count()
+            RasterEngine._executor = ProcessPoolExecutor(
+                max_workers=worker_count,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+            print(f"PDF渲染进程池已启动，进程数: {worker_count}")
+        return RasterEngine._executor
+
+    @staticmethod
+    def shutdown():
+        """关闭渲染进程池，取消所有尚未开始的渲染任务"""
+        for job_id in list(RasterEngine._jobs.keys()):
+            RasterEngine.cancel(job_id)
+
+        if RasterEngine._executor is not None:
+            RasterEngine._executor.shutdown(wait=False, cancel_futures=True)
+            RasterEngine._executor = None
+            print("PDF渲染进程池已关闭")
+
+    @staticmethod
+    async def run(func: Callable[..., Any], *args) -> Any:
+        """
+        在渲染进程池中运行函数
+
+        func必须是模块级函数（或可按名称导入的静态方法），参数必须可以被pickle序列化。
+        如果进程池因工作进程崩溃而不可用，会重建进程池后抛出异常。
+
+        Args:
+            func (Callable): 要执行的函数
+            *args: 传递给函数的位置参数
+
+        Returns:
+            Any: 函数的返回值
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(RasterEngine.get_executor(), func, *args)
+        except BrokenProcessPool:
+            print("PDF渲染进程池已损坏，将在下次使用时重建")
+            RasterEngine._executor = None
+            raise
+
+    @staticmethod
+    async def get_page_count(pdf_path: str) -> int:
+        """
+        在渲染进程中获取PDF总页数
+
+        Args:
+            pdf_path (str): PDF文件路径
+
+        Returns:
+            int: PDF总页数
+        """
+        return await RasterEngine.run(_get_page_count, pdf_path)
+
+    @staticmethod
+    def split_page_ranges(page_count: int, worker_count: int) -> List[tuple]:
+        """
+        将页面划分为若干连续范围，以便分发给多个工作进程
+
+        Args:
+            page_count (int): 总页数
+            worker_count (int): 工作进程数量
+
+        Returns:
+            List[tuple]: (起始页索引, 结束页索引) 列表
+        """
+        if page_count <= 0:
+            return []
+        range_count = max(1, min(page_count, worker_count * RANGES_PER_WORKER))
+        range_size = math.ceil(page_count / range_count)
+        return [(start, min(start + range_size, page_count)) for start in range(0, page_count, range_size)]
+
+    @staticmethod
+    async def render_pages(
+        pdf_path: str,
+        output_folder: str,
+        zoom_factor: float,
+        image_format: str = "jpg",
+        job_id: Optional[str] = None,
+        quality: Optional[int] = None,
+        target_bytes: Optional[int] = None,
+        target_width: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        使用进程池将PDF的所有页面渲染为图片文件
+
+        页面被划分为多个范围并行渲染，结果按页码排序返回。
+        调用方的协程被取消（如客户端断开连接）或调用cancel(job_id)时，
+        尚未开始的范围会被取消，正在渲染的范围会在当前页完成后停止。
+
+        Args:
+            pdf_path (str): PDF文件路径
+            output_folder (str): 输出目录
+            zoom_factor (float): 缩放因子
+            image_format (str): 输出图片格式，默认为jpg
+            job_id (str, optional): 渲染任务ID（UUID），未指定时自动生成
+            quality (int, optional): 编码质量
+            target_bytes (int, optional): 每页的目标字节数
+            target_width (int, optional): 输出图片宽度，指定时忽略zoom_factor
+
+        Returns:
+            List[Dict[str, Any]]: 每一页的渲染结果，按页码排序
+
+        Raises:
+            ValueError: 当任务ID不是有效的UUID时
+            RasterJobConflictError: 当任务ID已被正在进行的任务使用时
+            RasterCancelledError: 当任务被取消时
+        """
+        job_id = normalize_job_id(job_id) if job_id else str(uuid.uuid4())
+        if job_id in RasterEngine._jobs:
+            raise RasterJobConflictError(f"渲染任务ID正在使用中: {job_id}")
+
+        # 在第一次await之前登记任务ID，并发请求使用相同ID时只有一个能登记成功；
+        # 同时清除之前使用相同ID的任务遗留的取消标记，避免新任务一开始就被取消
+        RasterEngine._jobs[job_id] = []
+        RasterEngine._remove_cancel_flag(job_id)
+        cancel_flag = _cancel_flag_path(job_id)
+
+        try:
+            page_count = await RasterEngine.get_page_count(pdf_path)
+            page_ranges = RasterEngine.split_page_ranges(page_count, RasterEngine.get_worker_count())
+
+            loop = asyncio.get_running_loop()
+            executor = RasterEngine.get_executor()
+            futures = [
+                loop.run_in_executor(
+                    executor, _render_page_range,
+                    pdf_path, start, end, zoom_factor, output_folder, image_format, job_id,
+                    quality, target_bytes, target_width
+                )
+                for start, end in page_ranges
+            ]
+        except BaseException:
+            RasterEngine._jobs.pop(job_id, None)
+            raise
+        RasterEngine._jobs[job_id] = futures
+
+        try:
+            # 使用return_exceptions，被cancel()取消的范围以CancelledError形式出现在结果中
+            range_results = await asyncio.gather(*futures, return_exceptions=True)
+        except asyncio.CancelledError:
+            # 调用方被取消，通知工作进程停止
+            RasterEngine.cancel(job_id)
+            raise
+        finally:
+            RasterEngine._jobs.pop(job_id, None)
+            cancelled = os.path.exists(cancel_flag)
+            if cancelled:
+                # 正在渲染的工作进程可能还未检查到取消标记，延迟删除标记文件
+                loop.call_later(60, RasterEngine._remove_cancel_flag, job_id)
+
+        for result in range_results:
+            if isinstance(result, BrokenProcessPool):
+                print("PDF渲染进程池已损坏，将在下次使用时重建")
+                RasterEngine._executor = None
+                raise result
+            if isinstance(result, BaseException) and not isinstance(result, asyncio.CancelledError):
+                raise result
+
+        if cancelled or any(isinstance(result, asyncio.CancelledError) for result in range_results):
+            raise RasterCancelledError(f"渲染任务已取消: {job_id}")
+
+        results = [page for pages in range_results for page in pages]
+        results.sort(key=lambda item: item["page"])
+        return results
+
+    @staticmethod
+    def _remove_cancel_flag(job_id: str):
+        """删除渲染任务的取消标记文件"""
+        try:
+            os.remove(_cancel_flag_path(job_id))
+        except OSError:
+            pass
+
+    @staticmethod
+    def cancel(job_id: str) -> bool:
+        """
+        取消渲染任务
+
+        尚未开始的页面范围直接取消，正在渲染的工作进程在检查到取消标记后停止。
+
+        Args:
+            job_id (str): 渲染任务ID
+
+        Returns:
+            bool: 任务存在并已发出取消请求返回True，否则返回False
+        """
+        try:
+            job_id = normalize_job_id(job_id)
+        except ValueError:
+            return False
+
+        futures = RasterEngine._jobs.get(job_id)
+        if futures is None:
+            return False
+
+        try:
+            with open(_cancel_flag_path(job_id), "w") as f:
+                f.write(job_id)
+        except OSError as e:
+            print(f"创建渲染任务取消标记失败: {job_id}, 错误: {str(e)}")
+
+        for future in futures:
+            future.cancel()
+
+        print(f"渲染任务已请求取消: {job_id}")
+        return True
+
+    @staticmethod
+    def get_running_jobs() -> List[str]:
+        """
+        获取正在运行的渲染任务ID列表
+
+        Returns:
+            List[str]: 渲染任务ID列表
+        """
+        return list(RasterEngine._jobs.keys())
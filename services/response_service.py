@@ -0,0 +1,428 @@
+"""
+响应服务模块，为轮询接口提供快速序列化、压缩和预序列化缓存
+
+数百台平板定时轮询会议状态和会议数据，每次轮询都要查询数据库、构建字典并序列化为JSON。此模块提供：
+- FastJSONResponse：应用默认的JSON响应类，安装了orjson时使用orjson序列化，否则使用标准json
+- CompressionMiddleware：超过大小阈值的响应按Accept-Encoding使用brotli或gzip压缩
+- ResponseCache：热点接口按数据版本缓存序列化并压缩后的响应体，
+  数据版本在每次修改数据库的提交后递增，版本不变时轮询直接返回缓存的字节，
+  客户端带If-None-Match请求且内容未变化时返回304；Accept为application/msgpack时返回MessagePack格式
+
+orjson、msgpack和brotli都是可选依赖，未安装时分别退回为标准json、只提供JSON和只使用gzip。
+"""
+import gzip
+import json
+import time
+import hashlib
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    # 可选依赖：更快的JSON序列化
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    # 可选依赖：MessagePack格式
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    # 可选依赖：Brotli压缩
+    import brotli
+except ImportError:
+    brotli = None
+
+# 小于此大小（字节）的响应不压缩
+COMPRESSION_MIN_SIZE = 1024
+# 中间件实时压缩使用的压缩级别
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+# 缓存的响应只压缩一次，可以使用更高的压缩级别
+CACHED_GZIP_LEVEL = 9
+CACHED_BROTLI_QUALITY = 11
+# 缓存响应的最长有效时间（秒），防止其他进程修改数据库后本进程长期返回旧数据
+RESPONSE_CACHE_MAX_AGE = 10.0
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+MSGPACK_ACCEPT_TYPES = ("application/msgpack", "application/x-msgpack")
+
+# 可以压缩的响应类型，PDF、图片和压缩包本身已压缩，不再压缩
+COMPRESSIBLE_TYPES = (
+    "text/", "application/json", "application/javascript", "application/xml",
+    "application/msgpack", "application/x-msgpack", "image/svg+xml"
+)
+
+
+def serialize_json(content: Any) -> bytes:
+    """
+    将内容序列化为JSON字节，安装了orjson时使用orjson
+
+    Args:
+        content (Any): 要序列化的内容
+
+    Returns:
+        bytes: UTF-8编码的JSON
+    """
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def _parse_header_tokens(value: Optional[str]) -> Dict[str, float]:
+    """解析Accept或Accept-Encoding请求头，返回 值 -> 权重"""
+    tokens = {}
+    if not value:
+        return tokens
+
+    for part in value.split(","):
+        params = part.strip().split(";")
+        token = params[0].strip().lower()
+        if not token:
+            continue
+        quality = 1.0
+        for param in params[1:]:
+            key, _, param_value = param.strip().partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(param_value)
+                except ValueError:
+                    quality = 0.0
+        tokens[token] = quality
+
+    return tokens
+
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    根据Accept-Encoding选择压缩方式，优先brotli，其次gzip
+
+    Args:
+        accept_encoding (str, optional): Accept-Encoding请求头
+
+    Returns:
+        str: br、gzip，不压缩时为None
+    """
+    tokens = _parse_header_tokens(accept_encoding)
+    if brotli is not None and tokens.get("br", 0) > 0:
+        return "br"
+    if tokens.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+def compress_body(body: bytes, encoding: str, cached: bool = False) -> bytes:
+    """
+    压缩响应体
+
+    Args:
+        body (bytes): 响应体
+        encoding (str): br或gzip
+        cached (bool): 是否为缓存的响应，缓存的响应只压缩一次，使用更高的压缩级别
+
+    Returns:
+        bytes: 压缩后的数据
+    """
+    if encoding == "br":
+        return brotli.compress(body, quality=CACHED_BROTLI_QUALITY if cached else BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=CACHED_GZIP_LEVEL if cached else GZIP_LEVEL, mtime=0)
+
+
+def wants_msgpack(accept: Optional[str]) -> bool:
+    """
+    检查客户端是否请求MessagePack格式，未安装msgpack时始终返回False
+
+    Args:
+        accept (str, optional): Accept请求头
+
+    Returns:
+        bool: 需要返回MessagePack返回True
+    """
+    if msgpack is None:
+        return False
+    tokens = _parse_header_tokens(accept)
+    return any(tokens.get(media_type, 0) > 0 for media_type in MSGPACK_ACCEPT_TYPES)
+
+
+class FastJSONResponse(JSONResponse):
+    """使用orjson序列化的JSON响应类，作为应用的默认响应类"""
+
+    media_type = JSON_MEDIA_TYPE
+
+    def render(self, content: Any) -> bytes:
+        return serialize_json(content)
+
+
+class CompressionMiddleware:
+    """
+    响应压缩中间件
+
+    只压缩一次性发送的响应（普通JSON和HTML响应），文件下载和流式响应原样转发；
+    已设置Content-Encoding的响应（如ResponseCache预压缩的响应）不再压缩。
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                # 等到第一块响应体再决定是否压缩
+                start_message = message
+                return
+
+            if message["type"] != "http.response.body" or start_message is None:
+                await send(message)
+                return
+
+            headers = MutableHeaders(raw=start_message["headers"])
+            body = message.get("body", b"")
+            content_type = headers.get("content-type", "").lower()
+
+            compressible = (
+                not message.get("more_body", False)
+                and "content-encoding" not in headers
+                and start_message["status"] not in (204, 304)
+                and len(body) >= self.minimum_size
+                and content_type.startswith(COMPRESSIBLE_TYPES)
+            )
+
+            if not compressible:
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            compressed = compress_body(body, encoding)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            headers.add_vary_header("Accept-Encoding")
+
+            passthrough = True
+            await send(start_message)
+            await send({"type": "http.response.body", "body": compressed, "more_body": False})
+
+        await self.app(scope, receive, send_wrapper)
+
+
+class _CachedPayload:
+    """一个缓存键在某个数据版本下的响应内容，各种格式和压缩方式按需生成后保存"""
+
+    def __init__(self, version: int, content: Any):
+        self.version = version
+        self.created = time.monotonic()
+        self.content = content
+        self.bodies: Dict[Tuple[str, Optional[str]], bytes] = {}
+        self.bodies[("json", None)] = serialize_json(content)
+        self.etag = '"' + hashlib.blake2b(self.bodies[("json", None)], digest_size=12).hexdigest() + '"'
+        self.lock = threading.RLock()
+
+    def get_body(self, body_format: str, encoding: Optional[str]) -> bytes:
+        """获取指定格式和压缩方式的响应体，第一次请求时生成"""
+        key = (body_format, encoding)
+        body = self.bodies.get(key)
+        if body is not None:
+            return body
+
+        with self.lock:
+            body = self.bodies.get(key)
+            if body is None:
+                if encoding:
+                    body = compress_body(self.get_body(body_format, None), encoding, cached=True)
+                elif body_format == "msgpack":
+                    body = msgpack.packb(self.content, use_bin_type=True)
+                else:
+                    body = serialize_json(self.content)
+                self.bodies[key] = body
+
+        return body
+
+
+class ResponseCache:
+    """热点接口响应缓存类，按数据版本缓存序列化并压缩后的响应"""
+
+    _version = 0
+    _version_lock = threading.Lock()
+    _entries: Dict[str, _CachedPayload] = {}
+    _tracking_installed = False
+
+    @staticmethod
+    def get_data_version() -> int:
+        """
+        获取当前数据版本
+
+        Returns:
+            int: 数据版本，每次修改数据库的提交后递增
+        """
+        return ResponseCache._version
+
+    @staticmethod
+    def bump_version():
+        """递增数据版本，使所有缓存的响应失效"""
+        with ResponseCache._version_lock:
+            ResponseCache._version += 1
+
+    @staticmethod
+    def install_version_tracking():
+        """
+        监听SQLAlchemy会话事件：会话中有修改（ORM刷新或批量UPDATE/DELETE）且提交成功后递增数据版本
+
+        应用启动时调用一次。
+        """
+        if ResponseCache._tracking_installed:
+            return
+
+        from sqlalchemy import event
+        from sqlalchemy.orm import Session
+
+        def _mark_changed(session, *args):
+            session.info["response_cache_changed"] = True
+
+        def _mark_orm_execute(orm_execute_state):
+            if orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert:
+                orm_execute_state.session.info["response_cache_changed"] = True
+
+        def _after_commit(session):
+            if session.info.pop("response_cache_changed", False):
+                ResponseCache.bump_version()
+
+        def _after_rollback(session):
+            session.info.pop("response_cache_changed", None)
+
+        event.listen(Session, "after_flush", _mark_changed)
+        event.listen(Session, "do_orm_execute", _mark_orm_execute)
+        event.listen(Session, "after_commit", _after_commit)
+        event.listen(Session, "after_soft_rollback", lambda session, previous_transaction: _after_rollback(session))
+
+        ResponseCache._tracking_installed = True
+        print("响应缓存数据版本跟踪已启用")
+
+    @staticmethod
+    def invalidate(prefix: Optional[str] = None):
+        """
+        删除缓存的响应
+
+        Args:
+            prefix (str, optional): 只删除以此开头的缓存键，为None时删除全部
+        """
+        for key in list(ResponseCache._entries.keys()):
+            if prefix is None or key.startswith(prefix):
+                ResponseCache._entries.pop(key, None)
+
+    @staticmethod
+    def _get_payload(key: str, version: int, max_age: float) -> Optional[_CachedPayload]:
+        """获取仍然有效的缓存内容"""
+        payload = ResponseCache._entries.get(key)
+        if payload is None or payload.version != version or time.monotonic() - payload.created > max_age:
+            return None
+        return payload
+
+    @staticmethod
+    def _store(key: str, payload: _CachedPayload):
+        """保存缓存内容，同时删除其他旧版本的缓存"""
+        for other_key, other in list(ResponseCache._entries.items()):
+            if other.version < payload.version:
+                ResponseCache._entries.pop(other_key, None)
+        ResponseCache._entries[key] = payload
+
+    @staticmethod
+    def _render(request: Request, payload: _CachedPayload) -> Response:
+        """按Accept和Accept-Encoding协商缓存内容的格式和压缩方式"""
+        body_format = "msgpack" if wants_msgpack(request.headers.get("accept")) else "json"
+        etag = payload.etag if body_format == "json" else payload.etag[:-1] + '-mp"'
+        headers = {"ETag": etag, "Vary": "Accept, Accept-Encoding", "Cache-Control": "no-cache"}
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+            return Response(status_code=304, headers=headers)
+
+        media_type = MSGPACK_MEDIA_TYPE if body_format == "msgpack" else JSON_MEDIA_TYPE
+        encoding = None
+        if len(payload.get_body(body_format, None)) >= COMPRESSION_MIN_SIZE:
+            encoding = choose_encoding(request.headers.get("accept-encoding"))
+        if encoding:
+            headers["Content-Encoding"] = encoding
+
+        return Response(content=payload.get_body(body_format, encoding), media_type=media_type, headers=headers)
+
+    @staticmethod
+    def respond(request: Request, key: str, builder: Callable[[], Any],
+                max_age: float = RESPONSE_CACHE_MAX_AGE) -> Response:
+        """
+        返回缓存的响应，数据版本变化或超过最长有效时间时调用builder重新生成
+
+        builder抛出的异常（如HTTPException）不会被缓存，直接向上抛出。
+
+        Args:
+            request (Request): 请求对象，用于内容协商
+            key (str): 缓存键
+            builder (Callable[[], Any]): 生成响应内容（可JSON序列化的对象）的函数
+            max_age (float): 缓存的最长有效时间（秒）
+
+        Returns:
+            Response: 按Accept和Accept-Encoding协商后的响应
+        """
+        # 在生成内容之前读取版本，生成期间发生的修改会在下次请求时重新生成
+        version = ResponseCache._version
+        payload = ResponseCache._get_payload(key, version, max_age)
+        if payload is None:
+            payload = _CachedPayload(version, builder())
+            ResponseCache._store(key, payload)
+
+        return ResponseCache._render(request, payload)
+
+    @staticmethod
+    async def respond_async(request: Request, key: str, builder: Callable[[], Awaitable[Any]],
+                            max_age: float = RESPONSE_CACHE_MAX_AGE) -> Response:
+        """
+        respond的异步版本，builder为返回响应内容的协程函数
+
+        Args:
+            request (Request): 请求对象，用于内容协商
+            key (str): 缓存键
+            builder (Callable[[], Awaitable[Any]]): 生成响应内容的协程函数
+            max_age (float): 缓存的最长有效时间（秒）
+
+        Returns:
+            Response: 按Accept和Accept-Encoding协商后的响应
+        """
+        version = ResponseCache._version
+        payload = ResponseCache._get_payload(key, version, max_age)
+        if payload is None:
+            payload = _CachedPayload(version, await builder())
+            ResponseCache._store(key, payload)
+
+        return ResponseCache._render(request, payload)
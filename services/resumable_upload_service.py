@@ -0,0 +1,375 @@
+"""
+可续传上传服务模块，实现类似tus协议的分块上传
+
+大文件通过普通表单上传时，一旦网络中断就必须从头重新上传。此模块将上传拆分为：
+1. 创建上传会话（声明文件名和总大小）
+2. 按偏移量分块追加数据（PATCH），每块写入后立即落盘
+3. 查询当前偏移量（HEAD），网络恢复后从该位置继续
+4. 完成上传，将文件移入uploads/temp，进入与普通临时文件相同的处理流程
+
+未完成的上传保存在uploads/temp/resumable中，超过有效期未更新的会话由FileService.cleanup_temp_files清理。
+"""
+import os
+import json
+import time
+import uuid
+import asyncio
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Optional
+
+import aiofiles
+
+# 获取项目根目录
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+
+# 上传目录
+UPLOAD_DIR = os.path.join(project_root, "uploads")
+# 临时文件目录
+TEMP_DIR = os.path.join(UPLOAD_DIR, "temp")
+# 未完成的可续传上传目录
+RESUMABLE_DIR = os.path.join(TEMP_DIR, "resumable")
+
+# 允许的最大文件大小（字节）
+MAX_UPLOAD_SIZE = 2 * 1024 * 1024 * 1024
+# 未完成上传的有效期（秒），超过此时间未更新的会话会被清理
+UPLOAD_EXPIRE_SECONDS = 24 * 60 * 60
+# 完成上传的结果保留时间（秒），客户端超时后重试完成请求时返回同一结果
+FINALIZE_RESULT_TTL_SECONDS = 60 * 60
+
+
+class ResumableUploadError(Exception):
+    """可续传上传错误，status_code对应返回给客户端的HTTP状态码"""
+
+    def __init__(self, status_code: int, message: str, offset: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+        self.offset = offset
+
+
+class ResumableUploadService:
+    """可续传上传服务类，管理上传会话、分块写入和完成上传"""
+
+    # 正在写入的上传会话，同一会话同时只允许一个PATCH请求
+    _locks: Dict[str, asyncio.Lock] = {}
+    # 正在完成或最近已完成的上传：上传会话ID -> 完成上传的任务，同一会话只完成一次
+    _finalize_tasks: Dict[str, asyncio.Task] = {}
+    # 已成功完成的上传的完成时间，用于清理过期的结果
+    _finalized_at: Dict[str, float] = {}
+
+    @staticmethod
+    def _get_paths(upload_id: str):
+        """获取上传会话的数据文件和元数据文件路径"""
+        # 只接受UUID格式的ID，防止路径穿越
+        try:
+            uuid.UUID(upload_id)
+        except ValueError:
+            raise ResumableUploadError(404, "上传会话不存在")
+        return (
+            os.path.join(RESUMABLE_DIR, f"{upload_id}.part"),
+            os.path.join(RESUMABLE_DIR, f"{upload_id}.json")
+        )
+
+    @staticmethod
+    def _read_meta_sync(upload_id: str) -> Dict[str, Any]:
+        """读取上传会话的元数据，并以磁盘上的实际数据大小作为当前偏移量"""
+        part_path, meta_path = ResumableUploadService._get_paths(upload_id)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            meta["offset"] = os.path.getsize(part_path)
+        except (OSError, ValueError):
+            raise ResumableUploadError(404, "上传会话不存在或已过期")
+        return meta
+
+    @staticmethod
+    def _write_meta_sync(upload_id: str, meta: Dict[str, Any]):
+        """原子写入上传会话的元数据"""
+        _, meta_path = ResumableUploadService._get_paths(upload_id)
+        tmp_path = f"{meta_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_path, meta_path)
+
+    @staticmethod
+    async def create_upload(filename: str, length: int) -> Dict[str, Any]:
+        """
+        创建上传会话
+
+        Args:
+            filename (str): 原始文件名，只允许PDF文件
+            length (int): 文件总大小（字节）
+
+        Returns:
+            Dict[str, Any]: 包含upload_id、offset和length的字典
+
+        Raises:
+            ResumableUploadError: 当文件类型或大小不合法时
+        """
+        from services.async_utils import AsyncUtils
+
+        filename = os.path.basename(filename or "")
+        if not filename.lower().endswith(".pdf"):
+            raise ResumableUploadError(400, "只允许上传PDF文件")
+        if length is None or length <= 0:
+            raise ResumableUploadError(400, "文件大小必须大于0")
+        if length > MAX_UPLOAD_SIZE:
+            raise ResumableUploadError(413, f"文件大小超过上限 {MAX_UPLOAD_SIZE} 字节")
+
+        upload_id = str(uuid.uuid4())
+        part_path, _ = ResumableUploadService._get_paths(upload_id)
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        meta = {
+            "upload_id": upload_id,
+            "filename": filename,
+            "length": length,
+            "created_at": now,
+            "updated_at": now
+        }
+
+        def _create():
+            os.makedirs(RESUMABLE_DIR, exist_ok=True)
+            open(part_path, "wb").close()
+            ResumableUploadService._write_meta_sync(upload_id, meta)
+
+        await AsyncUtils.run_in_threadpool(_create)
+        print(f"创建可续传上传会话: {upload_id}, 文件: {filename}, 大小: {length} 字节")
+
+        return {"upload_id": upload_id, "filename": filename, "offset": 0, "length": length}
+
+    @staticmethod
+    async def get_status(upload_id: str) -> Dict[str, Any]:
+        """
+        查询上传会话的当前偏移量
+
+        Args:
+            upload_id (str): 上传会话ID
+
+        Returns:
+            Dict[str, Any]: 包含upload_id、filename、offset和length的字典
+        """
+        from services.async_utils import AsyncUtils
+
+        meta = await AsyncUtils.run_in_threadpool(ResumableUploadService._read_meta_sync, upload_id)
+        return {
+            "upload_id": upload_id,
+            "filename": meta["filename"],
+            "offset": meta["offset"],
+            "length": meta["length"]
+        }
+
+    @staticmethod
+    async def append_chunk(upload_id: str, offset: int, stream: AsyncIterator[bytes]) -> int:
+        """
+        从指定偏移量追加一块数据
+
+        客户端提供的偏移量必须与服务器上已保存的数据大小一致，否则返回409和当前偏移量，
+        客户端据此从正确的位置继续上传。连接中途断开时，已写入的数据会被保留。
+
+        Args:
+            upload_id (str): 上传会话ID
+            offset (int): 本块数据的起始偏移量
+            stream (AsyncIterator[bytes]): 请求体数据流
+
+        Returns:
+            int: 写入后的新偏移量
+
+        Raises:
+            ResumableUploadError: 当会话不存在、偏移量不匹配、数据超出声明大小或会话正在被写入时
+        """
+        from services.async_utils import AsyncUtils
+
+        lock = ResumableUploadService._locks.setdefault(upload_id, asyncio.Lock())
+        if lock.locked():
+            raise ResumableUploadError(409, "该上传会话正在写入中")
+
+        async with lock:
+            try:
+                meta = await AsyncUtils.run_in_threadpool(ResumableUploadService._read_meta_sync, upload_id)
+                current_offset = meta["offset"]
+                if offset != current_offset:
+                    raise ResumableUploadError(409, "上传偏移量不匹配", offset=current_offset)
+
+                part_path, _ = ResumableUploadService._get_paths(upload_id)
+                new_offset = current_offset
+                try:
+                    async with aiofiles.open(part_path, "ab") as out_file:
+                        async for chunk in stream:
+                            if not chunk:
+                                continue
+                            if new_offset + len(chunk) > meta["length"]:
+                                raise ResumableUploadError(413, "上传数据超过声明的文件大小", offset=new_offset)
+                            await out_file.write(chunk)
+                            new_offset += len(chunk)
+                finally:
+                    # 无论是否中断都更新时间，避免正在续传的会话被清理
+                    meta["updated_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                    meta.pop("offset", None)
+                    await AsyncUtils.run_in_threadpool(ResumableUploadService._write_meta_sync, upload_id, meta)
+
+                return new_offset
+            finally:
+                ResumableUploadService._locks.pop(upload_id, None)
+
+    @staticmethod
+    async def finalize_upload(upload_id: str) -> Dict[str, Any]:
+        """
+        完成上传，将文件移入uploads/temp并生成与普通临时文件上传相同的文件信息
+
+        同一会话只完成一次：客户端超时后重试或并发发出的完成请求等待同一个完成过程，
+        在FINALIZE_RESULT_TTL_SECONDS内返回相同的结果。完成失败时可以重新请求。
+
+        Args:
+            upload_id (str): 上传会话ID
+
+        Returns:
+            Dict[str, Any]: 临时文件信息，格式与PDFService.upload_temp_files返回的uploaded_files元素相同
+
+        Raises:
+            ResumableUploadError: 当会话不存在或数据尚未上传完整时
+        """
+        ResumableUploadService._prune_finalized()
+
+        task = ResumableUploadService._finalize_tasks.get(upload_id)
+        if task is None:
+            # 先校验ID格式，无效的ID不创建任务
+            ResumableUploadService._get_paths(upload_id)
+            task = asyncio.ensure_future(ResumableUploadService._finalize(upload_id))
+            ResumableUploadService._finalize_tasks[upload_id] = task
+            task.add_done_callback(lambda done: ResumableUploadService._on_finalized(upload_id, done))
+        else:
+            print(f"重复的完成上传请求，返回同一结果: {upload_id}")
+
+        # 请求被取消（如客户端断开）时不中断完成过程，重试的请求仍可得到结果
+        return dict(await asyncio.shield(task))
+
+    @staticmethod
+    def _on_finalized(upload_id: str, task: asyncio.Task):
+        """完成上传的任务结束时调用：失败的任务被移除以便重试，成功的结果保留一段时间"""
+        if task.cancelled() or task.exception() is not None:
+            ResumableUploadService._finalize_tasks.pop(upload_id, None)
+        else:
+            ResumableUploadService._finalized_at[upload_id] = time.time()
+
+    @staticmethod
+    def _prune_finalized():
+        """移除超过保留时间的完成结果"""
+        now = time.time()
+        for upload_id, finished_at in list(ResumableUploadService._finalized_at.items()):
+            if now - finished_at > FINALIZE_RESULT_TTL_SECONDS:
+                ResumableUploadService._finalized_at.pop(upload_id, None)
+                ResumableUploadService._finalize_tasks.pop(upload_id, None)
+
+    @staticmethod
+    async def _finalize(upload_id: str) -> Dict[str, Any]:
+        """执行完成上传：检查数据已上传完整，移动文件并生成临时文件信息"""
+        from services.async_utils import AsyncUtils
+        from services.blob_store import BlobStore
+        from services.pdf_service import PDFService
+
+        if ResumableUploadService._locks.get(upload_id) is not None:
+            raise ResumableUploadError(409, "该上传会话正在写入中")
+
+        meta = await AsyncUtils.run_in_threadpool(ResumableUploadService._read_meta_sync, upload_id)
+        if meta["offset"] != meta["length"]:
+            raise ResumableUploadError(
+                409, f"上传尚未完成: {meta['offset']}/{meta['length']} 字节", offset=meta["offset"]
+            )
+
+        part_path, meta_path = ResumableUploadService._get_paths(upload_id)
+        safe_filename = f"{upload_id}_{meta['filename']}"
+        file_path = os.path.join(TEMP_DIR, safe_filename)
+
+        def _move():
+            os.replace(part_path, file_path)
+            os.remove(meta_path)
+
+        await AsyncUtils.run_in_threadpool(_move)
+        sha256 = await AsyncUtils.run_in_threadpool(BlobStore.compute_sha256_sync, file_path)
+        print(f"可续传上传完成: {upload_id}, 文件: {meta['filename']}")
+
+        return await PDFService.finalize_temp_file(file_path, meta["filename"], upload_id, sha256)
+
+    @staticmethod
+    async def abort_upload(upload_id: str) -> bool:
+        """
+        取消上传会话并删除已上传的数据
+
+        Args:
+            upload_id (str): 上传会话ID
+
+        Returns:
+            bool: 会话存在并已删除返回True
+        """
+        from services.async_utils import AsyncUtils
+
+        part_path, meta_path = ResumableUploadService._get_paths(upload_id)
+
+        def _remove():
+            removed = False
+            for path in (part_path, meta_path):
+                try:
+                    os.remove(path)
+                    removed = True
+                except FileNotFoundError:
+                    pass
+            return removed
+
+        return await AsyncUtils.run_in_threadpool(_remove)
+
+    @staticmethod
+    def cleanup_expired_sync(max_age_seconds: int = UPLOAD_EXPIRE_SECONDS) -> int:
+        """
+        清理超过有效期未更新的上传会话（同步版本）
+
+        Args:
+            max_age_seconds (int): 有效期（秒）
+
+        Returns:
+            int: 清理的会话数量
+        """
+        if not os.path.isdir(RESUMABLE_DIR):
+            return 0
+
+        now = time.time()
+        expired = 0
+        for filename in os.listdir(RESUMABLE_DIR):
+            if not filename.endswith(".json"):
+                continue
+            upload_id = filename[:-len(".json")]
+            if upload_id in ResumableUploadService._locks:
+                continue
+            try:
+                part_path, meta_path = ResumableUploadService._get_paths(upload_id)
+            except ResumableUploadError:
+                continue
+
+            # 以数据文件和元数据文件中较新的修改时间作为最后活动时间
+            last_active = 0.0
+            for path in (part_path, meta_path):
+                try:
+                    last_active = max(last_active, os.path.getmtime(path))
+                except OSError:
+                    pass
+
+            if now - last_active > max_age_seconds:
+                for path in (part_path, meta_path):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                expired += 1
+                print(f"[{datetime.now()}] 删除过期的可续传上传会话: {upload_id}")
+
+        # 清理没有元数据的孤立数据文件
+        for filename in os.listdir(RESUMABLE_DIR):
+            path = os.path.join(RESUMABLE_DIR, filename)
+            if filename.endswith(".part") and not os.path.exists(path[:-len(".part")] + ".json"):
+                try:
+                    if now - os.path.getmtime(path) > max_age_seconds:
+                        os.remove(path)
+                except OSError:
+                    pass
+
+        return expired
@@ -0,0 +1,135 @@
+"""
+数据库结构升级模块，在启动时将已有的SQLite数据库升级到models中定义的结构
+
+应用只调用create_all创建缺少的表，不会修改已存在的表。旧版本创建的数据库缺少后来新增的字段
+（meetings.package_path、package_fingerprint、version），议程项表仍以(meeting_id, position)为复合主键，
+查询时会报"no such column"。此模块比较PRAGMA table_info与模型定义：
+- 缺少的普通字段通过ALTER TABLE ADD COLUMN添加
+- 主键与模型不一致的表（SQLite不能直接修改主键）重建后复制数据，新主键字段使用模型的默认值生成
+
+每一步都先检查当前结构，已是最新结构时不做任何修改，可以在每次启动时重复执行。
+alembic/versions中的迁移脚本记录了相同的结构变化，供使用alembic管理的部署参考。
+"""
+from typing import Dict, List
+
+from sqlalchemy import Table, inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+
+class SchemaUpgrade:
+    """数据库结构升级类"""
+
+    @staticmethod
+    def get_columns(connection: Connection, table_name: str) -> Dict[str, Dict]:
+        """
+        读取表中已有的字段
+
+        Args:
+            connection (Connection): 数据库连接
+            table_name (str): 表名
+
+        Returns:
+            Dict[str, Dict]: 字段名 -> PRAGMA table_info返回的字段信息，表不存在时为空字典
+        """
+        rows = connection.execute(text(f'PRAGMA table_info("{table_name}")')).mappings().all()
+        return {row["name"]: dict(row) for row in rows}
+
+    @staticmethod
+    def get_primary_key(columns: Dict[str, Dict]) -> List[str]:
+        """按主键顺序返回主键字段名"""
+        primary_key = [column for column in columns.values() if column["pk"]]
+        return [column["name"] for column in sorted(primary_key, key=lambda column: column["pk"])]
+
+    @staticmethod
+    def add_column(connection: Connection, table: Table, column_name: str):
+        """
+        为已有的表添加模型中新增的字段
+
+        Args:
+            connection (Connection): 数据库连接
+            table (Table): 模型中定义的表
+            column_name (str): 字段名
+        """
+        column = table.columns[column_name]
+        column_type = column.type.compile(dialect=connection.dialect)
+        definition = f'"{column.name}" {column_type}'
+        if column.server_default is not None:
+            definition += f" DEFAULT '{column.server_default.arg}'"
+            if not column.nullable:
+                definition += " NOT NULL"
+        elif not column.nullable:
+            raise RuntimeError(f"无法为已有的表 {table.name} 添加没有默认值的非空字段 {column.name}")
+
+        connection.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN {definition}'))
+        print(f"数据库结构升级: 表 {table.name} 添加字段 {column.name}")
+
+    @staticmethod
+    def rebuild_table(connection: Connection, table: Table, old_columns: Dict[str, Dict]):
+        """
+        按模型定义重建表并复制原有数据
+
+        原表改名后创建新表，逐行复制两者共有的字段，新表中缺少的字段（如新的主键ID）由模型的默认值生成。
+
+        Args:
+            connection (Connection): 数据库连接
+            table (Table): 模型中定义的表
+            old_columns (Dict[str, Dict]): 原表中的字段
+        """
+        old_name = f"{table.name}_old"
+
+        # 原表上的索引与新表的索引同名，需要先删除
+        indexes = connection.execute(text(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :table AND sql IS NOT NULL"
+        ), {"table": table.name}).scalars().all()
+        for index_name in indexes:
+            connection.execute(text(f'DROP INDEX "{index_name}"'))
+
+        connection.execute(text(f'ALTER TABLE "{table.name}" RENAME TO "{old_name}"'))
+        table.create(connection)
+
+        # 按模型字段类型读取原有数据（如JSON字段解析为对象），插入时再按相同类型写入
+        common_columns = [column for column in table.columns if column.name in old_columns]
+        column_list = ", ".join(f'"{column.name}"' for column in common_columns)
+        rows = connection.execute(
+            text(f'SELECT {column_list} FROM "{old_name}"').columns(*common_columns)
+        ).mappings().all()
+        if rows:
+            # 逐行插入，每行分别生成默认值
+            connection.execute(table.insert(), [dict(row) for row in rows])
+
+        connection.execute(text(f'DROP TABLE "{old_name}"'))
+        print(f"数据库结构升级: 重建表 {table.name}，复制 {len(rows)} 行数据")
+
+    @staticmethod
+    def upgrade_sync(engine: Engine, metadata) -> int:
+        """
+        将数据库中已有的表升级到模型定义的结构（同步版本），缺少的表由create_all创建
+
+        Args:
+            engine (Engine): 数据库引擎
+            metadata: 模型的MetaData
+
+        Returns:
+            int: 修改的表数量
+        """
+        upgraded = 0
+        with engine.begin() as connection:
+            existing_tables = set(inspect(connection).get_table_names())
+            for table in metadata.sorted_tables:
+                if table.name not in existing_tables:
+                    continue
+
+                columns = SchemaUpgrade.get_columns(connection, table.name)
+                model_primary_key = [column.name for column in table.primary_key.columns]
+                if SchemaUpgrade.get_primary_key(columns) != model_primary_key:
+                    SchemaUpgrade.rebuild_table(connection, table, columns)
+                    upgraded += 1
+                    continue
+
+                missing = [column.name for column in table.columns if column.name not in columns]
+                for column_name in missing:
+                    SchemaUpgrade.add_column(connection, table, column_name)
+                if missing:
+                    upgraded += 1
+
+        return upgraded
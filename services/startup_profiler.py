@@ -0,0 +1,127 @@
+"""
+启动耗时分析模块，统计服务启动时各模块的导入耗时和各初始化阶段的耗时
+
+使用 python server.py --profile-startup 启动（或设置环境变量 PROFILE_STARTUP=1 后用uvicorn main:app启动），
+服务开始接受请求时输出报告：最慢的模块导入、各初始化阶段的耗时，以及从进程启动到可以提供服务的总耗时。
+未启用时只记录阶段耗时，不拦截导入，不影响启动速度。
+"""
+import os
+import sys
+import time
+import builtins
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+# 报告中列出的最慢模块数量
+REPORT_TOP_IMPORTS = 20
+# 导入耗时低于该值（秒）的模块不列出
+REPORT_MIN_IMPORT_SECONDS = 0.005
+
+
+class StartupProfiler:
+    """启动耗时分析类"""
+
+    enabled = "--profile-startup" in sys.argv or os.environ.get("PROFILE_STARTUP") == "1"
+
+    _started_at = time.perf_counter()
+    _original_import = None
+    _import_depth = 0
+    # 首次导入的模块：(模块名, 包含子模块在内的耗时, 嵌套深度)
+    _imports: List[Tuple[str, float, int]] = []
+    # 初始化阶段：(阶段名称, 耗时)
+    _phases: List[Tuple[str, float]] = []
+    _marks: Dict[str, float] = {}
+
+    @staticmethod
+    def start():
+        """开始统计，启用时拦截模块导入以记录每个模块首次导入的耗时"""
+        StartupProfiler._started_at = time.perf_counter()
+        if not StartupProfiler.enabled or StartupProfiler._original_import is not None:
+            return
+
+        original_import = builtins.__import__
+        StartupProfiler._original_import = original_import
+
+        def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+            # 只统计首次导入，已导入的模块直接返回
+            if level != 0 or name in sys.modules:
+                return original_import(name, globals, locals, fromlist, level)
+            depth = StartupProfiler._import_depth
+            StartupProfiler._import_depth += 1
+            started_at = time.perf_counter()
+            try:
+                return original_import(name, globals, locals, fromlist, level)
+            finally:
+                StartupProfiler._import_depth -= 1
+                StartupProfiler._imports.append((name, time.perf_counter() - started_at, depth))
+
+        builtins.__import__ = _timed_import
+
+    @staticmethod
+    def stop_import_tracking():
+        """停止拦截模块导入"""
+        if StartupProfiler._original_import is not None:
+            builtins.__import__ = StartupProfiler._original_import
+            StartupProfiler._original_import = None
+
+    @staticmethod
+    @contextmanager
+    def phase(name: str):
+        """
+        记录一个初始化阶段的耗时
+
+        Args:
+            name (str): 阶段名称
+        """
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            StartupProfiler._phases.append((name, time.perf_counter() - started_at))
+
+    @staticmethod
+    def mark(name: str):
+        """
+        记录从开始统计到当前时刻的耗时
+
+        Args:
+            name (str): 时刻名称，如"开始接受请求"
+        """
+        StartupProfiler._marks[name] = time.perf_counter() - StartupProfiler._started_at
+
+    @staticmethod
+    def report() -> str:
+        """
+        生成启动耗时报告
+
+        Returns:
+            str: 报告文本
+        """
+        lines = ["========== 启动耗时报告 =========="]
+
+        if StartupProfiler._imports:
+            lines.append(f"最慢的模块导入（包含其导入的子模块，最多 {REPORT_TOP_IMPORTS} 个）:")
+            slowest = sorted(StartupProfiler._imports, key=lambda item: item[1], reverse=True)
+            for name, seconds, depth in slowest[:REPORT_TOP_IMPORTS]:
+                if seconds < REPORT_MIN_IMPORT_SECONDS:
+                    break
+                lines.append(f"  {seconds * 1000:8.1f} ms  {name} (深度 {depth})")
+            heavy = [name for name in ("fitz", "PIL") if name in sys.modules]
+            lines.append(f"启动时已加载的PDF/图像模块: {', '.join(heavy) if heavy else '无'}")
+
+        if StartupProfiler._phases:
+            lines.append("初始化阶段:")
+            for name, seconds in StartupProfiler._phases:
+                lines.append(f"  {seconds * 1000:8.1f} ms  {name}")
+
+        for name, seconds in StartupProfiler._marks.items():
+            lines.append(f"{name}: {seconds * 1000:.1f} ms")
+
+        lines.append("==================================")
+        return "\n".join(lines)
+
+    @staticmethod
+    def print_report():
+        """启用时输出启动耗时报告"""
+        if StartupProfiler.enabled:
+            print(StartupProfiler.report())
@@ -3,7 +3,9 @@
 
 此模块提供用户认证、授权和管理的服务，包括用户登录、注册、信息更新等功能。
 """
-from typing import List, Dict, Any, Optional, Union
+import time
+import threading
+from typing import List, Dict, Any, Optional, Tuple, Union
 from fastapi import HTTPException, Depends, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
@@ -20,6 +22,10 @@ SECRET_KEY = "09d25e094faa6ca2556c818166b7a9563b93f7099f6f0f4caa6cf63b88e8d3e7"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7天
 
+# 已认证用户缓存：按令牌缓存解码和查询得到的用户，缓存时间（秒）和最大条目数
+PRINCIPAL_CACHE_TTL = 300
+PRINCIPAL_CACHE_MAX_SIZE = 1024
+
 # 密码哈希工具
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -29,6 +35,12 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/v1/users/login")
 class UserService:
     """用户服务类，处理用户认证和管理相关的业务逻辑"""
 
+    ACCESS_TOKEN_EXPIRE_MINUTES = ACCESS_TOKEN_EXPIRE_MINUTES
+
+    # 已认证用户缓存：令牌 -> (过期时间, 用户副本)，用户更新或删除时失效
+    _principal_cache: Dict[str, Tuple[float, models.User]] = {}
+    _principal_cache_lock = threading.Lock()
+
     @staticmethod
     def get_users(db: Session, skip: int = 0, limit: int = 100) -> List[models.User]:
         """
@@ -118,6 +130,7 @@ class UserService:
         db_user = crud.update_user(db=db, user_id=user_id, user_update=user_update)
         if db_user is None:
             raise HTTPException(status_code=404, detail="用户不存在")
+        UserService.invalidate_principal(user_id)
         return db_user
 
     @staticmethod
@@ -138,6 +151,7 @@ class UserService:
         success = crud.delete_user(db=db, user_id=user_id)
         if not success:
             raise HTTPException(status_code=404, detail="用户不存在")
+        UserService.invalidate_principal(user_id)
         return {"message": "用户已删除"}
 
     @staticmethod
@@ -191,6 +205,53 @@ class UserService:
             return False
         return user
 
+    @staticmethod
+    async def authenticate_user_async(db: Session, username: str, password: str) -> Union[models.User, bool]:
+        """
+        用户认证，密码验证在独立的密码哈希进程池中执行，不占用共享线程池
+
+        Args:
+            db (Session): 数据库会话对象
+            username (str): 用户名
+            password (str): 密码
+
+        Returns:
+            Union[models.User, bool]: 认证成功返回用户对象，失败返回False
+        """
+        from services.password_hasher import PasswordHasher
+
+        user = UserService.get_user_by_username(db, username)
+        if not user:
+            return False
+        if not await PasswordHasher.verify(password, user.hashed_password):
+            return False
+        return user
+
+    @staticmethod
+    async def login_async(db: Session, username: str, password: str) -> models.User:
+        """
+        用户登录，密码验证在独立的密码哈希进程池中执行
+
+        Args:
+            db (Session): 数据库会话对象
+            username (str): 用户名
+            password (str): 密码
+
+        Returns:
+            models.User: 登录成功的用户对象
+
+        Raises:
+            HTTPException: 当用户名或密码错误时，返回401错误
+        """
+        user = await UserService.authenticate_user_async(db, username, password)
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="用户名或密码错误",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        return user
+
     @staticmethod
     def login(db: Session, username: str, password: str) -> models.User:
         """
@@ -237,11 +298,64 @@ class UserService:
         encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
         return encoded_jwt
 
+    @staticmethod
+    def _get_cached_principal(token: str) -> Optional[models.User]:
+        """获取缓存的已认证用户，缓存过期时返回None"""
+        with UserService._principal_cache_lock:
+            entry = UserService._principal_cache.get(token)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                UserService._principal_cache.pop(token, None)
+                return None
+            return entry[1]
+
+    @staticmethod
+    def _cache_principal(token: str, user: models.User, token_expire: Optional[float]):
+        """
+        缓存已认证用户
+
+        缓存的是不属于任何数据库会话的用户副本，避免请求结束后会话关闭导致属性无法访问。
+        缓存时间不超过PRINCIPAL_CACHE_TTL，也不超过令牌本身的过期时间。
+        """
+        expires_at = time.time() + PRINCIPAL_CACHE_TTL
+        if token_expire:
+            expires_at = min(expires_at, token_expire)
+        principal = models.User(**{
+            column.name: getattr(user, column.name) for column in models.User.__table__.columns
+        })
+
+        with UserService._principal_cache_lock:
+            UserService._principal_cache.pop(token, None)
+            while len(UserService._principal_cache) >= PRINCIPAL_CACHE_MAX_SIZE:
+                # 删除最早缓存的条目
+                UserService._principal_cache.pop(next(iter(UserService._principal_cache)))
+            UserService._principal_cache[token] = (expires_at, principal)
+
+    @staticmethod
+    def invalidate_principal(user_id: Optional[int] = None):
+        """
+        使已认证用户缓存失效
+
+        Args:
+            user_id (int, optional): 用户ID，只删除该用户的缓存；未指定时清空缓存
+        """
+        with UserService._principal_cache_lock:
+            if user_id is None:
+                UserService._principal_cache.clear()
+                return
+            for token, (_, principal) in list(UserService._principal_cache.items()):
+                if principal.id == user_id:
+                    UserService._principal_cache.pop(token, None)
+
     @staticmethod
     def get_current_user(db: Session, token: str) -> models.User:
         """
         获取当前用户
 
+        解码和查询的结果按令牌缓存，缓存时间内同一令牌的请求不再解码令牌和查询数据库。
+        用户被更新或删除时缓存失效。
+
         Args:
             db (Session): 数据库会话对象
             token (str): JWT令牌
@@ -257,6 +371,10 @@ class UserService:
             detail="无法验证凭据",
             headers={"WWW-Authenticate": "Bearer"},
         )
+        principal = UserService._get_cached_principal(token)
+        if principal is not None:
+            return principal
+
         try:
             payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
             username: str = payload.get("sub")
@@ -268,4 +386,5 @@ class UserService:
         user = UserService.get_user_by_username(db, username=token_data.username)
         if user is None:
             raise credentials_exception
+        UserService._cache_principal(token, user, payload.get("exp"))
         return user
@@ -0,0 +1,195 @@
+"""
+流式ZIP模块，边读取文件边生成ZIP数据，直接作为响应体返回
+
+与zipfile写入BytesIO或临时文件不同，此模块不在内存或磁盘中保存整个压缩包：
+- 所有成员使用存储模式（PDF本身已压缩），CRC在读取文件时计算，写在每个成员后的数据描述符中
+- 成员大小在开始前通过stat获取，因此可以预先计算出整个压缩包的Content-Length
+- 内存占用只与读取块大小有关，与文件数量和大小无关
+
+只支持ZIP32格式：单个文件和整个压缩包都不能超过4GB，成员数量不能超过65535个。
+"""
+import os
+import time
+import zlib
+import struct
+from typing import AsyncIterator, Dict, Iterable, List, Optional
+
+import aiofiles
+
+# 每次读取的块大小
+STREAM_CHUNK_SIZE = 256 * 1024
+
+# ZIP32格式的限制
+ZIP32_MAX_SIZE = 0xFFFFFFFF
+ZIP32_MAX_ENTRIES = 0xFFFF
+
+# 通用标志：第3位表示CRC和大小写在数据描述符中，第11位表示文件名使用UTF-8编码
+ZIP_FLAGS = 0x0008 | 0x0800
+# 解压所需的版本（2.0）
+ZIP_VERSION = 20
+
+LOCAL_HEADER_STRUCT = struct.Struct("<IHHHHHIIIHH")
+DATA_DESCRIPTOR_STRUCT = struct.Struct("<IIII")
+CENTRAL_HEADER_STRUCT = struct.Struct("<IHHHHHHIIIHHHHHII")
+END_RECORD_STRUCT = struct.Struct("<IHHHHIIH")
+
+
+def _dos_datetime(timestamp: float):
+    """将时间戳转换为ZIP使用的DOS日期和时间"""
+    t = time.localtime(timestamp)
+    year = min(max(t.tm_year, 1980), 2107)
+    dos_time = (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2)
+    dos_date = ((year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+    return dos_time, dos_date
+
+
+class ZipStreamEntry:
+    """流式ZIP中的一个成员，内容来自磁盘文件或内存中的数据"""
+
+    def __init__(self, arcname: str, path: Optional[str] = None, data: Optional[bytes] = None):
+        """
+        Args:
+            arcname (str): 成员在压缩包中的路径
+            path (str, optional): 磁盘文件路径
+            data (bytes, optional): 成员内容（如README或清单），与path二选一
+
+        Raises:
+            OSError: 当文件不存在时
+        """
+        if (path is None) == (data is None):
+            raise ValueError("必须且只能指定path或data之一")
+
+        self.arcname = arcname.replace(os.sep, "/").lstrip("/")
+        self.name_bytes = self.arcname.encode("utf-8")
+        self.path = path
+        self.data = data
+
+        if path is not None:
+            stat = os.stat(path)
+            self.size = stat.st_size
+            self.mtime = stat.st_mtime
+        else:
+            self.size = len(data)
+            self.mtime = time.time()
+
+
+class ZipStream:
+    """流式ZIP生成器"""
+
+    def __init__(self, entries: Iterable[ZipStreamEntry], chunk_size: int = STREAM_CHUNK_SIZE):
+        """
+        Args:
+            entries (Iterable[ZipStreamEntry]): 压缩包成员
+            chunk_size (int): 读取文件时的块大小
+
+        Raises:
+            ValueError: 当成员数量或大小超过ZIP32限制时
+        """
+        self.entries: List[ZipStreamEntry] = ZipStream._deduplicate(list(entries))
+        self.chunk_size = chunk_size
+
+        if len(self.entries) > ZIP32_MAX_ENTRIES:
+            raise ValueError(f"压缩包成员数量超过限制: {len(self.entries)}")
+        if self.content_length() > ZIP32_MAX_SIZE:
+            raise ValueError("压缩包大小超过4GB，无法生成")
+
+    @staticmethod
+    def _deduplicate(entries: List[ZipStreamEntry]) -> List[ZipStreamEntry]:
+        """为重名成员添加序号，如 报告.pdf、报告 (2).pdf"""
+        seen: Dict[str, int] = {}
+        for entry in entries:
+            name = entry.arcname
+            if name in seen:
+                seen[name] += 1
+                base, ext = os.path.splitext(name)
+                candidate = f"{base} ({seen[name]}){ext}"
+                while candidate in seen:
+                    seen[name] += 1
+                    candidate = f"{base} ({seen[name]}){ext}"
+                entry.arcname = candidate
+                entry.name_bytes = candidate.encode("utf-8")
+            seen.setdefault(entry.arcname, 1)
+        return entries
+
+    def content_length(self) -> int:
+        """
+        计算整个压缩包的字节数
+
+        Returns:
+            int: 压缩包大小
+        """
+        total = END_RECORD_STRUCT.size
+        for entry in self.entries:
+            name_length = len(entry.name_bytes)
+            total += LOCAL_HEADER_STRUCT.size + name_length + entry.size + DATA_DESCRIPTOR_STRUCT.size
+            total += CENTRAL_HEADER_STRUCT.size + name_length
+        return total
+
+    async def _iter_entry_data(self, entry: ZipStreamEntry) -> AsyncIterator[bytes]:
+        """读取成员内容，最多读取开始前记录的大小"""
+        if entry.data is not None:
+            yield entry.data
+            return
+
+        remaining = entry.size
+        async with aiofiles.open(entry.path, "rb") as f:
+            while remaining > 0:
+                chunk = await f.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    # 文件在生成过程中被截断，已声明的Content-Length无法满足，只能中断响应
+                    raise IOError(f"文件在生成压缩包时被修改: {entry.path}")
+                remaining -= len(chunk)
+                yield chunk
+
+    async def iter_bytes(self) -> AsyncIterator[bytes]:
+        """
+        逐块生成压缩包数据
+
+        Yields:
+            bytes: 压缩包数据块
+        """
+        central_records = []
+        offset = 0
+
+        for entry in self.entries:
+            dos_time, dos_date = _dos_datetime(entry.mtime)
+            header = LOCAL_HEADER_STRUCT.pack(
+                0x04034B50, ZIP_VERSION, ZIP_FLAGS, 0, dos_time, dos_date,
+                0, 0, 0, len(entry.name_bytes), 0
+            ) + entry.name_bytes
+            yield header
+
+            crc = 0
+            async for chunk in self._iter_entry_data(entry):
+                crc = zlib.crc32(chunk, crc)
+                yield chunk
+            crc &= 0xFFFFFFFF
+
+            yield DATA_DESCRIPTOR_STRUCT.pack(0x08074B50, crc, entry.size, entry.size)
+
+            central_records.append(CENTRAL_HEADER_STRUCT.pack(
+                0x02014B50, ZIP_VERSION, ZIP_VERSION, ZIP_FLAGS, 0, dos_time, dos_date,
+                crc, entry.size, entry.size, len(entry.name_bytes), 0, 0, 0, 0, 0, offset
+            ) + entry.name_bytes)
+            offset += len(header) + entry.size + DATA_DESCRIPTOR_STRUCT.size
+
+        central_directory = b"".join(central_records)
+        yield central_directory
+        yield END_RECORD_STRUCT.pack(
+            0x06054B50, 0, 0, len(self.entries), len(self.entries), len(central_directory), offset, 0
+        )
+
+    def get_response_headers(self, filename: str) -> Dict[str, str]:
+        """
+        生成下载响应的头部
+
+        Args:
+            filename (str): 下载文件名（ASCII）
+
+        Returns:
+            Dict[str, str]: 包含Content-Length和Content-Disposition的字典
+        """
+        return {
+            "Content-Length": str(self.content_length()),
+            "Content-Disposition": f'attachment; filename="{filename}"'
+        }
@@ -47,6 +47,92 @@ document.addEventListener('DOMContentLoaded', () => {
 
         // 绑定翻页按钮事件
         initPaginationEvents();
+
+        // 绑定预览窗口事件
+        initPreviewModal();
+    }
+
+    // 预览相关变量
+    let previewFileId = null;
+    let previewPage = 1;
+
+    // 初始化预览窗口事件
+    function initPreviewModal() {
+        const modal = document.getElementById('previewModal');
+        const closeBtn = document.getElementById('closePreviewModal');
+        const prevBtn = document.getElementById('previewPrevBtn');
+        const nextBtn = document.getElementById('previewNextBtn');
+        const image = document.getElementById('previewImage');
+        if (!modal || !image) return;
+
+        closeBtn.addEventListener('click', closePreview);
+        window.addEventListener('click', e => {
+            if (e.target === modal) {
+                closePreview();
+            }
+        });
+
+        prevBtn.addEventListener('click', () => {
+            if (previewPage > 1) {
+                loadPreviewPage(previewPage - 1);
+            }
+        });
+        nextBtn.addEventListener('click', () => loadPreviewPage(previewPage + 1));
+
+        image.addEventListener('load', () => {
+            image.style.display = 'inline';
+            document.getElementById('previewStatus').style.display = 'none';
+            prevBtn.disabled = previewPage <= 1;
+            nextBtn.disabled = false;
+        });
+        image.addEventListener('error', () => {
+            // 下一页不存在时回到上一页，并禁用下一页按钮
+            if (previewPage > 1) {
+                previewPage--;
+                document.getElementById('previewPageNumber').textContent = previewPage;
+                image.src = buildPreviewUrl(previewFileId, previewPage);
+                nextBtn.disabled = true;
+                return;
+            }
+            image.style.display = 'none';
+            const status = document.getElementById('previewStatus');
+            status.textContent = '无法预览该文件';
+            status.style.display = 'block';
+        });
+    }
+
+    // 构建页面图片URL，只渲染被请求的页面
+    function buildPreviewUrl(fileId, page) {
+        return `/api/v1/documents/${fileId}/pages/${page}.jpg?width=960`;
+    }
+
+    // 打开预览窗口并显示第一页
+    function openPreview(fileId, fileName) {
+        previewFileId = fileId;
+        document.getElementById('previewTitle').textContent = fileName || '文件预览';
+        document.getElementById('previewModal').style.display = 'block';
+        loadPreviewPage(1);
+    }
+
+    // 加载指定页面
+    function loadPreviewPage(page) {
+        previewPage = page;
+        document.getElementById('previewPageNumber').textContent = page;
+        const status = document.getElementById('previewStatus');
+        status.textContent = '加载中...';
+        status.style.display = 'block';
+        document.getElementById('previewPrevBtn').disabled = true;
+        document.getElementById('previewNextBtn').disabled = true;
+        document.getElementById('previewImage').src = buildPreviewUrl(previewFileId, page);
+    }
+
+    // 关闭预览窗口
+    function closePreview() {
+        const image = document.getElementById('previewImage');
+        image.removeAttribute('src');
+        image.style.display = 'none';
+        document.getElementById('previewModal').style.display = 'none';
+        previewFileId = null;
     }
 
     // 初始化翻页事件
@@ -292,6 +378,7 @@ document.addEventListener('DOMContentLoaded', () => {
                             <td>${file.upload_time || '-'}</td>
                             <td>${file.meeting_title || '未绑定任何会议'}</td>
                             <td>
+                                <button class="btn-action preview" data-id="${file.id}" data-name="${file.name || ''}">预览</button>
                                 <a href="${fileUrl}" target="_blank" class="btn-action view">查看</a>
                                 <button class="btn-action download" data-id="${file.id}" data-url="${fileUrl}">下载</button>
                                 <button class="btn-action delete ${disabledClass}" data-id="${file.id}" ${disabledTitle}>删除</button>
@@ -368,6 +455,13 @@ document.addEventListener('DOMContentLoaded', () => {
 
     // 文件操作按钮的事件监听器
     function attachFileActionListeners(container) {
+        // 预览按钮
+        container.querySelectorAll('.btn-action.preview').forEach(button => {
+            button.addEventListener('click', e => {
+                openPreview(e.target.dataset.id, e.target.dataset.name);
+            });
+        });
+
         // 下载按钮
         container.querySelectorAll('.btn-action.download').forEach(button => {
             button.addEventListener('click', e => {
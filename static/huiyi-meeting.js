@@ -749,23 +749,20 @@ document.addEventListener('DOMContentLoaded', () => {
                 });
 
                 try {
-                    // 创建FormData对象
-                    const formData = new FormData();
-                    pendingFiles.forEach(file => {
-                        formData.append('files', file);
-                    });
-
-                    // 发送临时文件上传请求
-                    const response = await fetch('/api/v1/pdf/upload-temp', {
-                        method: 'POST',
-                        body: formData
-                    });
-
-                    if (!response.ok) {
-                        throw new Error(`上传失败: ${response.status} ${response.statusText}`);
+                    // 使用可续传上传逐个上传文件，网络中断后从已上传的位置继续
+                    const result = { uploaded_files: [] };
+                    for (let i = 0; i < pendingFiles.length; i++) {
+                        const progressItem = fileItems[i];
+                        const fileInfo = await uploadFileResumable(pendingFiles[i], (loaded, total) => {
+                            if (!progressItem) return;
+                            const percent = total > 0 ? Math.floor(loaded * 100 / total) : 100;
+                            const bar = progressItem.querySelector('.progress-bar');
+                            const text = progressItem.querySelector('.progress-text');
+                            if (bar) bar.style.width = `${percent}%`;
+                            if (text) text.textContent = `${percent}%`;
+                        });
+                        result.uploaded_files.push(fileInfo);
                     }
-
-                    const result = await response.json();
                     console.log('上传成功:', result);
 
                     // 将上传的文件信息存储到议程项中
@@ -847,6 +844,84 @@ document.addEventListener('DOMContentLoaded', () => {
 
     }
 
+    // 可续传上传的分块大小（4MB）和每块的最大重试次数
+    const RESUMABLE_CHUNK_SIZE = 4 * 1024 * 1024;
+    const RESUMABLE_MAX_RETRIES = 8;
+
+    // 查询服务器上已保存的偏移量
+    async function getResumableOffset(uploadUrl) {
+        const response = await fetch(uploadUrl, { method: 'HEAD', cache: 'no-store' });
+        if (!response.ok) {
+            throw new Error(`查询上传进度失败: ${response.status}`);
+        }
+        return parseInt(response.headers.get('Upload-Offset') || '0', 10);
+    }
+
+    // 使用可续传上传协议上传单个文件，返回与/upload-temp相同格式的文件信息
+    async function uploadFileResumable(file, onProgress) {
+        const createResponse = await fetch('/api/v1/pdf/uploads', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ filename: file.name, length: file.size })
+        });
+        if (!createResponse.ok) {
+            const errorData = await createResponse.json().catch(() => ({}));
+            throw new Error(errorData.error || `创建上传失败: ${createResponse.status}`);
+        }
+        const session = await createResponse.json();
+        const uploadUrl = session.upload_url;
+
+        let offset = 0;
+        let retries = 0;
+        while (offset < file.size) {
+            const chunk = file.slice(offset, Math.min(offset + RESUMABLE_CHUNK_SIZE, file.size));
+            try {
+                const response = await fetch(uploadUrl, {
+                    method: 'PATCH',
+                    headers: {
+                        'Upload-Offset': String(offset),
+                        'Content-Type': 'application/offset+octet-stream'
+                    },
+                    body: chunk
+                });
+
+                if (response.status === 409 && response.headers.get('Upload-Offset') !== null) {
+                    // 偏移量不一致（例如上一块在服务器已写入但响应丢失），从服务器的偏移量继续
+                    offset = parseInt(response.headers.get('Upload-Offset'), 10);
+                    continue;
+                }
+                if (!response.ok) {
+                    throw new Error(`上传分块失败: ${response.status}`);
+                }
+
+                offset = parseInt(response.headers.get('Upload-Offset'), 10);
+                retries = 0;
+                if (onProgress) onProgress(offset, file.size);
+            } catch (error) {
+                // 网络中断：等待后查询服务器偏移量，只重新发送未保存的数据
+                retries += 1;
+                if (retries > RESUMABLE_MAX_RETRIES) {
+                    throw error;
+                }
+                console.warn(`上传中断，第 ${retries} 次重试:`, error);
+                await new Promise(resolve => setTimeout(resolve, Math.min(1000 * 2 ** (retries - 1), 30000)));
+                try {
+                    offset = await getResumableOffset(uploadUrl);
+                } catch (statusError) {
+                    console.warn('查询上传进度失败，稍后重试:', statusError);
+                }
+            }
+        }
+
+        const finalizeResponse = await fetch(`${uploadUrl}/finalize`, { method: 'POST' });
+        if (!finalizeResponse.ok) {
+            const errorData = await finalizeResponse.json().catch(() => ({}));
+            throw new Error(errorData.error || `完成上传失败: ${finalizeResponse.status}`);
+        }
+        const finalizeResult = await finalizeResponse.json();
+        return finalizeResult.uploaded_files[0];
+    }
+
     // 处理会议表单提交
     function handleMeetingFormSubmit(e) {
         e.preventDefault();
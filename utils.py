@@ -27,6 +27,58 @@ def format_file_size(size_bytes):
     return f"{s} {size_names[i]}"
 
 
+def get_agenda_folder_name(agenda_item_id):
+    """
+    获取议程项文件夹名称。
+
+    文件夹以稳定的议程项ID命名，调整议程顺序时文件夹不变。
+    早期版本创建的议程项文件夹为agenda_<位置>，这些文件夹中的文件路径仍记录在文件信息中。
+
+    Args:
+        agenda_item_id (str): 议程项ID
+
+    Returns:
+        str: 文件夹名称，如"item_<议程项ID>"
+    """
+    return f"item_{agenda_item_id}"
+
+
+def is_agenda_folder_name(folder_name):
+    """
+    判断会议目录中的子目录是否为议程项文件夹（item_<ID>或早期的agenda_<位置>）。
+
+    Args:
+        folder_name (str): 子目录名称
+
+    Returns:
+        bool: 是议程项文件夹返回True
+    """
+    return folder_name.startswith("item_") or folder_name.startswith("agenda_")
+
+
+def get_agenda_item_folders(agenda_item_id, files):
+    """
+    获取议程项使用的所有文件夹名称：以ID命名的文件夹，以及文件信息中记录的早期文件夹。
+
+    Args:
+        agenda_item_id (str): 议程项ID
+        files (list): 议程项的文件信息列表
+
+    Returns:
+        list: 文件夹名称列表，以ID命名的文件夹在最前面
+    """
+    folders = [get_agenda_folder_name(agenda_item_id)]
+    for file_info in files or []:
+        if not isinstance(file_info, dict):
+            continue
+        folder = file_info.get("agenda_folder")
+        if not folder and file_info.get("path"):
+            folder = os.path.basename(os.path.dirname(file_info["path"]))
+        if folder and is_agenda_folder_name(folder) and folder not in folders:
+            folders.append(folder)
+    return folders
+
+
 # 此函数已移动到services/pdf_service.py中
 async def ensure_jpg_for_pdf(pdf_path, jpg_dir, width=1920):
     """